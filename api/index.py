@@ -14,7 +14,11 @@ sys.path.insert(0, str(BASE_DIR))
 
 # Importar módulos do sistema
 from src.routes.checkup_intelligent import checkup_intelligent_bp
+from src.routes.prevent import prevent_bp
+from src.routes.pdf_jobs import pdf_jobs_bp
 from src.utils.analytics import analytics
+from src.utils.observability import register_observability
+from src.utils.template_env import preload_templates
 
 # Criar aplicação Flask
 app = Flask(__name__)
@@ -23,8 +27,16 @@ app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-secret-key-change-i
 # Configurar CORS
 CORS(app, resources={r"/api/*": {"origins": "*"}})
 
+# Server-Timing e /metrics
+register_observability(app)
+
 # Registrar blueprints
 app.register_blueprint(checkup_intelligent_bp, url_prefix='/api')
+app.register_blueprint(prevent_bp, url_prefix='/api')
+app.register_blueprint(pdf_jobs_bp, url_prefix='/api')
+
+# Compilar templates de documentos na inicialização
+preload_templates()
 
 @app.route('/')
 def index():
@@ -0,0 +1,9 @@
+"""
+Benchmarks do check-up inteligente
+
+    python -m benchmarks --saida resultados.json
+
+cohort: coorte sintética determinística que cobre todas as regras alcançáveis
+micro: funções isoladas (PREVENT, regras, referências, dedup, HTML)
+e2e: requisições completas pelo test client do Flask
+"""
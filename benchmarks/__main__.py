@@ -0,0 +1,135 @@
+"""
+Executa os benchmarks e grava os resultados em JSON
+
+    python -m benchmarks --saida resultados/antes.json
+    python -m benchmarks --saida resultados/depois.json
+    python -m benchmarks --comparar resultados/antes.json resultados/depois.json
+
+Opções: --pacientes N (tamanho da coorte), --seed S, --repeticoes R,
+--micro / --e2e (só um dos grupos). Mesma semente e tamanho geram a mesma
+coorte, o que torna as execuções comparáveis.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+
+def _ambiente() -> dict:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR,
+                                capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except Exception:
+        commit = None
+    from src.utils.compact_response import BROTLI_AVAILABLE
+    return {
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'cpus': os.cpu_count(),
+        'commit': commit,
+        'brotli': BROTLI_AVAILABLE,
+    }
+
+
+def executar(args) -> dict:
+    # Banco temporário e logs só de avisos, definidos antes de importar a aplicação
+    banco = tempfile.NamedTemporaryFile(prefix='evidens_bench_', suffix='.db', delete=False)
+    banco.close()
+    os.environ.setdefault('DATABASE_URL', f"sqlite:///{banco.name}")
+    os.environ.setdefault('CHECKUP_SPILL_DIR', banco.name + '.spill')
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+    from benchmarks import cohort, e2e, micro
+
+    coorte = cohort.gerar_coorte(args.pacientes, args.seed)
+    resultado = {
+        'quando': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'parametros': {'pacientes': args.pacientes, 'seed': args.seed, 'repeticoes': args.repeticoes},
+        'ambiente': _ambiente(),
+        'cobertura': cohort.cobertura(coorte),
+    }
+    try:
+        if not args.e2e:
+            resultado['micro'] = micro.executar(coorte, args.repeticoes)
+        if not args.micro:
+            from src.main import app
+            resultado['e2e'] = e2e.executar(app, coorte, args.repeticoes)
+            # Grava a fila de check-ups antes de remover o banco temporário
+            from src.utils.checkup_writer import checkup_writer
+            checkup_writer.close()
+    finally:
+        os.unlink(banco.name)
+    return resultado
+
+
+def _medicoes(resultado: dict) -> dict:
+    """{grupo/nome: resumo} de um arquivo de resultados"""
+    medicoes = {f'micro/{nome}': r for nome, r in (resultado.get('micro') or {}).items()}
+    medicoes.update({f'e2e/{nome}': r for nome, r in ((resultado.get('e2e') or {}).get('cenarios') or {}).items()})
+    return medicoes
+
+
+def comparar(base: dict, novo: dict) -> str:
+    """Tabela com média e p95 (µs) dos dois arquivos e a variação percentual"""
+    linhas = [f"{'benchmark':<44}{'media base':>12}{'media novo':>12}{'var':>9}{'p95 base':>12}{'p95 novo':>12}{'var':>9}"]
+    antes, depois = _medicoes(base), _medicoes(novo)
+
+    def variacao(a, b):
+        return f"{(b - a) / a * 100:+.1f}%" if a else '-'
+
+    for nome in [n for n in antes if n in depois]:
+        a, b = antes[nome], depois[nome]
+        linhas.append(
+            f"{nome:<44}{a['media_us']:>12.1f}{b['media_us']:>12.1f}{variacao(a['media_us'], b['media_us']):>9}"
+            f"{a['p95_us']:>12.1f}{b['p95_us']:>12.1f}{variacao(a['p95_us'], b['p95_us']):>9}"
+        )
+    if base.get('parametros') != novo.get('parametros'):
+        linhas.append(f"aviso: parâmetros diferentes ({base.get('parametros')} x {novo.get('parametros')})")
+    return '\n'.join(linhas)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description='Benchmarks do check-up inteligente')
+    parser.add_argument('--pacientes', type=int, default=130, help='tamanho da coorte (padrão 130, 10 por perfil)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeticoes', type=int, default=5, help='passagens medidas pela coorte')
+    grupo = parser.add_mutually_exclusive_group()
+    grupo.add_argument('--micro', action='store_true', help='só os micro-benchmarks')
+    grupo.add_argument('--e2e', action='store_true', help='só os benchmarks ponta a ponta')
+    parser.add_argument('--saida', help='arquivo JSON de resultados (padrão: stdout)')
+    parser.add_argument('--comparar', nargs=2, metavar=('BASE', 'NOVO'), help='compara dois arquivos de resultados')
+    args = parser.parse_args(argv)
+
+    if args.comparar:
+        with open(args.comparar[0], encoding='utf-8') as f:
+            base = json.load(f)
+        with open(args.comparar[1], encoding='utf-8') as f:
+            novo = json.load(f)
+        print(comparar(base, novo))
+        return 0
+
+    resultado = executar(args)
+    texto = json.dumps(resultado, ensure_ascii=False, indent=2)
+    if args.saida:
+        os.makedirs(os.path.dirname(os.path.abspath(args.saida)), exist_ok=True)
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            f.write(texto + '\n')
+    else:
+        print(texto)
+
+    nao_cobertas = resultado['cobertura']['nao_cobertas']
+    if nao_cobertas:
+        print(f"aviso: regras alcançáveis sem paciente na coorte: {', '.join(nao_cobertas)}", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
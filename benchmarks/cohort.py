@@ -0,0 +1,291 @@
+"""
+Coorte sintética de pacientes para os benchmarks
+
+Gera payloads realistas do formulário do check-up (mesmos campos e formatos
+aceitos por /api/checkup-intelligent) a partir de uma semente, distribuídos em
+perfis clínicos que juntos exercitam todas as etapas do motor de regras:
+rastreamento por idade/sexo, risco cardiovascular elevado (biomarcadores),
+LDCT, rastreamento e acompanhamento de diabetes (metformina, IECA/BRA), HIV
+(variantes de CD4, carga viral e TARV), DPOC, gestação e hipertensão
+resistente.
+
+    coorte = gerar_coorte(200, seed=42)
+    cobertura(coorte)['nao_cobertas']  # regras alcançáveis que nenhum paciente disparou
+"""
+import random
+from typing import Callable, Dict, List, NamedTuple
+from src.utils.patient_input import PatientInput
+from src.utils.prevent_calculator import calculate_prevent_risk, get_risk_classification
+from src.utils.reference_links import resolve_reference_links
+from src.utils.rule_engine import rule_engine
+from src.routes.checkup_intelligent import RISCOS_ELEVADOS
+
+NOMES = ('Ana', 'Bruno', 'Carla', 'Daniel', 'Elisa', 'Fábio', 'Gabriela', 'Hugo',
+         'Isabela', 'João', 'Larissa', 'Marcos', 'Natália', 'Otávio', 'Paula', 'Rafael')
+SOBRENOMES = ('Silva', 'Souza', 'Oliveira', 'Santos', 'Lima', 'Pereira', 'Costa', 'Almeida')
+
+ANTI_HIPERTENSIVOS = ('losartana 50mg', 'enalapril 10mg', 'anlodipino 5mg', 'atenolol 50mg')
+DIURETICOS = ('hidroclorotiazida 25mg', 'espironolactona 25mg', 'furosemida 40mg')
+
+
+class Paciente(NamedTuple):
+    perfil: str
+    payload: Dict
+
+
+def _comorbidades(rng, ativas):
+    """Comorbidades como lista ou como dict {opção: bool} (os dois formatos do formulário)"""
+    if rng.random() < 0.5:
+        return list(ativas)
+    extras = {c: False for c in ('hipertensao', 'diabetes_tipo_2', 'dpoc', 'hiv') if c not in ativas}
+    return {**extras, **{c: True for c in ativas}}
+
+
+def _base(rng, idade, sexo=None, ativas=()):
+    """Payload com sinais vitais e laboratório plausíveis para a idade"""
+    sexo = sexo or rng.choice(('masculino', 'feminino'))
+    altura = rng.randint(168, 188) if sexo == 'masculino' else rng.randint(152, 174)
+    imc = rng.uniform(19, 33)
+    return {
+        'nome': f"{rng.choice(NOMES)} {rng.choice(SOBRENOMES)}",
+        'idade': idade,
+        'sexo': sexo,
+        'pais_guideline': 'BR',
+        'peso': round(imc * (altura / 100) ** 2, 1),
+        'altura': altura,
+        'pressao_sistolica': rng.randint(105, 129),
+        'pressao_diastolica': rng.randint(65, 85),
+        'colesterol_total': rng.randint(150, 230),
+        'hdl': rng.randint(38, 75),
+        'creatinina': round(rng.uniform(0.6, 1.2), 2),
+        'tabagismo': 'nunca_fumou',
+        'comorbidades': _comorbidades(rng, ativas),
+        'medicacoes_continuo': '',
+    }
+
+
+def geral(rng):
+    return _base(rng, rng.randint(18, 90))
+
+
+def adolescente(rng):
+    return _base(rng, rng.randint(12, 19))
+
+
+def sobrepeso_fator_risco(rng):
+    """IMC ≥25 com um fator de risco: rastreamento de diabetes antes dos 35 anos"""
+    p = _base(rng, rng.randint(20, 34))
+    p['peso'] = round(rng.uniform(26, 36) * (p['altura'] / 100) ** 2, 1)
+    fator = rng.choice(('historia_familiar', 'sedentario', 'hdl_baixo', 'sop'))
+    if fator == 'historia_familiar':
+        p['historia_familiar'] = {'diabetes': True}
+    elif fator == 'sedentario':
+        p['atividade_fisica'] = 'sedentario'
+    elif fator == 'hdl_baixo':
+        p['hdl'] = rng.randint(25, 34)
+    else:
+        p['sexo'] = 'feminino'
+        p['comorbidades'] = ['sop']
+    return p
+
+
+def risco_cardiovascular(rng):
+    """Risco PREVENT borderline a alto (biomarcadores)"""
+    p = _base(rng, rng.randint(55, 79))
+    p.update({
+        'pressao_sistolica': rng.randint(145, 185),
+        'pressao_diastolica': rng.randint(88, 105),
+        'colesterol_total': rng.randint(240, 310),
+        'hdl': rng.randint(28, 40),
+        'creatinina': round(rng.uniform(1.1, 1.8), 2),
+        'tabagismo': {'status': 'fumante', 'macos_ano': rng.randint(5, 19)},
+        'medicacoes_continuo': rng.choice(ANTI_HIPERTENSIVOS),
+    })
+    return p
+
+
+def hipertenso(rng):
+    p = _base(rng, rng.randint(30, 85), ativas=rng.choice(((), ('hipertensao',))))
+    p['pressao_sistolica'] = rng.randint(131, 165)
+    p['medicacoes_continuo'] = rng.choice(ANTI_HIPERTENSIVOS + ('',))
+    return p
+
+
+def hipertensao_resistente(rng):
+    p = _base(rng, rng.randint(35, 80), ativas=('hipertensao', rng.choice(('hipertensao_resistente', 'has_resistente'))))
+    p['pressao_sistolica'] = rng.randint(140, 180)
+    p['medicacoes_continuo'] = ', '.join(rng.sample(ANTI_HIPERTENSIVOS, 2) + [rng.choice(DIURETICOS)])
+    return p
+
+
+def diabetico_metformina(rng):
+    """Diabetes tipo 2 em uso de metformina, com ou sem IECA/BRA/diurético"""
+    p = _base(rng, rng.randint(16, 85), ativas=('diabetes_tipo_2',))
+    p['hba1c'] = round(rng.uniform(6.6, 10.5), 1)
+    medicacoes = [rng.choice(('metformina 850mg 2x/dia', 'Metformina XR 500mg'))]
+    if rng.random() < 0.6:
+        medicacoes.append(rng.choice(ANTI_HIPERTENSIVOS[:2] + DIURETICOS))
+    p['medicacoes_continuo'] = ', '.join(medicacoes)
+    return p
+
+
+def diabetico_hba1c(rng):
+    """Diabetes identificado só pela HbA1c (sem comorbidade informada)"""
+    p = _base(rng, rng.randint(25, 80))
+    p['hba1c'] = round(rng.uniform(6.6, 9.0), 1)
+    p['medicacoes_continuo'] = rng.choice(('', 'glibenclamida 5mg'))
+    return p
+
+
+def dpoc(rng):
+    p = _base(rng, rng.randint(45, 85), ativas=('dpoc',))
+    p['tabagismo'] = rng.choice(('ex_fumante', 'fumante_atual'))
+    p['macos_ano'] = rng.randint(10, 60)
+    p['anos_parou_fumar'] = rng.randint(1, 25) if p['tabagismo'] == 'ex_fumante' else 0
+    return p
+
+
+def gestante(rng):
+    p = _base(rng, rng.randint(16, 42), sexo='feminino')
+    p['gestante'] = rng.choice((True, 'sim', 'on'))
+    return p
+
+
+def ldct(rng):
+    """Elegíveis (e quase elegíveis) ao rastreamento de câncer de pulmão"""
+    p = _base(rng, rng.randint(50, 80))
+    if rng.random() < 0.5:
+        p['tabagismo'] = 'fumante_atual'
+    else:
+        p['tabagismo'] = 'ex_fumante'
+        p['anos_parou_fumar'] = rng.randint(1, 20)
+    # Campos achatados do formulário em parte dos pacientes
+    if rng.random() < 0.5:
+        p['tabagismo_status'] = p.pop('tabagismo')
+        p['tabagismo_macos_ano'] = str(rng.randint(15, 60))
+    else:
+        p['macos_ano'] = rng.randint(15, 60)
+    return p
+
+
+def aaa(rng):
+    """Homens de 65 a 75 anos com ≥10 maços-ano (ultrassom de aorta abdominal)"""
+    p = _base(rng, rng.randint(65, 75), sexo='masculino')
+    p['tabagismo'] = {'status': rng.choice(('ex_fumante', 'fumante')), 'macos_ano': rng.randint(10, 19)}
+    p['anos_parou_fumar'] = rng.randint(15, 30)
+    return p
+
+
+# Variantes de HIV: (cd4, carga viral, em TARV, supressão viral)
+VARIANTES_HIV = (
+    (lambda rng: rng.randint(50, 349), lambda rng: rng.randint(1001, 200000), 'nao', 'nao'),
+    (lambda rng: rng.randint(350, 500), lambda rng: rng.randint(20, 40), 'sim', 'sim'),
+    (lambda rng: rng.randint(501, 1200), lambda rng: 0, 'sim', 'sim'),
+    (lambda rng: rng.randint(200, 900), lambda rng: rng.randint(1001, 50000), 'sim', 'nao'),
+    (lambda rng: rng.randint(350, 700), lambda rng: rng.randint(50, 999), 'sim', 'nao'),
+    (lambda rng: None, lambda rng: None, 'nao', 'nao'),
+)
+
+
+def hiv(rng):
+    """Pessoas vivendo com HIV: CD4, carga viral e TARV em todas as combinações de frequência"""
+    p = _base(rng, rng.randint(15, 70), ativas=('hiv',))
+    cd4, carga_viral, em_tarv, supressao = rng.choice(VARIANTES_HIV)
+    dados = {'cd4': cd4(rng), 'carga_viral': carga_viral(rng), 'em_tarv': em_tarv, 'supressao_viral': supressao}
+    dados = {k: (str(v) if isinstance(v, int) else v) for k, v in dados.items() if v is not None}
+    # Formato aninhado (hiv_data) ou campos direto no payload
+    if rng.random() < 0.5:
+        p['hiv_data'] = dados
+    else:
+        p.update(dados)
+    return p
+
+
+PERFIS: Dict[str, Callable[[random.Random], Dict]] = {
+    'geral': geral,
+    'adolescente': adolescente,
+    'sobrepeso_fator_risco': sobrepeso_fator_risco,
+    'risco_cardiovascular': risco_cardiovascular,
+    'hipertenso': hipertenso,
+    'hipertensao_resistente': hipertensao_resistente,
+    'diabetico_metformina': diabetico_metformina,
+    'diabetico_hba1c': diabetico_hba1c,
+    'dpoc': dpoc,
+    'gestante': gestante,
+    'ldct': ldct,
+    'aaa': aaa,
+    'hiv': hiv,
+}
+
+
+def gerar_coorte(n: int, seed: int = 42) -> List[Paciente]:
+    """n pacientes determinísticos para a semente, alternando os perfis em rodízio"""
+    rng = random.Random(seed)
+    nomes = list(PERFIS)
+    return [Paciente(nomes[i % len(nomes)], PERFIS[nomes[i % len(nomes)]](rng)) for i in range(n)]
+
+
+def flags_avaliadas(paciente: PatientInput):
+    """Flags com que o check-up avalia o paciente (inclui 'risco_elevado' do PREVENT)"""
+    flags = set(paciente.flags)
+    risco = calculate_prevent_risk(paciente.prevent_data())
+    if risco and get_risk_classification(risco['risk10Year']) in RISCOS_ELEVADOS:
+        flags.add('risco_elevado')
+    return flags
+
+
+def recomendacoes(paciente: PatientInput) -> List[Dict]:
+    """Recomendações antes da deduplicação, como montadas pela rota (com links)"""
+    resultado = rule_engine.evaluate(paciente.idade, paciente.sexo, flags_avaliadas(paciente),
+                                     dict(paciente.contexto))
+    recs = resultado['recommendations']
+    for rec in recs:
+        links, html = resolve_reference_links(rec.get('titulo', ''), rec.get('referencia', ''))
+        if links:
+            rec['referencias'] = links
+            rec['referencia_html'] = html
+    return recs
+
+
+def alcancaveis(compiled) -> List[str]:
+    """Regras que disparam para ao menos uma chave (as demais são sempre suprimidas)"""
+    ids = set()
+    for (sexo, faixa), regras in compiled.indice.items():
+        for rule in regras:
+            if rule.id in ids:
+                continue
+            # Só as flags exigidas: menos regras emitidas, menos supressão
+            plano = compiled._compilar_plano(sexo, faixa, rule.requer, None)
+            if rule in plano:
+                ids.add(rule.id)
+    return [r.id for r in compiled.rules if r.id in ids]
+
+
+def cobertura(coorte: List[Paciente]) -> Dict:
+    """Regras disparadas pela coorte, regras alcançáveis não cobertas e ramos do HIV"""
+    compiled = rule_engine.compiled
+    disparadas = {}
+    ramos_hiv = set()
+    por_perfil = {}
+    for perfil, payload in coorte:
+        paciente = PatientInput.from_request(payload)
+        plano = compiled.plan(paciente.idade, paciente.sexo, flags_avaliadas(paciente))
+        for rule in plano:
+            disparadas[rule.id] = disparadas.get(rule.id, 0) + 1
+        por_perfil[perfil] = por_perfil.get(perfil, 0) + 1
+        if paciente.hiv:
+            contexto = dict(paciente.contexto)
+            ramos_hiv.add((contexto['frequencia_cd4'], contexto['frequencia_cv'],
+                           'hiv_genotipagem' in paciente.flags))
+    alcancavel = alcancaveis(compiled)
+    return {
+        'pacientes': len(coorte),
+        'perfis': por_perfil,
+        'regras_total': len(compiled.rules),
+        'regras_alcancaveis': len(alcancavel),
+        'regras_disparadas': len(disparadas),
+        'nao_cobertas': [r for r in alcancavel if r not in disparadas],
+        'inalcancaveis': [r.id for r in compiled.rules if r.id not in set(alcancavel)],
+        'disparos_por_regra': disparadas,
+        'ramos_hiv': sorted([list(r) for r in ramos_hiv]),
+    }
@@ -0,0 +1,61 @@
+"""
+Benchmarks ponta a ponta com o test client do Flask
+
+Cada cenário envia a coorte inteira para a rota e mede a requisição completa
+(entrada, cache, regras, envio ao checkup_writer, analytics, serialização e leitura do corpo);
+as gravações em lote aparecem na etapa banco_lote da rota background.
+O banco é o de DATABASE_URL (o executor aponta para um arquivo temporário).
+"""
+import json
+from typing import Dict, List
+from src.utils.response_cache import checkup_cache
+from src.utils.stage_timer import stage_timings
+from benchmarks.cohort import Paciente
+from benchmarks.medicao import medir
+
+ROTA_CHECKUP = '/api/checkup-intelligent'
+ROTA_SOLICITACAO = '/api/gerar-solicitacao-exames'
+
+
+def _post(client, rota, payload, headers=None):
+    resposta = client.post(rota, data=json.dumps(payload), content_type='application/json',
+                           headers=headers or {})
+    # Consumir o corpo (streaming incluído) faz parte da requisição medida
+    corpo = resposta.get_data()
+    if resposta.status_code != 200:
+        raise RuntimeError(f"{rota} HTTP {resposta.status_code}: {corpo[:200]!r}")
+    return resposta
+
+
+def executar(app, coorte: List[Paciente], repeticoes: int = 3) -> Dict[str, Dict]:
+    """Resultados por cenário e as etapas medidas pelo stage_timer durante os cenários"""
+    client = app.test_client()
+    payloads = [p.payload for p in coorte]
+    stage_timings.clear()
+
+    cenarios = {
+        # Cache limpo antes de cada requisição: PREVENT, regras, links e dedup sempre calculados
+        'checkup_json_sem_cache': (ROTA_CHECKUP, {}, checkup_cache.clear),
+        # Coorte repetida: respostas servidas do cache de respostas
+        'checkup_json_cache': (ROTA_CHECKUP, {}, None),
+        'checkup_ndjson': (ROTA_CHECKUP + '?format=ndjson', {}, None),
+        'checkup_compact_gzip': (ROTA_CHECKUP + '?format=compact', {'Accept-Encoding': 'gzip'}, None),
+        'checkup_compact_br': (ROTA_CHECKUP + '?format=compact', {'Accept-Encoding': 'br'}, None),
+    }
+    resultados = {}
+    for nome, (rota, headers, antes) in cenarios.items():
+        resultados[nome] = medir(lambda p: _post(client, rota, p, headers), payloads, repeticoes, antes=antes)
+
+    # Solicitação de exames em HTML a partir das recomendações de cada paciente
+    documentos = []
+    for payload in payloads:
+        recs = _post(client, ROTA_CHECKUP, payload).get_json()['recommendations']
+        documentos.append({'recommendations': recs, 'patient_data': payload})
+    resultados['solicitacao_exames_html'] = medir(
+        lambda d: _post(client, ROTA_SOLICITACAO, d, {'Accept': 'text/html'}), documentos, repeticoes)
+
+    return {
+        'cenarios': resultados,
+        'etapas': stage_timings.stats(),
+        'cache': checkup_cache.stats(),
+    }
@@ -0,0 +1,159 @@
+"""
+Gotenberg local para testes de carga (sem Chromium)
+
+Implementa as rotas usadas pelo gotenberg_client com latência, taxa de erro,
+tamanho da saída e limite de conversões simultâneas configuráveis:
+
+    POST /forms/chromium/convert/html   -> PDF sintético de --tamanho-kb
+    POST /forms/pdfengines/merge        -> PDF sintético do tamanho dos arquivos recebidos
+    GET  /health
+
+    python -m benchmarks.fake_gotenberg --porta 3000 --latencia-ms 400 --jitter-ms 200 --taxa-erro 0.02
+
+Aponte a aplicação com GOTENBERG_URL=http://127.0.0.1:3000.
+"""
+import argparse
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROTA_HTML = '/forms/chromium/convert/html'
+ROTA_MERGE = '/forms/pdfengines/merge'
+
+
+def pdf_sintetico(tamanho: int) -> bytes:
+    """PDF mínimo com comentário de preenchimento até o tamanho pedido"""
+    inicio = b'%PDF-1.4\n'
+    fim = b'\n%%EOF\n'
+    preenchimento = max(0, tamanho - len(inicio) - len(fim) - 1)
+    return inicio + b'%' + b'x' * preenchimento + fim
+
+
+class FakeGotenberg:
+    """Servidor HTTP em thread própria que imita as respostas do Gotenberg"""
+
+    def __init__(self, host='127.0.0.1', porta=0, latencia_ms=200.0, jitter_ms=0.0, taxa_erro=0.0,
+                 status_erro=503, tamanho_kb=40, concorrencia=0, seed=None):
+        self.latencia_ms = latencia_ms
+        self.jitter_ms = jitter_ms
+        self.taxa_erro = taxa_erro
+        self.status_erro = status_erro
+        self.pdf = pdf_sintetico(int(tamanho_kb * 1024))
+        # Chromium converte poucas páginas por vez; 0 = sem limite
+        self._vagas = threading.BoundedSemaphore(concorrencia) if concorrencia > 0 else None
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._counters = {'requests': 0, 'errors': 0, 'bytes_in': 0, 'bytes_out': 0, 'in_flight': 0, 'max_in_flight': 0}
+
+        self._server = ThreadingHTTPServer((host, porta), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, porta = self._server.server_address[:2]
+        return f'http://{host}:{porta}'
+
+    def _sortear(self):
+        """Latência (s) e se a requisição falha, sorteadas sob o lock (Random não é thread-safe)"""
+        with self._lock:
+            latencia = self.latencia_ms + (self._rng.uniform(0, self.jitter_ms) if self.jitter_ms else 0)
+            return latencia / 1000, self._rng.random() < self.taxa_erro
+
+    def _contar(self, **deltas):
+        with self._lock:
+            for chave, delta in deltas.items():
+                self._counters[chave] += delta
+            self._counters['max_in_flight'] = max(self._counters['max_in_flight'], self._counters['in_flight'])
+
+    def _handler(self):
+        servidor = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # HTTP/1.1: conexões persistentes, como o pool do gotenberg_client
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def _responder(self, status, corpo, content_type):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(corpo)))
+                self.end_headers()
+                self.wfile.write(corpo)
+
+            def do_GET(self):
+                if self.path == '/health':
+                    return self._responder(200, b'{"status":"up"}', 'application/json')
+                self._responder(404, b'not found', 'text/plain')
+
+            def do_POST(self):
+                corpo = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                if self.path not in (ROTA_HTML, ROTA_MERGE):
+                    return self._responder(404, b'not found', 'text/plain')
+
+                servidor._contar(requests=1, bytes_in=len(corpo), in_flight=1)
+                try:
+                    latencia, falha = servidor._sortear()
+                    if servidor._vagas is not None:
+                        servidor._vagas.acquire()
+                    try:
+                        time.sleep(latencia)
+                    finally:
+                        if servidor._vagas is not None:
+                            servidor._vagas.release()
+                    if falha:
+                        servidor._contar(errors=1)
+                        return self._responder(servidor.status_erro, b'conversion failed', 'text/plain')
+                    pdf = servidor.pdf
+                    if self.path == ROTA_MERGE:
+                        pdf = pdf_sintetico(max(len(pdf), len(corpo)))
+                    servidor._contar(bytes_out=len(pdf))
+                    self._responder(200, pdf, 'application/pdf')
+                finally:
+                    servidor._contar(in_flight=-1)
+
+        return Handler
+
+    def iniciar(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='fake-gotenberg', daemon=True)
+        self._thread.start()
+        return self
+
+    def parar(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counters)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.fake_gotenberg', description='Gotenberg local sem Chromium')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--porta', type=int, default=3000)
+    parser.add_argument('--latencia-ms', type=float, default=200.0, help='latência base de cada conversão')
+    parser.add_argument('--jitter-ms', type=float, default=0.0, help='acréscimo uniforme de 0 a N ms')
+    parser.add_argument('--taxa-erro', type=float, default=0.0, help='fração de respostas com erro')
+    parser.add_argument('--status-erro', type=int, default=503)
+    parser.add_argument('--tamanho-kb', type=float, default=40, help='tamanho do PDF gerado')
+    parser.add_argument('--concorrencia', type=int, default=0, help='conversões simultâneas (0 = sem limite)')
+    args = parser.parse_args(argv)
+
+    servidor = FakeGotenberg(args.host, args.porta, args.latencia_ms, args.jitter_ms, args.taxa_erro,
+                             args.status_erro, args.tamanho_kb, args.concorrencia)
+    print(f'Gotenberg local em {servidor.url} (Ctrl+C para sair)')
+    try:
+        servidor._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor._server.server_close()
+        print(servidor.stats())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,315 @@
+"""
+Teste de carga em malha aberta do check-up e dos PDFs
+
+As chegadas seguem o ritmo pedido (--rps, intervalos fixos ou de Poisson)
+independentemente das respostas: uma requisição lenta não atrasa a próxima, e a
+latência é medida a partir do instante agendado (a espera por uma conexão livre
+também conta). Os corpos saem da coorte sintética, na proporção de --mix.
+
+Sem --alvo, a aplicação sobe no próprio processo (servidor threaded do
+Werkzeug) apontada para um Gotenberg local (benchmarks/fake_gotenberg.py) com a
+latência, a taxa de erro e o tamanho de PDF informados, banco SQLite temporário
+e cache de PDF desligado (cada PDF passa pelo Gotenberg):
+
+    python -m benchmarks.load --rps 40 --duracao 30 --mix checkup=6,pdf_laboratorio=2,pdf_vacinas=1,pdf_lote=1 \\
+        --gotenberg-latencia-ms 600 --gotenberg-jitter-ms 300 --gotenberg-taxa-erro 0.02
+
+Com --alvo http://host:porta a carga vai para um servidor já em execução (ex.:
+gunicorn com GOTENBERG_URL apontando para python -m benchmarks.fake_gotenberg).
+
+`pdf_lote` mede apenas o enfileiramento (202): o lote é convertido na fila de
+jobs, em segundo plano, disputando o Gotenberg com os PDFs interativos.
+
+O relatório traz, por endpoint, vazão, latência p50/p95/p99 e erros por status
+ou exceção; --saida grava o relatório em JSON.
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+# Endpoint -> rota
+ROTAS = {
+    'checkup': '/api/checkup-intelligent',
+    'pdf_laboratorio': '/api/gerar-pdf-exames-laboratoriais',
+    'pdf_imagem': '/api/gerar-pdf-exames-imagem',
+    'pdf_vacinas': '/api/gerar-pdf-vacinas',
+    'pdf_lote': '/api/gerar-pdf-lote',
+}
+
+# Categoria do catálogo exigida por cada rota de PDF (pacientes sem itens receberiam 400)
+CATEGORIAS = {'pdf_laboratorio': 'laboratorio', 'pdf_imagem': 'imagem', 'pdf_vacinas': 'vacina'}
+
+MIX_PADRAO = 'checkup=6,pdf_laboratorio=2,pdf_imagem=1,pdf_vacinas=1'
+
+PACIENTES_POR_LOTE = 3
+
+
+def parse_mix(texto: str) -> dict:
+    """'checkup=6,pdf_laboratorio=2' -> {'checkup': 6.0, 'pdf_laboratorio': 2.0}"""
+    mix = {}
+    for parte in texto.split(','):
+        nome, _, peso = parte.strip().partition('=')
+        if nome not in ROTAS:
+            raise ValueError(f"Endpoint desconhecido no mix: {nome} (opções: {', '.join(ROTAS)})")
+        mix[nome] = float(peso or 1)
+    if not any(mix.values()):
+        raise ValueError('Mix sem endpoints com peso positivo')
+    return {nome: peso for nome, peso in mix.items() if peso > 0}
+
+
+def corpos(coorte) -> dict:
+    """Corpos das requisições por endpoint, gerados da coorte"""
+    from src.utils.exam_catalog import exam_catalog
+    from src.utils.patient_input import PatientInput
+    from benchmarks.cohort import recomendacoes
+
+    documentos = []
+    for _, payload in coorte:
+        recs = exam_catalog.deduplicate(recomendacoes(PatientInput.from_request(payload)))
+        documentos.append({'dados_paciente': payload, 'recomendacoes': recs})
+
+    resultado = {'checkup': [p.payload for p in coorte]}
+    for endpoint, categoria in CATEGORIAS.items():
+        resultado[endpoint] = [
+            d for d in documentos if any(exam_catalog.categoria(r) == categoria for r in d['recomendacoes'])
+        ]
+    resultado['pdf_lote'] = [
+        {'pacientes': documentos[i:i + PACIENTES_POR_LOTE], 'formato': 'zip'}
+        for i in range(0, len(documentos) - PACIENTES_POR_LOTE + 1, PACIENTES_POR_LOTE)
+    ]
+    return resultado
+
+
+def _percentis_ms(valores) -> dict:
+    if not valores:
+        return {}
+    ordenados = sorted(valores)
+    n = len(ordenados)
+
+    def p(q):
+        return round(ordenados[min(n - 1, int(q * n))] * 1000, 2)
+
+    return {
+        'media': round(sum(ordenados) / n * 1000, 2),
+        'p50': p(0.5),
+        'p95': p(0.95),
+        'p99': p(0.99),
+        'max': round(ordenados[-1] * 1000, 2),
+    }
+
+
+class GeradorDeCarga:
+    """Dispara requisições no ritmo agendado e acumula os resultados por endpoint"""
+
+    def __init__(self, base_url, corpos_por_endpoint, mix, rps, duracao, conexoes=256,
+                 poisson=False, timeout=60.0, seed=42):
+        self.base_url = base_url.rstrip('/')
+        self.corpos = corpos_por_endpoint
+        self.mix = mix
+        self.rps = rps
+        self.duracao = duracao
+        self.conexoes = conexoes
+        self.poisson = poisson
+        self.timeout = timeout
+        self._rng = random.Random(seed)
+        self._local = threading.local()
+        self._resultados = []
+        self._atraso_max = 0.0
+
+    def _sessao(self):
+        import requests
+        from requests.adapters import HTTPAdapter
+        sessao = getattr(self._local, 'sessao', None)
+        if sessao is None:
+            sessao = self._local.sessao = requests.Session()
+            sessao.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=1))
+        return sessao
+
+    def _enviar(self, endpoint, corpo, agendado):
+        inicio = time.perf_counter()
+        resultado = None
+        tamanho = 0
+        try:
+            resposta = self._sessao().post(self.base_url + ROTAS[endpoint], json=corpo, timeout=self.timeout,
+                                           stream=True)
+            # Corpo consumido por completo (PDFs e ZIPs chegam em blocos)
+            for bloco in resposta.iter_content(65536):
+                tamanho += len(bloco)
+            resultado = resposta.status_code
+        except Exception as e:
+            resultado = type(e).__name__
+        fim = time.perf_counter()
+        # list.append é atômico: sem lock no caminho de cada requisição
+        self._resultados.append((endpoint, resultado, fim - agendado, fim - inicio, tamanho, fim))
+
+    def executar(self) -> dict:
+        nomes = list(self.mix)
+        pesos = [self.mix[n] for n in nomes]
+        vazios = [n for n in nomes if not self.corpos.get(n)]
+        if vazios:
+            raise ValueError(f"Coorte sem corpos para: {', '.join(vazios)}")
+
+        intervalo = 1.0 / self.rps
+        total = int(self.rps * self.duracao)
+        executor = ThreadPoolExecutor(max_workers=self.conexoes, thread_name_prefix='carga')
+        inicio = time.perf_counter()
+        agendado = inicio
+        try:
+            for _ in range(total):
+                agendado += self._rng.expovariate(self.rps) if self.poisson else intervalo
+                espera = agendado - time.perf_counter()
+                if espera > 0:
+                    time.sleep(espera)
+                else:
+                    # Gerador atrasado em relação ao agendamento (CPU saturada no cliente)
+                    self._atraso_max = max(self._atraso_max, -espera)
+                endpoint = self._rng.choices(nomes, pesos)[0]
+                executor.submit(self._enviar, endpoint, self._rng.choice(self.corpos[endpoint]), agendado)
+            fim_envio = time.perf_counter()
+        finally:
+            executor.shutdown(wait=True)
+        return self._relatorio(inicio, fim_envio, total)
+
+    def _relatorio(self, inicio, fim_envio, total) -> dict:
+        fim = max((r[5] for r in self._resultados), default=fim_envio)
+        duracao = fim - inicio
+        por_endpoint = {}
+        for endpoint in self.mix:
+            linhas = [r for r in self._resultados if r[0] == endpoint]
+            ok = [r for r in linhas if isinstance(r[1], int) and r[1] < 400]
+            erros = {}
+            for r in linhas:
+                if not (isinstance(r[1], int) and r[1] < 400):
+                    erros[str(r[1])] = erros.get(str(r[1]), 0) + 1
+            por_endpoint[endpoint] = {
+                'enviadas': len(linhas),
+                'sucesso': len(ok),
+                'erros': erros,
+                'taxa_erro': round((len(linhas) - len(ok)) / len(linhas), 4) if linhas else 0.0,
+                'vazao_rps': round(len(ok) / duracao, 2) if duracao else 0.0,
+                'latencia_ms': _percentis_ms([r[2] for r in ok]),
+                'servico_ms': _percentis_ms([r[3] for r in ok]),
+                'bytes_medio': round(sum(r[4] for r in ok) / len(ok)) if ok else 0,
+            }
+        sucesso = sum(e['sucesso'] for e in por_endpoint.values())
+        return {
+            'rps_alvo': self.rps,
+            'rps_oferecido': round(total / (fim_envio - inicio), 2) if fim_envio > inicio else 0.0,
+            'vazao_rps': round(sucesso / duracao, 2) if duracao else 0.0,
+            'duracao_s': round(duracao, 2),
+            'requisicoes': total,
+            'atraso_max_gerador_ms': round(self._atraso_max * 1000, 2),
+            'endpoints': por_endpoint,
+        }
+
+
+def _servidor_local(gotenberg_url, cache_pdf):
+    """Sobe a aplicação no processo (Werkzeug threaded) e retorna (url, servidor)"""
+    temporario = tempfile.mkdtemp(prefix='evidens_carga_')
+    os.environ['GOTENBERG_URL'] = gotenberg_url
+    os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(temporario, 'app.db')}")
+    os.environ.setdefault('CHECKUP_SPILL_DIR', os.path.join(temporario, 'checkup_spill'))
+    # 503 por sobrecarga são esperados na carga: ficam no relatório, não no log
+    os.environ.setdefault('LOG_LEVEL', 'ERROR')
+    if not cache_pdf:
+        os.environ['PDF_CACHE_MEMORY_MB'] = '0'
+        os.environ['PDF_CACHE_DISK_MB'] = '0'
+        os.environ['PDF_CACHE_DIR'] = os.path.join(temporario, 'pdf_cache')
+
+    from werkzeug.serving import make_server
+    from src.main import app
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    servidor = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=servidor.serve_forever, name='app-carga', daemon=True).start()
+    return f'http://127.0.0.1:{servidor.server_port}', servidor
+
+
+def formatar(relatorio: dict) -> str:
+    """Tabela legível do relatório"""
+    linhas = [
+        f"alvo {relatorio['rps_alvo']} rps | oferecido {relatorio['rps_oferecido']} rps | "
+        f"vazão {relatorio['vazao_rps']} rps | {relatorio['requisicoes']} requisições em {relatorio['duracao_s']} s | "
+        f"atraso máx. do gerador {relatorio['atraso_max_gerador_ms']} ms",
+        f"{'endpoint':<18}{'enviadas':>9}{'ok':>7}{'rps':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}  erros",
+    ]
+    for nome, e in relatorio['endpoints'].items():
+        lat = e['latencia_ms'] or {}
+        erros = ', '.join(f'{k}: {v}' for k, v in e['erros'].items()) or '-'
+        linhas.append(
+            f"{nome:<18}{e['enviadas']:>9}{e['sucesso']:>7}{e['vazao_rps']:>8}"
+            f"{lat.get('p50', '-'):>10}{lat.get('p95', '-'):>10}{lat.get('p99', '-'):>10}{lat.get('max', '-'):>10}  {erros}"
+        )
+    if relatorio.get('gotenberg'):
+        linhas.append(f"gotenberg local: {relatorio['gotenberg']}")
+    return '\n'.join(linhas)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.load', description='Teste de carga em malha aberta')
+    parser.add_argument('--alvo', help='URL de um servidor em execução (padrão: aplicação no processo)')
+    parser.add_argument('--rps', type=float, default=20.0, help='requisições por segundo agendadas')
+    parser.add_argument('--duracao', type=float, default=30.0, help='segundos de envio')
+    parser.add_argument('--mix', default=MIX_PADRAO, help=f'pesos por endpoint (padrão {MIX_PADRAO}; também pdf_lote)')
+    parser.add_argument('--poisson', action='store_true', help='intervalos exponenciais em vez de fixos')
+    parser.add_argument('--conexoes', type=int, default=256, help='requisições simultâneas no cliente')
+    parser.add_argument('--timeout', type=float, default=60.0)
+    parser.add_argument('--pacientes', type=int, default=130)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--gotenberg-latencia-ms', type=float, default=300.0)
+    parser.add_argument('--gotenberg-jitter-ms', type=float, default=100.0)
+    parser.add_argument('--gotenberg-taxa-erro', type=float, default=0.0)
+    parser.add_argument('--gotenberg-tamanho-kb', type=float, default=40.0)
+    parser.add_argument('--gotenberg-concorrencia', type=int, default=0, help='conversões simultâneas no Gotenberg local')
+    parser.add_argument('--cache-pdf', action='store_true', help='mantém o cache de PDF ligado (aplicação no processo)')
+    parser.add_argument('--saida', help='arquivo JSON do relatório')
+    args = parser.parse_args(argv)
+
+    mix = parse_mix(args.mix)
+    gotenberg = servidor = None
+    if args.alvo:
+        base_url = args.alvo
+    else:
+        from benchmarks.fake_gotenberg import FakeGotenberg
+        gotenberg = FakeGotenberg(latencia_ms=args.gotenberg_latencia_ms, jitter_ms=args.gotenberg_jitter_ms,
+                                  taxa_erro=args.gotenberg_taxa_erro, tamanho_kb=args.gotenberg_tamanho_kb,
+                                  concorrencia=args.gotenberg_concorrencia, seed=args.seed).iniciar()
+        base_url, servidor = _servidor_local(gotenberg.url, args.cache_pdf)
+
+    from benchmarks.cohort import gerar_coorte
+    try:
+        gerador = GeradorDeCarga(base_url, corpos(gerar_coorte(args.pacientes, args.seed)), mix, args.rps,
+                                 args.duracao, args.conexoes, args.poisson, args.timeout, args.seed)
+        relatorio = gerador.executar()
+    finally:
+        if servidor is not None:
+            servidor.shutdown()
+        if gotenberg is not None:
+            gotenberg.parar()
+
+    relatorio['parametros'] = {k: v for k, v in vars(args).items() if k != 'saida'}
+    if gotenberg is not None:
+        relatorio['gotenberg'] = gotenberg.stats()
+        from src.utils.gotenberg_client import gotenberg_client
+        relatorio['gotenberg_client'] = gotenberg_client.stats()
+
+    print(formatar(relatorio))
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump(relatorio, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,69 @@
+"""
+Medição dos benchmarks: amostras por chamada e resumo estatístico
+"""
+import gc
+import statistics
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+
+def resumo(amostras_ns: List[int]) -> Dict:
+    """Estatísticas das amostras em microssegundos (n, média, desvio, percentis, mín/máx)"""
+    if not amostras_ns:
+        return {'n': 0}
+    ordenadas = sorted(amostras_ns)
+    n = len(ordenadas)
+
+    def percentil(p):
+        return ordenadas[min(n - 1, int(p * n))] / 1000
+
+    return {
+        'n': n,
+        'media_us': round(statistics.fmean(ordenadas) / 1000, 3),
+        'desvio_us': round(statistics.pstdev(ordenadas) / 1000, 3),
+        'min_us': round(ordenadas[0] / 1000, 3),
+        'p50_us': round(percentil(0.5), 3),
+        'p95_us': round(percentil(0.95), 3),
+        'p99_us': round(percentil(0.99), 3),
+        'max_us': round(ordenadas[-1] / 1000, 3),
+        'total_ms': round(sum(ordenadas) / 1e6, 3),
+    }
+
+
+def medir(func: Callable, entradas: Iterable, repeticoes: int = 5, aquecimento: int = 1,
+          antes: Optional[Callable[[], None]] = None) -> Dict:
+    """
+    Mede func(entrada) para cada entrada, repetindo a passagem pela coorte
+
+    Args:
+        func: função medida (recebe uma entrada por chamada)
+        entradas: entradas da passagem (ex.: um item por paciente)
+        repeticoes: passagens medidas
+        aquecimento: passagens descartadas (caches, compilação de templates)
+        antes: chamado antes de cada chamada, fora da medição (ex.: limpar cache)
+    """
+    entradas = list(entradas)
+    for _ in range(aquecimento):
+        for entrada in entradas:
+            if antes is not None:
+                antes()
+            func(entrada)
+
+    amostras = []
+    relogio = time.perf_counter_ns
+    # Coletas do GC distorcem as amostras individuais
+    gc_ativo = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeticoes):
+            for entrada in entradas:
+                if antes is not None:
+                    antes()
+                inicio = relogio()
+                func(entrada)
+                amostras.append(relogio() - inicio)
+            gc.collect()
+    finally:
+        if gc_ativo:
+            gc.enable()
+    return resumo(amostras)
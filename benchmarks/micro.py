@@ -0,0 +1,56 @@
+"""
+Micro-benchmarks das etapas do check-up sobre a coorte sintética
+
+Cada benchmark mede uma função isolada com as entradas que ela recebe na
+requisição: PREVENT, normalização da entrada, motor de regras, links de
+referência (com o memo quente e frio), overrides de referência, deduplicação
+e renderização do HTML da solicitação de exames.
+"""
+import copy
+import itertools
+from typing import Dict, List
+from src.utils.patient_input import PatientInput
+from src.utils.prevent_calculator import calculate_prevent_risk, calculate_prevent_risk_batch
+from src.utils import reference_links
+from src.utils.reference_links import build_reference_links
+from src.utils.reference_manager import apply_reference_overrides
+from src.utils.exam_catalog import exam_catalog
+from src.utils.rule_engine import rule_engine
+from src.utils.pdf_service_gotenberg_simple import gerar_html_exames_simples
+from benchmarks.cohort import Paciente, flags_avaliadas, recomendacoes
+from benchmarks.medicao import medir
+
+
+def executar(coorte: List[Paciente], repeticoes: int = 5) -> Dict[str, Dict]:
+    """Resultados por benchmark ({nome: resumo de medicao.resumo})"""
+    payloads = [p.payload for p in coorte]
+    pacientes = [PatientInput.from_request(p) for p in payloads]
+    prevent = [p.prevent_data() for p in pacientes]
+    avaliacao = [(p.idade, p.sexo, flags_avaliadas(p), dict(p.contexto)) for p in pacientes]
+    registros = [recomendacoes(p) for p in pacientes]
+    referencias = [(rec.get('titulo', ''), rec.get('referencia', '')) for recs in registros for rec in recs]
+    unicos = [exam_catalog.deduplicate(recs) for recs in registros]
+    documentos = list(zip(payloads, unicos))
+
+    # apply_reference_overrides altera as recomendações: cada chamada recebe cópias novas
+    copias = []
+    proximo = itertools.cycle(registros)
+
+    def preparar_overrides():
+        copias.append(copy.deepcopy(next(proximo)))
+
+    resultados = {}
+    resultados['patient_input'] = medir(PatientInput.from_request, payloads, repeticoes)
+    resultados['calculate_prevent_risk'] = medir(calculate_prevent_risk, prevent, repeticoes)
+    resultados['calculate_prevent_risk_batch'] = medir(calculate_prevent_risk_batch, [prevent], repeticoes)
+    resultados['rule_engine_evaluate'] = medir(lambda a: rule_engine.evaluate(*a), avaliacao, repeticoes)
+    resultados['build_reference_links'] = medir(lambda r: build_reference_links(*r), referencias, repeticoes)
+    resultados['build_reference_links_frio'] = medir(
+        lambda r: build_reference_links(*r), referencias, repeticoes,
+        antes=reference_links._resolver.cache_clear)
+    resultados['apply_reference_overrides'] = medir(
+        lambda _: apply_reference_overrides(copias.pop()), range(len(registros)), repeticoes,
+        antes=preparar_overrides)
+    resultados['deduplicate'] = medir(exam_catalog.deduplicate, registros, repeticoes)
+    resultados['html_solicitacao_exames'] = medir(lambda d: gerar_html_exames_simples(*d), documentos, repeticoes)
+    return resultados
@@ -11,16 +11,22 @@ from src.routes.user import user_bp
 from src.routes.checkup import checkup_bp
 from src.routes.checkup_intelligent import checkup_intelligent_bp
 from src.routes.database_api import database_api_bp
+from src.routes.prevent import prevent_bp
+from src.routes.pdf_jobs import pdf_jobs_bp
 from src.utils.analytics import analytics, track_visit
 from src.utils.cors import register_private_network_sanitizer
+from src.utils.observability import register_observability
 
 app = Flask(__name__, static_folder=os.path.join(BASE_DIR, 'src', 'static'))
 app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
 CORS(app)
 register_private_network_sanitizer(app)
+register_observability(app)
 app.register_blueprint(user_bp, url_prefix='/api')
 app.register_blueprint(checkup_bp, url_prefix='/api')
 app.register_blueprint(checkup_intelligent_bp, url_prefix='/api')
+app.register_blueprint(prevent_bp, url_prefix='/api')
+app.register_blueprint(pdf_jobs_bp, url_prefix='/api')
 app.register_blueprint(database_api_bp)
 
 # Database configuration
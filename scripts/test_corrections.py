@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""
+Deliberate input-parsing changes of the typed patient input (PatientInput),
+kept out of the rule corpus (scripts/test_rule_corpus.py) because their
+output differs from the original route on purpose:
+- comorbidities sent as {item: bool} only count the checked items: the
+  original route tested dict keys, so {'diabetes': false} fed PREVENT as a
+  diabetic patient; lists and {item: true} are unchanged
+- smoking 'atual'/'fumante' mean current smoker (PREVENT smoking), 'ex' means
+  former smoker
+- comma-separated comorbidity strings are split into items
+- gestante "false" is not pregnant
+- the saved check-up keeps tabagismo and pressao_diastolica as submitted and
+  stores the medicacoes checkbox list as JSON (sqlite rejected the raw list)
+- the rejected-records file rotates once it passes its size cap
+
+Run:
+  python scripts/test_corrections.py
+"""
+from __future__ import annotations
+import glob
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+# Temporary database: the checks read back the saved check-up rows
+BANCO = tempfile.NamedTemporaryFile(prefix='evidens_corrections_', suffix='.db', delete=False)
+BANCO.close()
+os.environ.setdefault('DATABASE_URL', f'sqlite:///{BANCO.name}')
+os.environ.setdefault('CHECKUP_SPILL_DIR', BANCO.name + '.spill')
+os.environ.setdefault('LOG_LEVEL', 'ERROR')
+
+try:
+    from app import app
+    from src.utils.checkup_writer import CheckupWriter, checkup_writer
+    from src.utils.patient_input import PatientInput
+except Exception as e:
+    print(f"[FAIL] Could not import app: {e}")
+    sys.exit(1)
+
+BASE = {'idade': 60, 'sexo': 'masculino', 'pas': 140, 'colesterol_total': 220, 'hdl': 40}
+
+
+def assert_true(cond: bool, msg: str):
+    if not cond:
+        print(f"[FAIL] {msg}")
+        sys.exit(1)
+
+
+def post_json(client, payload: dict) -> dict:
+    r = client.post('/api/checkup-intelligent', data=json.dumps(payload), content_type='application/json')
+    assert_true(r.status_code == 200, f"/checkup-intelligent HTTP {r.status_code} for {payload!r}")
+    return r.get_json() or {}
+
+
+def prevent_risk(client, **campos) -> dict:
+    return post_json(client, dict(BASE, **campos))['prevent_risk']
+
+
+def check_comorbidities(client):
+    # PatientInput: only checked items count
+    for comorbidades, esperado in (({'diabetes': False}, False), ({'diabetes': True}, True),
+                                   (['diabetes'], True), ([], False), ({}, False)):
+        paciente = PatientInput.from_request(dict(BASE, comorbidades=comorbidades))
+        assert_true(paciente.diabetico is esperado, f"diabetico for {comorbidades!r}: {paciente.diabetico}")
+        assert_true(paciente.prevent_data()['diabetes'] is esperado,
+                    f"PREVENT diabetes for {comorbidades!r}: {paciente.prevent_data()['diabetes']}")
+    assert_true(not PatientInput.from_request(dict(BASE, pas=120, comorbidades={'hipertensao': False})).hipertenso,
+                "{'hipertensao': false} should not mark hypertension")
+    assert_true(PatientInput.from_request(dict(BASE, pas=120, comorbidades={'hipertensao': True})).hipertenso,
+                "{'hipertensao': true} should mark hypertension")
+
+    # /checkup-intelligent: dict-false scores like no diabetes, dict-true like the list form
+    sem_diabetes = prevent_risk(client, comorbidades=[])
+    com_diabetes = prevent_risk(client, comorbidades=['diabetes'])
+    assert_true(com_diabetes['risk10Year'] > sem_diabetes['risk10Year'], "diabetes should raise the PREVENT risk")
+    assert_true(prevent_risk(client, comorbidades={'diabetes': False}) == sem_diabetes,
+                "{'diabetes': false} should score as a non-diabetic patient")
+    assert_true(prevent_risk(client, comorbidades={'diabetes': True}) == com_diabetes,
+                "{'diabetes': true} should score like ['diabetes']")
+
+    # Comma-separated string
+    paciente = PatientInput.from_request(dict(BASE, comorbidades='hipertensao, diabetes'))
+    assert_true(paciente.comorbidades == ('hipertensao', 'diabetes'), f"string split: {paciente.comorbidades!r}")
+    assert_true(paciente.diabetico and paciente.hipertenso, "string comorbidities should be recognized")
+
+
+def check_smoking_and_pregnancy(client):
+    nunca = prevent_risk(client, tabagismo='nunca_fumou')
+    fumante = prevent_risk(client, tabagismo='fumante_atual')
+    assert_true(fumante['risk10Year'] > nunca['risk10Year'], "current smoking should raise the PREVENT risk")
+    for valor in ('atual', 'fumante'):
+        paciente = PatientInput.from_request(dict(BASE, tabagismo=valor))
+        assert_true(paciente.tabagismo == 'fumante_atual', f"tabagismo {valor!r} -> {paciente.tabagismo!r}")
+        assert_true(prevent_risk(client, tabagismo=valor) == fumante, f"tabagismo {valor!r} should score as smoker")
+    paciente = PatientInput.from_request(dict(BASE, tabagismo='ex'))
+    assert_true(paciente.tabagismo == 'ex_fumante' and not paciente.fumante, f"'ex' -> {paciente.tabagismo!r}")
+
+    for valor, esperado in (('false', False), ('true', True), (False, False), (True, True)):
+        gestante = PatientInput.from_request(dict(BASE, sexo='feminino', idade=30, gestante=valor)).gestante
+        assert_true(gestante is esperado, f"gestante {valor!r} -> {gestante}")
+
+
+def check_saved_checkup(client):
+    post_json(client, dict(BASE, nome='Correcoes Salvo', tabagismo='fumante', pad=95, pressao_diastolica=88))
+    post_json(client, dict(BASE, nome='Correcoes Sem PAD', tabagismo='atual', pad=95))
+    post_json(client, dict(BASE, nome='Correcoes Medicacoes', medicacoes=['anti_hipertensivos', 'estatina']))
+    checkup_writer.flush()
+    con = sqlite3.connect(BANCO.name)
+    try:
+        linhas = dict(con.execute(
+            "SELECT p.nome, c.tabagismo || '|' || IFNULL(c.pressao_diastolica, '-') FROM checkups c "
+            "JOIN patients p ON p.id = c.patient_id WHERE p.nome LIKE 'Correcoes %'").fetchall())
+        medicacoes = con.execute(
+            "SELECT c.medicacoes FROM checkups c JOIN patients p ON p.id = c.patient_id "
+            "WHERE p.nome = 'Correcoes Medicacoes'").fetchone()
+    finally:
+        con.close()
+    assert_true(linhas.get('Correcoes Salvo') == 'fumante|88.0', f"saved row: {linhas.get('Correcoes Salvo')!r}")
+    assert_true(linhas.get('Correcoes Sem PAD') == 'atual|-', f"saved row: {linhas.get('Correcoes Sem PAD')!r}")
+    assert_true(medicacoes is not None, "check-up with a medicacoes list was not saved")
+    assert_true(json.loads(medicacoes[0]) == ['anti_hipertensivos', 'estatina'], f"medicacoes: {medicacoes[0]!r}")
+    assert_true(not glob.glob(os.path.join(checkup_writer.spill_dir, 'rejeitados-*')),
+                "check-ups were rejected by the database")
+
+
+def check_rejected_rotation():
+    writer = CheckupWriter(spill_dir=tempfile.mkdtemp(prefix='evidens_rejected_'))
+    writer.rejected_max_bytes = 4096
+    registro = writer.registro(('Rejeitado', 60, 'masculino', None, None), ('x' * 1000,), ())
+    for _ in range(12):
+        writer._rejeitar([registro])
+    caminho = writer._arquivo('rejeitados')
+    assert_true(os.path.exists(caminho + '.1'), "rejected-records file was not rotated")
+    for path in (caminho, caminho + '.1'):
+        assert_true(os.path.getsize(path) <= writer.rejected_max_bytes,
+                    f"{os.path.basename(path)} passed the cap: {os.path.getsize(path)} bytes")
+    assert_true(writer.stats()['discarded'] == 12, f"discarded: {writer.stats()['discarded']}")
+
+
+def main():
+    client = app.test_client()
+    try:
+        check_comorbidities(client)
+        check_smoking_and_pregnancy(client)
+        check_saved_checkup(client)
+        check_rejected_rotation()
+    finally:
+        os.unlink(BANCO.name)
+    print("[OK] Input-parsing corrections pinned.")
+
+
+if __name__ == '__main__':
+    main()
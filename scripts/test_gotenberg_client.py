@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+"""
+GotenbergClient against the local stand-in (benchmarks/fake_gotenberg.py):
+- conversion and merge return the PDF bytes, connections are reused
+- 5xx responses are retried with backoff, 4xx are not
+- consecutive failures open the circuit breaker, which then rejects calls
+  without contacting the server
+- after breaker_reset a single half-open trial closes the circuit again
+- an unexpected exception during the trial releases the trial slot
+- background conversions (batches, PDF jobs) are capped at background_concurrency
+  slots and a freed slot goes to a waiting interactive request first
+
+Run:
+  python scripts/test_gotenberg_client.py
+"""
+from __future__ import annotations
+import os
+import sys
+import threading
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+os.environ.setdefault('LOG_LEVEL', 'ERROR')
+
+try:
+    import requests
+    from benchmarks.fake_gotenberg import FakeGotenberg
+    from src.utils.gotenberg_client import (
+        ABERTO, FECHADO, MEIO_ABERTO, GotenbergClient, GotenbergError, GotenbergUnavailable,
+    )
+except Exception as e:
+    print(f"[FAIL] Could not import Gotenberg client: {e}")
+    sys.exit(1)
+
+RESET_S = 0.3
+
+
+def assert_true(cond: bool, msg: str):
+    if not cond:
+        print(f"[FAIL] {msg}")
+        sys.exit(1)
+
+
+def expect(exc_type, func, msg: str):
+    try:
+        func()
+    except exc_type:
+        return
+    except Exception as e:
+        assert_true(False, f"{msg}: raised {type(e).__name__}: {e}")
+    assert_true(False, f"{msg}: nothing raised")
+
+
+def new_client(url: str) -> GotenbergClient:
+    return GotenbergClient(base_url=url, max_concurrency=2, timeout=5, connect_timeout=2, max_retries=2,
+                           backoff=0.01, breaker_threshold=3, breaker_reset=RESET_S, acquire_timeout=1)
+
+
+def wait_until(cond, msg: str, timeout: float = 2.0):
+    limite = time.monotonic() + timeout
+    while not cond():
+        assert_true(time.monotonic() < limite, msg)
+        time.sleep(0.01)
+
+
+def check_priority(url: str):
+    client = GotenbergClient(base_url=url, max_concurrency=2, background_concurrency=1, timeout=5,
+                             connect_timeout=2, max_retries=0, acquire_timeout=2)
+    streams = {}
+
+    def abrir(nome, segundo_plano):
+        if segundo_plano:
+            with client.segundo_plano():
+                streams[nome] = client.stream_html('<p>x</p>')
+        else:
+            streams[nome] = client.stream_html('<p>x</p>')
+
+    def em_thread(nome, segundo_plano):
+        thread = threading.Thread(target=abrir, args=(nome, segundo_plano), daemon=True)
+        thread.start()
+        return thread
+
+    abrir('interativo_1', False)
+    abrir('lote_1', True)
+    assert_true(client.stats()['background_in_flight'] == 1, "background slot not counted")
+
+    # Second background conversion exceeds background_concurrency and waits
+    lote_2 = em_thread('lote_2', True)
+    interativo_2 = em_thread('interativo_2', False)
+    wait_until(lambda: client.stats()['waiting'] == 1, "interactive request should wait for a slot")
+    assert_true('lote_2' not in streams, "background conversion exceeded background_concurrency")
+
+    # The freed slot goes to the waiting interactive request, not to the batch
+    streams['lote_1'].close()
+    interativo_2.join(2)
+    assert_true('interativo_2' in streams, "waiting interactive request did not get the freed slot")
+    assert_true('lote_2' not in streams, "background conversion jumped ahead of an interactive request")
+
+    streams['interativo_1'].close()
+    lote_2.join(2)
+    assert_true('lote_2' in streams, "background conversion did not run once a slot was free")
+    for stream in streams.values():
+        stream.close()
+    stats = client.stats()
+    assert_true(stats['in_flight'] == 0 and stats['background_in_flight'] == 0, f"slots leaked: {stats}")
+
+
+def main():
+    servidor = FakeGotenberg(latencia_ms=1, tamanho_kb=8, seed=1).iniciar()
+    try:
+        client = new_client(servidor.url)
+
+        # 1) Conversion and merge
+        pdf = client.convert_html('<p>ok</p>')
+        assert_true(pdf.startswith(b'%PDF') and len(pdf) == 8 * 1024, f"unexpected PDF ({len(pdf)} bytes)")
+        merged = client.merge_pdfs([pdf, pdf])
+        assert_true(merged.startswith(b'%PDF'), "merge did not return a PDF")
+        assert_true(client.stats()['in_flight'] == 0, "semaphore slot not released after conversion")
+
+        # 2) 5xx: every retry reaches the server, then GotenbergError
+        servidor.taxa_erro = 1.0
+        antes = servidor.stats()['requests']
+        expect(GotenbergError, lambda: client.convert_html('<p>x</p>'), "5xx should fail after retries")
+        assert_true(servidor.stats()['requests'] - antes == 3, "expected 1 attempt + 2 retries on 5xx")
+        assert_true(client.stats()['retries'] == 2, f"retries counter: {client.stats()['retries']}")
+        assert_true(client.stats()['state'] == ABERTO, "3 consecutive failures should open the circuit")
+
+        # 3) Open circuit: rejected without contacting the server
+        antes = servidor.stats()['requests']
+        expect(GotenbergUnavailable, lambda: client.convert_html('<p>x</p>'), "open circuit should reject")
+        assert_true(servidor.stats()['requests'] == antes, "open circuit must not call Gotenberg")
+        assert_true(client.stats()['rejected'] >= 1, "rejected counter not incremented")
+
+        # 4) Half-open trial fails: circuit opens again
+        time.sleep(RESET_S + 0.05)
+        expect(GotenbergError, lambda: client.convert_html('<p>x</p>'), "failed trial should raise")
+        assert_true(client.stats()['state'] == ABERTO, "failed trial should reopen the circuit")
+
+        # 5) Half-open trial raising an unhandled exception releases the trial slot
+        time.sleep(RESET_S + 0.05)
+        sessao = client._get_session()
+        post_original = sessao.post
+
+        def quebrado(*args, **kwargs):
+            raise requests.exceptions.ChunkedEncodingError('resposta truncada')
+
+        sessao.post = quebrado
+        try:
+            expect(requests.exceptions.ChunkedEncodingError, lambda: client.convert_html('<p>x</p>'),
+                   "unexpected error should propagate")
+        finally:
+            sessao.post = post_original
+        assert_true(client.stats()['state'] == MEIO_ABERTO, "circuit should still be half-open")
+        assert_true(not client._trial_in_flight, "trial slot leaked after an unexpected exception")
+        assert_true(client.stats()['in_flight'] == 0, "semaphore slot leaked after an unexpected exception")
+
+        # 6) Recovery: the next trial succeeds and closes the circuit
+        servidor.taxa_erro = 0.0
+        pdf = client.convert_html('<p>ok</p>')
+        assert_true(pdf.startswith(b'%PDF'), "trial after recovery should return a PDF")
+        assert_true(client.stats()['state'] == FECHADO, "successful trial should close the circuit")
+        assert_true(client.stats()['consecutive_failures'] == 0, "failures not reset after recovery")
+
+        # 7) 4xx is not retried and does not count against the breaker
+        servidor.taxa_erro, servidor.status_erro = 1.0, 400
+        antes = servidor.stats()['requests']
+        expect(GotenbergError, lambda: client.convert_html('<p>x</p>'), "4xx should raise GotenbergError")
+        assert_true(servidor.stats()['requests'] - antes == 1, "4xx must not be retried")
+        assert_true(client.stats()['state'] == FECHADO, "4xx must not open the circuit")
+
+        # 8) Priority: background work yields to interactive requests
+        servidor.taxa_erro = 0.0
+        check_priority(servidor.url)
+    finally:
+        servidor.parar()
+
+    # 9) Server down: connection errors are retried and open the circuit
+    client = new_client(servidor.url)
+    expect(GotenbergError, lambda: client.convert_html('<p>x</p>'), "connection refused should fail")
+    assert_true(client.stats()['state'] == ABERTO, "connection failures should open the circuit")
+
+    print("[OK] Gotenberg client tests passed.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""
+Scalar vs batch equivalence for the PREVENT calculator:
+- calculate_prevent_risk_batch must return, row by row, the same risk10Year,
+  risk30Year, egfr, bmi and classification as calculate_prevent_risk +
+  get_risk_classification
+- covered: seeded random patients, rows whose rounding falls a floating-point
+  step away from the .x5 midpoint, invalid rows (missing/zero/non-numeric
+  fields, unknown sex, overflow), column input and the scalar fallback used
+  without NumPy
+
+Run:
+  python scripts/test_prevent_batch.py
+"""
+from __future__ import annotations
+import math
+import os
+import random
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+os.environ.setdefault('LOG_LEVEL', 'ERROR')
+
+try:
+    from src.utils import prevent_calculator
+    from src.utils.prevent_calculator import (
+        PREVENT_CAMPOS, calculate_prevent_risk, calculate_prevent_risk_batch, get_risk_classification,
+        load_coefficients,
+    )
+except Exception as e:
+    print(f"[FAIL] Could not import prevent_calculator: {e}")
+    sys.exit(1)
+
+SEED = 3
+CAMPOS = ('risk10Year', 'risk30Year', 'egfr', 'bmi')
+
+
+def assert_true(cond: bool, msg: str):
+    if not cond:
+        print(f"[FAIL] {msg}")
+        sys.exit(1)
+
+
+def random_patients(n: int) -> list:
+    rnd = random.Random(SEED)
+    pacientes = []
+    for _ in range(n):
+        p = {
+            'age': rnd.randint(30, 79),
+            'sex': rnd.choice(['masculino', 'feminino', 'Feminino']),
+            'totalCholesterol': round(rnd.uniform(120, 340), rnd.choice([0, 1, 2])),
+            'hdlCholesterol': round(rnd.uniform(20, 100), rnd.choice([0, 1])),
+            'systolicBP': round(rnd.uniform(90, 200), rnd.choice([0, 1])),
+            'diabetes': rnd.random() < .3,
+            'smoking': rnd.random() < .3,
+        }
+        if rnd.random() < .6:
+            p['weight'] = round(rnd.uniform(40, 150), 1)
+            p['height'] = rnd.randint(140, 200)
+        if rnd.random() < .5:
+            p['creatinine'] = round(rnd.uniform(0.4, 3.0), 2)
+        pacientes.append(p)
+    return pacientes
+
+
+def _risk10(p: dict) -> float:
+    """Unrounded 10-year risk, same formula as calculate_prevent_risk"""
+    c = load_coefficients()['coefficients'][p['sex']]
+    log_odds = (c['intercept'] + c['beta_age'] * p['age'] + c['beta_chol'] * p['totalCholesterol']
+                + c['beta_hdl'] * p['hdlCholesterol'] + c['beta_sbp'] * p['systolicBP']
+                + (c['beta_diabetes'] if p['diabetes'] else 0) + (c['beta_smoking'] if p['smoking'] else 0))
+    return math.exp(log_odds) / (1 + math.exp(log_odds)) * 100
+
+
+def borderline_patients() -> list:
+    """Systolic BP bisected until risk10Year * 10 sits at a .5 midpoint, plus neighbouring floats"""
+    pacientes = []
+    for sexo in ('masculino', 'feminino'):
+        for idade in (45, 60, 75):
+            base = {'age': idade, 'sex': sexo, 'totalCholesterol': 210, 'hdlCholesterol': 45,
+                    'diabetes': idade == 60, 'smoking': idade == 75}
+            alvo_min = _risk10(dict(base, systolicBP=100)) * 10
+            alvo_max = _risk10(dict(base, systolicBP=190)) * 10
+            for meio in [k + 0.5 for k in range(math.ceil(alvo_min), math.floor(alvo_max))][:6]:
+                baixo, alto = 100.0, 190.0
+                for _ in range(200):
+                    sbp = (baixo + alto) / 2
+                    if _risk10(dict(base, systolicBP=sbp)) * 10 < meio:
+                        baixo = sbp
+                    else:
+                        alto = sbp
+                for passos in range(-3, 4):
+                    sbp = baixo
+                    for _ in range(abs(passos)):
+                        sbp = math.nextafter(sbp, math.inf if passos > 0 else -math.inf)
+                    pacientes.append(dict(base, systolicBP=sbp))
+    return pacientes
+
+
+def invalid_patients() -> list:
+    valido = {'age': 55, 'sex': 'masculino', 'totalCholesterol': 200, 'hdlCholesterol': 50, 'systolicBP': 130}
+    return [
+        {},
+        dict(valido, age=0),
+        dict(valido, totalCholesterol=None),
+        dict(valido, hdlCholesterol=''),
+        dict(valido, systolicBP='130'),
+        dict(valido, sex='outro'),
+        dict(valido, sex=''),
+        dict(valido, creatinine='1.2'),
+        dict(valido, creatinine=-1.0),
+        dict(valido, weight=70),
+        dict(valido, weight=70, height=0),
+        dict(valido, systolicBP=1e6),
+        dict(valido, systolicBP=-1e6),
+        dict(valido, age=1e308, creatinine=1.0),
+        dict(valido, diabetes='sim', smoking=0),
+        valido,
+    ]
+
+
+def expected(pacientes: list) -> dict:
+    esperado = {campo: [] for campo in CAMPOS + ('classificacao',)}
+    for p in pacientes:
+        r = calculate_prevent_risk(p)
+        for campo in CAMPOS:
+            esperado[campo].append(r[campo] if r else None)
+        esperado['classificacao'].append(get_risk_classification(r['risk10Year']) if r else None)
+    return esperado
+
+
+def compare(label: str, pacientes: list, obtido: dict):
+    esperado = expected(pacientes)
+    for campo in esperado:
+        for i, (a, b) in enumerate(zip(esperado[campo], obtido[campo])):
+            # Same value and type: 85 and 85.0 serialize differently in the JSON response
+            assert_true(a == b and type(a) is type(b),
+                        f"{label}: row {i} {campo} scalar={a!r} batch={b!r} patient={pacientes[i]!r}")
+        assert_true(len(obtido[campo]) == len(pacientes), f"{label}: {campo} has {len(obtido[campo])} rows")
+
+
+def main():
+    grupos = {
+        'random': random_patients(5000),
+        'borderline': borderline_patients(),
+        'invalid': invalid_patients(),
+    }
+    todos = [p for pacientes in grupos.values() for p in pacientes]
+    grupos['mixed'] = todos
+
+    for label, pacientes in grupos.items():
+        compare(label, pacientes, calculate_prevent_risk_batch(pacientes))
+
+    # Column input: {campo: [valores]}, missing columns take the defaults
+    colunas = {campo: [p.get(campo, padrao) for p in todos] for campo, padrao in PREVENT_CAMPOS.items()}
+    compare('columns', todos, calculate_prevent_risk_batch(colunas))
+
+    # Fallback without NumPy goes through the scalar path
+    numpy_disponivel = prevent_calculator.NUMPY_AVAILABLE
+    prevent_calculator.NUMPY_AVAILABLE = False
+    try:
+        compare('no-numpy', todos, calculate_prevent_risk_batch(todos))
+    finally:
+        prevent_calculator.NUMPY_AVAILABLE = numpy_disponivel
+
+    assert_true(calculate_prevent_risk_batch([]) == {campo: [] for campo in CAMPOS + ('classificacao',)},
+                "empty batch should return empty columns")
+    for invalido in ('x', [1, 2], {'age': [50], 'sex': ['masculino', 'feminino']}):
+        try:
+            calculate_prevent_risk_batch(invalido)
+        except ValueError:
+            continue
+        assert_true(False, f"batch {invalido!r} should raise ValueError")
+
+    print(f"[OK] PREVENT batch matches the scalar path ({len(todos)} patients, "
+          f"{len(grupos['borderline'])} borderline).")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""
+Corpus equivalence test for /checkup-intelligent:
+- a seeded corpus of patient payloads (ages 0-100, both sexes, blood pressure,
+  lipids, BMI, comorbidities, medications, smoking history, HIV data, pregnancy)
+  is posted to the endpoint
+- each response is compared with the fingerprint recorded in
+  scripts/rule_corpus_expected.json, captured from the original hand-written
+  rule cascade (baseline)
+
+The corpus only uses input forms whose meaning did not change on purpose
+(comorbidities as list or {item: true}, smoking 'nunca_fumou'/'ex', no PREVENT
+smoking input); the deliberate input-parsing fixes are pinned in
+scripts/test_corrections.py instead. `item_id`, added by the exam catalog, is
+not part of the fingerprint, and `descricao` is compared as a bag of words:
+the baseline joined merged descriptions in set order, which varied between runs.
+For the same reason a few payloads had more than one baseline output; --gravar
+runs the corpus under several PYTHONHASHSEED values and keeps every variant.
+
+Run:
+  python scripts/test_rule_corpus.py
+  python scripts/test_rule_corpus.py --gravar   # re-record after a deliberate change
+"""
+from __future__ import annotations
+import hashlib
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+EXPECTED_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'rule_corpus_expected.json')
+SEED = 20261017
+HASH_SEEDS = range(8)
+SEXES = ('masculino', 'feminino')
+COMORBIDADES = ('hipertensao', 'hipertensao_resistente', 'has_resistente', 'cardiopatia', 'dpoc', 'hiv',
+                'diabetes', 'diabetes_tipo_2', 'sop', 'obesidade')
+
+
+def corpus() -> list:
+    """Deterministic payloads: every age/sex pair plus 1800 random combinations"""
+    rnd = random.Random(SEED)
+    payloads = [{'nome': 'X', 'idade': idade, 'sexo': sexo} for idade in range(0, 101) for sexo in SEXES]
+    for i in range(1800):
+        p = {'nome': f'P{i}', 'idade': rnd.randint(14, 95), 'sexo': rnd.choice(SEXES)}
+        if rnd.random() < .2:
+            p['gestante'] = rnd.choice([True, False])
+        if rnd.random() < .5:
+            p['pas'] = rnd.choice([110, 125, 131, 135, 150, 180])
+            p['pad'] = rnd.choice([70, 85, 91, 95])
+        if rnd.random() < .5:
+            p['colesterol_total'] = rnd.choice([150, 200, 260, 320])
+            p['hdl'] = rnd.choice([30, 45, 60])
+        if rnd.random() < .4:
+            p['peso'] = rnd.choice([55, 70, 90, 120])
+            p['altura'] = rnd.choice([150, 165, 180])
+        itens = rnd.sample(COMORBIDADES, rnd.randint(0, 3))
+        p['comorbidades'] = {c: True for c in itens} if rnd.random() < .2 else itens
+        if rnd.random() < .3:
+            p['medicacoes'] = rnd.choice([['anti_hipertensivos'], []])
+        if rnd.random() < .5:
+            p['medicacoes_continuo'] = rnd.choice(['Metformina 850mg', 'losartana', 'Enalapril e furosemida',
+                                                   'bra', 'diurético', 'nada', 'METFORMIN, atenolol', ''])
+        if rnd.random() < .5:
+            p['tabagismo'] = rnd.choice(['nunca_fumou', 'ex'])
+            p['macos_ano'] = rnd.choice([0, 5, 10, 15, 20, 40])
+            p['anos_parou_fumar'] = rnd.choice([0, 5, 14, 15, 30])
+        if rnd.random() < .3:
+            p['hba1c'] = rnd.choice([5.2, 6.4, 6.6, 8])
+        if rnd.random() < .2:
+            p['creatinina'] = rnd.choice([0.8, 1.4])
+        if rnd.random() < .2:
+            p['historia_familiar'] = rnd.choice([{'diabetes': True}, [], {}])
+        if rnd.random() < .2:
+            p['atividade_fisica'] = rnd.choice(['sedentario', 'ativo', 'sedentário'])
+        if 'hiv' in itens or rnd.random() < .1:
+            hiv = {}
+            if rnd.random() < .7:
+                hiv['cd4'] = rnd.choice([100, 349, 350, 500, 501, 800])
+            if rnd.random() < .7:
+                hiv['carga_viral'] = rnd.choice([0, 40, 1000, 1001, 50000])
+            if rnd.random() < .7:
+                hiv['em_tarv'] = rnd.choice(['sim', 'nao'])
+            if rnd.random() < .7:
+                hiv['supressao_viral'] = rnd.choice(['sim', 'nao'])
+            if rnd.random() < .5:
+                p['hiv_data'] = hiv
+            else:
+                p.update(hiv)
+        payloads.append(p)
+    return payloads
+
+
+def normalize(valor):
+    """Drop item_id and compare merged descriptions as a bag of words"""
+    if isinstance(valor, dict):
+        return {k: ' '.join(sorted(v.split())) if k == 'descricao' and isinstance(v, str) else normalize(v)
+                for k, v in valor.items() if k != 'item_id'}
+    if isinstance(valor, list):
+        return [normalize(v) for v in valor]
+    return valor
+
+
+def fingerprint(status: int, body) -> str:
+    texto = json.dumps([status, normalize(body)], ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(texto.encode('utf-8')).hexdigest()[:16]
+
+
+def run_corpus(app) -> list:
+    client = app.test_client()
+    resultados = []
+    for payload in corpus():
+        resposta = client.post('/api/checkup-intelligent', data=json.dumps(payload),
+                               content_type='application/json')
+        resultados.append(fingerprint(resposta.status_code, resposta.get_json()))
+    return resultados
+
+
+def record() -> list:
+    """Fingerprints of every PYTHONHASHSEED run; payloads with several outputs keep all of them"""
+    variantes = []
+    for hash_seed in HASH_SEEDS:
+        with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as f:
+            saida = f.name
+        env = dict(os.environ, PYTHONHASHSEED=str(hash_seed))
+        subprocess.run([sys.executable, os.path.abspath(__file__), '--listar', saida], env=env,
+                       check=True, stdout=subprocess.DEVNULL)
+        with open(saida, encoding='utf-8') as f:
+            variantes.append(json.load(f))
+        os.unlink(saida)
+    registrados = []
+    for obtidos in zip(*variantes):
+        unicos = sorted(set(obtidos))
+        registrados.append(unicos[0] if len(unicos) == 1 else unicos)
+    return registrados
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if '--gravar' in argv:
+        registrados = record()
+        with open(EXPECTED_PATH, 'w', encoding='utf-8') as f:
+            json.dump({'seed': SEED, 'fingerprints': registrados}, f, indent=0)
+            f.write('\n')
+        variaveis = sum(isinstance(r, list) for r in registrados)
+        print(f"[OK] Recorded {len(registrados)} fingerprints ({variaveis} with several variants) in {EXPECTED_PATH}")
+        return
+
+    # Temporary database: the corpus must not write thousands of check-ups into the project database
+    banco = tempfile.NamedTemporaryFile(prefix='evidens_corpus_', suffix='.db', delete=False)
+    banco.close()
+    os.environ.setdefault('DATABASE_URL', f'sqlite:///{banco.name}')
+    os.environ.setdefault('CHECKUP_SPILL_DIR', banco.name + '.spill')
+    os.environ.setdefault('LOG_LEVEL', 'ERROR')
+    try:
+        from app import app
+    except Exception as e:
+        print(f"[FAIL] Could not import app: {e}")
+        sys.exit(1)
+
+    try:
+        obtidos = run_corpus(app)
+    finally:
+        os.unlink(banco.name)
+
+    if '--listar' in argv:
+        with open(argv[argv.index('--listar') + 1], 'w', encoding='utf-8') as f:
+            json.dump(obtidos, f)
+        return
+
+    with open(EXPECTED_PATH, encoding='utf-8') as f:
+        esperado = json.load(f)
+    if esperado.get('seed') != SEED or len(esperado['fingerprints']) != len(obtidos):
+        print("[FAIL] Corpus changed; expected fingerprints do not match the generator")
+        sys.exit(1)
+
+    payloads = corpus()
+    divergentes = [
+        i for i, (registrado, obtido) in enumerate(zip(esperado['fingerprints'], obtidos))
+        if obtido != registrado and not (isinstance(registrado, list) and obtido in registrado)
+    ]
+    if divergentes:
+        print(f"[FAIL] {len(divergentes)} of {len(obtidos)} responses differ from the recorded corpus")
+        for i in divergentes[:5]:
+            print(f"  #{i}: {json.dumps(payloads[i], ensure_ascii=False)}")
+        sys.exit(1)
+    print(f"[OK] Rule corpus matches ({len(obtidos)} payloads).")
+
+
+if __name__ == '__main__':
+    main()
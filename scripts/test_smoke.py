@@ -67,6 +67,15 @@ def main():
     assert_true(any((rec.get('referencia_html') or '') for rec in recs1),
                 "No referencia_html found in recommendations (25M)")
 
+    # Observability: Server-Timing on instrumented routes and Prometheus text at /metrics
+    assert_true('total;dur=' in r1.headers.get('Server-Timing', ''), "Server-Timing missing on /checkup-intelligent")
+    r_metrics = client.get('/metrics')
+    assert_true(r_metrics.status_code == 200, f"/metrics HTTP {r_metrics.status_code}")
+    assert_true((r_metrics.content_type or '').startswith('text/plain; version=0.0.4'),
+                f"Expected Prometheus content-type, got {r_metrics.content_type}")
+    assert_true('evidens_http_requests_total' in r_metrics.get_data(as_text=True),
+                "/metrics missing evidens_http_requests_total")
+
     # 2) Male, 55y (Pneumococcal >=50y)
     payload_55m = {
         'nome': 'Teste 55M',
@@ -10,8 +10,13 @@ from src.routes.user import user_bp
 from src.routes.checkup import checkup_bp
 from src.routes.checkup_intelligent import checkup_intelligent_bp
 from src.routes.database_api import database_api_bp
+from src.routes.prevent import prevent_bp
+from src.routes.pdf_jobs import pdf_jobs_bp
 from src.utils.analytics import analytics, track_visit
 from src.utils.cors import register_private_network_sanitizer
+from src.utils.observability import register_observability
+from src.utils.checkup_writer import checkup_writer
+from src.utils.template_env import preload_templates
 
 app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
 app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
@@ -19,18 +24,28 @@ app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
 # Habilitar CORS para todas as rotas
 CORS(app)
 register_private_network_sanitizer(app)
+register_observability(app)
 
 app.register_blueprint(user_bp, url_prefix='/api')
 app.register_blueprint(checkup_bp, url_prefix='/api')
 app.register_blueprint(checkup_intelligent_bp, url_prefix='/api')
+app.register_blueprint(prevent_bp, url_prefix='/api')
+app.register_blueprint(pdf_jobs_bp, url_prefix='/api')
 app.register_blueprint(database_api_bp)
 
+# Compilar templates de documentos na inicialização
+preload_templates()
+
 # uncomment if you need to use database
-app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
+# DATABASE_URL aponta para outro banco (ex.: benchmarks gravando em um arquivo temporário)
+app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv(
+    'DATABASE_URL', f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}")
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 db.init_app(app)
 with app.app_context():
     db.create_all()
+# Gravação dos check-ups em lote fora da requisição (regrava o que ficou em disco)
+checkup_writer.init_app(app)
 
 @app.route('/analytics/stats')
 def get_analytics_stats():
@@ -1,57 +1,10 @@
 from flask import Blueprint, request, jsonify
+from src.utils.patient_input import PatientInput, parse_smoking_status as _parse_smoking_status
+from src.utils.term_extractor import term_extractor, CONDICAO
 
 checkup_bp = Blueprint('checkup', __name__)
 
 
-def _parse_smoking_status(tabagismo, data=None):
-    """Normaliza tabagismo vindo como string, dict ou campos achatados para (status, macos_ano)."""
-    status = 'nunca_fumou'
-    macos = 0
-    
-    try:
-        # Priorizar dict tabagismo se disponível
-        if isinstance(tabagismo, dict):
-            status = tabagismo.get('status') or tabagismo.get('estado') or 'nunca_fumou'
-            macos_value = tabagismo.get('macos_ano') or tabagismo.get('pack_years') or 0
-            try:
-                macos = int(macos_value) if macos_value else 0
-            except (ValueError, TypeError):
-                macos = 0
-        elif isinstance(tabagismo, str):
-            status = tabagismo
-        
-        # Verificar campos achatados no payload principal se data fornecido
-        if data:
-            flat_status = data.get('tabagismo_status')
-            flat_macos = data.get('tabagismo_macos_ano')
-            
-            if flat_status:
-                status = flat_status
-            if flat_macos:
-                try:
-                    macos = int(flat_macos) if flat_macos else 0
-                except (ValueError, TypeError):
-                    macos = 0
-                    
-    except Exception:
-        # Em caso de qualquer erro, usar valores padrão seguros
-        status = 'nunca_fumou'
-        macos = 0
-    
-    # Normalizar status
-    if isinstance(status, str):
-        status = status.replace('-', '_').lower().strip()
-        if status == 'fumante':
-            status = 'fumante_atual'
-        elif status == 'ex_fumante' or status == 'ex-fumante':
-            status = 'ex_fumante'
-        elif status not in ['fumante_atual', 'ex_fumante', 'nunca_fumou']:
-            status = 'nunca_fumou'
-    else:
-        status = 'nunca_fumou'
-        
-    return status, macos
-
 @checkup_bp.route('/api/checkup', methods=['POST'])
 def gerar_recomendacoes():
     """
@@ -67,20 +20,16 @@ def gerar_recomendacoes():
         if 'idade' not in data or 'sexo' not in data:
             return jsonify({'error': 'Idade e sexo são obrigatórios'}), 400
         
-        idade = data['idade']
-        sexo = data['sexo']
-        comorbidades = data.get('comorbidades', [])
+        paciente = PatientInput.from_request(data)
+        idade = paciente.idade
+        sexo = paciente.sexo
+        comorbidades = list(paciente.comorbidades)
         outras_comorbidades = data.get('outras_comorbidades', '')
         historia_familiar = data.get('historia_familiar', [])
         outras_hf = data.get('outras_hf', '')
-        tabagismo = data.get('tabagismo', {})
-        
-        # Normalizar tabagismo usando helper resiliente
-        tabagismo_normalizado, macos_ano = _parse_smoking_status(tabagismo, data)
-        print(f"DEBUG: tabagismo(normalizado)={tabagismo_normalizado}, macos_ano={macos_ano}")
         
-        # Reconstruir dict tabagismo normalizado para compatibilidade
-        tabagismo = {'status': tabagismo_normalizado, 'macos_ano': macos_ano}
+        # Tabagismo já normalizado (string, dict ou campos achatados)
+        tabagismo = {'status': paciente.tabagismo, 'macos_ano': int(paciente.macos_ano)}
         
         # Gerar recomendações
         recomendacoes = []
@@ -129,9 +78,10 @@ def gerar_recomendacoes():
 def process_other_conditions_simple(conditions_text, condition_type):
     """Processa condições adicionais usando regras simples"""
     recomendacoes = []
-    conditions_lower = conditions_text.lower()
+    # Classes de condições citadas no texto (config/clinical_terms.json, sem acentos)
+    encontradas = term_extractor.classes(conditions_text, CONDICAO)
     
-    # Mapeamento de condições para recomendações
+    # Mapeamento de classes de condições para recomendações
     condition_mappings = {
         'dpoc': {
             'titulo': 'Espirometria',
@@ -151,7 +101,7 @@ def process_other_conditions_simple(conditions_text, condition_type):
             'prioridade': 'alta',
             'referencia': 'ATA 2014'
         },
-        'depressão': {
+        'depressao': {
             'titulo': 'PHQ-9',
             'descricao': 'Questionário de depressão semestral',
             'prioridade': 'alta',
@@ -163,7 +113,7 @@ def process_other_conditions_simple(conditions_text, condition_type):
             'prioridade': 'media',
             'referencia': 'USPSTF Grau B'
         },
-        'próstata': {
+        'prostata': {
             'titulo': 'PSA',
             'descricao': 'Antígeno prostático específico anual após os 50 anos',
             'prioridade': 'media',
@@ -178,7 +128,7 @@ def process_other_conditions_simple(conditions_text, condition_type):
     }
     
     for condition, recommendation in condition_mappings.items():
-        if condition in conditions_lower:
+        if condition in encontradas:
             rec = recommendation.copy()
             rec['categoria'] = f'outras_{condition_type}'
             recomendacoes.append(rec)
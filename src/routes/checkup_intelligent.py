@@ -1,21 +1,31 @@
-from flask import Blueprint, request, jsonify, render_template_string, Response
+from flask import Blueprint, request, jsonify, render_template_string, Response, current_app, stream_with_context
 import json
 import math
+import time
 from datetime import datetime
 from dateutil.relativedelta import relativedelta
 from src.utils.analytics import analytics
-from src.utils.reference_links import build_reference_links, build_reference_html
+from src.utils.reference_links import resolve_reference_links
 from src.utils.prevent_calculator import calculate_prevent_risk, get_risk_classification
 from src.utils.reference_manager import apply_reference_overrides
+from src.utils.rule_engine import rule_engine
+from src.utils.exam_catalog import exam_catalog
+from src.utils.vaccine_catalog import vaccine_catalog
+from src.utils.response_cache import checkup_cache, compact_cache
+from src.utils.stage_timer import etapa, registrar, stage_timings
+from src.utils.compact_response import FORMATO_COMPACTO, compactar, comprimir, escolher_codificacao
+from src.utils.patient_input import PatientInput, age_sex_flags as _age_sex_flags
+from src.utils.gotenberg_client import GotenbergUnavailable
+from src.utils.structured_log import get_logger
+
+log = get_logger(__name__)
 try:
     from src.models.user import db
-    from src.models.medical import Patient, Checkup, Recomendacao
+    from src.utils.checkup_writer import checkup_writer
 except ImportError:
     # Modelos não disponíveis em ambiente serverless
     db = None
-    Patient = None
-    Checkup = None
-    Recomendacao = None
+    checkup_writer = None
 
 checkup_intelligent_bp = Blueprint('checkup_intelligent', __name__)
 
@@ -34,6 +44,15 @@ def _wants_html(req: request) -> bool:
     accept = (req.headers.get('Accept') or '').lower()
     return 'text/html' in accept and 'application/json' not in accept
 
+def _wants_ndjson(req: request) -> bool:
+    """Detect opt-in streaming (one JSON object per line).
+    Priority: explicit query param (format=ndjson) > Accept header.
+    """
+    fmt = (req.args.get('format') or '').lower()
+    if fmt:
+        return fmt == 'ndjson'
+    return 'application/x-ndjson' in (req.headers.get('Accept') or '').lower()
+
 def _html_error_page(title: str, message: str) -> str:
     return f"""
     <!DOCTYPE html>
@@ -92,51 +111,12 @@ def parse_date_ymd(date_str):
 
 # Funções calculate_prevent_risk e get_risk_classification agora são importadas de src.utils.prevent_calculator
 
+RISCOS_ELEVADOS = ('borderline', 'intermediario', 'alto')
+
 def generate_biomarker_recommendations(risk_level, age, sex):
     """Gera recomendações de biomarcadores baseadas no nível de risco"""
-    recommendations = []
-    
-    if risk_level in ['borderline', 'intermediario', 'alto']:
-        recommendations.extend([
-            {
-                'titulo': 'Anti-HIV 1 e 2, soro',
-                'descricao': 'Teste para detecção de HIV',
-                'subtitulo': 'Rastreamento de HIV',
-                'categoria': 'laboratorio',
-                'prioridade': 'alta',
-                'referencia': 'MS 2024',
-                'grau_evidencia': 'A'
-            },
-            {
-                'titulo': 'Anti-HCV IgG, soro',
-                'descricao': 'Teste para detecção de Hepatite C',
-                'subtitulo': 'Rastreamento de Hepatite C',
-                'categoria': 'laboratorio',
-                'prioridade': 'alta',
-                'referencia': 'MS 2024',
-                'grau_evidencia': 'A'
-            },
-            {
-                'titulo': 'TOTG-75g, soro',
-                'descricao': 'Teste oral de tolerância à glicose',
-                'subtitulo': 'Avaliação de intolerância à glicose',
-                'categoria': 'laboratorio',
-                'prioridade': 'alta',
-                'referencia': 'ADA 2024',
-                'grau_evidencia': 'A'
-            },
-            {
-                'titulo': 'HbA1c, soro',
-                'descricao': 'Hemoglobina glicada',
-                'subtitulo': 'Rastreamento de diabetes',
-                'categoria': 'laboratorio',
-                'prioridade': 'alta',
-                'referencia': 'ADA 2024',
-                'grau_evidencia': 'A'
-            }
-        ])
-    
-    return recommendations
+    flags = ['risco_elevado'] if risk_level in RISCOS_ELEVADOS else []
+    return rule_engine.evaluate(age, sex, flags, etapas=('biomarcadores',))['recommendations']
 
 def generate_age_sex_recommendations(age, sex, country='BR', has_hypertension=False, has_resistant_hypertension=False, is_pregnant=False, tabagismo='nunca_fumou', macos_ano=0, has_dpoc=False):
     """Gera recomendações baseadas em idade, sexo e condições clínicas
@@ -148,1520 +128,323 @@ def generate_age_sex_recommendations(age, sex, country='BR', has_hypertension=Fa
         has_hypertension: Se o paciente tem hipertensão (detectado por PA ou checkboxes)
         has_resistant_hypertension: Se o paciente tem hipertensão resistente
     """
-    recommendations = []
-
-    def _add_rec(rec):
-        # Evita duplicados pelo título (case-insensitive) dentro desta função
-        title = (rec.get('titulo') or '').strip().lower()
-        if not title:
-            print(f"Recomendação ignorada: título vazio - {rec}")
-            return
-        
-        # Verificar se já existe uma recomendação com título similar
-        existing_titles = [(r.get('titulo') or '').strip().lower() for r in recommendations]
-        if title in existing_titles:
-            print(f"Recomendação duplicada ignorada: {title}")
-            return
-            
-        # Garantir que campos obrigatórios estão presentes
-        if 'subtitulo' not in rec or rec['subtitulo'] is None:
-            rec['subtitulo'] = ''
-        if 'grau_evidencia' not in rec or rec['grau_evidencia'] is None:
-            rec['grau_evidencia'] = ''
-            
-        recommendations.append(rec)
-        print(f"Recomendação adicionada: {title}")
-    
-    # Exames laboratoriais básicos - Rastreamento de Diabetes (3 exames separados)
-    _add_rec({
-        'titulo': 'Glicose, soro',
-        'descricao': 'Rastreamento de pré-diabetes e diabetes tipo 2. Valores de referência: <100 mg/dL normal, 100-125 mg/dL pré-diabetes, ≥126 mg/dL diabetes.',
-        'subtitulo': 'Adultos ≥35 anos | A cada 3 anos se normal',
-        'categoria': 'laboratorio',
-        'prioridade': 'alta',
-        'referencia': 'ADA 2024',
-        'grau_evidencia': 'A'
-    })
-    
-    _add_rec({
-        'titulo': 'Hemoglobina glicada (HbA1c), soro',
-        'descricao': 'Rastreamento de pré-diabetes e diabetes tipo 2. Valores de referência: <5,7% normal, 5,7-6,4% pré-diabetes, ≥6,5% diabetes. Reflete controle glicêmico dos últimos 2-3 meses.',
-        'subtitulo': 'Adultos ≥35 anos | A cada 3 anos se normal',
-        'categoria': 'laboratorio',
-        'prioridade': 'alta',
-        'referencia': 'ADA 2024',
-        'grau_evidencia': 'A'
-    })
-    
-    _add_rec({
-        'titulo': 'TOTG-75g (Teste Oral de Tolerância à Glicose), soro',
-        'descricao': 'Teste confirmatório para diabetes gestacional e rastreamento de diabetes tipo 2 quando glicemia de jejum e HbA1c são inconclusivos. Valores 2h pós-carga: <140 mg/dL normal, 140-199 mg/dL pré-diabetes, ≥200 mg/dL diabetes.',
-        'subtitulo': 'Adultos ≥35 anos com glicemia/HbA1c limítrofes | Conforme indicação',
-        'categoria': 'laboratorio',
-        'prioridade': 'media',
-        'referencia': 'ADA 2024',
-        'grau_evidencia': 'A'
-    })
-    
-    # Painel lipídico - recomendação ajustada por idade
-    if age >= 40:
-        # Adultos ≥40 anos
-        _add_rec({
-            'titulo': 'Colesterol total e frações, soro',
-            'descricao': 'Painel lipídico completo (não jejum): Colesterol total, HDL-C, triglicerídeos, LDL-C calculado e non-HDL-C. Rastreamento a cada 4-6 anos. Considerar ApoB se triglicerídeos altos, diabetes ou obesidade.',
-            'subtitulo': 'Adultos ≥40 anos | A cada 4-6 anos',
-            'categoria': 'laboratorio',
-            'prioridade': 'alta',
-            'referencia': 'ACC/AHA 2019 / ESC/EAS 2019',
-            'grau_evidencia': 'A'
-        })
-    elif age >= 20:
-        # Adultos 20-39 anos
-        _add_rec({
-            'titulo': 'Colesterol total e frações, soro',
-            'descricao': 'Colesterol total, HDL-C, triglicerídeos, LDL-C calculado e non-HDL-C. Rastreamento a cada 4-6 anos.',
-            'subtitulo': 'Adultos 20-39 anos | A cada 4-6 anos',
-            'categoria': 'laboratorio',
-            'prioridade': 'alta',
-            'referencia': 'ACC/AHA 2019',
-            'grau_evidencia': 'A'
-        })
-    
-    # Lipoproteína(a) - recomendação única na vida adulta
-    if age >= 20:
-        _add_rec({
-            'titulo': 'Lipoproteína(a) - Lp(a), soro',
-            'descricao': 'Medição única na vida adulta para refinamento de risco cardiovascular. Preferir ensaio independente de isoforma.',
-            'subtitulo': 'Adultos ≥20 anos | Dose única na vida',
-            'categoria': 'laboratorio',
-            'prioridade': 'media',
-            'referencia': 'ESC/EAS 2019 / EAS 2022',
-            'grau_evidencia': 'B'
-        })
-    
-    # Hemograma e TSH removidos - não há evidência para rastreamento universal
-    # TSH: USPSTF grau I (evidência insuficiente)
-    # Hemograma: sem guideline que recomende rastreamento universal
-    
-    _add_rec({
-        'titulo': 'Creatinina, soro',
-        'descricao': 'Avaliação da função renal',
-        'subtitulo': 'Adultos ≥18 anos | Anual',
-        'categoria': 'laboratorio',
-        'prioridade': 'alta',
-        'referencia': 'KDIGO 2024',
-        'grau_evidencia': 'A'
-    })
-    
-    # TGO/TGP removido: sem evidência para rastreamento universal em assintomáticos
-    # Apenas indicado para pacientes com fatores de risco específicos
-    
-    # HIV: Rastreamento para adolescentes e jovens ≤30 anos (PCDT-IST 2022)
-    if age <= 30:
-        _add_rec({
-            'titulo': 'Anti-HIV 1 e 2, soro',
-            'descricao': 'Rastreamento de HIV conforme PCDT-IST MS 2022. Adolescentes e jovens devem realizar teste anualmente.',
-            'subtitulo': 'Adolescentes e jovens ≤30 anos | Anual',
-            'categoria': 'laboratorio',
-            'prioridade': 'alta',
-            'referencia': 'PCDT-IST MS 2022',
-            'grau_evidencia': 'A'
-        })
-    
-    _add_rec({
-        'titulo': 'Anti-HCV IgG, soro',
-        'descricao': 'Teste para detecção de Hepatite C',
-        'subtitulo': 'Adultos ≥18 anos | Pelo menos 1x na vida',
-        'categoria': 'laboratorio',
-        'prioridade': 'alta',
-        'referencia': 'USPSTF 2024',
-        'grau_evidencia': 'A'
-    })
-    
-    # Exames para avaliação de hipertensão arterial (AHA 2025 / SBC 2025)
-    # Apenas adicionar se o paciente tiver hipertensão
-    if has_hypertension and age >= 18:
-        _add_rec({
-            'titulo': 'Potássio, soro',
-            'descricao': 'Avaliação de distúrbios eletrolíticos e investigação de hipertensão secundária',
-            'subtitulo': 'Adultos com HAS | Anual',
-            'categoria': 'laboratorio',
-            'prioridade': 'alta',
-            'referencia': 'AHA 2025 / SBC 2025',
-            'grau_evidencia': 'A'
-        })
-        
-        _add_rec({
-            'titulo': 'Ácido úrico, soro',
-            'descricao': 'Avaliação de risco cardiovascular e renal em pacientes hipertensos',
-            'subtitulo': 'Adultos com HAS | Anual',
-            'categoria': 'laboratorio',
-            'prioridade': 'media',
-            'referencia': 'AHA 2025 / SBC 2025',
-            'grau_evidencia': 'B'
-        })
-        
-        _add_rec({
-            'titulo': 'EAS - Elementos Anormais e Sedimentoscopia',
-            'descricao': 'Análise de urina para avaliação de lesão renal e investigação de hipertensão secundária',
-            'subtitulo': 'Adultos com HAS | Anual',
-            'categoria': 'laboratorio',
-            'prioridade': 'alta',
-            'referencia': 'AHA 2025 / SBC 2025',
-            'grau_evidencia': 'A'
-        })
-        
-        _add_rec({
-            'titulo': 'Razão albumina/creatinina, urina',
-            'descricao': 'Avaliação de albuminúria para detecção precoce de lesão renal em hipertensos',
-            'subtitulo': 'Adultos com HAS | Anual',
-            'categoria': 'laboratorio',
-            'prioridade': 'alta',
-            'referencia': 'AHA 2025 / SBC 2025',
-            'grau_evidencia': 'A'
-        })
-    
-    # Exames de imagem
-    _add_rec({
-        'titulo': 'Eletrocardiograma de repouso',
-        'descricao': 'ECG de 12 derivações - Rastreamento cardiovascular para hipertensão, diabetes ou ≥40 anos',
-        'subtitulo': 'Adultos ≥40 anos | Anual',
-        'categoria': 'imagem',
-        'prioridade': 'alta',
-        'referencia': 'AHA 2025 / SBC 2025 / AHA 2022 / SBC 2018',
-        'grau_evidencia': 'B'
-    })
-    
-    # Exames de imagem para avaliação de hipertensão (AHA 2025 / SBC 2025)
-    # Apenas adicionar se o paciente tiver hipertensão
-    if has_hypertension and age >= 18:
-        _add_rec({
-            'titulo': 'MAPA - Monitorização Ambulatorial da Pressão Arterial (24h)',
-            'descricao': 'Confirmação diagnóstica de hipertensão arterial, investigação de hipertensão do avental branco e hipertensão mascarada',
-            'subtitulo': 'Adultos com suspeita de HAS | Conforme necessidade',
-            'categoria': 'imagem',
-            'prioridade': 'alta',
-            'referencia': 'AHA 2025 / SBC 2025',
-            'grau_evidencia': 'A'
-        })
-        
-        _add_rec({
-            'titulo': 'Ecocardiograma transtorácico',
-            'descricao': 'Avaliação de hipertrofia ventricular esquerda, função diastólica e lesão de órgão-alvo em hipertensos',
-            'subtitulo': 'Adultos com HAS | Inicial e a cada 1-2 anos',
-            'categoria': 'imagem',
-            'prioridade': 'media',
-            'referencia': 'AHA 2025 / SBC 2025',
-            'grau_evidencia': 'B'
-        })
-    
-    # Rastreamento de câncer por idade e sexo
-    if sex == 'feminino':
-        if 40 <= age <= 74:
-            _add_rec({
-                'titulo': 'Mamografia Digital - Bilateral',
-                'descricao': 'Mamografia bienal (40-74 anos)',
-                'subtitulo': 'Mulheres 40-74 anos | Bienal',
-                'categoria': 'imagem',
-                'prioridade': 'alta',
-                'referencia': 'USPSTF 2024',
-                'grau_evidencia': 'B'
-            })
-        
-        if 21 <= age <= 65:
-            _add_rec({
-                'titulo': 'Pesquisa do Papilomavírus Humano (HPV), por técnica molecular',
-                'descricao': 'Papanicolaou a cada 3 anos (21-65 anos)',
-                'subtitulo': 'Mulheres 21-65 anos | A cada 3 anos',
-                'categoria': 'laboratorio',
-                'prioridade': 'alta',
-                'referencia': 'USPSTF',
-                'grau_evidencia': 'A'
-            })
-    
-    if sex == 'masculino' and age >= 50:
-        _add_rec({
-            'titulo': 'PSA total, soro',
-            'descricao': 'Rastreamento de câncer de próstata (≥50 anos)',
-            'subtitulo': 'Homens ≥50 anos | Anual',
-            'categoria': 'laboratorio',
-            'prioridade': 'media',
-            'referencia': 'USPSTF 2018',
-            'grau_evidencia': 'C'
-        })
-    
-    # Densitometria óssea (Osteoporose)
-    if sex == 'feminino' and age >= 65:
-        _add_rec({
-            'titulo': 'Densitometria óssea (DEXA)',
-            'descricao': 'Rastreamento de osteoporose para prevenir fraturas osteoporóticas. Mulheres ≥65 anos.',
-            'subtitulo': 'Mulheres ≥65 anos | A cada 2 anos',
-            'categoria': 'imagem',
-            'prioridade': 'alta',
-            'referencia': 'USPSTF 2024',
-            'grau_evidencia': 'B'
-        })
-    
-    # Densitometria para mulheres pós-menopausa <65 anos com fatores de risco
-    # Nota: Requer avaliação individualizada de fatores de risco
-    
-    # Colonoscopia
-    if 45 <= age <= 75:
-        _add_rec({
-            'titulo': 'Colonoscopia de Rastreio com ou sem biópsia',
-            'descricao': 'Colonoscopia a cada 10 anos (45-75 anos)',
-            'subtitulo': 'Adultos 45-75 anos | A cada 10 anos',
-            'categoria': 'imagem',
-            'prioridade': 'alta',
-            'referencia': 'USPSTF 2021',
-            'grau_evidencia': 'B'
-        })
-    
-    # Aneurisma de Aorta Abdominal (AAA)
-    # Critérios: Homens 65-75 anos E (DPOC OU fumante/ex-fumante com ≥10 maços-ano)
-    if sex == 'masculino' and 65 <= age <= 75:
-        elegivel_aaa = has_dpoc or (tabagismo in ['atual', 'ex'] and macos_ano >= 10)
-        if elegivel_aaa:
-            _add_rec({
-                'titulo': 'Ultrassonografia com Doppler de Aorta Abdominal',
-                'descricao': 'Rastreamento de aneurisma de aorta abdominal. Homens 65-75 anos com DPOC ou história de tabagismo ≥10 maços-ano.',
-                'subtitulo': 'Homens 65-75 anos com DPOC ou ≥10 maços-ano | Dose única',
-                'categoria': 'imagem',
-                'prioridade': 'alta',
-                'referencia': 'USPSTF 2019',
-                'grau_evidencia': 'B'
-            })
-    
-    # Vacinas
-    # Influenza - nome comercial varia conforme idade
-    if age >= 65:
-        _add_rec({
-            'titulo': 'Influenza Tetravalente (Efluelda®)',
-            'descricao': 'Dose anual. Vacina de alta dose ou adjuvantada recomendada para idosos. Aplicar em dose única, INTRAMUSCULAR, anualmente.',
-            'subtitulo': 'Adultos ≥65 anos | Anual | Reforço: anual',
-            'categoria': 'vacina',
-            'prioridade': 'alta',
-            'referencia': 'SBIm 2025 / CDC 2025',
-            'grau_evidencia': 'A'
-        })
-    else:
-        _add_rec({
-            'titulo': 'Influenza Tetravalente (Fluarix®, Vaxigrip® ou similar)',
-            'descricao': 'Dose anual. Aplicar em dose única, INTRAMUSCULAR, anualmente.',
-            'subtitulo': 'Todos ≥6 meses | Anual | Reforço: anual',
-            'categoria': 'vacina',
-            'prioridade': 'alta',
-            'referencia': 'SBIm 2025 / CDC 2025',
-            'grau_evidencia': 'A'
-        })
-
-    # HPV (masculino e feminino) até 45 anos
-    if age <= 45:
-        prioridade_hpv = 'alta' if age <= 26 else 'media'
-        _add_rec({
-            'titulo': 'Gardasil 9® (Vacina HPV 9-Valente)',
-            'descricao': '2 doses (9-14 anos) ou 3 doses (15-45 anos). Esquema 0-2-6 meses para 3 doses ou 0-6 meses para 2 doses.',
-            'subtitulo': '9-45 anos | 2-3 doses conforme idade | Sem reforço',
-            'categoria': 'vacina',
-            'prioridade': prioridade_hpv,
-            'referencia': 'SBIm 2024',
-            'grau_evidencia': 'A'
-        })
-
-    # Hepatite B (adultos não vacinados)
-    if 19 <= age <= 59:
-        _add_rec({
-            'titulo': 'Hepatite B (Engerix-B® ou Euvax B®)',
-            'descricao': 'Esquema de 3 doses (0, 1, 6 meses) em não vacinados. Adultos até 59 anos devem ser vacinados.',
-            'subtitulo': 'Adultos 19-59 anos não imunizados | 3 doses',
-            'categoria': 'vacina',
-            'prioridade': 'alta',
-            'referencia': 'SBIm 2025 / CDC 2025',
-            'grau_evidencia': 'A'
-        })
-
-    # dTpa (Tétano, difteria, coqueluche)
-    _add_rec({
-            'titulo': 'dTpa (Adacel® ou Boostrix®)',
-        'descricao': '1 dose de dTpa, depois reforço com dT ou dTpa a cada 10 anos. Gestantes devem receber dTpa a cada gestação.',
-        'subtitulo': 'Adultos ≥18 anos | 1 dose inicial + reforços | Reforço: 10 anos (+ cada gestação)',
-        'categoria': 'vacina',
-        'prioridade': 'alta',
-        'referencia': 'SBIm 2025 / CDC 2025',
-        'grau_evidencia': 'A'
-    })
-
-    # Tríplice viral (Sarampo, caxumba, rubéola)
-    if age <= 68:  # CDC 2025: recomendada até 68 anos
-        _add_rec({
-            'titulo': 'Tríplice Viral - SCR (Priorix® ou M-M-R® II)',
-            'descricao': '1 ou 2 doses para adultos não vacinados ou sem comprovação vacinal. Adultos até 68 anos.',
-            'subtitulo': 'Adultos 19-68 anos não imunizados | 1-2 doses | Sem reforço',
-            'categoria': 'vacina',
-            'prioridade': 'media',
-            'referencia': 'SBIm 2025 / CDC 2025',
-            'grau_evidencia': 'A'
-        })
-
-    # Hepatite A
-    _add_rec({
-            'titulo': 'Hepatite A (Havrix® ou Vaqta®)',
-        'descricao': '2 doses com intervalo de 6 meses. Recomendada para grupos de risco, viajantes e áreas endêmicas.',
-        'subtitulo': 'Grupos de risco e viajantes | 2 doses',
-        'categoria': 'vacina',
-        'prioridade': 'media',
-        'referencia': 'SBIm 2025 / CDC 2025',
-        'grau_evidencia': 'A'
-    })
-
-    # Febre amarela (para áreas endêmicas)
-    _add_rec({
-            'titulo': 'Febre Amarela (Stamaril®)',
-        'descricao': 'Dose única ou 2 doses com intervalo de 10 anos (SBIm recomenda 2 doses). Indicada para residentes ou viajantes para áreas endêmicas.',
-        'subtitulo': 'Áreas endêmicas | 1-2 doses | Reforço: 10 anos (se 2 doses)',
-        'categoria': 'vacina',
-        'prioridade': 'media',
-        'referencia': 'SBIm 2025',
-        'grau_evidencia': 'A'
-    })
-
-    # Meningocócica ACWY
-    if age <= 59:
-        _add_rec({
-            'titulo': 'Meningocócica ACWY (Menactra® ou Menveo®)',
-            'descricao': 'Dose única ou reforço a cada 5 anos para grupos de risco. Adolescentes: dose aos 11-12 anos e reforço aos 16 anos.',
-            'subtitulo': 'Adolescentes 11-12 anos e adultos ≤59 anos | 1 dose | Reforço: 5 anos (grupos de risco)',
-            'categoria': 'vacina',
-            'prioridade': 'media',
-            'referencia': 'SBIm 2025 / CDC 2025',
-            'grau_evidencia': 'B'
-        })
-
-    # Meningocócica B (16-23 anos)
-    if 16 <= age <= 23:
-        _add_rec({
-            'titulo': 'Meningocócica B (Bexsero® ou Trumenba®)',
-            'descricao': '2 doses conforme esquema do fabricante. Bexsero®: intervalo de 1 mês. Trumenba®: intervalo de 6 meses.',
-            'subtitulo': 'Adolescentes 16-23 anos | 2 doses | Sem reforço',
-            'categoria': 'vacina',
-            'prioridade': 'media',
-            'referencia': 'SBIm 2025 / CDC 2025',
-            'grau_evidencia': 'B'
-        })
-
-    # Dengue (Qdenga)
-    if 4 <= age <= 60:
-        _add_rec({
-            'titulo': 'Dengue (Qdenga®)',
-            'descricao': '2 doses com intervalo de 3 meses. Indicada para áreas endêmicas. Licenciada para 4-60 anos.',
-            'subtitulo': '4-60 anos (áreas endêmicas) | 2 doses (0-3 meses) | Sem reforço',
-            'categoria': 'vacina',
-            'prioridade': 'media',
-            'referencia': 'SBIm 2025',
-            'grau_evidencia': 'B'
-        })
-
-    # COVID-19
-    _add_rec({
-            'titulo': 'COVID-19 (Comirnaty®, Spikevax® ou outras)',
-        'descricao': 'Dose de reforço anual conforme vacina disponível. Idosos ≥65 anos: pelo menos 2 doses da vacina atual.',
-        'subtitulo': 'Todos ≥6 meses | Anual (atualizada)',
-        'categoria': 'vacina',
-        'prioridade': 'alta',
-        'referencia': 'CDC 2025',
-        'grau_evidencia': 'A'
-    })
-
-    # Herpes zóster a partir de 50 anos
-    if age >= 50:
-        _add_rec({
-            'titulo': 'Herpes Zóster (Shingrix®)',
-            'descricao': '2 doses com intervalo de 2 a 6 meses.',
-            'subtitulo': 'Adultos ≥50 anos | 2 doses (0-2 a 6 meses) | Sem reforço',
-            'categoria': 'vacina',
-            'prioridade': 'alta',
-            'referencia': 'SBIm 2024 / CDC 2025',
-            'grau_evidencia': 'A'
-        })
-
-    # Pneumocócicas a partir de 50 anos
-    if age >= 50:
-        _add_rec({
-            'titulo': 'Pneumocócica 20V (Prevenar 20®) ou 15V (Vaxneuvance®)',
-            'descricao': 'VPC20 em dose única OU esquema sequencial VPC15 seguida de VPP23 após 6-12 meses. Pode ser coadministrada com Shingrix®, Efluelda® e Arexvy®.',
-            'subtitulo': 'Adultos ≥50 anos | Dose única ou esquema sequencial | Sem reforço',
-            'categoria': 'vacina',
-            'prioridade': 'alta',
-            'referencia': 'SBIm 2025 / CDC 2025',
-            'grau_evidencia': 'A'
-        })
-        _add_rec({
-            'titulo': 'Pneumocócica 23V (Pneumovax 23®)',
-            'descricao': '1 dose 6-12 meses após VPC15 (se esquema sequencial escolhido). Reforço 5 anos após a primeira dose de VPP23. Não necessária se VPC20 foi utilizada.',
-            'subtitulo': 'Adultos ≥50 anos | Esquema sequencial (se VPC15) | Reforço: 5 anos',
-            'categoria': 'vacina',
-            'prioridade': 'alta',
-            'referencia': 'SBIm 2025 / CDC 2025',
-            'grau_evidencia': 'A'
-        })
-    
-    # Vírus Sincicial Respiratório (RSV)
-    # Abrysvo®: APENAS para gestantes (32-36 semanas)
-    # Arexvy®: para adultos ≥50 anos NÃO gestantes
-    
-    if is_pregnant and sex == 'feminino':
-        # Abrysvo® para gestantes (32-36 semanas)
-        _add_rec({
-            'titulo': 'RSV - Vírus Sincicial Respiratório (Abrysvo®)',
-            'descricao': 'Dose única durante a gestação (32-36 semanas) para proteção do bebê contra doença respiratória grave causada por RSV. Única vacina RSV aprovada para uso em gestantes. Administração sazonal preferencial.',
-            'subtitulo': 'Gestantes 32-36 semanas | Dose única | Sem reforço',
-            'categoria': 'vacina',
-            'prioridade': 'alta',
-            'referencia': 'CDC 2025 / ACOG 2025',
-            'grau_evidencia': 'A'
-        })
-    elif age >= 50 and not is_pregnant:
-        # Arexvy® para adultos ≥50 anos não gestantes
-        # Prioridade alta para ≥75 anos, média para 50-74 anos
-        prioridade_rsv = 'alta' if age >= 75 else 'media'
-        _add_rec({
-            'titulo': 'RSV - Vírus Sincicial Respiratório (Arexvy®)',
-            'descricao': 'Dose única. Recomendada para adultos ≥50 anos com maior risco de evolução grave (cardiopatia, pneumopatia, diabetes, obesidade, nefropatia). Obrigatória para ≥75 anos. Pode ser coadministrada com Shingrix®, Efluelda® e vacinas pneumocócicas.',
-            'subtitulo': 'Adultos ≥50 anos (obrigatória ≥75 anos) | Dose única | Sem reforço',
-            'categoria': 'vacina',
-            'prioridade': prioridade_rsv,
-            'referencia': 'SBIm 2025 / CDC 2025',
-            'grau_evidencia': 'A'
-        })
-    
-    # Varicela (catapora) para suscetíveis não vacinados
-    if age <= 45:  # Prioridade para adultos jovens nascidos nos EUA
-        _add_rec({
-            'titulo': 'Varicela (Varilrix® ou Varivax®)',
-            'descricao': '2 doses com intervalo de 1-2 meses para adultos suscetíveis (sem história de doença ou vacinação prévia). Contraindicada para gestantes.',
-            'subtitulo': 'Adultos suscetíveis ≤45 anos | 2 doses (0-1 a 2 meses) | Sem reforço',
-            'categoria': 'vacina',
-            'prioridade': 'media',
-            'referencia': 'SBIm 2025 / CDC 2025',
-            'grau_evidencia': 'A'
-        })
-    
-    # Hepatites A e B combinada (Twinrix) - alternativa para quem precisa das duas
-    if 18 <= age <= 59:
-        _add_rec({
-            'titulo': 'Hepatites A e B Combinada (Twinrix®)',
-            'descricao': '3 doses (esquema 0-1-6 meses) ou esquema acelerado (0-7-21 dias + reforço aos 12 meses). Alternativa para adultos que precisam de ambas as vacinas.',
-            'subtitulo': 'Adultos 18-59 anos não imunizados | 3-4 doses (0-1-6 meses) | Sem reforço',
-            'categoria': 'vacina',
-            'prioridade': 'media',
-            'referencia': 'SBIm 2025',
-            'grau_evidencia': 'A'
-        })
-    
-    # Exames específicos para hipertensão resistente (AHA 2025 / SBC 2025)
-    # Apenas adicionar se o paciente tiver hipertensão resistente
-    if has_resistant_hypertension and age >= 18:
-        _add_rec({
-            'titulo': 'Polissonografia',
-            'descricao': 'Investigação de apneia obstrutiva do sono, causa comum de hipertensão resistente. Indicada para pacientes com ronco, sonolência diurna excessiva ou pausas respiratórias durante o sono.',
-            'subtitulo': 'Adultos com HAS resistente | Conforme necessidade',
-            'categoria': 'imagem',
-            'prioridade': 'alta',
-            'referencia': 'AHA 2025 / SBC 2025',
-            'grau_evidencia': 'A'
-        })
-        
-        _add_rec({
-            'titulo': 'Doppler de artérias renais',
-            'descricao': 'Investigação de estenose de artéria renal como causa de hipertensão secundária. Indicado em pacientes com hipertensão resistente, início abrupto de hipertensão grave, ou piora da função renal após IECA/BRA.',
-            'subtitulo': 'Adultos com HAS resistente | Conforme necessidade',
-            'categoria': 'imagem',
-            'prioridade': 'alta',
-            'referencia': 'AHA 2025 / SBC 2025',
-            'grau_evidencia': 'B'
-        })
-        
-        _add_rec({
-            'titulo': 'Relação Aldosterona/Renina (A/R)',
-            'descricao': 'Rastreamento de hiperaldosteronismo primário, causa importante de hipertensão resistente. Coletar pela manhã após 2 horas em pé. Relação >20-30 sugere hiperaldosteronismo.',
-            'subtitulo': 'Adultos com HAS resistente | Conforme necessidade',
-            'categoria': 'laboratorio',
-            'prioridade': 'alta',
-            'referencia': 'AHA 2025 / SBC 2025',
-            'grau_evidencia': 'A'
-        })
-        
-        _add_rec({
-            'titulo': 'Metanefrinas, plasma ou urina de 24h',
-            'descricao': 'Rastreamento de feocromocitoma em pacientes com hipertensão resistente, especialmente se crises hipertensivas, cefaleia, palpitações ou sudorese excessiva.',
-            'subtitulo': 'Adultos com HAS resistente | Conforme necessidade',
-            'categoria': 'laboratorio',
-            'prioridade': 'media',
-            'referencia': 'AHA 2025 / SBC 2025',
-            'grau_evidencia': 'B'
-        })
+    flags = _age_sex_flags(has_hypertension, has_resistant_hypertension, is_pregnant,
+                           tabagismo, macos_ano, has_dpoc)
+    return rule_engine.evaluate(age, sex, flags, etapas=('idade_sexo',))['recommendations']
+
+
+def _calcular_risco(patient_data):
+    """Risco PREVENT e sua classificação ('baixo' quando não calculável)"""
+    risk_result = calculate_prevent_risk(patient_data)
+    risk_level = 'baixo'
     
-    return recommendations
+    if risk_result:
+        risk_level = get_risk_classification(risk_result['risk10Year'])
+    return risk_result, risk_level
 
-@checkup_intelligent_bp.route('/checkup-intelligent', methods=['POST'])
-def generate_intelligent_recommendations():
-    try:
-        data = request.get_json()
-        if not data:
-            return jsonify({'error': 'Dados não fornecidos'}), 400
-        
-        # Extrair dados do paciente
-        age = int(data.get('idade', 0))
-        sex = data.get('sexo', 'masculino')
-        is_pregnant = data.get('gestante', False) or data.get('gestante') == 'true'
-        weight = float(data.get('peso', 0)) if data.get('peso') else None
-        height = float(data.get('altura', 0)) if data.get('altura') else None
-        
-        # Aceitar tanto 'pas' quanto 'pressao_sistolica' (compatibilidade com formulário)
-        sbp_value = data.get('pas') or data.get('pressao_sistolica') or 0
-        dbp_value = data.get('pad') or data.get('pressao_diastolica') or 0
-        
-        # Dados clínicos para PREVENT
-        patient_data = {
-            'age': age,
-            'sex': sex,
-            'totalCholesterol': float(data.get('colesterol_total', 0) or data.get('colesterol', 0)) if (data.get('colesterol_total') or data.get('colesterol')) else 0,
-            'hdlCholesterol': float(data.get('hdl_colesterol', 0) or data.get('hdl', 0)) if (data.get('hdl_colesterol') or data.get('hdl')) else 0,
-            'systolicBP': float(sbp_value) if sbp_value else 0,
-            'diabetes': 'diabetes_tipo_2' in data.get('comorbidades', []) or 'diabetes' in data.get('comorbidades', []),
-            'smoking': data.get('tabagismo') == 'fumante_atual',
-            'weight': weight,
-            'height': height,
-            'creatinine': float(data.get('creatinina', 1.0)) if data.get('creatinina') else 1.0
-        }
-        
-        # Calcular risco PREVENT
-        risk_result = calculate_prevent_risk(patient_data)
-        risk_level = 'baixo'
-        
-        if risk_result:
-            risk_level = get_risk_classification(risk_result['risk10Year'])
-        
-        # Detectar hipertensão automaticamente
-        has_hypertension = False
-        has_resistant_hypertension = False
-        
-        # 1. Detecção por valores de PA (SBP >130 ou DBP >90)
-        sbp = float(sbp_value) if sbp_value else 0
-        dbp = float(dbp_value) if dbp_value else 0
-        if sbp > 130 or dbp > 90:
-            has_hypertension = True
-            print(f"[DEBUG] Hipertensão detectada por PA: SBP={sbp}, DBP={dbp}")
-        
-        # 2. Detecção por checkboxes clínicos
-        comorbidades = data.get('comorbidades', [])
-        # Garantir que comorbidades é uma lista
-        if isinstance(comorbidades, str):
-            comorbidades = [comorbidades]
-        elif isinstance(comorbidades, dict):
-            # Se for objeto, extrair chaves onde valor é True
-            comorbidades = [k for k, v in comorbidades.items() if v]
-        elif not isinstance(comorbidades, list):
-            comorbidades = []
-        
-        medicacoes_checkboxes = data.get('medicacoes', [])
-        # Garantir que medicacoes é uma lista
-        if isinstance(medicacoes_checkboxes, str):
-            medicacoes_checkboxes = [medicacoes_checkboxes]
-        elif not isinstance(medicacoes_checkboxes, list):
-            medicacoes_checkboxes = []
-        
-        # Campo de texto de medicações contínuas
-        medicacoes_continuo = (data.get('medicacoes_continuo', '') or '').lower()
-        
-        # Verificar se tem hipertensão nas comorbidades
-        if 'hipertensao' in comorbidades or 'hipertensão' in comorbidades:
-            has_hypertension = True
-        
-        # Verificar se tem hipertensão resistente
-        if 'hipertensao_resistente' in comorbidades or 'has_resistente' in comorbidades:
-            has_hypertension = True
-            has_resistant_hypertension = True
-        
-        # Verificar se tem cardiopatia (frequentemente associada a HAS)
-        if 'cardiopatia' in comorbidades:
-            has_hypertension = True
-        
-        # Verificar se marcou checkbox de anti-hipertensivos
-        if 'anti_hipertensivos' in medicacoes_checkboxes:
-            has_hypertension = True
-        
-        # Verificar se usa medicações anti-hipertensivas no campo de texto
-        anti_htn_keywords = ['losartan', 'enalapril', 'captopril', 'valsartan', 'anlodipino', 
-                             'hidroclorotiazida', 'atenolol', 'propranolol', 'carvedilol',
-                             'metoprolol', 'bisoprolol', 'espironolactona', 'furosemida',
-                             'anti-hipertensiv', 'antihipertensiv']
-        for keyword in anti_htn_keywords:
-            if keyword in medicacoes_continuo:
-                has_hypertension = True
-                break
-        
-        # Extrair dados de tabagismo e DPOC
-        tabagismo = data.get('tabagismo', 'nunca_fumou')
-        macos_ano = float(data.get('macos_ano', 0)) if data.get('macos_ano') else 0
-        has_dpoc = 'dpoc' in comorbidades
-        
-        # Gerar recomendações
-        recommendations = []
-        
-        # Recomendações baseadas em idade, sexo e status de hipertensão
-        age_sex_recs = generate_age_sex_recommendations(age, sex, country='BR', 
-                                                         has_hypertension=has_hypertension,
-                                                         has_resistant_hypertension=has_resistant_hypertension,
-                                                         is_pregnant=is_pregnant,
-                                                         tabagismo=tabagismo,
-                                                         macos_ano=macos_ano,
-                                                         has_dpoc=has_dpoc)
-        recommendations.extend(age_sex_recs)
-        
-        # Recomendações de biomarcadores se necessário
-        if risk_level in ['borderline', 'intermediario', 'alto']:
-            biomarker_recs = generate_biomarker_recommendations(risk_level, age, sex)
-            recommendations.extend(biomarker_recs)
-        
-        # Rastreamento de câncer de pulmão (LDCT) - USPSTF 2021
-        # tabagismo e macos_ano já extraídos acima
-        anos_parou_fumar = float(data.get('anos_parou_fumar', 0)) if data.get('anos_parou_fumar') else 0
-        
-        # Critérios: 50-80 anos, ≥20 maços-ano, fumante atual OU parou há <15 anos
-        elegivel_ldct = False
-        if 50 <= age <= 80 and macos_ano >= 20:
-            if tabagismo == 'atual':
-                elegivel_ldct = True
-            elif tabagismo == 'ex' and anos_parou_fumar < 15:
-                elegivel_ldct = True
-        
-        if elegivel_ldct:
-            recommendations.append({
-                'titulo': 'Tomografia computadorizada de tórax de baixa dose (LDCT)',
-                'descricao': 'Rastreamento anual de câncer de pulmão. Indicado para adultos 50-80 anos com história de tabagismo de 20 maços-ano e que atualmente fumam ou pararam nos últimos 15 anos. Descontinuar se não fumou por 15 anos ou desenvolveu problema de saúde que limita substancialmente expectativa de vida.',
-                'subtitulo': 'Adultos 50-80 anos com ≥20 maços-ano | Anual',
-                'categoria': 'imagem',
-                'prioridade': 'alta',
-                'referencia': 'USPSTF 2021',
-                'link': 'https://www.uspreventiveservicestaskforce.org/uspstf/recommendation/lung-cancer-screening',
-                'grau_evidencia': 'B'
-            })
-        
-        # ========== DIABETES SCREENING E MANAGEMENT (ADA 2024) ==========
-        
-        # Calcular IMC
-        imc = None
-        if weight and height:
-            altura_m = height / 100
-            imc = weight / (altura_m ** 2)
-        
-        # Verificar se já é diabético
-        is_diabetic = 'diabetes_tipo_2' in comorbidades or 'diabetes' in comorbidades
-        
-        # Verificar HbA1C se fornecido
-        hba1c = float(data.get('hba1c', 0)) if data.get('hba1c') else None
-        if hba1c and hba1c > 6.5 and not is_diabetic:
-            # HbA1C > 6.5% indica diabetes - marcar automaticamente
-            is_diabetic = True
-            if 'diabetes_tipo_2' not in comorbidades:
-                comorbidades.append('diabetes_tipo_2')
-        
-        # SCREENING DE DIABETES (ADA 2024 Criteria)
-        should_screen_diabetes = False
-        
-        # Critério 1: Idade ≥35 anos (todos)
-        if age >= 35 and not is_diabetic:
-            should_screen_diabetes = True
-        
-        # Critério 2: Adultos com sobrepeso/obesidade + fatores de risco
-        if not is_diabetic and imc:
-            # IMC ≥25 (≥23 para asiáticos) + 1 fator de risco
-            if imc >= 25:
-                # Fatores de risco
-                has_risk_factors = False
-                
-                # Familiar de primeiro grau com diabetes
-                historia_familiar = data.get('historia_familiar', {})
-                if isinstance(historia_familiar, dict) and historia_familiar.get('diabetes'):
-                    has_risk_factors = True
-                
-                # Hipertensão
-                if has_hypertension:
-                    has_risk_factors = True
-                
-                # HDL < 35 mg/dL ou triglicerídeos > 250 mg/dL
-                hdl = float(data.get('hdl_colesterol', 0) or data.get('hdl', 0)) if (data.get('hdl_colesterol') or data.get('hdl')) else 0
-                if hdl > 0 and hdl < 35:
-                    has_risk_factors = True
-                
-                # Síndrome dos ovários policísticos (SOP)
-                if 'sop' in comorbidades or 'ovarios_policisticos' in comorbidades:
-                    has_risk_factors = True
-                
-                # Inatividade física
-                atividade_fisica = data.get('atividade_fisica', '')
-                if atividade_fisica == 'sedentario' or atividade_fisica == 'sedentário':
-                    has_risk_factors = True
-                
-                # Outras condições de resistência insulínica
-                if 'obesidade' in comorbidades or imc >= 30:
-                    has_risk_factors = True
-                
-                if has_risk_factors:
-                    should_screen_diabetes = True
-        
-        # Adicionar exames de screening se indicado
-        if should_screen_diabetes:
-            # Verificar se já não tem HbA1C nas recomendações
-            tem_hba1c = any('hba1c' in rec.get('titulo', '').lower() or 'hemoglobina glicada' in rec.get('titulo', '').lower() for rec in recommendations)
-            if not tem_hba1c:
-                recommendations.append({
-                    'titulo': 'Hemoglobina glicada (HbA1c), soro',
-                    'descricao': 'Rastreamento de pré-diabetes e diabetes tipo 2. Valores de referência: <5,7% normal, 5,7-6,4% pré-diabetes, ≥6,5% diabetes. Reflete controle glicêmico dos últimos 2-3 meses. Indicado para adultos ≥35 anos ou com sobrepeso/obesidade + fatores de risco.',
-                    'subtitulo': 'Adultos ≥35 anos ou com fatores de risco | A cada 3 anos se normal',
-                    'categoria': 'laboratorio',
-                    'prioridade': 'alta',
-                    'referencia': 'ADA 2024',
-                    'grau_evidencia': 'B'
-                })
-        
-        # EXAMES PARA DIABÉTICOS (ADA 2024 - Laboratory Evaluation)
-        if is_diabetic:
-            # Perfil lipídico completo
-            tem_lipidico = any('lipid' in rec.get('titulo', '').lower() or 'colesterol' in rec.get('titulo', '').lower() for rec in recommendations)
-            if not tem_lipidico:
-                recommendations.append({
-                    'titulo': 'Colesterol total e frações, soro',
-                    'descricao': 'Avaliação do risco cardiovascular em pacientes diabéticos. Realizar anualmente ou mais frequentemente se em tratamento para dislipidemia.',
-                    'subtitulo': 'Diabéticos | Anual',
-                    'categoria': 'laboratorio',
-                    'prioridade': 'alta',
-                    'referencia': 'ADA 2024',
-                    'grau_evidencia': 'A'
-                })
-            
-            # Função hepática (TGO, TGP)
-            recommendations.append({
-                'titulo': 'Aspartato aminotransferase, soro',
-                'descricao': 'Avaliação da função hepática em pacientes diabéticos. Importante antes de iniciar estatinas e para rastreamento de esteatose hepática não alcoólica (NAFLD).',
-                'subtitulo': 'Diabéticos | Anual',
-                'categoria': 'laboratorio',
-                'prioridade': 'alta',
-                'referencia': '<a href="https://diabetesjournals.org/care/article/47/Supplement_1/S1/153904/Standards-of-Care-in-Diabetes-2024" target="_blank">ADA 2024</a>',
-                'grau_evidencia': 'A'
-            })
-            recommendations.append({
-                'titulo': 'Alanina aminotransferase, soro',
-                'descricao': 'Avaliação da função hepática em pacientes diabéticos. Importante antes de iniciar estatinas e para rastreamento de esteatose hepática não alcoólica (NAFLD).',
-                'subtitulo': 'Diabéticos | Anual',
-                'categoria': 'laboratorio',
-                'prioridade': 'alta',
-                'referencia': 'ADA 2024',
-                'grau_evidencia': 'B'
-            })
-            
-            # Relação albumina/creatinina urinária (microalbuminúria)
-            recommendations.append({
-                'titulo': 'Relação albumina/creatinina urinária (uACR)',
-                'descricao': 'Rastreamento de nefropatia diabética. Valores ≥30 mg/g indicam albuminúria e risco aumentado de doença renal. Realizar anualmente.',
-                'subtitulo': 'Diabéticos | Anual',
-                'categoria': 'laboratorio',
-                'prioridade': 'alta',
-                'referencia': 'ADA 2024',
-                'grau_evidencia': 'A'
-            })
-            
-            # Creatinina sérica e eGFR
-            tem_creatinina = any('creatinina' in rec.get('titulo', '').lower() for rec in recommendations)
-            if not tem_creatinina:
-                recommendations.append({
-                    'titulo': 'Creatinina, soro',
-                    'descricao': 'Avaliação da função renal em pacientes diabéticos. Realizar anualmente para detecção precoce de doença renal diabética.',
-                    'subtitulo': 'Diabéticos | Anual',
-                    'categoria': 'laboratorio',
-                    'prioridade': 'alta',
-                    'referencia': 'ADA 2024',
-                    'grau_evidencia': 'A'
-                })
-            
-            # TSH (para diabetes tipo 1, mas pode ser útil para tipo 2 também)
-            recommendations.append({
-                'titulo': 'Hormônio Tireoestimulante (TSH), soro',
-                'descricao': 'Rastreamento de disfunção tireoidiana em pacientes diabéticos, especialmente tipo 1. Diabetes e doenças tireoidianas frequentemente coexistem.',
-                'subtitulo': 'Diabéticos tipo 1 | A cada 1-2 anos',
-                'categoria': 'laboratorio',
-                'prioridade': 'media',
-                'referencia': 'ADA 2024',
-                'grau_evidencia': 'E'
-            })
-            
-            # Vitamina B12 (se em uso de metformina)
-            medicacoes_continuo_lower = medicacoes_continuo.lower()
-            if 'metformina' in medicacoes_continuo_lower or 'metformin' in medicacoes_continuo_lower:
-                recommendations.append({
-                    'titulo': 'Vitamina B12, soro',
-                    'descricao': 'Monitoramento de deficiência de vitamina B12 em pacientes em uso de metformina. A metformina pode reduzir a absorção de B12, especialmente em uso prolongado.',
-                    'subtitulo': 'Diabéticos em uso de metformina | Periódico',
-                    'categoria': 'laboratorio',
-                    'prioridade': 'media',
-                    'referencia': 'ADA 2024',
-                    'grau_evidencia': 'B'
-                })
-            
-            # Hemograma completo
-            recommendations.append({
-                'titulo': 'Hemograma completo com plaquetas',
-                'descricao': 'Avaliação hematológica em pacientes diabéticos. Importante para detectar anemia, infecções e outras alterações hematológicas.',
-                'subtitulo': 'Diabéticos | Anual',
-                'categoria': 'laboratorio',
-                'prioridade': 'media',
-                'referencia': 'ADA 2024',
-                'grau_evidencia': 'E'
-            })
-            
-            # Potássio sérico (se em uso de IECA/BRA/diuréticos)
-            usa_ieca_bra = any(keyword in medicacoes_continuo_lower for keyword in ['enalapril', 'captopril', 'losartan', 'valsartan', 'ieca', 'bra'])
-            usa_diuretico = any(keyword in medicacoes_continuo_lower for keyword in ['hidroclorotiazida', 'furosemida', 'espironolactona', 'diurético', 'diuretico'])
-            
-            if usa_ieca_bra or usa_diuretico:
-                recommendations.append({
-                    'titulo': 'Potássio, soro',
-                    'descricao': 'Monitoramento de potássio em pacientes diabéticos em uso de IECA, BRA ou diuréticos. Importante para prevenir hiper ou hipocalemia.',
-                    'subtitulo': 'Diabéticos em uso de IECA/BRA/diuréticos | Periódico',
-                    'categoria': 'laboratorio',
-                    'prioridade': 'alta',
-                    'referencia': 'ADA 2024',
-                    'grau_evidencia': 'E'
-                })
-            
-            # Cálcio, vitamina D e fósforo (para pacientes apropriados)
-            recommendations.append({
-                'titulo': 'Cálcio, soro',
-                'descricao': 'Avaliação do metabolismo ósseo e risco de osteoporose em pacientes diabéticos.',
-                'subtitulo': 'Diabéticos | Anual',
-                'categoria': 'laboratorio',
-                'prioridade': 'media',
-                'referencia': '<a href="https://diabetesjournals.org/care/article/47/Supplement_1/S1/153904/Standards-of-Care-in-Diabetes-2024" target="_blank">ADA 2024</a>',
-                'grau_evidencia': 'B'
-            })
-            recommendations.append({
-                'titulo': '25-hidroxivitamina D, soro',
-                'descricao': 'Avaliação do metabolismo ósseo e risco de osteoporose em pacientes diabéticos.',
-                'subtitulo': 'Diabéticos | Anual',
-                'categoria': 'laboratorio',
-                'prioridade': 'media',
-                'referencia': '<a href="https://diabetesjournals.org/care/article/47/Supplement_1/S1/153904/Standards-of-Care-in-Diabetes-2024" target="_blank">ADA 2024</a>',
-                'grau_evidencia': 'B'
-            })
-            recommendations.append({
-                'titulo': 'Fósforo, soro',
-                'descricao': 'Avaliação do metabolismo ósseo em pacientes diabéticos, especialmente com doença renal ou osteoporose. Deficiência de vitamina D é comum em diabéticos.',
-                'subtitulo': 'Diabéticos com doença renal ou osteoporose | Conforme necessidade',
-                'categoria': 'laboratorio',
-                'prioridade': 'media',
-                'referencia': 'ADA 2024',
-                'grau_evidencia': 'E'
-            })
-            
-            # EXAMES DE IMAGEM PARA DIABÉTICOS
-            
-            # Fundoscopia (exame oftalmológico)
-            recommendations.append({
-                'titulo': 'Fundoscopia (Exame de fundo de olho)',
-                'descricao': 'Rastreamento de retinopatia diabética. Realizar exame oftalmológico completo com dilatação pupilar anualmente. A retinopatia diabética é a principal causa de cegueira em adultos.',
-                'subtitulo': 'Diabéticos | Anual',
-                'categoria': 'imagem',
-                'prioridade': 'alta',
-                'referencia': 'ADA 2024',
-                'grau_evidencia': 'A'
-            })
-            
-            # ECG (se ainda não estiver nas recomendações)
-            tem_ecg = any('eletrocardiograma' in rec.get('titulo', '').lower() or 'ecg' in rec.get('titulo', '').lower() for rec in recommendations)
-            if not tem_ecg:
-                recommendations.append({
-                    'titulo': 'Eletrocardiograma de repouso',
-                    'descricao': 'ECG de 12 derivações para rastreamento de doença cardiovascular em pacientes diabéticos. Diabetes é fator de risco importante para doença coronariana.',
-                    'subtitulo': 'Diabéticos | Anual',
-                    'categoria': 'imagem',
-                    'prioridade': 'alta',
-                    'referencia': 'ADA 2024',
-                    'grau_evidencia': 'C'
-                })
-        
-        # ========== HIV MANAGEMENT (EACS 2024, NIH 2024, MS Brasil 2024) ==========
-        
-        # Verificar se é HIV positivo
-        is_hiv_positive = 'hiv' in comorbidades
-        
-        if is_hiv_positive:
-            # Coletar dados HIV (aceitar tanto formato direto quanto hiv_data)
-            hiv_data = data.get('hiv_data', {})
-            try:
-                cd4_value = hiv_data.get('cd4') or data.get('cd4')
-                cd4 = int(cd4_value) if cd4_value and str(cd4_value).strip() else None
-            except (ValueError, TypeError):
-                cd4 = None
-            
-            try:
-                carga_viral_value = hiv_data.get('carga_viral') or data.get('carga_viral')
-                carga_viral = int(carga_viral_value) if carga_viral_value and str(carga_viral_value).strip() else None
-            except (ValueError, TypeError):
-                carga_viral = None
-            em_tarv = (hiv_data.get('em_tarv') == 'sim') or (data.get('em_tarv') == 'sim')
-            supressao_viral = (hiv_data.get('supressao_viral') == 'sim') or (data.get('supressao_viral') == 'sim')
-            
-            # EXAMES LABORATORIAIS PARA HIV+
-            
-            # CD4 Count - Frequência baseada em valor e TARV
-            frequencia_cd4 = 'A cada 6 meses'
-            if cd4 and cd4 < 350:
-                frequencia_cd4 = 'A cada 6 meses'
-            elif cd4 and 350 <= cd4 <= 500 and em_tarv:
-                frequencia_cd4 = 'Anualmente'
-            elif cd4 and cd4 > 500 and em_tarv:
-                # Se 2 exames consecutivos > 500, pode não solicitar
-                frequencia_cd4 = 'Não solicitar se >500 em 2 exames consecutivos com intervalo de 6 meses'
-            elif not em_tarv:
-                frequencia_cd4 = 'A cada 6 meses'
-            
-            recommendations.append({
-                'titulo': 'Contagem de linfócitos T CD4+',
-                'descricao': f'Monitoramento imunológico de pacientes HIV+. CD4 atual: {cd4 if cd4 else "não informado"} células/mm³. Essencial para avaliar urgência de início de TARV e necessidade de profilaxia de infecções oportunistas.',
-                'subtitulo': f'HIV+ | {frequencia_cd4}',
-                'categoria': 'laboratorio',
-                'prioridade': 'alta',
-                'referencia': '<a href="https://www.gov.br/aids/pt-br/central-de-conteudo/pcdts/pcdt_hiv_modulo_1_2024.pdf" target="_blank">MS Brasil PCDT HIV 2024</a> | <a href="https://www.eacsociety.org/media/guidelines-11.1_final_09-10.pdf" target="_blank">EACS 11.1</a> | <a href="https://clinicalinfo.hiv.gov/en/guidelines/hiv-clinical-guidelines-adult-and-adolescent-arv/tests-initial-assessment-follow-up" target="_blank">NIH/CDC HIV Guidelines</a>',
-                'grau_evidencia': 'A'
-            })
-            
-            # Carga viral HIV
-            frequencia_cv = 'A cada 3-6 meses'
-            if em_tarv and supressao_viral:
-                frequencia_cv = 'A cada 6 meses'
-            elif em_tarv and not supressao_viral:
-                frequencia_cv = 'Após 8 semanas do início ou mudança de TARV'
-            
-            recommendations.append({
-                'titulo': 'Carga Viral do HIV (HIV RNA)',
-                'descricao': f'Monitoramento virológico. Carga viral atual: {carga_viral if carga_viral else "não informada"} cópias/mL. Objetivo: <50 cópias/mL (indetectável). Confirma eficácia da TARV e adesão ao tratamento.',
-                'subtitulo': f'HIV+ | {frequencia_cv}',
-                'categoria': 'laboratorio',
-                'prioridade': 'alta',
-                'referencia': '<a href="https://www.gov.br/aids/pt-br/central-de-conteudo/pcdts/pcdt_hiv_modulo_1_2024.pdf" target="_blank">MS Brasil PCDT HIV 2024</a> | <a href="https://www.eacsociety.org/media/guidelines-11.1_final_09-10.pdf" target="_blank">EACS 11.1</a> | <a href="https://clinicalinfo.hiv.gov/en/guidelines/hiv-clinical-guidelines-adult-and-adolescent-arv/tests-initial-assessment-follow-up" target="_blank">NIH/CDC HIV Guidelines</a>',
-                'grau_evidencia': 'A'
-            })
-            
-            # Glicemia de jejumste de resistência)
-            if not em_tarv or (carga_viral and carga_viral > 1000):
-                recommendations.append({
-                    'titulo': 'Genotipagem do HIV (Teste de Resistência)',
-                    'descricao': 'Teste de resistência genotípica (PR/RT +/- gene integrase). Indicado antes do início da TARV e em caso de falha virológica. Essencial para escolha do esquema terapêutico adequado.',
-                    'subtitulo': 'HIV+ | Avaliação inicial ou falha virológica',
-                    'categoria': 'laboratorio',
-                    'prioridade': 'alta',
-                    'referencia': '<a href="https://clinicalinfo.hiv.gov/en/guidelines/hiv-clinical-guidelines-adult-and-adolescent-arv/tests-initial-assessment-follow-up" target="_blank">NIH 2024</a>',
-                    'grau_evidencia': 'A'
-                })
-            
-            # Hemograma completo
-            recommendations.append({
-                'titulo': 'Hemograma completo com plaquetas',
-                'descricao': 'Monitoramento de citopenias relacionadas ao HIV ou TARV. Repetir em 2-8 semanas em caso de início ou troca de TARV com zidovudina ou outros medicamentos mielotóxicos.',
-                'subtitulo': 'HIV+ | A cada 6-12 meses',
-                'categoria': 'laboratorio',
-                'prioridade': 'alta',
-                'referencia': '<a href="https://www.gov.br/aids/pt-br/central-de-conteudo/pcdts/pcdt_hiv_modulo_1_2024.pdf" target="_blank">MS Brasil PCDT HIV 2024</a> | <a href="https://www.eacsociety.org/media/guidelines-11.1_final_09-10.pdf" target="_blank">EACS 11.1</a> | <a href="https://clinicalinfo.hiv.gov/en/guidelines/hiv-clinical-guidelines-adult-and-adolescent-arv/tests-initial-assessment-follow-up" target="_blank">NIH/CDC HIV Guidelines</a>',
-                'grau_evidencia': 'A'
-            })
-            
-            # Creatinina e TFGe
-            recommendations.append({
-                'titulo': 'Creatinina, soro',
-                'descricao': 'Avaliação de função renal. Intervalo de 3-6 meses em caso de uso de medicamentos nefrotóxicos (TFGe abaixo de 60 mL/min/1.73m² ou risco aumentado para doença renal).',
-                'subtitulo': 'HIV+ | Anual (ou 3-6 meses se nefrotóxicos)',
-                'categoria': 'laboratorio',
-                'prioridade': 'alta',
-                'referencia': '<a href="https://www.gov.br/aids/pt-br/central-de-conteudo/pcdts/pcdt_hiv_modulo_1_2024.pdf" target="_blank">MS Brasil PCDT HIV 2024</a> | <a href="https://www.eacsociety.org/media/guidelines-11.1_final_09-10.pdf" target="_blank">EACS 11.1</a> | <a href="https://clinicalinfo.hiv.gov/en/guidelines/hiv-clinical-guidelines-adult-and-adolescent-arv/tests-initial-assessment-follow-up" target="_blank">NIH/CDC HIV Guidelines</a>',
-                'grau_evidencia': 'A'
-            })
-            
-            # Exame básico de urina
-            recommendations.append({
-                'titulo': 'EAS - Elementos Anormais e Sedimentoscopia, urina',
-                'descricao': 'Rastreamento de alterações renais. Intervalo de 3-6 meses em caso de uso de medicamentos nefrotóxicos, proteinúria ou risco aumentado para doença renal.',
-                'subtitulo': 'HIV+ | Anual',
-                'categoria': 'laboratorio',
-                'prioridade': 'alta',
-                'referencia': '<a href="https://www.gov.br/aids/pt-br/central-de-conteudo/pcdts/pcdt_hiv_modulo_1_2024.pdf" target="_blank">MS Brasil PCDT HIV 2024</a> | <a href="https://www.eacsociety.org/media/guidelines-11.1_final_09-10.pdf" target="_blank">EACS 11.1</a> | <a href="https://clinicalinfo.hiv.gov/en/guidelines/hiv-clinical-guidelines-adult-and-adolescent-arv/tests-initial-assessment-follow-up" target="_blank">NIH/CDC HIV Guidelines</a>',
-                'grau_evidencia': 'A'
-            })
-            
-            # Perfil lipídico
-            recommendations.append({
-                'titulo': 'Colesterol total e frações, soro',
-                'descricao': 'Avaliação de dislipidemia. Intervalo de 6-12 meses em caso de alteração na última análise. HIV e TARV podem aumentar risco cardiovascular.',
-                'subtitulo': 'HIV+ | Anual',
-                'categoria': 'laboratorio',
-                'prioridade': 'alta',
-                'referencia': '<a href="https://www.gov.br/aids/pt-br/central-de-conteudo/pcdts/pcdt_hiv_modulo_1_2024.pdf" target="_blank">MS Brasil PCDT HIV 2024</a> | <a href="https://www.eacsociety.org/media/guidelines-11.1_final_09-10.pdf" target="_blank">EACS 11.1</a> | <a href="https://clinicalinfo.hiv.gov/en/guidelines/hiv-clinical-guidelines-adult-and-adolescent-arv/tests-initial-assessment-follow-up" target="_blank">NIH/CDC HIV Guidelines</a>',
-                'grau_evidencia': 'A'
-            })
-            
-            # Hemograma de jejum
-            recommendations.append({
-                'titulo': 'Glicose, soro',
-                'descricao': 'Rastreamento de diabetes. Alguns antirretrovirais podem aumentar risco de hiperglicemia.',
-                'subtitulo': 'HIV+ | Anual',
-                'categoria': 'laboratorio',
-                'prioridade': 'alta',
-                'referencia': '<a href="https://www.gov.br/aids/pt-br/central-de-conteudo/pcdts/pcdt_hiv_modulo_1_2024.pdf" target="_blank">MS Brasil PCDT HIV 2024</a> | <a href="https://www.eacsociety.org/media/guidelines-11.1_final_09-10.pdf" target="_blank">EACS 11.1</a> | <a href="https://clinicalinfo.hiv.gov/en/guidelines/hiv-clinical-guidelines-adult-and-adolescent-arv/tests-initial-assessment-follow-up" target="_blank">NIH/CDC HIV Guidelines</a>',
-                'grau_evidencia': 'A'
-            })
-            
-            # Transaminases (TGO/AST e TGP/ALT)
-            recommendations.append({
-                'titulo': 'Aspartato aminotransferase, soro',
-                'descricao': 'Avaliação de função hepática. Intervalos mais frequentes em caso de uso de medicamentos hepatotóxicos, doença hepática ou HCV/HBV.',
-                'subtitulo': 'HIV+ | A cada 3-12 meses',
-                'categoria': 'laboratorio',
-                'prioridade': 'alta',
-                'referencia': '<a href="https://www.gov.br/aids/pt-br/central-de-conteudo/pcdts/pcdt_hiv_modulo_1_2024.pdf" target="_blank">MS Brasil PCDT HIV 2024</a> | <a href="https://www.eacsociety.org/media/guidelines-11.1_final_09-10.pdf" target="_blank">EACS 11.1</a> | <a href="https://clinicalinfo.hiv.gov/en/guidelines/hiv-clinical-guidelines-adult-and-adolescent-arv/tests-initial-assessment-follow-up" target="_blank">NIH/CDC HIV Guidelines</a>',
-                'grau_evidencia': 'A'
-            })
-            recommendations.append({
-                'titulo': 'Alanina aminotransferase, soro',
-                'descricao': 'Avaliação de função hepática. Intervalos mais frequentes em caso de uso de medicamentos hepatotóxicos, doença hepática ou HCV/HBV.',
-                'subtitulo': 'HIV+ | A cada 3-12 meses',
-                'categoria': 'laboratorio',
-                'prioridade': 'alta',
-                'referencia': '<a href="https://www.gov.br/aids/pt-br/central-de-conteudo/pcdts/pcdt_hiv_modulo_1_2024.pdf" target="_blank">MS Brasil PCDT HIV 2024</a> | <a href="https://www.eacsociety.org/media/guidelines-11.1_final_09-10.pdf" target="_blank">EACS 11.1</a> | <a href="https://clinicalinfo.hiv.gov/en/guidelines/hiv-clinical-guidelines-adult-and-adolescent-arv/tests-initial-assessment-follow-up" target="_blank">NIH/CDC HIV Guidelines</a>',
-                'grau_evidencia': 'A'
-            })
-            
-            # Teste de sífilis
-            recommendations.append({
-                'titulo': 'VDRL, soro',
-                'descricao': 'Rastreamento de sífilis. Considerar maior frequência de triagem em caso de risco ou exposição. Pessoas não imunizadas (anti-HBs negativo) não necessitam nova triagem para HIV.',
-                'subtitulo': 'HIV+ | Semestral ou conforme indicação',
-                'categoria': 'laboratorio',
-                'prioridade': 'alta',
-                'referencia': '<a href="https://www.gov.br/aids/pt-br/central-de-conteudo/pcdts/pcdt_hiv_modulo_1_2024.pdf" target="_blank">MS Brasil PCDT HIV 2024</a> | <a href="https://www.eacsociety.org/media/guidelines-11.1_final_09-10.pdf" target="_blank">EACS 11.1</a> | <a href="https://clinicalinfo.hiv.gov/en/guidelines/hiv-clinical-guidelines-adult-and-adolescent-arv/tests-initial-assessment-follow-up" target="_blank">NIH/CDC HIV Guidelines</a>',
-                'grau_evidencia': 'A'
-            })
-            
-            # Anti-HCV
-            recommendations.append({
-                'titulo': 'Anticorpos anti-HCV, soro',
-                'descricao': 'Rastreamento de hepatite C. Solicitar carga viral de HCV em caso de anti-HCV positivo ou suspeita de infecção aguda.',
-                'subtitulo': 'HIV+ | Anual ou conforme indicação',
-                'categoria': 'laboratorio',
-                'prioridade': 'alta',
-                'referencia': '<a href="https://www.gov.br/aids/pt-br/central-de-conteudo/pcdts/pcdt_hiv_modulo_1_2024.pdf" target="_blank">MS Brasil PCDT HIV 2024</a> | <a href="https://www.eacsociety.org/media/guidelines-11.1_final_09-10.pdf" target="_blank">EACS 11.1</a> | <a href="https://clinicalinfo.hiv.gov/en/guidelines/hiv-clinical-guidelines-adult-and-adolescent-arv/tests-initial-assessment-follow-up" target="_blank">NIH/CDC HIV Guidelines</a>',
-                'grau_evidencia': 'A'
-            })
-            
-            # Triagem HBV (HBsAg, anti-HBs, anti-HBc total)
-            recommendations.append({
-                'titulo': 'Antígeno HBs, soro',
-                'descricao': 'Rastreamento de hepatite B (HBsAg). Vacinar pessoas não imunizadas (anti-HBs negativo). Pessoas imunizadas não necessitam nova triagem para HBV.',
-                'subtitulo': 'HIV+ | Avaliação inicial',
-                'categoria': 'laboratorio',
-                'prioridade': 'alta',
-                'referencia': '<a href="https://www.gov.br/aids/pt-br/central-de-conteudo/pcdts/pcdt_hiv_modulo_1_2024.pdf" target="_blank">MS Brasil PCDT HIV 2024</a> | <a href="https://www.eacsociety.org/media/guidelines-11.1_final_09-10.pdf" target="_blank">EACS 11.1</a> | <a href="https://clinicalinfo.hiv.gov/en/guidelines/hiv-clinical-guidelines-adult-and-adolescent-arv/tests-initial-assessment-follow-up" target="_blank">NIH/CDC HIV Guidelines</a>',
-                'grau_evidencia': 'A'
-            })
-            recommendations.append({
-                'titulo': 'Anticorpos anti-HBs, soro',
-                'descricao': 'Rastreamento de hepatite B (anti-HBs). Vacinar pessoas não imunizadas (anti-HBs negativo). Pessoas imunizadas não necessitam nova triagem para HBV.',
-                'subtitulo': 'HIV+ | Avaliação inicial',
-                'categoria': 'laboratorio',
-                'prioridade': 'alta',
-                'referencia': '<a href="https://www.gov.br/aids/pt-br/central-de-conteudo/pcdts/pcdt_hiv_modulo_1_2024.pdf" target="_blank">MS Brasil PCDT HIV 2024</a> | <a href="https://www.eacsociety.org/media/guidelines-11.1_final_09-10.pdf" target="_blank">EACS 11.1</a> | <a href="https://clinicalinfo.hiv.gov/en/guidelines/hiv-clinical-guidelines-adult-and-adolescent-arv/tests-initial-assessment-follow-up" target="_blank">NIH/CDC HIV Guidelines</a>',
-                'grau_evidencia': 'A'
-            })
-            recommendations.append({
-                'titulo': 'Anticorpos anti-HBc total, soro',
-                'descricao': 'Rastreamento de hepatite B. Vacinar pessoas não imunizadas (anti-HBs negativo). Pessoas imunizadas não necessitam nova triagem para HBV.',
-                'subtitulo': 'HIV+ | Avaliação inicial',
-                'categoria': 'laboratorio',
-                'prioridade': 'alta',
-                'referencia': '<a href="https://www.gov.br/aids/pt-br/central-de-conteudo/pcdts/pcdt_hiv_modulo_1_2024.pdf" target="_blank">MS Brasil PCDT HIV 2024</a> | <a href="https://www.eacsociety.org/media/guidelines-11.1_final_09-10.pdf" target="_blank">EACS 11.1</a> | <a href="https://clinicalinfo.hiv.gov/en/guidelines/hiv-clinical-guidelines-adult-and-adolescent-arv/tests-initial-assessment-follow-up" target="_blank">NIH/CDC HIV Guidelines</a>',
-                'grau_evidencia': 'A'
-            })
-            
 
-            # Teste de gravidez (se aplicável)
-            if sex == 'feminino' and 15 <= age <= 49:
-                recommendations.append({
-                    'titulo': 'Teste de gravidez (Beta-hCG)',
-                    'descricao': 'Teste de gravidez quando possibilidade de gestação. TARV deve ser iniciada o mais rápido possível em gestantes para prevenir transmissão perinatal do HIV.',
-                    'subtitulo': 'Mulheres HIV+ em idade fértil | Conforme indicação',
-                    'categoria': 'laboratorio',
-                    'prioridade': 'alta',
-                    'referencia': '<a href="https://clinicalinfo.hiv.gov/en/guidelines/hiv-clinical-guidelines-adult-and-adolescent-arv/tests-initial-assessment-follow-up" target="_blank">NIH 2024</a>',
-                    'grau_evidencia': 'A'
-                })
-        
-        # ========== DPOC MANAGEMENT (GOLD COPD 2023) ==========
-        
-        is_dpoc = 'dpoc' in comorbidades
-        
-        if is_dpoc:
-            # Espirometria - exame fundamental para diagnóstico e monitoramento
-            recommendations.append({
-                'titulo': 'Espirometria',
-                'descricao': 'Exame essencial para confirmar o diagnóstico de DPOC, avaliar gravidade da obstrução do fluxo aéreo e monitorar progressão da doença. Deve ser realizada após broncodilatador.',
-                'subtitulo': 'DPOC | Anual ou conforme sintomas',
-                'categoria': 'imagem',
-                'prioridade': 'alta',
-                'referencia': 'GOLD COPD 2023',
-                'link': 'https://goldcopd.org/2023-gold-report-2/',
-                'grau_evidencia': 'A'
-            })
-            
-            # Teste de caminhada de 6 minutos
-            recommendations.append({
-                'titulo': 'Teste de caminhada de 6 minutos',
-                'descricao': 'Avalia capacidade funcional e tolerância ao exercício em pacientes com DPOC. Útil para avaliar resposta ao tratamento e prognóstico.',
-                'subtitulo': 'DPOC | Anual ou conforme indicação',
-                'categoria': 'imagem',
-                'prioridade': 'media',
-                'referencia': 'GOLD COPD 2023',
-                'link': 'https://goldcopd.org/2023-gold-report-2/',
-                'grau_evidencia': 'B'
-            })
-            
-            # Gasometria arterial
-            recommendations.append({
-                'titulo': 'Gasometria arterial, sangue arterial',
-                'descricao': 'Avalia oxigenação e ventilação em pacientes com DPOC, especialmente em exacerbações ou doença avançada. Indica necessidade de oxigenoterapia.',
-                'subtitulo': 'DPOC | Conforme indicação clínica',
-                'categoria': 'laboratorio',
-                'prioridade': 'alta',
-                'referencia': 'GOLD COPD 2023',
-                'link': 'https://goldcopd.org/2023-gold-report-2/',
-                'grau_evidencia': 'A'
-            })
-            
-            # Eletrólitos
-            recommendations.append({
-                'titulo': 'Sódio, soro',
-                'descricao': 'Avaliação de distúrbios eletrolíticos. Importante em pacientes com DPOC grave ou em uso de diuréticos.',
-                'subtitulo': 'DPOC | Anual ou conforme indicação',
-                'categoria': 'laboratorio',
-                'prioridade': 'media',
-                'referencia': '<a href="https://goldcopd.org/2023-gold-report/" target="_blank">GOLD COPD 2023</a>',
-                'grau_evidencia': 'B'
-            })
-            recommendations.append({
-                'titulo': 'Potássio, soro',
-                'descricao': 'Avaliação de distúrbios eletrolíticos. Importante em pacientes com DPOC grave ou em uso de diuréticos.',
-                'subtitulo': 'DPOC | Anual ou conforme indicação',
-                'categoria': 'laboratorio',
-                'prioridade': 'media',
-                'referencia': '<a href="https://goldcopd.org/2023-gold-report/" target="_blank">GOLD COPD 2023</a>',
-                'grau_evidencia': 'B'
-            })
-            recommendations.append({
-                'titulo': 'Cloreto, soro',
-                'descricao': 'Monitoramento de eletrólitos em pacientes com DPOC, especialmente aqueles em uso de diuréticos ou corticosteroides. Hipocalemia pode ocorrer com beta-agonistas.',
-                'subtitulo': 'DPOC | Conforme uso de medicações',
-                'categoria': 'laboratorio',
-                'prioridade': 'media',
-                'referencia': 'GOLD COPD 2023',
-                'link': 'https://goldcopd.org/2023-gold-report-2/',
-                'grau_evidencia': 'B'
-            })
-            
-            # Radiografia de tórax
-            recommendations.append({
-                'titulo': 'Radiografia de tórax',
-                'descricao': 'Exame de imagem para avaliar complicações (pneumonia, pneumotórax, insuficiência cardíaca) e excluir outros diagnósticos diferenciais.',
-                'subtitulo': 'DPOC | Conforme indicação clínica',
-                'categoria': 'imagem',
-                'prioridade': 'media',
-                'referencia': 'GOLD COPD 2023',
-                'link': 'https://goldcopd.org/2023-gold-report-2/',
-                'grau_evidencia': 'B'
-            })
-            
-            # Hemograma completo
-            recommendations.append({
-                'titulo': 'Hemograma completo, sangue total',
-                'descricao': 'Avaliar policitemia secundária à hipoxemia crônica e descartar anemia que pode agravar dispneia.',
-                'subtitulo': 'DPOC | Anual',
-                'categoria': 'laboratorio',
-                'prioridade': 'media',
-                'referencia': 'GOLD COPD 2023',
-                'link': 'https://goldcopd.org/2023-gold-report-2/',
-                'grau_evidencia': 'B'
-            })
-        
-    # Salvar no banco de dados se possível
-        if db:
-            try:
-                # Criar ou encontrar paciente
-                patient = Patient(
-                    nome=data.get('nome', f'Paciente {age} anos'),
-                    idade=age,
-                    sexo=sex,
-                    peso=weight,
-                    altura=height
-                )
-                db.session.add(patient)
-                db.session.flush()  # Para obter o ID
-                
-                # Criar checkup
-                checkup = Checkup(
-                    patient_id=patient.id,
-                    pressao_sistolica=patient_data['systolicBP'],
-                    pressao_diastolica=float(data.get('pressao_diastolica', 0)) if data.get('pressao_diastolica') else None,
-                    colesterol_total=patient_data['totalCholesterol'],
-                    hdl_colesterol=patient_data['hdlCholesterol'],
-                    creatinina=patient_data['creatinine'],
-                    hba1c=float(data.get('hba1c', 0)) if data.get('hba1c') else None,
-                    risco_10_anos=risk_result['risk10Year'] if risk_result else None,
-                    risco_30_anos=risk_result['risk30Year'] if risk_result else None,
-                    classificacao_risco=risk_level,
-                    comorbidades=json.dumps(data.get('comorbidades', [])),
-                    historia_familiar=json.dumps(data.get('historia_familiar', [])),
-                    tabagismo=data.get('tabagismo', 'nunca_fumou'),
-                    medicacoes=data.get('medicacoes', ''),
-                    pais_guideline=data.get('pais_guideline', 'BR')
-                )
-                db.session.add(checkup)
-                db.session.flush()
-                
-                # Salvar recomendações
-                for rec in recommendations:
-                    recomendacao = Recomendacao(
-                        checkup_id=checkup.id,
-                        titulo=rec['titulo'],
-                        descricao=rec['descricao'],
-                        subtitulo=rec.get('subtitulo'),
-                        categoria=rec['categoria'],
-                        prioridade=rec['prioridade'],
-                        referencia=rec['referencia'],
-                        grau_evidencia=rec.get('grau_evidencia')
-                    )
-                    db.session.add(recomendacao)
-                
-                db.session.commit()
-                
-            except Exception as db_error:
-                print(f"Erro ao salvar no banco: {db_error}")
-                if db and hasattr(db, 'session'):
-                    db.session.rollback()
-        
-        # Enriquecer recomendações com links (referencia_html)
-        try:
+def _avaliar_checkup(age, sex, flags, contexto, patient_data, risco=None):
+    """
+    Calcula o PREVENT, avalia as regras e monta a resposta do check-up
+
+    Depende apenas da chave clínica do paciente (idade, sexo, flags, contexto e
+    dados do PREVENT), por isso o resultado pode ser memoizado. Os objetos
+    retornados são compartilhados entre requisições e não devem ser alterados.
+
+    Args:
+        risco: (prevent_risk, risk_classification) já calculados, se houver
+
+    Returns:
+        dict: {'prevent_risk', 'risk_classification', 'linhas_recomendacoes'
+        (valores das recomendações antes da deduplicação, na ordem de
+        CAMPOS_RECOMENDACAO, para o banco), 'response' (corpo da resposta)}
+    """
+    # Calcular risco PREVENT
+    if risco is None:
+        with etapa('prevent'):
+            risco = _calcular_risco(patient_data)
+    risk_result, risk_level = risco
+    
+    # Biomarcadores se risco cardiovascular elevado
+    flags = set(flags)
+    if risk_level in RISCOS_ELEVADOS:
+        flags.add('risco_elevado')
+    
+    # Gerar recomendações (idade/sexo, biomarcadores, LDCT, diabetes, HIV, DPOC e calculadoras)
+    with etapa('regras'):
+        resultado = rule_engine.evaluate(age, sex, flags, contexto)
+    recommendations = resultado['recommendations']
+    outras_recomendacoes = resultado['outras_recomendacoes']
+    
+    # Enriquecer recomendações com links (referencia_html)
+    try:
+        with etapa('referencias'):
             for rec in recommendations:
                 titulo = rec.get('titulo', '')
                 ref_str = rec.get('referencia', '')
-                links = build_reference_links(titulo, ref_str)
+                links, html = resolve_reference_links(titulo, ref_str)
                 if links:
                     rec['referencias'] = links
-                    rec['referencia_html'] = build_reference_html(links)
-        except Exception as _e:
-            # Não bloquear resposta por erro de link
-            pass
+                    rec['referencia_html'] = html
+    except Exception as _e:
+        # Não bloquear resposta por erro de link
+        pass
+    
+    # Preparar resposta
+    response = {
+        'success': True,
+        'prevent_risk': risk_result,
+        'risk_classification': risk_level,
+        'recommendations': recommendations,
+        'outras_recomendacoes': outras_recomendacoes,
+        'total_recommendations': len(recommendations)
+    }
+    
+    # Deduplicar pelo item do catálogo antes de responder (unindo referências)
+    try:
+        with etapa('dedup'):
+            unique = exam_catalog.deduplicate(recommendations)
+        response['recommendations'] = unique
+        response['total_recommendations'] = len(unique)
+    except Exception as e:
+        log.warning('deduplicacao_falhou', erro=str(e))
+        pass
+    
+    # Garantir chaves opcionais presentes em todas as recomendações
+    try:
+        for rec in response.get('recommendations', []) or []:
+            if 'subtitulo' not in rec or rec['subtitulo'] is None:
+                rec['subtitulo'] = ''
+            if 'grau_evidencia' not in rec or rec['grau_evidencia'] is None:
+                rec['grau_evidencia'] = ''
+    except Exception:
+        pass
+    
+    return {
+        'prevent_risk': risk_result,
+        'risk_classification': risk_level,
+        'linhas_recomendacoes': tuple(
+            (rec['titulo'], rec['descricao'], rec.get('subtitulo'), rec['categoria'],
+             rec['prioridade'], rec['referencia'], rec.get('grau_evidencia'))
+            for rec in recommendations
+        ),
+        'response': response
+    }
+
+
+def _salvar_checkup(data, paciente, avaliacao):
+    """Envia paciente, check-up e recomendações para gravação (falhas não afetam a resposta)"""
+    if not db:
+        return
+    with etapa('banco'):
+        try:
+            # Só enfileira: a gravação em lote acontece na thread do checkup_writer
+            checkup_writer.enviar(_registro_checkup(data, paciente, avaliacao))
+        except Exception as e:
+            log.error('checkup_gravacao_falhou', erro=str(e))
 
-        # Registrar analytics
+
+def _registro_checkup(data, paciente, avaliacao):
+    """
+    Registro compacto para o checkup_writer, na ordem das colunas de CAMPOS_*
+
+    Diastólica e tabagismo são gravados como chegaram no formulário
+    (`pressao_diastolica` e o texto de `tabagismo`), como sempre foram; o
+    vocabulário normalizado do PatientInput vale só para as regras e o PREVENT.
+    Comorbidades, história familiar e medicações (lista de checkboxes no
+    formulário) são gravadas como JSON.
+    """
+    risk_result = avaliacao['prevent_risk']
+    return checkup_writer.registro(
+        paciente=(data.get('nome', f'Paciente {paciente.idade} anos'), paciente.idade, paciente.sexo,
+                  paciente.peso, paciente.altura),
+        checkup=(
+            paciente.pas,
+            float(data['pressao_diastolica']) if data.get('pressao_diastolica') else None,
+            paciente.colesterol_total,
+            paciente.hdl,
+            paciente.creatinina,
+            paciente.hba1c,
+            risk_result['risk10Year'] if risk_result else None,
+            risk_result['risk30Year'] if risk_result else None,
+            avaliacao['risk_classification'],
+            json.dumps(data.get('comorbidades', [])),
+            json.dumps(data.get('historia_familiar', [])),
+            data.get('tabagismo', 'nunca_fumou'),
+            json.dumps(data.get('medicacoes', [])),
+            data.get('pais_guideline', 'BR'),
+        ),
+        recomendacoes=avaliacao['linhas_recomendacoes'],
+    )
+
+
+def _avaliar_paciente(paciente, risco=None):
+    """Avaliação do paciente (sem consultar o cache) gravada no cache de respostas"""
+    avaliacao = _avaliar_checkup(paciente.idade, paciente.sexo, paciente.flags,
+                                 dict(paciente.contexto), paciente.prevent_data(), risco)
+    checkup_cache.put(paciente.chave_clinica, avaliacao)
+    return avaliacao
+
+
+def _resposta_compacta(chave, avaliacao):
+    """
+    Corpo no formato compacto, comprimido conforme o Accept-Encoding
+
+    Os bytes de cada codificação ficam no compact_cache, indexados por
+    (chave clínica, codificação); a avaliação compartilhada não é alterada.
+    """
+    codificacao = escolher_codificacao(request.accept_encodings)
+    corpo = compact_cache.get((chave, codificacao))
+    if corpo is None:
+        identidade = compact_cache.get((chave, 'identity')) if codificacao != 'identity' else None
+        if identidade is None:
+            identidade = current_app.json.dumps(compactar(avaliacao['response'])).encode('utf-8')
+            compact_cache.put((chave, 'identity'), identidade)
+        if codificacao == 'identity':
+            corpo = identidade
+        else:
+            corpo = comprimir(identidade, codificacao)
+            compact_cache.put((chave, codificacao), corpo)
+    response = Response(corpo, mimetype='application/json')
+    if codificacao != 'identity':
+        response.headers['Content-Encoding'] = codificacao
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
+
+
+def _linhas_checkup(data, paciente):
+    """
+    Resposta em JSON lines, na ordem em que cada parte fica pronta
+
+    1. {"evento": "prevent", ...}: risco calculado antes da avaliação das regras
+    2. {"evento": "categoria", "categoria": ..., "recommendations": [...]}: uma
+       linha por categoria (após a deduplicação), na ordem da resposta JSON
+    3. {"evento": "outras_recomendacoes", ...}
+    4. {"evento": "fim", "success": true, "total_recommendations": N}
+    Um erro no meio do fluxo encerra com {"evento": "erro", "error": ...}.
+    """
+    dumps = current_app.json.dumps
+
+    def linha(evento, **campos):
+        return dumps({'evento': evento, **campos}) + '\n'
+
+    try:
+        avaliacao = checkup_cache.get(paciente.chave_clinica)
+        if avaliacao is None:
+            with etapa('prevent'):
+                risco = _calcular_risco(paciente.prevent_data())
+            yield linha('prevent', prevent_risk=risco[0], risk_classification=risco[1])
+            avaliacao = _avaliar_paciente(paciente, risco=risco)
+        else:
+            yield linha('prevent', prevent_risk=avaliacao['prevent_risk'],
+                        risk_classification=avaliacao['risk_classification'])
+
+        # Antes das recomendações, como no caminho JSON: um cliente que desconecta
+        # no meio do fluxo não deixa o check-up sem gravação nem analytics
+        _salvar_checkup(data, paciente, avaliacao)
         analytics.track_recommendation()
+
+        response = avaliacao['response']
+        categorias = {}
+        for rec in response['recommendations']:
+            categorias.setdefault(rec.get('categoria'), []).append(rec)
+        for categoria, recs in categorias.items():
+            yield linha('categoria', categoria=categoria, recommendations=recs)
+        yield linha('outras_recomendacoes', outras_recomendacoes=response['outras_recomendacoes'])
+        yield linha('fim', success=True, total_recommendations=response['total_recommendations'])
+    except Exception as e:
+        log.exception('checkup_falhou')
+        yield linha('erro', error='Erro interno do servidor')
+
+
+@checkup_intelligent_bp.route('/checkup-intelligent', methods=['POST'])
+def generate_intelligent_recommendations():
+    try:
+        with etapa('entrada'):
+            data = request.get_json()
+            if not data:
+                return jsonify({'error': 'Dados não fornecidos'}), 400
+            
+            # Dados do paciente tipados e condições clínicas derivadas (flags do motor de regras)
+            paciente = PatientInput.from_request(data)
+        
+        # Modo streaming opcional (Accept: application/x-ndjson)
+        if _wants_ndjson(request):
+            response = Response(stream_with_context(_linhas_checkup(data, paciente)),
+                                mimetype='application/x-ndjson')
+            # Evita que proxies acumulem as linhas antes de repassar
+            response.headers['X-Accel-Buffering'] = 'no'
+            response.headers['Cache-Control'] = 'no-store'
+            return response
+        
+        # Resposta memoizada pela chave clínica (nome não entra na chave)
+        with etapa('cache'):
+            avaliacao = checkup_cache.get(paciente.chave_clinica)
+        if avaliacao is None:
+            avaliacao = _avaliar_paciente(paciente)
+        
+        # Salvar no banco de dados se possível
+        _salvar_checkup(data, paciente, avaliacao)
         
-        # Preparar outras recomendações (FRAX, calculadoras, etc.)
-        outras_recomendacoes = []
-        
-        # FRAX para HIV+ com ≥40 anos
-        if is_hiv_positive and age >= 40:
-            outras_recomendacoes.append({
-                'titulo': 'FRAX - Calculadora de Risco de Fraturas',
-                'descricao': 'Avaliação de risco de fraturas em homens e mulheres com mais de 40 anos. Pessoa vivendo com HIV ou aids tem alto risco de fratura por fragilidade.',
-                'subtitulo': 'HIV+ com ≥40 anos | Conforme indicação',
-                'tipo': 'calculadora',
-                'prioridade': 'media',
-                'link': 'https://www.fraxplus.org/pt/calculation-tool',
-                'referencia': '<a href="https://www.gov.br/aids/pt-br/central-de-conteudo/pcdts/pcdt_hiv_modulo_1_2024.pdf" target="_blank">MS Brasil PCDT HIV 2024</a> | <a href="https://www.eacsociety.org/media/guidelines-11.1_final_09-10.pdf" target="_blank">EACS 11.1</a> | <a href="https://clinicalinfo.hiv.gov/en/guidelines/hiv-clinical-guidelines-adult-and-adolescent-arv/tests-initial-assessment-follow-up" target="_blank">NIH/CDC HIV Guidelines</a>',
-                'grau_evidencia': 'B'
-            })
-        
-        # Preparar resposta
-        response = {
-            'success': True,
-            'prevent_risk': risk_result,
-            'risk_classification': risk_level,
-            'recommendations': recommendations,
-            'outras_recomendacoes': outras_recomendacoes,
-            'total_recommendations': len(recommendations)
-        }
+        # Registrar analytics
+        with etapa('analytics'):
+            analytics.track_recommendation()
         
-        # Deduplicar por título antes de responder (deduplicação inteligente)
-        try:
-            from collections import defaultdict
-            import re
+        with etapa('serializacao'):
+            # Formato compacto opcional (dicionário de valores repetidos + compressão)
+            if (request.args.get('format') or '').lower() == FORMATO_COMPACTO:
+                return _resposta_compacta(paciente.chave_clinica, avaliacao)
             
-            # Agrupar exames similares
-            grupos = defaultdict(list)
-            
-            for rec in recommendations:
-                titulo = (rec.get('titulo') or '').strip()
-                if not titulo:
-                    continue
-                
-                # Normalizar título para identificação de duplicados
-                # Remove material biológico, parênteses e pontuação
-                titulo_norm = re.sub(r',\s*(soro|plasma|sangue.*|urina)', '', titulo, flags=re.IGNORECASE)
-                titulo_norm = re.sub(r'\s*\([^)]*\)', '', titulo_norm)  # Remove parênteses
-                titulo_norm = re.sub(r'[^a-z0-9\s]', '', titulo_norm.lower())  # Remove pontuação
-                titulo_norm = ' '.join(titulo_norm.split())  # Normaliza espaços
-                
-                # Chave de agrupamento
-                key = titulo_norm
-                grupos[key].append(rec)
-            
-            # Manter apenas 1 exame por grupo, unindo referências
-            unique = []
-            for key, recs in grupos.items():
-                if len(recs) == 1:
-                    unique.append(recs[0])
-                else:
-                    # Múltiplas recomendações do mesmo exame - unir referências
-                    # Priorizar título mais completo (com material biológico)
-                    recs_sorted = sorted(recs, key=lambda r: len(r.get('titulo', '')), reverse=True)
-                    melhor = recs_sorted[0].copy()
-                    
-                    # Unir referências de todas as recomendações
-                    refs = []
-                    for r in recs:
-                        ref = r.get('referencia', '')
-                        if ref and ref not in refs:
-                            refs.append(ref)
-                    
-                    if refs:
-                        melhor['referencia'] = ' | '.join(refs)
-                    
-                    # Unir descrições se diferentes
-                    descricoes = list(set([r.get('descricao', '') for r in recs if r.get('descricao')]))
-                    if len(descricoes) > 1:
-                        melhor['descricao'] = ' '.join(descricoes[:2])  # Limitar a 2 descrições
-                    
-                    unique.append(melhor)
-            
-            response['recommendations'] = unique
-            response['total_recommendations'] = len(unique)
-        except Exception as e:
-            print(f"Erro na deduplicação: {e}")
-            pass
-
-        # Garantir chaves opcionais presentes em todas as recomendações
-        try:
-            for rec in response.get('recommendations', []) or []:
-                if 'subtitulo' not in rec or rec['subtitulo'] is None:
-                    rec['subtitulo'] = ''
-                if 'grau_evidencia' not in rec or rec['grau_evidencia'] is None:
-                    rec['grau_evidencia'] = ''
-        except Exception:
-            pass
-
-        return jsonify(response)
+            return jsonify(avaliacao['response'])
         
     except Exception as e:
-        print(f"Erro na geração de recomendações: {e}")
+        log.exception('checkup_falhou')
         return jsonify({'error': 'Erro interno do servidor'}), 500
 
+@checkup_intelligent_bp.route('/checkup-intelligent/cache', methods=['GET'])
+def checkup_cache_stats():
+    """Contadores do cache de respostas (acertos, falhas, taxa de acerto, ocupação)"""
+    return jsonify(checkup_cache.stats())
+
+@checkup_intelligent_bp.route('/timings', methods=['GET'])
+def stage_timings_stats():
+    """Histogramas das etapas por rota (total, média e percentis aproximados em ms)"""
+    return jsonify(stage_timings.stats())
+
 @checkup_intelligent_bp.route('/generate-pdf', methods=['POST'])
 def generate_pdf_report():
-    """Gera relatório em PDF das recomendações"""
+    """
+    Enfileira o relatório em PDF das recomendações (exames e vacinas do paciente
+    em um único documento) e retorna o job para consulta em /pdf-jobs/<id>
+    """
     try:
-        data = request.get_json()
+        from src.routes.pdf_jobs import enfileirar
         
-        # Aqui você pode implementar a geração de PDF
-        # Por enquanto, retornamos uma resposta de sucesso
-        
-        analytics.track_pdf_generated()
+        data = request.get_json()
+        if not data:
+            return jsonify({'error': 'Dados não fornecidos'}), 400
         
-        return jsonify({
-            'success': True,
-            'message': 'PDF gerado com sucesso',
-            'download_url': '/download/relatorio.pdf'
-        })
+        pedido = {
+            'tipo': 'lote',
+            'formato': 'pdf',
+            'pacientes': [{
+                'dados_paciente': data.get('dados_paciente', {}),
+                'recomendacoes': data.get('recomendacoes', [])
+            }]
+        }
+        response, status, headers = enfileirar(pedido)
+        if status == 202:
+            body = response.get_json()
+            body.update({'success': True, 'message': 'PDF em processamento', 'job_id': body['id']})
+            return jsonify(body), status, headers
+        return response, status, headers
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-# Dicionário com informações detalhadas de administração de vacinas
-VACINAS_ADMINISTRACAO = {
-    "Gardasil 9": {"doses": "3 doses", "via": "INTRAMUSCULAR", "volume": "0,5ml", "intervalo": "0, 2 e 6 meses", "detalhes": "Aplicar uma dose (0,5ml), INTRAMUSCULAR, no intervalo 0, 2 e 6 meses."},
-    "Hepatite B": {"doses": "3 doses", "via": "INTRAMUSCULAR", "volume": "1,0ml (adultos)", "intervalo": "0, 1 e 6 meses", "detalhes": "Aplicar uma dose (1,0ml), INTRAMUSCULAR, no intervalo 0, 1 e 6 meses."},
-    "Hepatite A": {"doses": "2 doses", "via": "INTRAMUSCULAR", "volume": "1,0ml", "intervalo": "0 e 6 meses", "detalhes": "Aplicar uma dose (1,0ml), INTRAMUSCULAR, no intervalo 0 e 6 meses."},
-    "Hepatites A e B combinada": {"doses": "3-4 doses", "via": "INTRAMUSCULAR", "volume": "1,0ml", "intervalo": "0, 1 e 6 meses (padrão) ou 0, 7, 21 dias e reforço aos 12 meses (acelerado)", "detalhes": "Aplicar uma dose (1,0ml), INTRAMUSCULAR. Esquema padrão: 0, 1 e 6 meses. Esquema acelerado: 0, 7, 21 dias e reforço aos 12 meses."},
-    "dTpa": {"doses": "1 dose (reforço a cada 10 anos)", "via": "INTRAMUSCULAR", "volume": "0,5ml", "intervalo": "Dose única, reforço a cada 10 anos", "detalhes": "Aplicar uma dose (0,5ml), INTRAMUSCULAR. Reforço a cada 10 anos."},
-    "DT": {"doses": "1 dose (reforço a cada 10 anos)", "via": "INTRAMUSCULAR", "volume": "0,5ml", "intervalo": "Dose única, reforço a cada 10 anos", "detalhes": "Aplicar uma dose (0,5ml), INTRAMUSCULAR. Reforço a cada 10 anos."},
-    "Tríplice viral": {"doses": "1-2 doses", "via": "SUBCUTÂNEA", "volume": "0,5ml", "intervalo": "Dose única ou 2 doses com intervalo de 1 mês", "detalhes": "Aplicar uma dose (0,5ml), SUBCUTÂNEA. Se necessário, segunda dose com intervalo mínimo de 1 mês."},
-    "Influenza": {"doses": "1 dose anual", "via": "INTRAMUSCULAR", "volume": "0,5ml", "intervalo": "Anual", "detalhes": "Aplicar uma dose (0,5ml), INTRAMUSCULAR, anualmente."},
-    "Pneumocócica 23-valente": {"doses": "1-2 doses", "via": "INTRAMUSCULAR ou SUBCUTÂNEA", "volume": "0,5ml", "intervalo": "Dose única ou reforço após 5 anos (grupos de risco)", "detalhes": "Aplicar uma dose (0,5ml), INTRAMUSCULAR ou SUBCUTÂNEA. Reforço após 5 anos para grupos de risco."},
-    "Pneumocócica 13-valente": {"doses": "1 dose", "via": "INTRAMUSCULAR", "volume": "0,5ml", "intervalo": "Dose única", "detalhes": "Aplicar uma dose (0,5ml), INTRAMUSCULAR."},
-    "Pneumocócica 20-valente": {"doses": "1 dose", "via": "INTRAMUSCULAR", "volume": "0,5ml", "intervalo": "Dose única", "detalhes": "Aplicar uma dose (0,5ml), INTRAMUSCULAR."},
-    "Meningocócica ACWY": {"doses": "1 dose (reforço a cada 5 anos)", "via": "INTRAMUSCULAR", "volume": "0,5ml", "intervalo": "Dose única, reforço a cada 5 anos para grupos de risco", "detalhes": "Aplicar uma dose (0,5ml), INTRAMUSCULAR. Reforço a cada 5 anos para grupos de risco."},
-    "Meningocócica B": {"doses": "2 doses", "via": "INTRAMUSCULAR", "volume": "0,5ml", "intervalo": "0 e 1-2 meses", "detalhes": "Aplicar uma dose (0,5ml), INTRAMUSCULAR, no intervalo 0 e 1-2 meses."},
-    "Febre amarela": {"doses": "1 dose", "via": "SUBCUTÂNEA", "volume": "0,5ml", "intervalo": "Dose única (proteção por 10 anos)", "detalhes": "Aplicar uma dose (0,5ml), SUBCUTÂNEA. Reforço a cada 10 anos se necessário."},
-    "Dengue": {"doses": "2 doses", "via": "SUBCUTÂNEA", "volume": "0,5ml", "intervalo": "0 e 3 meses", "detalhes": "Aplicar uma dose (0,5ml), SUBCUTÂNEA, no intervalo 0 e 3 meses."},
-    "COVID-19": {"doses": "1 dose anual", "via": "INTRAMUSCULAR", "volume": "0,5ml", "intervalo": "Anual (atualizada)", "detalhes": "Aplicar uma dose (0,5ml), INTRAMUSCULAR, anualmente (vacina atualizada)."},
-    "Varicela": {"doses": "2 doses", "via": "SUBCUTÂNEA", "volume": "0,5ml", "intervalo": "0 e 1-2 meses", "detalhes": "Aplicar uma dose (0,5ml), SUBCUTÂNEA, no intervalo 0 e 1-2 meses."},
-    "Herpes Zóster": {"doses": "2 doses", "via": "INTRAMUSCULAR", "volume": "0,5ml", "intervalo": "0 e 2-6 meses", "detalhes": "Aplicar uma dose (0,5ml), INTRAMUSCULAR, no intervalo 0 e 2-6 meses."},
-    "RSV": {"doses": "1 dose", "via": "INTRAMUSCULAR", "volume": "0,5ml", "intervalo": "Dose única", "detalhes": "Aplicar uma dose (0,5ml), INTRAMUSCULAR."},
-    "RSV Gestantes": {"doses": "1 dose", "via": "INTRAMUSCULAR", "volume": "0,5ml", "intervalo": "Dose única (32-36 semanas de gestação)", "detalhes": "Aplicar uma dose (0,5ml), INTRAMUSCULAR, entre 32-36 semanas de gestação."}
-}
-
 def get_detalhes_administracao_vacina(titulo_vacina):
-    """Retorna os detalhes de administração de uma vacina baseado no título."""
-    titulo_normalizado = titulo_vacina.upper().strip()
-    
-    if "GARDASIL" in titulo_normalizado or "HPV" in titulo_normalizado:
-        return VACINAS_ADMINISTRACAO["Gardasil 9"]
-    elif "HEPATITE B" in titulo_normalizado and "COMBINADA" not in titulo_normalizado and "TWINRIX" not in titulo_normalizado:
-        return VACINAS_ADMINISTRACAO["Hepatite B"]
-    elif "HEPATITE A" in titulo_normalizado and "COMBINADA" not in titulo_normalizado and "TWINRIX" not in titulo_normalizado:
-        return VACINAS_ADMINISTRACAO["Hepatite A"]
-    elif "TWINRIX" in titulo_normalizado or ("HEPATITE" in titulo_normalizado and "COMBINADA" in titulo_normalizado):
-        return VACINAS_ADMINISTRACAO["Hepatites A e B combinada"]
-    elif "DTPA" in titulo_normalizado or "ADACEL" in titulo_normalizado or "BOOSTRIX" in titulo_normalizado:
-        return VACINAS_ADMINISTRACAO["dTpa"]
-    elif "DT" in titulo_normalizado and "DTPA" not in titulo_normalizado:
-        return VACINAS_ADMINISTRACAO["DT"]
-    elif "TRÍPLICE VIRAL" in titulo_normalizado or "SCR" in titulo_normalizado:
-        return VACINAS_ADMINISTRACAO["Tríplice viral"]
-    elif "INFLUENZA" in titulo_normalizado or "GRIPE" in titulo_normalizado or "FLUARIX" in titulo_normalizado or "EFLUELDA" in titulo_normalizado:
-        return VACINAS_ADMINISTRACAO["Influenza"]
-    elif "PNEUMO 23" in titulo_normalizado or "PNEUMOCÓCICA 23" in titulo_normalizado:
-        return VACINAS_ADMINISTRACAO["Pneumocócica 23-valente"]
-    elif "PREVENAR 13" in titulo_normalizado or "PNEUMOCÓCICA 13" in titulo_normalizado:
-        return VACINAS_ADMINISTRACAO["Pneumocócica 13-valente"]
-    elif "PREVENAR 20" in titulo_normalizado or "PNEUMOCÓCICA 20" in titulo_normalizado:
-        return VACINAS_ADMINISTRACAO["Pneumocócica 20-valente"]
-    elif "MENINGOCÓCICA ACWY" in titulo_normalizado or "MENACTRA" in titulo_normalizado or "MENVEO" in titulo_normalizado:
-        return VACINAS_ADMINISTRACAO["Meningocócica ACWY"]
-    elif "MENINGOCÓCICA B" in titulo_normalizado or "BEXSERO" in titulo_normalizado:
-        return VACINAS_ADMINISTRACAO["Meningocócica B"]
-    elif "FEBRE AMARELA" in titulo_normalizado or "STAMARIL" in titulo_normalizado:
-        return VACINAS_ADMINISTRACAO["Febre amarela"]
-    elif "DENGUE" in titulo_normalizado or "QDENGA" in titulo_normalizado:
-        return VACINAS_ADMINISTRACAO["Dengue"]
-    elif "COVID" in titulo_normalizado or "COMIRNATY" in titulo_normalizado or "SPIKEVAX" in titulo_normalizado:
-        return VACINAS_ADMINISTRACAO["COVID-19"]
-    elif "VARICELA" in titulo_normalizado or "VARILRIX" in titulo_normalizado or "VARIVAX" in titulo_normalizado:
-        return VACINAS_ADMINISTRACAO["Varicela"]
-    elif "HERPES ZÓSTER" in titulo_normalizado or "SHINGRIX" in titulo_normalizado or "ZOSTER" in titulo_normalizado:
-        return VACINAS_ADMINISTRACAO["Herpes Zóster"]
-    elif "RSV" in titulo_normalizado or "SINCICIAL" in titulo_normalizado:
-        if "ABRYSVO" in titulo_normalizado or "GESTANTE" in titulo_normalizado:
-            return VACINAS_ADMINISTRACAO["RSV Gestantes"]
-        else:
-            return VACINAS_ADMINISTRACAO["RSV"]
-    else:
-        return {"doses": "Conforme orientação médica", "via": "Conforme bula", "volume": "Conforme bula", "intervalo": "Conforme orientação médica", "detalhes": "Aplicar conforme orientação médica e bula do fabricante."}
+    """Retorna os detalhes de administração de uma vacina baseado no título (catálogo de vacinas)."""
+    return vaccine_catalog.administracao(titulo_vacina)
 
 @checkup_intelligent_bp.route('/gerar-receita-vacinas', methods=['POST'])
 def gerar_receita_vacinas():
@@ -1791,6 +574,35 @@ def gerar_receita_vacinas():
         return jsonify({'error': err}), 500
 
 
+def _classificar_exame_por_titulo(rec):
+    """Classificação por palavras-chave para recomendações fora do catálogo"""
+    categoria = (rec.get('categoria') or '').lower()
+    titulo = (rec.get('titulo') or '').lower()
+    
+    # Categorizar exames laboratoriais
+    if (categoria in ['laboratorial', 'laboratorio'] or
+        'soro' in titulo or 'sangue' in titulo or 'urina' in titulo or
+        'jejum' in titulo or 'glicemia' in titulo or 'colesterol' in titulo or
+        'hba1c' in titulo or 'creatinina' in titulo or 'hiv' in titulo or
+        'hepatite' in titulo or 'totg' in titulo):
+        return 'laboratorio'
+        
+    # Categorizar exames de imagem e rastreamento
+    if (categoria in ['rastreamento', 'imagem'] or
+        'mamografia' in titulo or 'colonoscopia' in titulo or 
+        'eletrocardiograma' in titulo or 'ultrassom' in titulo or
+        'tomografia' in titulo or 'densitometria' in titulo):
+        return 'imagem'
+    return None
+
+def _classificar_exame(rec):
+    """Tipo do exame ('laboratorio', 'imagem' ou None) pelo item do catálogo"""
+    item = exam_catalog.item(rec)
+    if item is None:
+        return _classificar_exame_por_titulo(rec)
+    return item.categoria if item.categoria in ('laboratorio', 'imagem') else None
+
+
 @checkup_intelligent_bp.route('/gerar-solicitacao-exames', methods=['POST'])
 def gerar_solicitacao_exames():
     try:
@@ -1810,29 +622,15 @@ def gerar_solicitacao_exames():
 
         for rec in recommendations:
             try:
-                categoria = (rec.get('categoria') or '').lower()
-                titulo = (rec.get('titulo') or '').lower()
-                
-                # Categorizar exames laboratoriais
-                if (categoria in ['laboratorial', 'laboratorio'] or
-                    'soro' in titulo or 'sangue' in titulo or 'urina' in titulo or
-                    'jejum' in titulo or 'glicemia' in titulo or 'colesterol' in titulo or
-                    'hba1c' in titulo or 'creatinina' in titulo or 'hiv' in titulo or
-                    'hepatite' in titulo or 'totg' in titulo):
+                tipo = _classificar_exame(rec)
+                if tipo == 'laboratorio':
                     exames_laboratoriais.append(rec)
-                    print(f"Exame laboratorial adicionado: {rec.get('titulo')}")
-                    
-                # Categorizar exames de imagem e rastreamento
-                elif (categoria in ['rastreamento', 'imagem'] or
-                      'mamografia' in titulo or 'colonoscopia' in titulo or 
-                      'eletrocardiograma' in titulo or 'ultrassom' in titulo or
-                      'tomografia' in titulo or 'densitometria' in titulo):
+                elif tipo == 'imagem':
                     exames_imagem.append(rec)
-                    print(f"Exame de imagem/rastreamento adicionado: {rec.get('titulo')}")
                 else:
-                    print(f"Exame não categorizado: {rec.get('titulo')} - categoria: {categoria}")
+                    log.debug('exame_nao_categorizado', titulo=rec.get('titulo'), categoria=rec.get('categoria'))
             except Exception as e:
-                print(f"Erro ao processar recomendação: {e}")
+                log.warning('recomendacao_invalida', erro=str(e))
                 continue
 
         exames = exames_laboratoriais + exames_imagem
@@ -2019,6 +817,34 @@ def gerar_solicitacao_exames():
 
 # ==================== ENDPOINTS DE GERAÇÃO DE PDFs ====================
 
+def _pdf_stream_response(documento, download_name):
+    """
+    Resposta do PDF endereçado pelo conteúdo
+
+    - If-None-Match com o ETag do documento: 304 sem renderizar nem consultar o cache
+    - PDF em cache: bytes servidos diretamente
+    - Caso contrário: blocos repassados do Gotenberg e gravados no cache ao final
+    """
+    headers = {
+        'ETag': f'"{documento.etag}"',
+        'Cache-Control': 'private, no-cache'
+    }
+    if request.if_none_match.contains(documento.etag):
+        return Response(status=304, headers=headers)
+
+    pdf_stream = documento.abrir()
+    response = Response(iter(pdf_stream), mimetype='application/pdf', headers=headers, direct_passthrough=True)
+    # Envio do corpo: termina depois do cabeçalho, então vai só para o histograma
+    inicio_envio = time.perf_counter()
+    response.call_on_close(lambda: registrar('envio', (time.perf_counter() - inicio_envio) * 1000))
+    response.headers['Content-Disposition'] = f'attachment; filename={download_name}'
+    response.headers['X-PDF-Cache'] = 'HIT' if documento.cached else 'MISS'
+    if pdf_stream.content_length is not None:
+        response.headers['Content-Length'] = str(pdf_stream.content_length)
+    # Libera a conexão/vaga do Gotenberg mesmo se o cliente desconectar no meio
+    response.call_on_close(pdf_stream.close)
+    return response
+
 @checkup_intelligent_bp.route('/gerar-pdf-exames-laboratoriais', methods=['POST'])
 def gerar_pdf_exames_laboratoriais_endpoint():
     """
@@ -2032,8 +858,6 @@ def gerar_pdf_exames_laboratoriais_endpoint():
     """
     try:
         from src.utils.pdf_service_gotenberg import gerar_pdf_exames_laboratoriais, gerar_pdf_exames_imagem, gerar_pdf_vacinas
-        from flask import send_file
-        import io
         from datetime import datetime
         
         data = request.get_json()
@@ -2046,27 +870,26 @@ def gerar_pdf_exames_laboratoriais_endpoint():
         # Filtrar apenas exames laboratoriais
         exames_lab = [
             rec for rec in recomendacoes 
-            if rec.get('categoria') == 'laboratorio'
+            if exam_catalog.categoria(rec) == 'laboratorio'
         ]
         
         if not exames_lab:
             return jsonify({'error': 'Nenhum exame laboratorial encontrado'}), 400
         
-        # Gerar PDF
-        pdf_bytes = gerar_pdf_exames_laboratoriais(dados_paciente, exames_lab)
+        # Gerar PDF (do cache ou transmitido do Gotenberg ao cliente em blocos)
+        documento = gerar_pdf_exames_laboratoriais(dados_paciente, exames_lab, stream=True)
         
         # Retornar PDF
-        return send_file(
-            io.BytesIO(pdf_bytes),
-            mimetype='application/pdf',
-            as_attachment=True,
-            download_name=f'exames_laboratoriais_{datetime.now().strftime("%Y%m%d_%H%M%S")}.pdf'
+        return _pdf_stream_response(
+            documento,
+            f'exames_laboratoriais_{datetime.now().strftime("%Y%m%d_%H%M%S")}.pdf'
         )
         
+    except GotenbergUnavailable as e:
+        log.warning('gotenberg_indisponivel', documento='laboratorio', erro=str(e))
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
-        print(f"❌ Erro ao gerar PDF laboratoriais: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        log.exception('pdf_falhou', documento='laboratorio')
         return jsonify({'error': f'Erro ao gerar PDF de exames laboratoriais: {str(e)}'}), 500
 
 
@@ -2083,8 +906,6 @@ def gerar_pdf_exames_imagem_endpoint():
     """
     try:
         from src.utils.pdf_service_gotenberg import gerar_pdf_exames_laboratoriais, gerar_pdf_exames_imagem, gerar_pdf_vacinas
-        from flask import send_file
-        import io
         from datetime import datetime
         
         data = request.get_json()
@@ -2097,27 +918,26 @@ def gerar_pdf_exames_imagem_endpoint():
         # Filtrar apenas exames de imagem
         exames_imagem = [
             rec for rec in recomendacoes 
-            if rec.get('categoria') == 'imagem'
+            if exam_catalog.categoria(rec) == 'imagem'
         ]
         
         if not exames_imagem:
             return jsonify({'error': 'Nenhum exame de imagem encontrado'}), 400
         
-        # Gerar PDF
-        pdf_bytes = gerar_pdf_exames_imagem(dados_paciente, exames_imagem)
+        # Gerar PDF (do cache ou transmitido do Gotenberg ao cliente em blocos)
+        documento = gerar_pdf_exames_imagem(dados_paciente, exames_imagem, stream=True)
         
         # Retornar PDF
-        return send_file(
-            io.BytesIO(pdf_bytes),
-            mimetype='application/pdf',
-            as_attachment=True,
-            download_name=f'exames_imagem_{datetime.now().strftime("%Y%m%d_%H%M%S")}.pdf'
+        return _pdf_stream_response(
+            documento,
+            f'exames_imagem_{datetime.now().strftime("%Y%m%d_%H%M%S")}.pdf'
         )
         
+    except GotenbergUnavailable as e:
+        log.warning('gotenberg_indisponivel', documento='imagem', erro=str(e))
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
-        print(f"❌ Erro ao gerar PDF imagem: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        log.exception('pdf_falhou', documento='imagem')
         return jsonify({'error': f'Erro ao gerar PDF de exames de imagem: {str(e)}'}), 500
 
 
@@ -2134,8 +954,6 @@ def gerar_pdf_vacinas_endpoint():
     """
     try:
         from src.utils.pdf_service_gotenberg import gerar_pdf_exames_laboratoriais, gerar_pdf_exames_imagem, gerar_pdf_vacinas
-        from flask import send_file
-        import io
         from datetime import datetime
         
         data = request.get_json()
@@ -2148,25 +966,52 @@ def gerar_pdf_vacinas_endpoint():
         # Filtrar apenas vacinas
         vacinas = [
             rec for rec in recomendacoes 
-            if rec.get('categoria') == 'vacina'
+            if exam_catalog.categoria(rec) == 'vacina'
         ]
         
         if not vacinas:
             return jsonify({'error': 'Nenhuma vacina encontrada'}), 400
         
-        # Gerar PDF
-        pdf_bytes = gerar_pdf_vacinas(dados_paciente, vacinas)
+        # Gerar PDF (do cache ou transmitido do Gotenberg ao cliente em blocos)
+        documento = gerar_pdf_vacinas(dados_paciente, vacinas, stream=True)
         
         # Retornar PDF
-        return send_file(
-            io.BytesIO(pdf_bytes),
-            mimetype='application/pdf',
-            as_attachment=True,
-            download_name=f'vacinas_{datetime.now().strftime("%Y%m%d_%H%M%S")}.pdf'
+        return _pdf_stream_response(
+            documento,
+            f'vacinas_{datetime.now().strftime("%Y%m%d_%H%M%S")}.pdf'
         )
         
+    except GotenbergUnavailable as e:
+        log.warning('gotenberg_indisponivel', documento='vacina', erro=str(e))
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
-        print(f"❌ Erro ao gerar PDF vacinas: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        log.exception('pdf_falhou', documento='vacina')
         return jsonify({'error': f'Erro ao gerar PDF de vacinas: {str(e)}'}), 500
+
+
+@checkup_intelligent_bp.route('/gerar-pdf-lote', methods=['POST'])
+def gerar_pdf_lote_endpoint():
+    """
+    Endpoint para gerar os documentos de vários pacientes em um único job.
+    
+    Recebe JSON com:
+    - pacientes: lista de {dados_paciente, recomendacoes}
+    - formato: 'zip' (padrão, um PDF por documento) ou 'pdf' (PDF único mesclado)
+    - documentos: tipos a gerar ('laboratorio', 'imagem', 'vacina'; padrão: todos)
+    
+    Retorna: 202 com o job da fila de PDFs; o ZIP ou PDF mesclado é baixado em
+    /pdf-jobs/<id>/download quando o job termina
+    """
+    from src.routes.pdf_jobs import enfileirar
+    
+    data = request.get_json(silent=True)
+    if not data or not isinstance(data, dict):
+        return jsonify({'error': 'Dados não fornecidos'}), 400
+    
+    pedido = {
+        'tipo': 'lote',
+        'formato': data.get('formato', 'zip'),
+        'pacientes': data.get('pacientes'),
+        'documentos': data.get('documentos')
+    }
+    return enfileirar(pedido)
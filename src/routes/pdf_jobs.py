@@ -0,0 +1,91 @@
+from flask import Blueprint, request, jsonify, send_file, url_for
+from src.utils.pdf_batch import LoteInvalido
+from src.utils.pdf_jobs import pdf_jobs, criar_job, FilaCheia, CONCLUIDO, ERRO
+from src.utils.structured_log import get_logger
+
+log = get_logger(__name__)
+
+pdf_jobs_bp = Blueprint('pdf_jobs', __name__)
+
+def job_response(job):
+    """Representação pública do job, com URLs de consulta e download"""
+    resposta = {
+        'id': job['id'],
+        'tipo': job['tipo'],
+        'status': job['status'],
+        'criado_em': job['criado_em'],
+        'atualizado_em': job['atualizado_em'],
+        'status_url': url_for('pdf_jobs.pdf_job_status', job_id=job['id'])
+    }
+    if job['status'] == CONCLUIDO:
+        resposta['download_url'] = url_for('pdf_jobs.pdf_job_download', job_id=job['id'])
+        resposta['tamanho'] = job['tamanho']
+    elif job['status'] == ERRO:
+        resposta['erro'] = job['erro']
+    return resposta
+
+def enfileirar(pedido):
+    """Cria o job e devolve a resposta 202 (ou o erro correspondente)"""
+    try:
+        job = criar_job(pedido)
+    except LoteInvalido as e:
+        return jsonify({'error': str(e)}), 400, {}
+    except FilaCheia as e:
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '5'}
+    except OSError as e:
+        # PDF_JOBS_DIR inacessível ou de outro usuário: não gravar dados de pacientes nele
+        log.error('pdf_jobs_diretorio_indisponivel', erro=str(e))
+        return jsonify({'error': 'Fila de PDFs indisponível'}), 503, {}
+
+    resposta = job_response(job)
+    # O download já fica disponível no endereço definitivo
+    resposta['download_url'] = url_for('pdf_jobs.pdf_job_download', job_id=job['id'])
+    return jsonify(resposta), 202, {'Location': resposta['status_url']}
+
+@pdf_jobs_bp.route('/pdf-jobs', methods=['POST'])
+def create_pdf_job():
+    """
+    Enfileira a geração de um PDF e retorna o id do job imediatamente
+
+    Corpo (JSON):
+        - {tipo: 'laboratorio' | 'imagem' | 'vacina', dados_paciente, recomendacoes}
+        - {tipo: 'lote', pacientes: [...], formato: 'pdf' | 'zip', documentos: [...]}
+    """
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({'error': 'Dados não fornecidos'}), 400
+    return enfileirar(data)
+
+@pdf_jobs_bp.route('/pdf-jobs/<job_id>', methods=['GET'])
+def pdf_job_status(job_id):
+    """Consulta o estado do job"""
+    job = pdf_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job não encontrado ou expirado'}), 404
+    return jsonify(job_response(job))
+
+@pdf_jobs_bp.route('/pdf-jobs/<job_id>/download', methods=['GET'])
+def pdf_job_download(job_id):
+    """Baixa o resultado do job concluído"""
+    job = pdf_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job não encontrado ou expirado'}), 404
+    if job['status'] == ERRO:
+        return jsonify({'error': job['erro'], 'status': job['status']}), 500
+    if job['status'] != CONCLUIDO:
+        # Ainda em processamento: o cliente deve consultar novamente
+        return jsonify(job_response(job)), 409, {'Retry-After': '1'}
+
+    try:
+        response = send_file(
+            pdf_jobs.result_path(job),
+            mimetype=job['mimetype'],
+            as_attachment=True,
+            download_name=job['arquivo'],
+            etag=job['etag'] or True,
+            conditional=True
+        )
+    except FileNotFoundError:
+        return jsonify({'error': 'Resultado expirado'}), 404
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
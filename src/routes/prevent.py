@@ -0,0 +1,62 @@
+from flask import Blueprint, request, jsonify
+import json
+import os
+from src.utils.prevent_calculator import calculate_prevent_risk_batch
+
+prevent_bp = Blueprint('prevent', __name__)
+
+# Limite de pacientes por requisição em lote
+PREVENT_BATCH_MAX = int(os.getenv('PREVENT_BATCH_MAX', '100000'))
+
+NDJSON_MIMETYPES = ('application/x-ndjson', 'application/jsonl', 'application/json-lines')
+
+def _ler_lote():
+    """
+    Extrai o lote do corpo da requisição
+
+    Formatos aceitos:
+        - JSON lines (Content-Type application/x-ndjson): um paciente por linha
+        - JSON: lista de pacientes, {"pacientes": [...]} ou colunas {"age": [...], ...}
+    """
+    if request.mimetype in NDJSON_MIMETYPES:
+        texto = request.get_data(as_text=True)
+        return [json.loads(linha) for linha in texto.splitlines() if linha.strip()]
+
+    data = request.get_json(silent=True)
+    if isinstance(data, dict) and 'pacientes' in data:
+        return data['pacientes']
+    return data
+
+def _tamanho_lote(lote):
+    if isinstance(lote, dict):
+        return max((len(v) for v in lote.values() if isinstance(v, (list, tuple))), default=0)
+    return len(lote)
+
+@prevent_bp.route('/prevent/batch', methods=['POST'])
+def prevent_batch():
+    """Calcula o risco PREVENT para um lote de pacientes (resultado em colunas)"""
+    try:
+        lote = _ler_lote()
+    except ValueError as e:
+        return jsonify({'error': f'JSON lines inválido: {e}'}), 400
+
+    if not lote or not isinstance(lote, (list, dict)):
+        return jsonify({'error': 'Dados não fornecidos'}), 400
+
+    total = _tamanho_lote(lote)
+    if total > PREVENT_BATCH_MAX:
+        return jsonify({'error': f'Lote excede o limite de {PREVENT_BATCH_MAX} pacientes'}), 413
+
+    try:
+        resultados = calculate_prevent_risk_batch(lote)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    if resultados is None:
+        return jsonify({'error': 'Coeficientes PREVENT indisponíveis'}), 500
+
+    return jsonify({
+        'total': total,
+        'validos': sum(1 for r in resultados['risk10Year'] if r is not None),
+        'resultados': resultados
+    })
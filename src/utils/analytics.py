@@ -1,12 +1,86 @@
+import atexit
+import copy
 import json
 import os
 import tempfile
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
 from datetime import datetime
 from functools import wraps
 from flask import request, g
+from src.utils.structured_log import get_logger
+
+log = get_logger(__name__)
+
+# Lock de arquivo entre processos (indisponível no Windows: apenas um processo escreve)
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Campos de contagem por dia/mês e total correspondente de cada tipo de evento
+EVENT_FIELDS = {
+    'visit': ('visits', 'total_visits'),
+    'recommendation': ('recommendations', 'total_recommendations'),
+    'exam_request': ('exam_requests', 'total_exam_requests'),
+    'vaccine_prescription': ('vaccine_prescriptions', 'total_vaccine_prescriptions'),
+}
+
+def _empty_period():
+    return {
+        'visits': 0,
+        'recommendations': 0,
+        'exam_requests': 0,
+        'vaccine_prescriptions': 0
+    }
+
+def apply_event(data, event):
+    """
+    Aplica um evento do log ao agregado
+
+    Args:
+        data (dict): Agregado no formato de analytics_data.json
+        event (list): [timestamp ISO, tipo, user_agent, país, id do escritor]
+    """
+    timestamp, kind, user_agent, country = event[:4]
+    field, total = EVENT_FIELDS[kind]
+    today = timestamp[:10]
+    month = timestamp[:7]
+
+    data[total] += 1
+
+    if kind == 'visit':
+        # Apenas visitas abrem o dia/mês; demais eventos só contam se já existirem
+        data['daily_stats'].setdefault(today, _empty_period())
+        data['monthly_stats'].setdefault(month, _empty_period())
+        if user_agent:
+            data['user_agents'][user_agent] = data['user_agents'].get(user_agent, 0) + 1
+        if country:
+            data['countries'][country] = data['countries'].get(country, 0) + 1
+
+    if today in data['daily_stats']:
+        data['daily_stats'][today][field] += 1
+    if month in data['monthly_stats']:
+        data['monthly_stats'][month][field] += 1
+
+    data['last_updated'] = timestamp
 
 class Analytics:
-    def __init__(self, data_file='analytics_data.json'):
+    """
+    Analytics com log de eventos append-only
+
+    As requisições apenas colocam uma tupla compacta em uma fila limitada; um
+    worker em segundo plano agrega os eventos em memória e os anexa como linhas
+    JSON em analytics_events.jsonl (a cada N eventos ou M milissegundos). Na
+    inicialização o snapshot analytics_data.json é reconstruído reproduzindo o
+    log, que então é compactado (zerado).
+    """
+
+    def __init__(self, data_file='analytics_data.json', log_file='analytics_events.jsonl',
+                 flush_events=None, flush_interval_ms=None, queue_size=None, queue_policy=None):
         # Store analytics in the system temp directory (cross-platform)
         temp_dir = tempfile.gettempdir()
         try:
@@ -15,18 +89,45 @@ class Analytics:
             # Fallback to current working directory if temp isn't writable
             temp_dir = os.getcwd()
         self.data_file = os.path.join(temp_dir, data_file)
-        self.data = self.load_data()
-    
-    def load_data(self):
-        """Carrega dados de analytics do arquivo JSON"""
-        if os.path.exists(self.data_file):
-            try:
-                with open(self.data_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except (json.JSONDecodeError, FileNotFoundError):
-                pass
-        
-        # Dados padrão se arquivo não existe ou está corrompido
+        self.log_file = os.path.join(temp_dir, log_file)
+        self.lock_file = self.log_file + '.lock'
+
+        # Lote do flusher: N eventos ou M milissegundos, o que ocorrer primeiro
+        self.flush_events = flush_events or int(os.getenv('ANALYTICS_FLUSH_EVENTS', '100'))
+        self.flush_interval = (flush_interval_ms or int(os.getenv('ANALYTICS_FLUSH_MS', '1000'))) / 1000
+        # Tamanho do log que dispara compactação fora da inicialização
+        self.compact_bytes = int(os.getenv('ANALYTICS_COMPACT_BYTES', str(8 * 1024 * 1024)))
+        # Fila limitada: com a fila cheia, 'drop' descarta o evento e 'block'
+        # aguarda espaço por até ANALYTICS_BLOCK_TIMEOUT_MS antes de descartar
+        self.queue_size = queue_size or int(os.getenv('ANALYTICS_QUEUE_SIZE', '10000'))
+        self.queue_policy = (queue_policy or os.getenv('ANALYTICS_QUEUE_POLICY', 'drop')).lower()
+        self.block_timeout = int(os.getenv('ANALYTICS_BLOCK_TIMEOUT_MS', '100')) / 1000
+        self.dropped = 0
+
+        self._writer = uuid.uuid4().hex[:12]
+        self._log_ino = None
+        self._offset = 0
+        self._init_worker_state()
+
+        self.data = self.compact()
+        self._start_worker()
+        atexit.register(self.close)
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _init_worker_state(self):
+        # deque.append/popleft são atômicos: produtores não disputam lock
+        self._queue = deque()
+        self._lock = threading.RLock()
+        self._io_lock = threading.Lock()
+        self._pending = []
+        self._wakeup = threading.Event()
+        self._space = threading.Event()
+        self._stopping = False
+        self._worker = None
+
+    @staticmethod
+    def default_data():
         return {
             'total_visits': 0,
             'total_recommendations': 0,
@@ -38,146 +139,281 @@ class Analytics:
             'countries': {},
             'last_updated': None
         }
-    
-    def save_data(self):
-        """Salva dados de analytics no arquivo JSON"""
-        self.data['last_updated'] = datetime.now().isoformat()
+
+    def load_data(self):
+        """Carrega o snapshot compactado de analytics"""
+        if os.path.exists(self.data_file):
+            try:
+                with open(self.data_file, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except (json.JSONDecodeError, FileNotFoundError):
+                pass
+
+        # Dados padrão se arquivo não existe ou está corrompido
+        return self.default_data()
+
+    def save_data(self, data=None):
+        """Grava o snapshot de forma atômica (arquivo temporário + rename)"""
+        data = self.data if data is None else data
         try:
             # Ensure directory exists
             dirpath = os.path.dirname(self.data_file)
             if dirpath:
                 os.makedirs(dirpath, exist_ok=True)
-            with open(self.data_file, 'w', encoding='utf-8') as f:
-                json.dump(self.data, f, indent=2, ensure_ascii=False)
+            tmp_path = f"{self.data_file}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(tmp_path, self.data_file)
+            return True
         except Exception as e:
-            print(f"Erro ao salvar analytics: {e}")
-    
+            log.warning('analytics_gravacao_falhou', erro=str(e))
+            return False
+
+    @contextmanager
+    def _file_lock(self, exclusive):
+        """Escritores compartilham o lock; a compactação o obtém com exclusividade"""
+        if fcntl is None:
+            yield
+            return
+        with open(self.lock_file, 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _read_log(self, offset=0):
+        """Lê eventos completos a partir do offset; retorna (eventos, novo offset, inode)"""
+        events = []
+        try:
+            with open(self.log_file, 'rb') as f:
+                ino = os.fstat(f.fileno()).st_ino
+                f.seek(offset)
+                chunk = f.read()
+        except FileNotFoundError:
+            return events, 0, None
+
+        # Ignorar uma última linha incompleta (escrita em andamento)
+        end = chunk.rfind(b'\n') + 1
+        for line in chunk[:end].splitlines():
+            try:
+                event = json.loads(line)
+                if event[1] in EVENT_FIELDS:
+                    events.append(event)
+            except (ValueError, IndexError, TypeError):
+                continue
+        return events, offset + end, ino
+
+    def _replay(self):
+        """Snapshot + eventos do log ainda não incorporados; retorna (dados, offset, inode)"""
+        data = self.load_data()
+        # Ponto do log já incorporado ao snapshot (torna a compactação idempotente)
+        checkpoint = data.pop('log_checkpoint', None)
+        try:
+            ino = os.stat(self.log_file).st_ino
+        except FileNotFoundError:
+            ino = None
+        start = checkpoint[1] if checkpoint and ino is not None and checkpoint[0] == ino else 0
+        events, offset, ino = self._read_log(start)
+        for event in events:
+            apply_event(data, event)
+        return data, offset, ino
+
+    def compact(self):
+        """Reconstrói o snapshot reproduzindo o log e reinicia o log vazio"""
+        with self._io_lock:
+            return self._compact()
+
+    def _compact(self):
+        with self._file_lock(exclusive=True):
+            data, self._offset, self._log_ino = self._replay()
+            if not self.save_data(dict(data, log_checkpoint=[self._log_ino, self._offset])):
+                # Sem snapshot gravado o log não pode ser descartado
+                return data
+            try:
+                tmp_path = f"{self.log_file}.{os.getpid()}.tmp"
+                open(tmp_path, 'wb').close()
+                os.replace(tmp_path, self.log_file)
+                self._log_ino = os.stat(self.log_file).st_ino
+                self._offset = 0
+            except Exception as e:
+                log.warning('analytics_compactacao_falhou', erro=str(e))
+        return data
+
+    def _reload(self, compact=False):
+        """Recarrega snapshot + log (após compactação por este ou outro processo)"""
+        # Chamado com self._io_lock adquirido
+        if compact:
+            data = self._compact()
+        else:
+            with self._file_lock(exclusive=False):
+                data, self._offset, self._log_ino = self._replay()
+        with self._lock:
+            # Eventos ainda não gravados continuam valendo sobre o novo agregado
+            for event in self._pending:
+                apply_event(data, event)
+            self.data = data
+
+    def _sync(self):
+        """Incorpora eventos gravados por outros processos desde a última leitura"""
+        with self._io_lock:
+            try:
+                ino = os.stat(self.log_file).st_ino
+            except FileNotFoundError:
+                ino = None
+            if ino != self._log_ino:
+                self._reload()
+                return
+            events, self._offset, _ = self._read_log(self._offset)
+            with self._lock:
+                for event in events:
+                    if event[4:5] != [self._writer]:
+                        apply_event(self.data, event)
+
+    def _start_worker(self):
+        self._worker = threading.Thread(target=self._run_worker, name='analytics-worker', daemon=True)
+        self._worker.start()
+
+    def _after_fork(self):
+        # Processo filho: novo escritor; fila e pendências ficam com o processo pai
+        self._writer = uuid.uuid4().hex[:12]
+        self._init_worker_state()
+        self._start_worker()
+
+    def _run_worker(self):
+        while not self._stopping:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self._drain()
+            self.flush()
+
+    def _drain(self):
+        """Retira os eventos da fila, agrega em memória e os prepara para o log"""
+        queue = self._queue
+        batch = []
+        while True:
+            try:
+                timestamp, kind, user_agent, country = queue.popleft()
+            except IndexError:
+                break
+            batch.append([datetime.fromtimestamp(timestamp).isoformat(timespec='seconds'),
+                          kind, user_agent, country, self._writer])
+        if not batch:
+            return
+        self._space.set()
+        with self._lock:
+            for event in batch:
+                apply_event(self.data, event)
+            self._pending.extend(batch)
+
+    def _wait_for_space(self):
+        """Política 'block': aguarda o worker liberar espaço na fila"""
+        if self.queue_policy != 'block':
+            return False
+        deadline = time.monotonic() + self.block_timeout
+        while len(self._queue) >= self.queue_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self._worker is None or not self._worker.is_alive():
+                return False
+            self._space.clear()
+            self._wakeup.set()
+            self._space.wait(min(remaining, 0.05))
+        return True
+
+    def _record(self, kind, user_agent=None, country=None):
+        """Enfileira o evento sem bloquear a requisição (salvo política 'block' com fila cheia)"""
+        queue = self._queue
+        if len(queue) >= self.queue_size and not self._wait_for_space():
+            with self._lock:
+                self.dropped += 1
+            return
+        queue.append((time.time(), kind, user_agent, country))
+        if len(queue) >= self.flush_events:
+            self._wakeup.set()
+
+    def flush(self):
+        """Anexa ao log os eventos pendentes em uma única escrita"""
+        with self._io_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return
+
+            payload = ''.join(
+                json.dumps(event, ensure_ascii=False, separators=(',', ':')) + '\n' for event in batch
+            ).encode('utf-8')
+            try:
+                with self._file_lock(exclusive=False):
+                    with open(self.log_file, 'ab') as f:
+                        f.write(payload)
+                    size = os.path.getsize(self.log_file)
+            except Exception as e:
+                log.warning('analytics_gravacao_falhou', erro=str(e))
+                with self._lock:
+                    self._pending[:0] = batch
+                return
+
+            if size > self.compact_bytes:
+                self._reload(compact=True)
+
+    def close(self):
+        """Encerramento: agrega o que restou na fila e grava no log"""
+        self._stopping = True
+        self._wakeup.set()
+        self._drain()
+        self.flush()
+
     def track_visit(self, user_agent=None, country=None):
         """Registra uma visita ao site"""
-        print(f"[ANALYTICS] Registrando visita - UA: {user_agent}, País: {country}")
-        today = datetime.now().strftime('%Y-%m-%d')
-        month = datetime.now().strftime('%Y-%m')
-        
-        # Incrementa contadores gerais
-        self.data['total_visits'] += 1
-        print(f"[ANALYTICS] Total de visitas agora: {self.data['total_visits']}")
-        
-        # Estatísticas diárias
-        if today not in self.data['daily_stats']:
-            self.data['daily_stats'][today] = {
-                'visits': 0,
-                'recommendations': 0,
-                'exam_requests': 0,
-                'vaccine_prescriptions': 0
-            }
-        self.data['daily_stats'][today]['visits'] += 1
-        
-        # Estatísticas mensais
-        if month not in self.data['monthly_stats']:
-            self.data['monthly_stats'][month] = {
-                'visits': 0,
-                'recommendations': 0,
-                'exam_requests': 0,
-                'vaccine_prescriptions': 0
-            }
-        self.data['monthly_stats'][month]['visits'] += 1
-        
-        # User agents
-        if user_agent:
-            if user_agent not in self.data['user_agents']:
-                self.data['user_agents'][user_agent] = 0
-            self.data['user_agents'][user_agent] += 1
-        
-        # Países
-        if country:
-            if country not in self.data['countries']:
-                self.data['countries'][country] = 0
-            self.data['countries'][country] += 1
-        
-        self.save_data()
-        print(f"[ANALYTICS] Dados salvos em: {self.data_file}")
-    
+        self._record('visit', user_agent, country)
+
     def track_recommendation(self):
         """Registra geração de recomendação"""
-        print(f"[ANALYTICS] Registrando recomendação gerada")
-        today = datetime.now().strftime('%Y-%m-%d')
-        month = datetime.now().strftime('%Y-%m')
-        
-        self.data['total_recommendations'] += 1
-        print(f"[ANALYTICS] Total de recomendações agora: {self.data['total_recommendations']}")
-        
-        if today in self.data['daily_stats']:
-            self.data['daily_stats'][today]['recommendations'] += 1
-        
-        if month in self.data['monthly_stats']:
-            self.data['monthly_stats'][month]['recommendations'] += 1
-        
-        self.save_data()
-        print(f"[ANALYTICS] Recomendação salva com sucesso")
-    
+        self._record('recommendation')
+
     def track_exam_request(self):
         """Registra geração de solicitação de exames"""
-        print(f"[ANALYTICS] Registrando solicitação de exames")
-        today = datetime.now().strftime('%Y-%m-%d')
-        month = datetime.now().strftime('%Y-%m')
-        
-        self.data['total_exam_requests'] += 1
-        print(f"[ANALYTICS] Total de solicitações de exames agora: {self.data['total_exam_requests']}")
-        
-        if today in self.data['daily_stats']:
-            self.data['daily_stats'][today]['exam_requests'] += 1
-        
-        if month in self.data['monthly_stats']:
-            self.data['monthly_stats'][month]['exam_requests'] += 1
-        
-        self.save_data()
-        print(f"[ANALYTICS] Solicitação de exames salva com sucesso")
-    
+        self._record('exam_request')
+
     def track_vaccine_prescription(self):
         """Registra geração de receita de vacinas"""
-        print(f"[ANALYTICS] Registrando receita de vacinas")
-        today = datetime.now().strftime('%Y-%m-%d')
-        month = datetime.now().strftime('%Y-%m')
-        
-        self.data['total_vaccine_prescriptions'] += 1
-        print(f"[ANALYTICS] Total de receitas de vacinas agora: {self.data['total_vaccine_prescriptions']}")
-        
-        if today in self.data['daily_stats']:
-            self.data['daily_stats'][today]['vaccine_prescriptions'] += 1
-        
-        if month in self.data['monthly_stats']:
-            self.data['monthly_stats'][month]['vaccine_prescriptions'] += 1
-        
-        self.save_data()
-        print(f"[ANALYTICS] Receita de vacinas salva com sucesso")
-    
+        self._record('vaccine_prescription')
+
+    def queue_stats(self):
+        """Estado da fila de ingestão"""
+        return {
+            'queued': len(self._queue),
+            'capacity': self.queue_size,
+            'policy': self.queue_policy,
+            'dropped': self.dropped
+        }
+
     def get_stats(self):
         """Retorna estatísticas completas"""
-        return self.data
-    
+        self._drain()
+        self._sync()
+        with self._lock:
+            return copy.deepcopy(self.data)
+
     def get_summary(self):
         """Retorna resumo das estatísticas principais"""
         today = datetime.now().strftime('%Y-%m-%d')
         month = datetime.now().strftime('%Y-%m')
-        
-        today_stats = self.data['daily_stats'].get(today, {
-            'visits': 0, 'recommendations': 0, 'exam_requests': 0, 'vaccine_prescriptions': 0
-        })
-        
-        month_stats = self.data['monthly_stats'].get(month, {
-            'visits': 0, 'recommendations': 0, 'exam_requests': 0, 'vaccine_prescriptions': 0
-        })
-        
+        data = self.get_stats()
+
+        today_stats = data['daily_stats'].get(today, _empty_period())
+        month_stats = data['monthly_stats'].get(month, _empty_period())
+
         return {
             'total': {
-                'visits': self.data['total_visits'],
-                'recommendations': self.data['total_recommendations'],
-                'exam_requests': self.data['total_exam_requests'],
-                'vaccine_prescriptions': self.data['total_vaccine_prescriptions']
+                'visits': data['total_visits'],
+                'recommendations': data['total_recommendations'],
+                'exam_requests': data['total_exam_requests'],
+                'vaccine_prescriptions': data['total_vaccine_prescriptions']
             },
             'today': today_stats,
             'this_month': month_stats,
-            'last_updated': self.data['last_updated']
+            'last_updated': data['last_updated']
         }
 
 # Instância global
@@ -200,9 +436,8 @@ def track_visit():
                 simplified_ua = 'Edge'
             else:
                 simplified_ua = 'Other'
-            
+
             analytics.track_visit(user_agent=simplified_ua)
             return f(*args, **kwargs)
         return decorated_function
     return decorator
-
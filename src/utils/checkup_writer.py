@@ -0,0 +1,431 @@
+"""
+Gravação dos check-ups fora da requisição (write-behind)
+
+A requisição monta um registro compacto (tuplas com os valores das colunas de
+patients, checkups e recomendacoes) e o coloca em uma fila limitada; uma thread
+de fundo grava os registros em lotes, cada lote em uma única transação com
+inserts em massa (executemany, com RETURNING dos ids de pacientes e check-ups).
+
+- Fila cheia: CHECKUP_WRITER_QUEUE_POLICY 'spill' (padrão) grava o registro no
+  arquivo de espera em disco; 'block' aguarda espaço por até
+  CHECKUP_WRITER_BLOCK_TIMEOUT_MS e então grava em disco; 'drop' descarta
+- Banco indisponível: o lote vai para o arquivo de espera (JSON por linha, com
+  fsync) em CHECKUP_SPILL_DIR e é regravado a cada CHECKUP_WRITER_RETRY_S
+  segundos; arquivos de processos encerrados também são regravados
+- Registros rejeitados pelo banco (dados inválidos) são isolados do lote e
+  guardados em rejeitados-<pid>.jsonl, sem novas tentativas; acima de
+  CHECKUP_REJECTED_MAX_MB o arquivo é rotacionado para rejeitados-<pid>.jsonl.1
+  (a rotação anterior é descartada)
+- Os arquivos de espera contêm os dados completos dos pacientes: o diretório
+  (padrão src/database/checkup_spill) é criado com modo 0700 e os arquivos com
+  0600; um diretório ou arquivo de outro usuário nunca é regravado no banco
+- Encerramento do processo: a fila é esvaziada no banco (ou em disco)
+
+CHECKUP_WRITE_BEHIND=0 grava na própria requisição (mesmo caminho, lote de um).
+A entrega é pelo menos uma vez: um processo interrompido durante a regravação
+do arquivo de espera pode duplicar os registros já gravados daquele arquivo.
+"""
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from flask import current_app, has_app_context
+from sqlalchemy import insert
+from sqlalchemy.exc import DBAPIError, DisconnectionError, InterfaceError, OperationalError
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from src.models.user import db
+from src.models.medical import Patient, Checkup, Recomendacao
+from src.utils.metrics import metrics, _processo_vivo
+from src.utils.private_storage import APP_DATA_DIR, abrir_privado, diretorio_privado
+from src.utils.stage_timer import registrar
+from src.utils.structured_log import get_logger
+
+log = get_logger(__name__)
+
+# Colunas na ordem dos valores do registro
+CAMPOS_PACIENTE = ('nome', 'idade', 'sexo', 'peso', 'altura')
+CAMPOS_CHECKUP = ('pressao_sistolica', 'pressao_diastolica', 'colesterol_total', 'hdl_colesterol',
+                  'creatinina', 'hba1c', 'risco_10_anos', 'risco_30_anos', 'classificacao_risco',
+                  'comorbidades', 'historia_familiar', 'tabagismo', 'medicacoes', 'pais_guideline')
+CAMPOS_RECOMENDACAO = ('titulo', 'descricao', 'subtitulo', 'categoria', 'prioridade', 'referencia',
+                       'grau_evidencia')
+
+# Falhas de conexão/bloqueio: o lote espera em disco; as demais são erros dos dados
+ERROS_INDISPONIVEL = (OperationalError, InterfaceError, DisconnectionError, PoolTimeoutError)
+
+POLITICAS = ('spill', 'block', 'drop')
+
+
+class BancoIndisponivel(Exception):
+    """Banco fora do ar, bloqueado ou sem conexão livre"""
+
+
+def _erro(e) -> str:
+    """Mensagem do driver sem o SQL e os parâmetros (dados do paciente não vão para o log)"""
+    return str(getattr(e, 'orig', None) or e)
+
+
+class CheckupWriter:
+    """Fila limitada de registros de check-up gravados em lote por uma thread de fundo"""
+
+    def __init__(self, enabled=None, queue_size=None, queue_policy=None, batch_size=None,
+                 flush_interval_ms=None, retry_interval=None, spill_dir=None):
+        self.enabled = enabled if enabled is not None else \
+            os.getenv('CHECKUP_WRITE_BEHIND', '1').lower() not in ('0', 'false', 'no')
+        self.queue_size = queue_size or int(os.getenv('CHECKUP_WRITER_QUEUE_SIZE', '10000'))
+        self.queue_policy = (queue_policy or os.getenv('CHECKUP_WRITER_QUEUE_POLICY', 'spill')).lower()
+        if self.queue_policy not in POLITICAS:
+            self.queue_policy = 'spill'
+        self.block_timeout = int(os.getenv('CHECKUP_WRITER_BLOCK_TIMEOUT_MS', '100')) / 1000
+        self.batch_size = batch_size or int(os.getenv('CHECKUP_WRITER_BATCH', '500'))
+        self.flush_interval = (flush_interval_ms or int(os.getenv('CHECKUP_WRITER_FLUSH_MS', '200'))) / 1000
+        self.retry_interval = retry_interval or float(os.getenv('CHECKUP_WRITER_RETRY_S', '5'))
+        self.spill_dir = spill_dir or os.getenv('CHECKUP_SPILL_DIR') or \
+            os.path.join(APP_DATA_DIR, 'checkup_spill')
+        self.rejected_max_bytes = int(float(os.getenv('CHECKUP_REJECTED_MAX_MB', '16')) * 1024 * 1024)
+
+        self._engine = None
+        self._counters = {'enqueued': 0, 'written': 0, 'batches': 0, 'spilled': 0, 'replayed': 0,
+                          'dropped': 0, 'discarded': 0, 'failures': 0}
+        self._init_worker_state()
+        atexit.register(self.close)
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _init_worker_state(self):
+        # deque.append/popleft são atômicos: a requisição não disputa lock para enfileirar
+        self._queue = deque()
+        self._lock = threading.Lock()
+        self._io_lock = threading.Lock()
+        self._spill_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._space = threading.Event()
+        self._stopping = False
+        self._worker = None
+        # Enquanto o banco estiver indisponível os lotes vão direto para o disco
+        self._indisponivel_ate = 0.0
+        self._proxima_regravacao = 0.0
+
+    # Inicialização
+
+    def init_app(self, app):
+        """Associa o engine da aplicação e inicia a thread de gravação"""
+        with app.app_context():
+            self._engine = db.engine
+        if self.enabled and self._worker is None:
+            self._start_worker()
+
+    def _start_worker(self):
+        self._worker = threading.Thread(target=self._run_worker, name='checkup-writer', daemon=True)
+        self._worker.start()
+
+    def _after_fork(self):
+        # Processo filho: fila própria e conexões novas (as do pai não podem ser reutilizadas)
+        iniciado = self._worker is not None
+        self._init_worker_state()
+        if self._engine is not None:
+            self._engine.dispose(close=False)
+        if iniciado:
+            self._start_worker()
+
+    # Requisição
+
+    @staticmethod
+    def registro(paciente, checkup, recomendacoes):
+        """Registro compacto: (criado_em, valores do paciente, do check-up, das recomendações)"""
+        return (datetime.utcnow(), tuple(paciente), tuple(checkup), tuple(recomendacoes))
+
+    def enviar(self, registro):
+        """Enfileira o registro (ou grava na hora com CHECKUP_WRITE_BEHIND=0)"""
+        if self._engine is None and has_app_context():
+            self.init_app(current_app._get_current_object())
+        if not self.enabled or self._worker is None:
+            self._gravar_ou_guardar([registro])
+            return
+
+        queue = self._queue
+        if len(queue) >= self.queue_size and not self._wait_for_space():
+            if self.queue_policy == 'drop':
+                with self._lock:
+                    self._counters['dropped'] += 1
+                return
+            # Sem espaço na fila: o registro vai para o disco e é gravado na próxima regravação
+            self._guardar([registro])
+            return
+        queue.append(registro)
+        with self._lock:
+            self._counters['enqueued'] += 1
+        if len(queue) >= self.batch_size:
+            self._wakeup.set()
+
+    def _wait_for_space(self):
+        """Política 'block': aguarda a thread de gravação liberar espaço na fila"""
+        if self.queue_policy != 'block':
+            return False
+        deadline = time.monotonic() + self.block_timeout
+        while len(self._queue) >= self.queue_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self._worker is None or not self._worker.is_alive():
+                return False
+            self._space.clear()
+            self._wakeup.set()
+            self._space.wait(min(remaining, 0.05))
+        return True
+
+    # Thread de gravação
+
+    def _run_worker(self):
+        # Primeira passagem imediata: regrava o que ficou em disco de execuções anteriores
+        while True:
+            try:
+                self.flush()
+                if time.monotonic() >= self._proxima_regravacao:
+                    self.regravar()
+            except Exception as e:
+                log.exception('checkup_writer_falhou', erro=str(e))
+            if self._stopping:
+                return
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+
+    def _retirar(self):
+        """Até batch_size registros da fila"""
+        queue = self._queue
+        lote = []
+        while len(lote) < self.batch_size:
+            try:
+                lote.append(queue.popleft())
+            except IndexError:
+                break
+        if lote:
+            self._space.set()
+        return lote
+
+    def flush(self):
+        """Grava em lotes tudo o que está na fila"""
+        with self._io_lock:
+            while True:
+                lote = self._retirar()
+                if not lote:
+                    return
+                self._gravar_ou_guardar(lote)
+
+    def _gravar_ou_guardar(self, lote):
+        """Grava o lote; com o banco indisponível guarda em disco, com dados inválidos isola os registros"""
+        if time.monotonic() < self._indisponivel_ate:
+            self._guardar(lote)
+            return
+        try:
+            self._gravar(lote)
+        except BancoIndisponivel as e:
+            log.warning('checkup_banco_indisponivel', registros=len(lote), erro=str(e))
+            self._indisponivel_ate = self._proxima_regravacao = time.monotonic() + self.retry_interval
+            self._guardar(lote)
+        except Exception as e:
+            if len(lote) == 1:
+                log.error('checkup_gravacao_falhou', erro=_erro(e))
+                self._rejeitar(lote)
+                return
+            # Um registro inválido não pode derrubar o lote inteiro
+            for registro in lote:
+                self._gravar_ou_guardar([registro])
+
+    def _gravar(self, lote):
+        """Insere o lote em uma transação: pacientes e check-ups com RETURNING, recomendações em executemany"""
+        engine = self._engine
+        if engine is None:
+            raise BancoIndisponivel('engine não inicializado (checkup_writer.init_app)')
+        pacientes, checkups = Patient.__table__, Checkup.__table__
+        inicio = time.perf_counter()
+        try:
+            with engine.begin() as conn:
+                ids_pacientes = conn.execute(
+                    insert(pacientes).returning(pacientes.c.id, sort_by_parameter_order=True),
+                    [dict(zip(CAMPOS_PACIENTE, r[1]), created_at=r[0], updated_at=r[0]) for r in lote]
+                ).scalars().all()
+                ids_checkups = conn.execute(
+                    insert(checkups).returning(checkups.c.id, sort_by_parameter_order=True),
+                    [dict(zip(CAMPOS_CHECKUP, r[2]), patient_id=pid, created_at=r[0])
+                     for r, pid in zip(lote, ids_pacientes)]
+                ).scalars().all()
+                linhas = [
+                    dict(zip(CAMPOS_RECOMENDACAO, rec), checkup_id=cid, created_at=r[0])
+                    for r, cid in zip(lote, ids_checkups) for rec in r[3]
+                ]
+                if linhas:
+                    conn.execute(insert(Recomendacao.__table__), linhas)
+        except ERROS_INDISPONIVEL as e:
+            with self._lock:
+                self._counters['failures'] += 1
+            raise BancoIndisponivel(_erro(e)) from e
+        except DBAPIError:
+            with self._lock:
+                self._counters['failures'] += 1
+            raise
+        duracao = time.perf_counter() - inicio
+        metrics.observe('db_commit_duration_seconds', duracao)
+        registrar('banco_lote', duracao * 1000)
+        with self._lock:
+            self._counters['written'] += len(lote)
+            self._counters['batches'] += 1
+
+    # Arquivo de espera
+
+    def _arquivo(self, prefixo, pid=None):
+        return os.path.join(self.spill_dir, f'{prefixo}-{pid or os.getpid()}.jsonl')
+
+    def _anexar(self, caminho, lote, max_bytes=None):
+        """Anexa os registros (JSON por linha) e força a gravação em disco"""
+        dados = ''.join(
+            json.dumps([str(r[0]), r[1], r[2], r[3]], ensure_ascii=False, separators=(',', ':')) + '\n'
+            for r in lote
+        ).encode('utf-8')
+        with self._spill_lock:
+            diretorio_privado(self.spill_dir)
+            if max_bytes:
+                self._rotacionar(caminho, max_bytes - len(dados))
+            with abrir_privado(caminho, 'ab') as f:
+                f.write(dados)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _guardar(self, lote):
+        try:
+            self._anexar(self._arquivo('checkups'), lote)
+        except OSError as e:
+            log.error('checkup_spill_falhou', registros=len(lote), erro=str(e))
+            with self._lock:
+                self._counters['dropped'] += len(lote)
+            return
+        with self._lock:
+            self._counters['spilled'] += len(lote)
+
+    @staticmethod
+    def _rotacionar(caminho, limite):
+        """Move o arquivo para <caminho>.1 quando ele passaria do limite"""
+        try:
+            tamanho = os.path.getsize(caminho)
+        except FileNotFoundError:
+            return
+        if tamanho > limite:
+            os.replace(caminho, caminho + '.1')
+            log.warning('checkup_rejeitados_rotacionado', arquivo=caminho, bytes=tamanho)
+
+    def _rejeitar(self, lote):
+        with self._lock:
+            self._counters['discarded'] += len(lote)
+        try:
+            self._anexar(self._arquivo('rejeitados'), lote, max_bytes=self.rejected_max_bytes)
+        except OSError as e:
+            log.error('checkup_spill_falhou', registros=len(lote), erro=str(e))
+
+    @staticmethod
+    def _ler(caminho):
+        """Registros do arquivo de espera (linhas incompletas de uma escrita interrompida são ignoradas)"""
+        lote = []
+        with open(caminho, 'rb') as f:
+            for linha in f:
+                try:
+                    criado_em, paciente, checkup, recomendacoes = json.loads(linha)
+                    lote.append((datetime.fromisoformat(criado_em), tuple(paciente), tuple(checkup),
+                                 tuple(map(tuple, recomendacoes))))
+                except (ValueError, TypeError):
+                    log.warning('checkup_spill_linha_invalida', arquivo=caminho)
+        return lote
+
+    def _reivindicar(self):
+        """Arquivos de espera deste processo e de processos encerrados, renomeados para regravação"""
+        pid = os.getpid()
+        reivindicados = []
+        for caminho in sorted(glob.glob(os.path.join(self.spill_dir, 'checkups-*.jsonl*'))):
+            nome = os.path.basename(caminho)
+            if nome.endswith('.replay'):
+                # Regravação interrompida: <arquivo>.<pid que regravava>.replay
+                dono = int(nome.rsplit('.', 2)[1])
+            elif nome.endswith('.jsonl'):
+                dono = int(nome[len('checkups-'):-len('.jsonl')])
+            else:
+                continue
+            if dono != pid and _processo_vivo(dono):
+                continue
+            try:
+                alheio = hasattr(os, 'getuid') and os.lstat(caminho).st_uid != os.getuid()
+            except FileNotFoundError:
+                continue
+            if alheio:
+                log.warning('checkup_spill_arquivo_ignorado', arquivo=caminho, motivo='outro usuário')
+                continue
+            destino = os.path.join(self.spill_dir, f"{nome.split('.jsonl')[0]}.jsonl.{pid}.replay")
+            try:
+                # O próprio arquivo só é renomeado entre duas escritas
+                with self._spill_lock:
+                    os.rename(caminho, destino)
+            except FileNotFoundError:
+                continue
+            reivindicados.append(destino)
+        return reivindicados
+
+    def regravar(self):
+        """Regrava no banco os registros guardados em disco"""
+        self._proxima_regravacao = time.monotonic() + self.retry_interval
+        if not os.path.isdir(self.spill_dir):
+            return
+        try:
+            # Arquivos plantados em um diretório de outro usuário não entram no banco
+            diretorio_privado(self.spill_dir)
+        except OSError as e:
+            log.error('checkup_spill_diretorio_inseguro', diretorio=self.spill_dir, erro=str(e))
+            return
+        self._indisponivel_ate = 0.0
+        with self._io_lock:
+            for caminho in self._reivindicar():
+                try:
+                    lote = self._ler(caminho)
+                except OSError as e:
+                    log.warning('checkup_spill_leitura_falhou', arquivo=caminho, erro=str(e))
+                    continue
+                for inicio in range(0, len(lote), self.batch_size):
+                    parte = lote[inicio:inicio + self.batch_size]
+                    self._gravar_ou_guardar(parte)
+                    if time.monotonic() < self._indisponivel_ate:
+                        # Banco caiu no meio: o restante volta para o arquivo deste processo
+                        self._guardar(lote[inicio + self.batch_size:])
+                        break
+                    with self._lock:
+                        self._counters['replayed'] += len(parte)
+                os.remove(caminho)
+                if time.monotonic() < self._indisponivel_ate:
+                    return
+
+    # Encerramento e estado
+
+    def close(self):
+        """Encerramento: grava o que restou na fila (ou guarda em disco)"""
+        self._stopping = True
+        self._wakeup.set()
+        worker = self._worker
+        if worker is not None and worker.is_alive() and worker is not threading.current_thread():
+            worker.join(timeout=10)
+        self.flush()
+
+    def stats(self):
+        """Contadores, fila e política"""
+        with self._lock:
+            stats = dict(self._counters)
+        stats.update({
+            'queued': len(self._queue),
+            'capacity': self.queue_size,
+            'policy': self.queue_policy,
+            'write_behind': self.enabled,
+        })
+        return stats
+
+
+# Instância global; a thread de gravação começa em init_app
+checkup_writer = CheckupWriter()
@@ -0,0 +1,84 @@
+"""
+Formato compacto da resposta do check-up (format=compact)
+
+Descrições e referências se repetem entre recomendações (o mesmo PCDT em todos
+os exames de HIV, por exemplo). No formato compacto esses campos vão uma única
+vez para o dicionário no topo da resposta e cada recomendação guarda apenas o
+índice do valor:
+
+    {"formato": "compact", "campos_compartilhados": [...], "dicionario": [...],
+     "recommendations": [{"titulo": "...", "descricao": 0, "referencia": 1, ...}], ...}
+
+Para reconstruir: rec[campo] = dicionario[rec[campo]] para cada campo
+compartilhado presente. O corpo é comprimido com brotli ou gzip conforme o
+Accept-Encoding do cliente.
+"""
+import gzip
+import json
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    brotli = None
+    BROTLI_AVAILABLE = False
+
+FORMATO_COMPACTO = 'compact'
+
+# Campos longos e repetidos substituídos por índices do dicionário
+CAMPOS_COMPARTILHADOS = ('descricao', 'referencia', 'referencia_html', 'referencias')
+
+# Listas de recomendações presentes na resposta
+LISTAS = ('recommendations', 'outras_recomendacoes')
+
+# Níveis pensados para respostas dinâmicas (compressão rápida)
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def compactar(corpo: dict) -> dict:
+    """Resposta com os campos compartilhados movidos para o dicionário"""
+    dicionario = []
+    indices = {}
+
+    def indice(valor):
+        # Listas (referencias) indexadas pela forma serializada
+        chave = json.dumps(valor, sort_keys=True, ensure_ascii=False) if isinstance(valor, (list, dict)) else valor
+        posicao = indices.get(chave)
+        if posicao is None:
+            posicao = indices[chave] = len(dicionario)
+            dicionario.append(valor)
+        return posicao
+
+    compacto = {campo: valor for campo, valor in corpo.items() if campo not in LISTAS}
+    for lista in LISTAS:
+        if lista not in corpo:
+            continue
+        recs = []
+        for rec in corpo[lista] or []:
+            rec = dict(rec)
+            for campo in CAMPOS_COMPARTILHADOS:
+                if rec.get(campo) not in (None, ''):
+                    rec[campo] = indice(rec[campo])
+            recs.append(rec)
+        compacto[lista] = recs
+    compacto['formato'] = FORMATO_COMPACTO
+    compacto['campos_compartilhados'] = list(CAMPOS_COMPARTILHADOS)
+    compacto['dicionario'] = dicionario
+    return compacto
+
+
+def escolher_codificacao(accept_encodings) -> str:
+    """'br', 'gzip' ou 'identity' conforme o Accept-Encoding (objeto Accept do Werkzeug)"""
+    opcoes = ['gzip', 'identity']
+    if BROTLI_AVAILABLE:
+        opcoes.insert(0, 'br')
+    return accept_encodings.best_match(opcoes, default='identity') or 'identity'
+
+
+def comprimir(dados: bytes, codificacao: str) -> bytes:
+    if codificacao == 'br':
+        return brotli.compress(dados, quality=BROTLI_QUALITY)
+    if codificacao == 'gzip':
+        return gzip.compress(dados, compresslevel=GZIP_LEVEL)
+    return dados
@@ -0,0 +1,173 @@
+"""
+Registro Compartilhado de Configurações JSON
+
+Mantém em memória um snapshot congelado de cada arquivo de config/ e só relê o
+arquivo quando o mtime (ou tamanho) muda e o hash do conteúdo é diferente.
+A troca do snapshot é atômica: leitores sempre veem a versão antiga completa ou
+a nova completa.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from types import MappingProxyType
+from src.utils.structured_log import get_logger
+
+log = get_logger(__name__)
+
+
+def freeze(value):
+    """Converte dicts/listas em estruturas imutáveis (MappingProxyType/tuple)"""
+    if isinstance(value, dict):
+        return MappingProxyType({k: freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(freeze(v) for v in value)
+    return value
+
+
+class _Entry:
+    __slots__ = ('data', 'digest', 'signature', 'checked_at', 'loaded_at')
+
+    def __init__(self, data, digest, signature, checked_at):
+        self.data = data
+        self.digest = digest
+        self.signature = signature
+        self.checked_at = checked_at
+        self.loaded_at = checked_at
+
+
+class ConfigRegistry:
+    """Cache de configurações com recarga a quente baseada em mtime/hash"""
+
+    def __init__(self, check_interval=1.0):
+        # Intervalo mínimo (s) entre verificações de mtime de um mesmo arquivo
+        self.check_interval = check_interval
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0, 'reloads': 0, 'errors': 0}
+
+    @staticmethod
+    def _signature(path):
+        st = os.stat(path)
+        return (st.st_mtime_ns, st.st_size)
+
+    def _load(self, path, previous):
+        """Lê o arquivo; reaproveita o snapshot anterior se o hash não mudou"""
+        now = time.monotonic()
+        signature = self._signature(path)
+        with open(path, 'rb') as f:
+            raw = f.read()
+        digest = hashlib.sha256(raw).hexdigest()
+        if previous is not None and previous.digest == digest:
+            entry = _Entry(previous.data, digest, signature, now)
+            entry.loaded_at = previous.loaded_at
+            return entry, False
+        data = freeze(json.loads(raw.decode('utf-8')))
+        return _Entry(data, digest, signature, now), True
+
+    def get(self, path):
+        """
+        Retorna o snapshot congelado do arquivo JSON
+
+        Args:
+            path: Caminho do arquivo de configuração
+
+        Returns:
+            Estrutura imutável (MappingProxyType/tuple) com o conteúdo do arquivo
+
+        Raises:
+            OSError, ValueError: se o arquivo não puder ser lido na primeira carga
+        """
+        key = str(Path(path))
+        entry = self._entries.get(key)
+        now = time.monotonic()
+        if entry is not None and now - entry.checked_at < self.check_interval:
+            self._counters['hits'] += 1
+            return entry.data
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                try:
+                    entry, _ = self._load(key, None)
+                except Exception:
+                    self._counters['errors'] += 1
+                    raise
+                self._entries[key] = entry
+                self._counters['misses'] += 1
+                return entry.data
+
+            try:
+                signature = self._signature(key)
+            except OSError:
+                # Arquivo removido/inacessível: manter último snapshot válido
+                self._counters['errors'] += 1
+                entry.checked_at = now
+                return entry.data
+
+            if signature == entry.signature:
+                entry.checked_at = now
+                self._counters['hits'] += 1
+                return entry.data
+
+            try:
+                new_entry, changed = self._load(key, entry)
+            except Exception as e:
+                # Arquivo em escrita ou inválido: manter último snapshot válido
+                log.error('config_recarga_falhou', arquivo=key, erro=str(e))
+                self._counters['errors'] += 1
+                entry.checked_at = now
+                return entry.data
+            self._entries[key] = new_entry
+            self._counters['reloads' if changed else 'hits'] += 1
+            return new_entry.data
+
+    def version(self, path):
+        """Hash do conteúdo atualmente servido para o arquivo (None se não carregado)"""
+        entry = self._entries.get(str(Path(path)))
+        return entry.digest if entry is not None else None
+
+    def versions(self):
+        """Mapa arquivo -> hash de todas as configurações carregadas"""
+        return {key: entry.digest for key, entry in list(self._entries.items())}
+
+    def generation(self):
+        """
+        Versões atuais de todas as configurações carregadas, revalidando o mtime
+        de cada arquivo (no máximo uma vez por check_interval)
+
+        Returns:
+            tuple: pares (arquivo, hash) ordenados; muda quando qualquer arquivo muda
+        """
+        for key in list(self._entries):
+            try:
+                self.get(key)
+            except Exception:
+                pass
+        return tuple(sorted(self.versions().items()))
+
+    def invalidate(self, path=None):
+        """Força nova verificação de mtime na próxima leitura"""
+        entries = [self._entries.get(str(Path(path)))] if path else list(self._entries.values())
+        for entry in entries:
+            if entry is not None:
+                entry.checked_at = float('-inf')
+
+    def stats(self):
+        """Contadores de hit/miss/reload e arquivos carregados"""
+        counters = dict(self._counters)
+        lookups = counters['hits'] + counters['misses'] + counters['reloads']
+        counters['hit_ratio'] = round(counters['hits'] / lookups, 4) if lookups else 0.0
+        counters['files'] = {
+            key: {'version': entry.digest[:12], 'loaded_at': entry.loaded_at}
+            for key, entry in list(self._entries.items())
+        }
+        return counters
+
+
+# Instância global compartilhada pelos carregadores de config/
+config_registry = ConfigRegistry(
+    check_interval=float(os.getenv('CONFIG_CHECK_INTERVAL', '1.0'))
+)
@@ -0,0 +1,202 @@
+"""
+Catálogo canônico de exames, exames de imagem e vacinas
+
+Cada item de config/exam_catalog.json tem um id inteiro estável, uma categoria
+e uma política de mesclagem. As regras emitem o id do item ('item_id' em cada
+recomendação), de modo que a deduplicação e a classificação dos documentos
+trabalham com inteiros: um bitset detecta repetições em O(n) e a normalização
+do título por expressões regulares só é usada para recomendações sem id e com
+título desconhecido (enviadas por clientes antigos).
+"""
+import re
+import threading
+from pathlib import Path
+from types import MappingProxyType
+from typing import Dict, Iterable, List, Optional
+from src.utils.config_registry import config_registry
+from src.utils.structured_log import get_logger
+
+log = get_logger(__name__)
+
+# Carregar configurações (snapshot compartilhado via config_registry)
+CONFIG_PATH = Path(__file__).resolve().parent.parent.parent / 'config' / 'exam_catalog.json'
+
+# Políticas de mesclagem de recomendações repetidas
+UNIR = 'unir'
+PRIMEIRO = 'primeiro'
+
+_MATERIAL = re.compile(r',\s*(soro|plasma|sangue.*|urina)', re.IGNORECASE)
+_PARENTESES = re.compile(r'\s*\([^)]*\)')
+_PONTUACAO = re.compile(r'[^a-z0-9\s]')
+
+def load_catalog():
+    """Carrega o catálogo do arquivo de configuração"""
+    try:
+        return config_registry.get(CONFIG_PATH)
+    except Exception as e:
+        log.error('config_carregamento_falhou', arquivo=str(CONFIG_PATH), erro=str(e))
+        return None
+
+def chave_titulo(titulo: str) -> str:
+    """
+    Chave de agrupamento por título (sem material biológico, parênteses e pontuação)
+
+    Ex.: 'TOTG-75g (Teste Oral de Tolerância à Glicose), soro' -> 'totg75g'
+    """
+    chave = _MATERIAL.sub('', titulo)
+    chave = _PARENTESES.sub('', chave)
+    chave = _PONTUACAO.sub('', chave.lower())
+    return ' '.join(chave.split())
+
+
+class Item:
+    """Item do catálogo"""
+
+    __slots__ = ('id', 'chave', 'categoria', 'mesclagem', 'titulos')
+
+    def __init__(self, raw: Dict):
+        self.id = int(raw['id'])
+        self.chave = raw['chave']
+        self.categoria = raw.get('categoria')
+        self.mesclagem = raw.get('mesclagem', UNIR)
+        self.titulos = tuple(raw.get('titulos', []))
+
+
+class CompiledCatalog:
+    """Catálogo compilado: índices por id, título exato e chave normalizada"""
+
+    def __init__(self, config: Dict):
+        self.version = config.get('version')
+        self.itens: Dict[int, Item] = {}
+        por_titulo = {}
+        por_chave = {}
+        for raw in config.get('itens', []):
+            item = Item(raw)
+            if item.id <= 0 or item.id in self.itens:
+                raise ValueError(f'Id de item inválido ou repetido no catálogo: {item.id}')
+            self.itens[item.id] = item
+            for titulo in item.titulos:
+                por_titulo[titulo] = item
+                por_chave.setdefault(chave_titulo(titulo), item)
+        self.por_titulo = MappingProxyType(por_titulo)
+        self.por_chave = MappingProxyType(por_chave)
+
+    def item(self, rec: Dict) -> Optional[Item]:
+        """Item do catálogo correspondente à recomendação (pelo id ou, sem id, pelo título)"""
+        item_id = rec.get('item_id')
+        if item_id is not None:
+            item = self.itens.get(item_id)
+            if item is not None:
+                return item
+        titulo = (rec.get('titulo') or '').strip()
+        item = self.por_titulo.get(titulo)
+        if item is None and titulo:
+            item = self.por_chave.get(chave_titulo(titulo))
+        return item
+
+    def categoria(self, rec: Dict) -> Optional[str]:
+        """Categoria canônica da recomendação (categoria informada se fora do catálogo)"""
+        item = self.item(rec)
+        return item.categoria if item is not None else rec.get('categoria')
+
+    @staticmethod
+    def _mesclar(recs: List[Dict], politica: str) -> Dict:
+        if politica == PRIMEIRO:
+            return recs[0]
+        # Priorizar título mais completo (com material biológico)
+        melhor = max(recs, key=lambda r: len(r.get('titulo', ''))).copy()
+
+        # Unir referências de todas as recomendações
+        refs = list(dict.fromkeys(r.get('referencia') for r in recs if r.get('referencia')))
+        if refs:
+            melhor['referencia'] = ' | '.join(refs)
+
+        # Unir descrições se diferentes (limitar a 2, na ordem das recomendações)
+        descricoes = list(dict.fromkeys(r.get('descricao') for r in recs if r.get('descricao')))
+        if len(descricoes) > 1:
+            melhor['descricao'] = ' '.join(descricoes[:2])
+        return melhor
+
+    def deduplicate(self, recs: Iterable[Dict]) -> List[Dict]:
+        """
+        Mantém uma recomendação por item do catálogo, unindo as repetidas
+        conforme a política de mesclagem do item
+
+        A posição da recomendação mesclada é a da primeira ocorrência do item.
+        """
+        entradas = []
+        vistos = 0
+        repetidos = 0
+        for rec in recs:
+            if not (rec.get('titulo') or '').strip():
+                continue
+            item = self.item(rec)
+            if item is None:
+                # Fora do catálogo: agrupar pela chave do título
+                entradas.append((chave_titulo(rec['titulo'].strip()), rec))
+                continue
+            bit = 1 << item.id
+            if vistos & bit:
+                repetidos |= bit
+            vistos |= bit
+            entradas.append((item.id, rec))
+
+        grupos = {}
+        for chave, rec in entradas:
+            if isinstance(chave, str) or repetidos >> chave & 1:
+                grupos.setdefault(chave, []).append(rec)
+
+        unique = []
+        for chave, rec in entradas:
+            grupo = grupos.get(chave)
+            if grupo is None:
+                unique.append(rec)
+            elif grupo:
+                if len(grupo) == 1:
+                    unique.append(grupo[0])
+                else:
+                    item = self.itens.get(chave) if isinstance(chave, int) else None
+                    unique.append(self._mesclar(grupo, item.mesclagem if item else UNIR))
+                # Grupo já emitido na primeira ocorrência
+                grupos[chave] = ()
+        return unique
+
+
+class ExamCatalog:
+    """Ponto de acesso ao catálogo compilado, recompilando quando o arquivo muda"""
+
+    def __init__(self):
+        self._config = None
+        self._compiled = None
+        self._lock = threading.Lock()
+
+    @property
+    def compiled(self) -> CompiledCatalog:
+        config = load_catalog()
+        if config is None and self._compiled is not None:
+            # Manter o último catálogo válido se o arquivo ficar indisponível
+            return self._compiled
+        if config is not self._config:
+            with self._lock:
+                if config is not self._config:
+                    self._compiled = CompiledCatalog(config or {})
+                    self._config = config
+        return self._compiled
+
+    @property
+    def version(self):
+        return self.compiled.version
+
+    def item(self, rec: Dict) -> Optional[Item]:
+        return self.compiled.item(rec)
+
+    def categoria(self, rec: Dict) -> Optional[str]:
+        return self.compiled.categoria(rec)
+
+    def deduplicate(self, recs: Iterable[Dict]) -> List[Dict]:
+        return self.compiled.deduplicate(recs)
+
+
+# Instância global; o catálogo é compilado na importação
+exam_catalog = ExamCatalog()
+exam_catalog.compiled
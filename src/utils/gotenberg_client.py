@@ -0,0 +1,340 @@
+"""
+Cliente HTTP reutilizável para o Gotenberg
+
+- Pool de conexões persistentes (keep-alive) compartilhado entre requisições
+- Limite de conversões simultâneas, com prioridade para as interativas: conversões
+  em segundo plano (lotes, fila de jobs) ocupam no máximo GOTENBERG_BACKGROUND_CONCURRENCY
+  vagas e só pegam uma vaga livre quando nenhuma requisição interativa está esperando
+- Novas tentativas com backoff exponencial e jitter em erros 5xx/de conexão
+- Circuit breaker: com o Gotenberg fora do ar, falha imediatamente por um período
+- Corpo da resposta transmitido em blocos, sem bufferizar o PDF inteiro
+"""
+import os
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from functools import partial
+
+import requests
+from requests.adapters import HTTPAdapter
+from src.utils.metrics import metrics
+
+# Estados do circuit breaker
+FECHADO = 'fechado'
+ABERTO = 'aberto'
+MEIO_ABERTO = 'meio_aberto'
+
+
+class GotenbergError(Exception):
+    """Falha na conversão via Gotenberg"""
+
+
+class GotenbergUnavailable(GotenbergError):
+    """Gotenberg indisponível (circuito aberto ou limite de conversões atingido)"""
+
+
+class GotenbergStream:
+    """
+    Resposta do Gotenberg transmitida em blocos
+
+    Mantém a vaga de conversão até o corpo ser consumido ou close() ser chamado.
+    """
+
+    def __init__(self, response, release, chunk_size):
+        self._response = response
+        self._release = release
+        self._chunk_size = chunk_size
+        self._closed = False
+        length = response.headers.get('Content-Length')
+        self.content_length = int(length) if length and length.isdigit() else None
+
+    def __iter__(self):
+        try:
+            for chunk in self._response.iter_content(self._chunk_size):
+                if chunk:
+                    yield chunk
+        finally:
+            self.close()
+
+    def read(self):
+        return b''.join(self)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self._response.close()
+        finally:
+            self._release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class GotenbergClient:
+    """Cliente Gotenberg com pool, limite de concorrência, retries e circuit breaker"""
+
+    def __init__(self, base_url=None, max_concurrency=None, timeout=None, connect_timeout=None,
+                 max_retries=None, backoff=None, breaker_threshold=None, breaker_reset=None,
+                 acquire_timeout=None, background_concurrency=None, chunk_size=64 * 1024):
+        self.base_url = (base_url or os.getenv('GOTENBERG_URL', 'http://localhost:3000')).rstrip('/')
+        self.max_concurrency = max_concurrency or int(os.getenv('GOTENBERG_MAX_CONCURRENCY', '4'))
+        self.timeout = timeout or float(os.getenv('GOTENBERG_TIMEOUT', '30'))
+        self.connect_timeout = connect_timeout or float(os.getenv('GOTENBERG_CONNECT_TIMEOUT', '5'))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv('GOTENBERG_MAX_RETRIES', '2'))
+        self.backoff = backoff if backoff is not None else float(os.getenv('GOTENBERG_BACKOFF', '0.2'))
+        self.breaker_threshold = breaker_threshold or int(os.getenv('GOTENBERG_BREAKER_THRESHOLD', '5'))
+        self.breaker_reset = breaker_reset or float(os.getenv('GOTENBERG_BREAKER_RESET', '30'))
+        # Tempo máximo aguardando uma vaga antes de recusar a conversão
+        self.acquire_timeout = acquire_timeout or float(os.getenv('GOTENBERG_ACQUIRE_TIMEOUT', '10'))
+        # Vagas que as conversões em segundo plano podem ocupar (padrão: metade)
+        self.background_concurrency = min(self.max_concurrency, background_concurrency or int(
+            os.getenv('GOTENBERG_BACKGROUND_CONCURRENCY', '0')) or max(1, self.max_concurrency // 2))
+        self.chunk_size = chunk_size
+
+        self._lock = threading.Lock()
+        self._vagas = threading.Condition(self._lock)
+        self._local = threading.local()
+        self._session = None
+        self._session_pid = None
+        self._state = FECHADO
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._in_flight = 0
+        self._background_in_flight = 0
+        self._waiting = 0
+        self._counters = {'requests': 0, 'retries': 0, 'failures': 0, 'rejected': 0}
+
+    def _get_session(self):
+        # Sessão recriada após fork (conexões não podem ser compartilhadas entre processos)
+        if self._session is None or self._session_pid != os.getpid():
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_concurrency)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            self._session = session
+            self._session_pid = os.getpid()
+        return self._session
+
+    # Circuit breaker
+
+    def _allow_request(self):
+        """Libera a chamada; True se ela é a requisição de teste do circuito meio aberto"""
+        with self._lock:
+            if self._state == FECHADO:
+                return False
+            if self._state == ABERTO and time.monotonic() - self._opened_at >= self.breaker_reset:
+                self._state = MEIO_ABERTO
+            if self._state == MEIO_ABERTO and not self._trial_in_flight:
+                # Uma única requisição de teste decide se o circuito fecha
+                self._trial_in_flight = True
+                return True
+            self._counters['rejected'] += 1
+        raise GotenbergUnavailable('Gotenberg indisponível (circuito aberto)')
+
+    def _record_success(self):
+        with self._lock:
+            self._state = FECHADO
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def _record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._counters['failures'] += 1
+            self._trial_in_flight = False
+            if self._state == MEIO_ABERTO or self._failures >= self.breaker_threshold:
+                self._state = ABERTO
+                self._opened_at = time.monotonic()
+
+    def _sleep_backoff(self, attempt):
+        # Full jitter: espera aleatória entre 0 e backoff * 2^tentativa
+        time.sleep(random.uniform(0, self.backoff * (2 ** attempt)))
+
+    # Conversão
+
+    @staticmethod
+    def _multipart(files):
+        """Corpo multipart/form-data com uma parte "files" por (nome, tipo, bytes)"""
+        boundary = f'----evidens{uuid.uuid4().hex}'
+        parts = []
+        for filename, content_type, data in files:
+            parts.extend((
+                f'--{boundary}\r\n'.encode(),
+                f'Content-Disposition: form-data; name="files"; filename="{filename}"\r\n'.encode(),
+                f'Content-Type: {content_type}\r\n\r\n'.encode(),
+                data,
+                b'\r\n',
+            ))
+        parts.append(f'--{boundary}--\r\n'.encode())
+        return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+    @contextmanager
+    def segundo_plano(self):
+        """Marca as conversões feitas pela thread atual como de segundo plano (menor prioridade)"""
+        anterior = getattr(self._local, 'segundo_plano', False)
+        self._local.segundo_plano = True
+        try:
+            yield
+        finally:
+            self._local.segundo_plano = anterior
+
+    def _acquire(self, segundo_plano):
+        """Ocupa uma vaga de conversão; False se a requisição interativa esgotou acquire_timeout"""
+        with self._vagas:
+            if segundo_plano:
+                # Trabalho enfileirado espera sem prazo, cedendo a vez às requisições interativas
+                self._vagas.wait_for(lambda: self._in_flight < self.max_concurrency and not self._waiting
+                                     and self._background_in_flight < self.background_concurrency)
+                self._background_in_flight += 1
+            else:
+                self._waiting += 1
+                try:
+                    if not self._vagas.wait_for(lambda: self._in_flight < self.max_concurrency,
+                                                timeout=self.acquire_timeout):
+                        return False
+                finally:
+                    self._waiting -= 1
+            self._in_flight += 1
+            return True
+
+    def _release(self, segundo_plano=False):
+        with self._vagas:
+            self._in_flight -= 1
+            if segundo_plano:
+                self._background_in_flight -= 1
+            self._vagas.notify_all()
+
+    def stream_html(self, html_content, filename='index.html'):
+        """
+        Converte HTML em PDF e retorna o corpo em streaming
+
+        Returns:
+            GotenbergStream: iterável de blocos do PDF (feche após o uso)
+
+        Raises:
+            GotenbergUnavailable: circuito aberto ou sem vaga para nova conversão
+            GotenbergError: falha HTTP/conexão após as novas tentativas
+        """
+        files = [(filename, 'text/html', html_content.encode('utf-8'))]
+        return self._stream('/forms/chromium/convert/html', files)
+
+    def _stream(self, route, files):
+        """Envia o formulário ao Gotenberg com retries e circuit breaker"""
+        teste = self._allow_request()
+        try:
+            return self._stream_com_vaga(route, files)
+        finally:
+            if teste:
+                # Qualquer desfecho libera a vaga de teste, inclusive exceções não tratadas
+                # (InvalidURL, ChunkedEncodingError...); sem isso o circuito recusaria tudo
+                with self._lock:
+                    self._trial_in_flight = False
+
+    def _stream_com_vaga(self, route, files):
+        """Ocupa uma vaga de conversão e tenta até obter resposta, erro definitivo ou circuito aberto"""
+        segundo_plano = getattr(self._local, 'segundo_plano', False)
+        if not self._acquire(segundo_plano):
+            with self._lock:
+                self._counters['rejected'] += 1
+            raise GotenbergUnavailable('Gotenberg sobrecarregado: limite de conversões simultâneas atingido')
+        release = partial(self._release, segundo_plano)
+
+        url = f"{self.base_url}{route}"
+        body, content_type = self._multipart(files)
+        attempt = 0
+        try:
+            while True:
+                with self._lock:
+                    self._counters['requests'] += 1
+                inicio = time.perf_counter()
+                response = None
+                try:
+                    response = self._get_session().post(
+                        url,
+                        data=body,
+                        headers={'Content-Type': content_type},
+                        timeout=(self.connect_timeout, self.timeout),
+                        stream=True
+                    )
+                except requests.exceptions.ConnectTimeout as e:
+                    error, retryable = f"Erro de conexão ao gerar PDF via Gotenberg: {e}", True
+                    resultado = 'conexao'
+                except requests.exceptions.Timeout as e:
+                    # Conversão lenta: repetir só aumentaria a carga no Gotenberg
+                    error, retryable = f"Tempo esgotado ao gerar PDF via Gotenberg: {e}", False
+                    resultado = 'timeout'
+                except requests.exceptions.ConnectionError as e:
+                    error, retryable = f"Erro de conexão ao gerar PDF via Gotenberg: {e}", True
+                    resultado = 'conexao'
+                # Latência até o cabeçalho da resposta, por tentativa (outcome: status HTTP ou tipo de erro)
+                metrics.observe('gotenberg_request_duration_seconds', time.perf_counter() - inicio,
+                                route=route, outcome=resultado if response is None else response.status_code)
+                if response is not None:
+                    if response.status_code < 400:
+                        self._record_success()
+                        return GotenbergStream(response, release, self.chunk_size)
+                    error = f"Erro HTTP ao gerar PDF via Gotenberg: {response.status_code} - {response.reason}"
+                    retryable = response.status_code >= 500
+                    response.close()
+                    if not retryable:
+                        # Erro 4xx: requisição inválida, Gotenberg está no ar
+                        self._record_success()
+                        raise GotenbergError(error)
+
+                self._record_failure()
+                if not retryable or attempt >= self.max_retries or self._state == ABERTO:
+                    raise GotenbergError(error)
+                with self._lock:
+                    self._counters['retries'] += 1
+                self._sleep_backoff(attempt)
+                attempt += 1
+        except BaseException:
+            release()
+            raise
+
+    def convert_html(self, html_content, filename='index.html'):
+        """Converte HTML em PDF e retorna os bytes completos"""
+        with self.stream_html(html_content, filename) as stream:
+            return stream.read()
+
+    def merge_pdfs(self, pdfs):
+        """
+        Junta vários PDFs em um único documento, na ordem recebida
+
+        Args:
+            pdfs: lista de bytes de PDFs
+
+        Returns:
+            bytes: PDF mesclado
+        """
+        # O Gotenberg mescla os arquivos em ordem alfabética do nome
+        files = [(f'{i:05d}.pdf', 'application/pdf', data) for i, data in enumerate(pdfs)]
+        with self._stream('/forms/pdfengines/merge', files) as stream:
+            return stream.read()
+
+    def stats(self):
+        """Contadores, estado do circuito e conversões em andamento"""
+        with self._lock:
+            stats = dict(self._counters)
+            stats.update({
+                'state': self._state,
+                'in_flight': self._in_flight,
+                'background_in_flight': self._background_in_flight,
+                'waiting': self._waiting,
+                'max_concurrency': self.max_concurrency,
+                'background_concurrency': self.background_concurrency,
+                'consecutive_failures': self._failures
+            })
+        return stats
+
+
+# Instância global compartilhada pelos serviços de PDF
+gotenberg_client = GotenbergClient()
@@ -0,0 +1,452 @@
+"""
+Métricas operacionais no formato de exposição do Prometheus (GET /metrics)
+
+Registro em processo com contadores, gauges e histogramas, mais coletores que
+leem os contadores já mantidos pelos componentes (cache de respostas, cache de
+PDF, config_registry, cliente do Gotenberg, fila de jobs de PDF e histogramas
+de etapas do stage_timer).
+
+Modo multiprocesso (gunicorn com vários workers): com METRICS_MULTIPROC_DIR
+(ou PROMETHEUS_MULTIPROC_DIR) definido, cada worker grava periodicamente seu
+snapshot em <dir>/metrics_<pid>.json e o worker que atende /metrics soma os
+arquivos de todos. Contadores e histogramas de workers encerrados continuam
+somados (totais monotônicos); gauges só contam processos vivos. O diretório
+deve ser esvaziado na inicialização do servidor, como no prometheus_client.
+"""
+import atexit
+import json
+import os
+import threading
+import time
+from flask import g, request
+from src.utils.stage_timer import BUCKETS_MS, Histograma, stage_timings
+from src.utils.structured_log import get_logger
+
+log = get_logger(__name__)
+
+# Buckets de latência em segundos (padrão do Prometheus)
+BUCKETS_S = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+PREFIXO = 'evidens_'
+
+MULTIPROC_DIR = os.getenv('METRICS_MULTIPROC_DIR') or os.getenv('PROMETHEUS_MULTIPROC_DIR')
+FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', '5'))
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+CONTADOR = 'counter'
+GAUGE = 'gauge'
+HISTOGRAMA = 'histogram'
+
+# Descrição das métricas: nome -> (tipo, ajuda)
+DESCRICOES = {
+    'http_requests_total': (CONTADOR, 'Requisições HTTP atendidas'),
+    'http_request_duration_seconds': (HISTOGRAMA, 'Latência das requisições HTTP (até o envio do cabeçalho)'),
+    'http_requests_in_flight': (GAUGE, 'Requisições HTTP em andamento'),
+    'stage_duration_seconds': (HISTOGRAMA, 'Duração das etapas instrumentadas (stage_timer)'),
+    'gotenberg_request_duration_seconds': (HISTOGRAMA, 'Latência de cada tentativa de chamada ao Gotenberg'),
+    'gotenberg_requests_total': (CONTADOR, 'Tentativas de chamada ao Gotenberg'),
+    'gotenberg_retries_total': (CONTADOR, 'Novas tentativas após falha do Gotenberg'),
+    'gotenberg_failures_total': (CONTADOR, 'Falhas de chamada ao Gotenberg (5xx, conexão, timeout)'),
+    'gotenberg_rejected_total': (CONTADOR, 'Conversões recusadas (circuito aberto ou limite de concorrência)'),
+    'gotenberg_in_flight': (GAUGE, 'Conversões em andamento no Gotenberg'),
+    'gotenberg_background_in_flight': (GAUGE, 'Conversões em segundo plano (lotes, jobs) em andamento'),
+    'gotenberg_circuit_open': (GAUGE, 'Workers com o circuit breaker do Gotenberg aberto'),
+    'response_cache_hits_total': (CONTADOR, 'Acertos do cache de respostas do check-up'),
+    'response_cache_misses_total': (CONTADOR, 'Falhas do cache de respostas do check-up'),
+    'response_cache_evictions_total': (CONTADOR, 'Remoções por tamanho no cache de respostas'),
+    'response_cache_expirations_total': (CONTADOR, 'Entradas expiradas no cache de respostas'),
+    'response_cache_invalidations_total': (CONTADOR, 'Invalidações do cache de respostas por mudança de configuração'),
+    'response_cache_entries': (GAUGE, 'Entradas no cache de respostas'),
+    'response_cache_hit_ratio': (GAUGE, 'Taxa de acerto do cache de respostas'),
+    'config_cache_hits_total': (CONTADOR, 'Leituras de configuração servidas do snapshot'),
+    'config_cache_misses_total': (CONTADOR, 'Primeiras leituras de arquivos de configuração'),
+    'config_cache_reloads_total': (CONTADOR, 'Recargas de arquivos de configuração alterados'),
+    'config_cache_errors_total': (CONTADOR, 'Erros ao carregar arquivos de configuração'),
+    'config_cache_hit_ratio': (GAUGE, 'Taxa de acerto do cache de configurações'),
+    'pdf_cache_memory_hits_total': (CONTADOR, 'PDFs servidos do cache em memória'),
+    'pdf_cache_disk_hits_total': (CONTADOR, 'PDFs servidos do cache em disco'),
+    'pdf_cache_misses_total': (CONTADOR, 'PDFs fora do cache'),
+    'pdf_cache_stores_total': (CONTADOR, 'PDFs gravados no cache'),
+    'pdf_cache_evictions_total': (CONTADOR, 'PDFs removidos do cache'),
+    'pdf_cache_memory_bytes': (GAUGE, 'Bytes do cache de PDF em memória'),
+    'pdf_cache_disk_bytes': (GAUGE, 'Bytes do cache de PDF em disco'),
+    'pdf_cache_hit_ratio': (GAUGE, 'Taxa de acerto do cache de PDF'),
+    'pdf_jobs_submitted_total': (CONTADOR, 'Jobs de PDF enfileirados'),
+    'pdf_jobs_completed_total': (CONTADOR, 'Jobs de PDF concluídos'),
+    'pdf_jobs_failed_total': (CONTADOR, 'Jobs de PDF com erro'),
+    'pdf_jobs_rejected_total': (CONTADOR, 'Jobs de PDF recusados (fila cheia)'),
+    'pdf_jobs_expired_total': (CONTADOR, 'Resultados de jobs de PDF expirados'),
+    'pdf_jobs_pending': (GAUGE, 'Jobs de PDF aguardando na fila'),
+    'pdf_jobs_running': (GAUGE, 'Jobs de PDF em processamento'),
+    'pdf_bytes_served_total': (CONTADOR, 'Bytes de PDF/ZIP enviados aos clientes'),
+    'db_commit_duration_seconds': (HISTOGRAMA, 'Latência dos commits no banco'),
+    'checkup_writer_enqueued_total': (CONTADOR, 'Check-ups enfileirados para gravação em lote'),
+    'checkup_writer_written_total': (CONTADOR, 'Check-ups gravados no banco'),
+    'checkup_writer_batches_total': (CONTADOR, 'Transações de gravação em lote'),
+    'checkup_writer_spilled_total': (CONTADOR, 'Check-ups guardados em disco (fila cheia ou banco indisponível)'),
+    'checkup_writer_replayed_total': (CONTADOR, 'Check-ups regravados a partir do disco'),
+    'checkup_writer_dropped_total': (CONTADOR, 'Check-ups descartados (fila cheia com política drop ou disco indisponível)'),
+    'checkup_writer_discarded_total': (CONTADOR, 'Check-ups rejeitados pelo banco'),
+    'checkup_writer_failures_total': (CONTADOR, 'Transações de gravação com erro'),
+    'checkup_writer_queued': (GAUGE, 'Check-ups aguardando gravação'),
+}
+
+# Taxas de acerto derivadas dos contadores somados: gauge -> (acertos, demais consultas)
+TAXAS = {
+    'response_cache_hit_ratio': (('response_cache_hits_total',), ('response_cache_misses_total',)),
+    'config_cache_hit_ratio': (('config_cache_hits_total',),
+                               ('config_cache_misses_total', 'config_cache_reloads_total')),
+    'pdf_cache_hit_ratio': (('pdf_cache_memory_hits_total', 'pdf_cache_disk_hits_total'),
+                            ('pdf_cache_misses_total',)),
+}
+
+# Respostas cujo corpo conta como documento servido
+MIMETYPES_DOCUMENTO = ('application/pdf', 'application/zip')
+
+
+def _labels(labels) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class MetricsRegistry:
+    """Contadores, gauges e histogramas do processo"""
+
+    def __init__(self):
+        self._contadores = {}
+        self._gauges = {}
+        self._histogramas = {}
+        self._lock = threading.Lock()
+
+    def inc(self, nome: str, valor: float = 1, **labels):
+        chave = (nome, _labels(labels))
+        with self._lock:
+            self._contadores[chave] = self._contadores.get(chave, 0) + valor
+
+    def gauge_add(self, nome: str, valor: float, **labels):
+        chave = (nome, _labels(labels))
+        with self._lock:
+            self._gauges[chave] = self._gauges.get(chave, 0) + valor
+
+    def observe(self, nome: str, segundos: float, **labels):
+        chave = (nome, _labels(labels))
+        with self._lock:
+            histograma = self._histogramas.get(chave)
+            if histograma is None:
+                histograma = self._histogramas[chave] = Histograma(BUCKETS_S)
+            histograma.observar(segundos)
+
+    def clear(self):
+        with self._lock:
+            self._contadores.clear()
+            self._gauges.clear()
+            self._histogramas.clear()
+
+    def coletar(self) -> dict:
+        """Snapshot serializável do processo (registro + contadores dos componentes)"""
+        with self._lock:
+            amostras = {
+                CONTADOR: [[n, list(l), v] for (n, l), v in self._contadores.items()],
+                GAUGE: [[n, list(l), v] for (n, l), v in self._gauges.items()],
+                HISTOGRAMA: [[n, list(l), list(h.limites), list(h.contagens), h.soma, h.total]
+                             for (n, l), h in self._histogramas.items()],
+            }
+        for coletor in _COLETORES:
+            try:
+                coletor(amostras)
+            except Exception as e:
+                log.warning('metricas_coleta_falhou', coletor=coletor.__name__, erro=str(e))
+        amostras['pid'] = os.getpid()
+        return amostras
+
+    def exposicao(self) -> str:
+        """Texto no formato de exposição do Prometheus (todos os workers, se multiprocesso)"""
+        snapshots = [self.coletar()]
+        if MULTIPROC_DIR:
+            gravar_snapshot(snapshots[0])
+            snapshots += ler_snapshots(excluir_pid=os.getpid())
+        return renderizar(agregar(snapshots))
+
+
+def _contadores(amostras, prefixo, stats, campos):
+    for campo in campos:
+        amostras[CONTADOR].append([f'{prefixo}_{campo}_total', [], stats.get(campo) or 0])
+
+
+def _coletar_response_cache(amostras):
+    from src.utils.response_cache import checkup_cache
+    stats = checkup_cache.stats()
+    _contadores(amostras, 'response_cache', stats,
+                ('hits', 'misses', 'evictions', 'expirations', 'invalidations'))
+    amostras[GAUGE].append(['response_cache_entries', [], stats['entries']])
+
+
+def _coletar_config_registry(amostras):
+    from src.utils.config_registry import config_registry
+    _contadores(amostras, 'config_cache', config_registry.stats(), ('hits', 'misses', 'reloads', 'errors'))
+
+
+def _coletar_pdf_cache(amostras):
+    from src.utils.pdf_cache import pdf_cache
+    stats = pdf_cache.stats()
+    _contadores(amostras, 'pdf_cache', stats, ('memory_hits', 'disk_hits', 'misses', 'stores', 'evictions'))
+    amostras[GAUGE].append(['pdf_cache_memory_bytes', [], stats['memory_bytes'] or 0])
+    # Tamanho em disco só é conhecido após a primeira varredura do diretório
+    amostras[GAUGE].append(['pdf_cache_disk_bytes', [], stats['disk_bytes'] or 0])
+
+
+def _coletar_gotenberg(amostras):
+    from src.utils.gotenberg_client import gotenberg_client, ABERTO
+    stats = gotenberg_client.stats()
+    _contadores(amostras, 'gotenberg', stats, ('requests', 'retries', 'failures', 'rejected'))
+    amostras[GAUGE].append(['gotenberg_in_flight', [], stats['in_flight']])
+    amostras[GAUGE].append(['gotenberg_background_in_flight', [], stats['background_in_flight']])
+    amostras[GAUGE].append(['gotenberg_circuit_open', [], 1 if stats['state'] == ABERTO else 0])
+
+
+def _coletar_pdf_jobs(amostras):
+    from src.utils.pdf_jobs import pdf_jobs
+    stats = pdf_jobs.stats()
+    _contadores(amostras, 'pdf_jobs', stats, ('submitted', 'completed', 'failed', 'rejected', 'expired'))
+    amostras[GAUGE].append(['pdf_jobs_pending', [], stats['pending']])
+    amostras[GAUGE].append(['pdf_jobs_running', [], stats['running']])
+
+
+def _coletar_checkup_writer(amostras):
+    try:
+        from src.utils.checkup_writer import checkup_writer
+    except ImportError:
+        return
+    stats = checkup_writer.stats()
+    _contadores(amostras, 'checkup_writer', stats,
+                ('enqueued', 'written', 'batches', 'spilled', 'replayed', 'dropped', 'discarded', 'failures'))
+    amostras[GAUGE].append(['checkup_writer_queued', [], stats['queued']])
+
+
+def _coletar_etapas(amostras):
+    limites = [ms / 1000 for ms in BUCKETS_MS]
+    for (rota, nome), (contagens, soma, total) in stage_timings.snapshot().items():
+        amostras[HISTOGRAMA].append([
+            'stage_duration_seconds', [['route', rota], ['stage', nome]],
+            limites, contagens, soma / 1000, total
+        ])
+
+
+_COLETORES = (_coletar_response_cache, _coletar_config_registry, _coletar_pdf_cache,
+              _coletar_gotenberg, _coletar_pdf_jobs, _coletar_checkup_writer, _coletar_etapas)
+
+
+def _processo_vivo(pid) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        # Sem permissão para sinalizar: o processo existe
+        return True
+    return True
+
+
+def agregar(snapshots) -> dict:
+    """Soma os snapshots (gauges apenas de processos vivos)"""
+    contadores, gauges, histogramas = {}, {}, {}
+    pid_atual = os.getpid()
+    for snapshot in snapshots:
+        for nome, labels, valor in snapshot.get(CONTADOR, []):
+            chave = (nome, tuple(map(tuple, labels)))
+            contadores[chave] = contadores.get(chave, 0) + valor
+        pid = snapshot.get('pid')
+        if pid == pid_atual or pid is None or _processo_vivo(pid):
+            for nome, labels, valor in snapshot.get(GAUGE, []):
+                chave = (nome, tuple(map(tuple, labels)))
+                gauges[chave] = gauges.get(chave, 0) + valor
+        for nome, labels, limites, contagens, soma, total in snapshot.get(HISTOGRAMA, []):
+            chave = (nome, tuple(map(tuple, labels)), tuple(limites))
+            atual = histogramas.get(chave)
+            if atual is None:
+                histogramas[chave] = [list(contagens), soma, total]
+            else:
+                atual[0] = [a + b for a, b in zip(atual[0], contagens)]
+                atual[1] += soma
+                atual[2] += total
+
+    # Taxas de acerto recalculadas a partir dos contadores somados
+    for taxa, (acertos, outros) in TAXAS.items():
+        soma_acertos = sum(contadores.get((n, ()), 0) for n in acertos)
+        consultas = soma_acertos + sum(contadores.get((n, ()), 0) for n in outros)
+        gauges[(taxa, ())] = round(soma_acertos / consultas, 4) if consultas else 0.0
+    return {CONTADOR: contadores, GAUGE: gauges, HISTOGRAMA: histogramas}
+
+
+def _formatar_labels(labels, extra=()) -> str:
+    pares = list(labels) + list(extra)
+    if not pares:
+        return ''
+    texto = ','.join(
+        '{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for k, v in pares
+    )
+    return '{' + texto + '}'
+
+
+def _numero(valor) -> str:
+    if isinstance(valor, float):
+        return repr(valor) if valor == valor and valor not in (float('inf'), float('-inf')) else str(valor)
+    return str(valor)
+
+
+def renderizar(agregado) -> str:
+    """Formato de exposição em texto (version=0.0.4)"""
+    por_nome = {}
+    for tipo in (CONTADOR, GAUGE, HISTOGRAMA):
+        for chave, valor in agregado[tipo].items():
+            por_nome.setdefault(chave[0], []).append((chave, valor))
+
+    linhas = []
+    for nome in sorted(por_nome):
+        tipo, ajuda = DESCRICOES.get(nome, (HISTOGRAMA if len(por_nome[nome][0][0]) == 3 else GAUGE, nome))
+        completo = PREFIXO + nome
+        linhas.append(f'# HELP {completo} {ajuda}')
+        linhas.append(f'# TYPE {completo} {tipo}')
+        for chave, valor in sorted(por_nome[nome], key=lambda item: item[0][1]):
+            labels = chave[1]
+            if tipo != HISTOGRAMA:
+                linhas.append(f'{completo}{_formatar_labels(labels)} {_numero(valor)}')
+                continue
+            limites = chave[2]
+            contagens, soma, total = valor
+            acumulado = 0
+            for limite, contagem in zip(limites, contagens):
+                acumulado += contagem
+                linhas.append(f'{completo}_bucket{_formatar_labels(labels, [("le", _numero(float(limite)))])} {acumulado}')
+            linhas.append(f'{completo}_bucket{_formatar_labels(labels, [("le", "+Inf")])} {total}')
+            linhas.append(f'{completo}_sum{_formatar_labels(labels)} {_numero(float(soma))}')
+            linhas.append(f'{completo}_count{_formatar_labels(labels)} {total}')
+    return '\n'.join(linhas) + '\n'
+
+
+def _arquivo(pid) -> str:
+    return os.path.join(MULTIPROC_DIR, f'metrics_{pid}.json')
+
+
+def gravar_snapshot(snapshot=None):
+    """Grava o snapshot do processo de forma atômica (modo multiprocesso)"""
+    if not MULTIPROC_DIR:
+        return
+    snapshot = snapshot or metrics.coletar()
+    try:
+        os.makedirs(MULTIPROC_DIR, exist_ok=True)
+        destino = _arquivo(snapshot['pid'])
+        tmp_path = f'{destino}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(snapshot, f)
+        os.replace(tmp_path, destino)
+    except OSError as e:
+        log.warning('metricas_snapshot_falhou', erro=str(e))
+
+
+def ler_snapshots(excluir_pid=None) -> list:
+    """Snapshots gravados pelos demais workers"""
+    snapshots = []
+    try:
+        nomes = os.listdir(MULTIPROC_DIR)
+    except OSError:
+        return snapshots
+    for nome in nomes:
+        if not (nome.startswith('metrics_') and nome.endswith('.json')):
+            continue
+        if nome == f'metrics_{excluir_pid}.json':
+            continue
+        try:
+            with open(os.path.join(MULTIPROC_DIR, nome)) as f:
+                snapshots.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return snapshots
+
+
+def _gravar_periodicamente():
+    while True:
+        time.sleep(FLUSH_INTERVAL)
+        gravar_snapshot()
+
+
+_flusher_lock = threading.Lock()
+_flusher_pid = None
+
+
+def _iniciar_flusher():
+    """Thread de gravação do snapshot (uma por processo, recriada após fork)"""
+    global _flusher_pid
+    if not MULTIPROC_DIR or _flusher_pid == os.getpid():
+        return
+    with _flusher_lock:
+        if _flusher_pid == os.getpid():
+            return
+        _flusher_pid = os.getpid()
+        threading.Thread(target=_gravar_periodicamente, name='metrics-flusher', daemon=True).start()
+        atexit.register(gravar_snapshot)
+
+
+def _rota_atual() -> str:
+    regra = request.url_rule
+    # Rotas inexistentes agrupadas para não multiplicar séries
+    return regra.rule if regra is not None else 'unmatched'
+
+
+class _CorpoContado:
+    """Iterável que soma os bytes enviados (corpo de tamanho desconhecido)"""
+
+    def __init__(self, corpo, mimetype):
+        self._corpo = corpo
+        self._mimetype = mimetype
+
+    def __iter__(self):
+        enviados = 0
+        try:
+            for chunk in self._corpo:
+                enviados += len(chunk)
+                yield chunk
+        finally:
+            metrics.inc('pdf_bytes_served_total', enviados, mimetype=self._mimetype)
+
+    def close(self):
+        close = getattr(self._corpo, 'close', None)
+        if close is not None:
+            close()
+
+
+def register_metrics(app):
+    """Latência, contagem e requisições em andamento por rota"""
+
+    @app.before_request
+    def _iniciar_metricas():
+        _iniciar_flusher()
+        g._metricas = (time.perf_counter(), _rota_atual())
+        metrics.gauge_add('http_requests_in_flight', 1, route=g._metricas[1])
+
+    @app.after_request
+    def _registrar_resposta(response):
+        g._status_metricas = response.status_code
+        if response.mimetype in MIMETYPES_DOCUMENTO and response.status_code == 200:
+            if response.content_length is not None:
+                metrics.inc('pdf_bytes_served_total', response.content_length, mimetype=response.mimetype)
+            elif not response.is_sequence:
+                response.response = _CorpoContado(response.response, response.mimetype)
+        return response
+
+    @app.teardown_request
+    def _finalizar_metricas(exc):
+        inicio_rota = g.pop('_metricas', None)
+        if inicio_rota is None:
+            return
+        inicio, rota = inicio_rota
+        status = g.pop('_status_metricas', 500)
+        metrics.gauge_add('http_requests_in_flight', -1, route=rota)
+        metrics.inc('http_requests_total', route=rota, method=request.method, status=status)
+        metrics.observe('http_request_duration_seconds', time.perf_counter() - inicio,
+                        route=rota, method=request.method)
+
+
+# Instância global do processo
+metrics = MetricsRegistry()
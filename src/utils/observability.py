@@ -0,0 +1,21 @@
+"""
+Instrumentação comum aos pontos de entrada da aplicação
+
+app.py, api/index.py (Vercel), run_server.py e src/main.py montam cada um o
+seu Flask; todos chamam register_observability(app) para responder com o
+cabeçalho Server-Timing e servir GET /metrics no formato do Prometheus.
+"""
+from src.utils.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, metrics, register_metrics
+from src.utils.stage_timer import register_server_timing
+
+
+def get_metrics():
+    """Métricas operacionais no formato de exposição do Prometheus"""
+    return metrics.exposicao(), 200, {'Content-Type': METRICS_CONTENT_TYPE}
+
+
+def register_observability(app):
+    """Registra Server-Timing, métricas por requisição e a rota /metrics na aplicação"""
+    register_server_timing(app)
+    register_metrics(app)
+    app.add_url_rule('/metrics', 'get_metrics', get_metrics)
@@ -0,0 +1,384 @@
+"""
+Entrada do paciente normalizada
+
+O JSON da requisição é convertido uma única vez em um PatientInput imutável,
+com os campos já tipados (números, listas de comorbidades e medicações,
+tabagismo no vocabulário canônico) e as condições derivadas (IMC, hipertensão,
+diabetes, HIV) calculadas. As rotas consomem esse objeto em vez de reler o
+dicionário da requisição, e as flags do motor de regras, o contexto e os dados
+do PREVENT saem dele prontos, formando uma chave compacta e hashable para o
+cache de respostas.
+"""
+from typing import FrozenSet, NamedTuple, Optional, Tuple
+from src.utils.term_extractor import term_extractor, MEDICACAO
+
+# Vocabulário canônico de tabagismo
+FUMANTE_ATUAL = 'fumante_atual'
+EX_FUMANTE = 'ex_fumante'
+NUNCA_FUMOU = 'nunca_fumou'
+
+# Valores aceitos dos formulários (index.html, intelligent-tools.html e /api/checkup)
+_TABAGISMO = {
+    'fumante_atual': FUMANTE_ATUAL,
+    'fumante': FUMANTE_ATUAL,
+    'atual': FUMANTE_ATUAL,
+    'ex_fumante': EX_FUMANTE,
+    'ex': EX_FUMANTE,
+    'nunca_fumou': NUNCA_FUMOU,
+    'nunca': NUNCA_FUMOU,
+}
+
+
+def normalizar_tabagismo(status) -> str:
+    """Status de tabagismo no vocabulário canônico (desconhecido -> nunca_fumou)"""
+    if not isinstance(status, str):
+        return NUNCA_FUMOU
+    return _TABAGISMO.get(status.replace('-', '_').lower().strip(), NUNCA_FUMOU)
+
+
+def parse_smoking_status(tabagismo, data=None):
+    """Normaliza tabagismo vindo como string, dict ou campos achatados para (status, macos_ano)."""
+    status = NUNCA_FUMOU
+    macos = 0
+
+    try:
+        # Priorizar dict tabagismo se disponível
+        if isinstance(tabagismo, dict):
+            status = tabagismo.get('status') or tabagismo.get('estado') or NUNCA_FUMOU
+            macos_value = tabagismo.get('macos_ano') or tabagismo.get('pack_years') or 0
+            try:
+                macos = int(macos_value) if macos_value else 0
+            except (ValueError, TypeError):
+                macos = 0
+        elif isinstance(tabagismo, str):
+            status = tabagismo
+
+        # Verificar campos achatados no payload principal se data fornecido
+        if data:
+            flat_status = data.get('tabagismo_status')
+            flat_macos = data.get('tabagismo_macos_ano')
+
+            if flat_status:
+                status = flat_status
+            if flat_macos:
+                try:
+                    macos = int(flat_macos) if flat_macos else 0
+                except (ValueError, TypeError):
+                    macos = 0
+
+    except Exception:
+        # Em caso de qualquer erro, usar valores padrão seguros
+        status = NUNCA_FUMOU
+        macos = 0
+
+    return normalizar_tabagismo(status), macos
+
+
+def age_sex_flags(has_hypertension=False, has_resistant_hypertension=False, is_pregnant=False,
+                  tabagismo=NUNCA_FUMOU, macos_ano=0, has_dpoc=False):
+    """Converte as condições clínicas da etapa idade/sexo em flags do motor de regras"""
+    flags = set()
+    if has_hypertension:
+        flags.add('hipertensao')
+    if has_resistant_hypertension:
+        flags.add('hipertensao_resistente')
+    if is_pregnant:
+        flags.add('gestante')
+    if has_dpoc:
+        flags.add('dpoc')
+    # AAA: DPOC OU fumante/ex-fumante com ≥10 maços-ano
+    if has_dpoc or (normalizar_tabagismo(tabagismo) in (FUMANTE_ATUAL, EX_FUMANTE) and macos_ano >= 10):
+        flags.add('elegivel_aaa')
+    return flags
+
+
+def _numero(valor, tipo=float, padrao=None, estrito=True):
+    """Converte valores preenchidos; vazio -> padrão (inválido -> erro ou padrão)"""
+    if not valor:
+        return padrao
+    try:
+        return tipo(valor)
+    except (ValueError, TypeError):
+        if estrito:
+            raise
+        return padrao
+
+
+def _lista(valor, dict_ativos=False) -> Tuple:
+    """Lista de opções marcadas (string separada por vírgulas, lista ou dict {opção: bool})"""
+    if isinstance(valor, str):
+        return tuple(v.strip() for v in valor.split(',') if v.strip())
+    if dict_ativos and isinstance(valor, dict):
+        return tuple(k for k, v in valor.items() if v)
+    if isinstance(valor, (list, tuple)):
+        return tuple(valor)
+    return ()
+
+
+def _sim(valor) -> bool:
+    """Checkbox/radio marcado (True, 'true', 'sim', 'on', '1')"""
+    if isinstance(valor, str):
+        return valor.strip().lower() in ('true', 'sim', 'on', '1')
+    return bool(valor)
+
+
+class PatientInput(NamedTuple):
+    """Dados do paciente já tipados, com as condições clínicas derivadas"""
+
+    nome: Optional[str]
+    idade: int
+    sexo: str
+    gestante: bool
+    peso: Optional[float]
+    altura: Optional[float]
+    imc: Optional[float]
+    pas: float
+    pad: float
+    colesterol_total: float
+    hdl: float
+    creatinina: float
+    hba1c: Optional[float]
+    comorbidades: Tuple[str, ...]
+    medicacoes: Tuple[str, ...]
+    medicacoes_continuo: str
+    classes_medicacao: FrozenSet[str]
+    tabagismo: str
+    macos_ano: float
+    anos_parou_fumar: float
+    hipertenso: bool
+    hipertensao_resistente: bool
+    diabetico: bool
+    hiv: bool
+    flags: FrozenSet[str]
+    contexto: Tuple[Tuple[str, object], ...]
+
+    @classmethod
+    def from_request(cls, data, estrito=True):
+        """
+        Converte o JSON da requisição
+
+        Args:
+            data: corpo da requisição (formulário do check-up ou dados_paciente)
+            estrito: se True, números inválidos geram ValueError (resposta de erro);
+                se False, são ignorados (documentos com dados incompletos)
+        """
+        def numero(chave, tipo=float, padrao=None, *alternativas):
+            valor = data.get(chave)
+            for alternativa in alternativas:
+                valor = valor or data.get(alternativa)
+            return _numero(valor, tipo, padrao, estrito)
+
+        if estrito:
+            idade = int(data.get('idade', 0))
+        else:
+            idade = _numero(data.get('idade'), int, 0, estrito=False)
+        sexo = data.get('sexo', 'masculino')
+        peso = numero('peso')
+        altura = numero('altura')
+        imc = peso / ((altura / 100) ** 2) if peso and altura else None
+
+        # Aceitar tanto 'pas' quanto 'pressao_sistolica' (compatibilidade com formulário)
+        pas = numero('pas', float, 0, 'pressao_sistolica')
+        pad = numero('pad', float, 0, 'pressao_diastolica')
+        colesterol_total = numero('colesterol_total', float, 0, 'colesterol')
+        hdl = numero('hdl_colesterol', float, 0, 'hdl')
+        creatinina = numero('creatinina', float, 1.0)
+        hba1c = numero('hba1c')
+
+        comorbidades = _lista(data.get('comorbidades', []), dict_ativos=True)
+        medicacoes = _lista(data.get('medicacoes', []))
+        medicacoes_continuo = (data.get('medicacoes_continuo', '') or '').lower()
+        # Classes de medicamentos citadas no texto livre (anti-hipertensivo, ieca_bra, diuretico, metformina...)
+        classes_medicacao = term_extractor.classes(medicacoes_continuo, MEDICACAO)
+
+        tabagismo, macos_ano = parse_smoking_status(data.get('tabagismo'), data)
+        macos_ano = numero('macos_ano', float, macos_ano)
+        anos_parou_fumar = numero('anos_parou_fumar', float, 0)
+
+        # Hipertensão: PA (SBP >130 ou DBP >90), comorbidades ou medicações anti-hipertensivas
+        hipertensao_resistente = 'hipertensao_resistente' in comorbidades or 'has_resistente' in comorbidades
+        hipertenso = (
+            pas > 130 or pad > 90
+            or hipertensao_resistente
+            or any(c in comorbidades for c in ('hipertensao', 'hipertensão', 'cardiopatia'))
+            or 'anti_hipertensivos' in medicacoes
+            or 'anti_hipertensivo' in classes_medicacao
+        )
+
+        # Diabetes: comorbidade informada ou HbA1C > 6.5%
+        diabetico = ('diabetes_tipo_2' in comorbidades or 'diabetes' in comorbidades
+                     or bool(hba1c and hba1c > 6.5))
+        hiv = 'hiv' in comorbidades
+
+        campos = dict(
+            nome=data.get('nome'),
+            idade=idade,
+            sexo=sexo,
+            gestante=_sim(data.get('gestante', False)),
+            peso=peso,
+            altura=altura,
+            imc=imc,
+            pas=pas,
+            pad=pad,
+            colesterol_total=colesterol_total,
+            hdl=hdl,
+            creatinina=creatinina,
+            hba1c=hba1c,
+            comorbidades=comorbidades,
+            medicacoes=medicacoes,
+            medicacoes_continuo=medicacoes_continuo,
+            classes_medicacao=classes_medicacao,
+            tabagismo=tabagismo,
+            macos_ano=macos_ano,
+            anos_parou_fumar=anos_parou_fumar,
+            hipertenso=hipertenso,
+            hipertensao_resistente=hipertensao_resistente,
+            diabetico=diabetico,
+            hiv=hiv,
+        )
+        flags, contexto = _condicoes(data, campos, estrito)
+        return cls(flags=flags, contexto=contexto, **campos)
+
+    @property
+    def fumante(self) -> bool:
+        return self.tabagismo == FUMANTE_ATUAL
+
+    @property
+    def feminino(self) -> bool:
+        return self.sexo in ('feminino', 'F', 'f')
+
+    def prevent_data(self) -> dict:
+        """Dados clínicos no formato de calculate_prevent_risk"""
+        return {
+            'age': self.idade,
+            'sex': self.sexo,
+            'totalCholesterol': self.colesterol_total,
+            'hdlCholesterol': self.hdl,
+            'systolicBP': self.pas,
+            # HbA1C alterada não entra no PREVENT, só a comorbidade informada
+            'diabetes': 'diabetes_tipo_2' in self.comorbidades or 'diabetes' in self.comorbidades,
+            'smoking': self.fumante,
+            'weight': self.peso,
+            'height': self.altura,
+            'creatinine': self.creatinina
+        }
+
+    @property
+    def chave_clinica(self) -> tuple:
+        """Chave hashable com tudo que altera a resposta do check-up (sem nome)"""
+        prevent = self.prevent_data()
+        return (self.idade, self.sexo, tuple(sorted(self.flags)), self.contexto,
+                tuple(prevent[k] for k in sorted(prevent)))
+
+
+def _condicoes(data, campos, estrito):
+    """Flags do motor de regras e contexto (HIV) a partir dos campos normalizados"""
+    idade = campos['idade']
+    comorbidades = campos['comorbidades']
+    imc = campos['imc']
+    tabagismo = campos['tabagismo']
+    macos_ano = campos['macos_ano']
+    classes_medicacao = campos['classes_medicacao']
+    diabetico = campos['diabetico']
+
+    flags = age_sex_flags(has_hypertension=campos['hipertenso'],
+                          has_resistant_hypertension=campos['hipertensao_resistente'],
+                          is_pregnant=campos['gestante'],
+                          tabagismo=tabagismo,
+                          macos_ano=macos_ano,
+                          has_dpoc='dpoc' in comorbidades)
+
+    # Rastreamento de câncer de pulmão (LDCT) - USPSTF 2021
+    # Critérios: 50-80 anos, ≥20 maços-ano, fumante atual OU parou há <15 anos
+    if 50 <= idade <= 80 and macos_ano >= 20:
+        if tabagismo == FUMANTE_ATUAL or (tabagismo == EX_FUMANTE and campos['anos_parou_fumar'] < 15):
+            flags.add('elegivel_ldct')
+
+    # ========== DIABETES SCREENING E MANAGEMENT (ADA 2024) ==========
+    # Critério 1: Idade ≥35 anos (todos)
+    rastrear_diabetes = idade >= 35 and not diabetico
+
+    # Critério 2: IMC ≥25 + 1 fator de risco
+    if not diabetico and imc and imc >= 25:
+        historia_familiar = data.get('historia_familiar', {})
+        atividade_fisica = data.get('atividade_fisica', '')
+        fatores_risco = (
+            # Familiar de primeiro grau com diabetes
+            (isinstance(historia_familiar, dict) and bool(historia_familiar.get('diabetes')))
+            or campos['hipertenso']
+            # HDL < 35 mg/dL
+            or 0 < campos['hdl'] < 35
+            # Síndrome dos ovários policísticos (SOP)
+            or 'sop' in comorbidades or 'ovarios_policisticos' in comorbidades
+            # Inatividade física
+            or atividade_fisica in ('sedentario', 'sedentário')
+            # Outras condições de resistência insulínica
+            or 'obesidade' in comorbidades or imc >= 30
+        )
+        rastrear_diabetes = rastrear_diabetes or fatores_risco
+
+    # HbA1c de rastreamento (suprimida pelo motor se já houver HbA1c nas recomendações)
+    if rastrear_diabetes:
+        flags.add('rastrear_diabetes')
+
+    # EXAMES PARA DIABÉTICOS (ADA 2024 - Laboratory Evaluation)
+    if diabetico:
+        flags.add('diabetico')
+        # Vitamina B12 (se em uso de metformina)
+        if 'metformina' in classes_medicacao:
+            flags.add('metformina')
+        # Potássio sérico (se em uso de IECA/BRA/diuréticos)
+        if 'ieca_bra' in classes_medicacao or 'diuretico' in classes_medicacao:
+            flags.add('ieca_bra_diuretico')
+
+    # ========== HIV MANAGEMENT (EACS 2024, NIH 2024, MS Brasil 2024) ==========
+    contexto = ()
+    if campos['hiv']:
+        flags.add('hiv')
+
+        # Coletar dados HIV (aceitar tanto formato direto quanto hiv_data)
+        hiv_data = data.get('hiv_data', {})
+        if not isinstance(hiv_data, dict):
+            hiv_data = {}
+
+        def inteiro(chave):
+            valor = hiv_data.get(chave) or data.get(chave)
+            try:
+                return int(valor) if valor and str(valor).strip() else None
+            except (ValueError, TypeError):
+                return None
+
+        cd4 = inteiro('cd4')
+        carga_viral = inteiro('carga_viral')
+        em_tarv = (hiv_data.get('em_tarv') == 'sim') or (data.get('em_tarv') == 'sim')
+        supressao_viral = (hiv_data.get('supressao_viral') == 'sim') or (data.get('supressao_viral') == 'sim')
+
+        # CD4 Count - Frequência baseada em valor e TARV
+        frequencia_cd4 = 'A cada 6 meses'
+        if cd4 and cd4 < 350:
+            frequencia_cd4 = 'A cada 6 meses'
+        elif cd4 and 350 <= cd4 <= 500 and em_tarv:
+            frequencia_cd4 = 'Anualmente'
+        elif cd4 and cd4 > 500 and em_tarv:
+            # Se 2 exames consecutivos > 500, pode não solicitar
+            frequencia_cd4 = 'Não solicitar se >500 em 2 exames consecutivos com intervalo de 6 meses'
+
+        # Carga viral HIV
+        frequencia_cv = 'A cada 3-6 meses'
+        if em_tarv and supressao_viral:
+            frequencia_cv = 'A cada 6 meses'
+        elif em_tarv and not supressao_viral:
+            frequencia_cv = 'Após 8 semanas do início ou mudança de TARV'
+
+        # Genotipagem (teste de resistência)
+        if not em_tarv or (carga_viral and carga_viral > 1000):
+            flags.add('hiv_genotipagem')
+
+        contexto = (
+            ('cd4', cd4 if cd4 else 'não informado'),
+            ('carga_viral', carga_viral if carga_viral else 'não informada'),
+            ('frequencia_cd4', frequencia_cd4),
+            ('frequencia_cv', frequencia_cv),
+        )
+
+    return frozenset(flags), contexto
@@ -0,0 +1,228 @@
+"""
+Geração de documentos em lote (agenda do dia do consultório)
+
+Renderiza os PDFs de exames laboratoriais, exames de imagem e vacinas de vários
+pacientes em paralelo e entrega o resultado como ZIP gravado à medida que os
+documentos ficam prontos ou como um único PDF mesclado pelo Gotenberg. Os lotes
+rodam nos workers da fila de jobs (src/utils/pdf_jobs.py).
+
+Todos os lotes do processo dividem um único pool limitado (PDF_BATCH_WORKERS), e
+as conversões são de segundo plano no cliente Gotenberg: não passam de
+GOTENBERG_BACKGROUND_CONCURRENCY vagas e cedem a vez aos PDFs interativos.
+Documentos repetidos continuam sendo servidos pelo cache de PDFs.
+"""
+import json
+import os
+import re
+import threading
+import unicodedata
+import zipfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from src.utils.gotenberg_client import gotenberg_client
+from src.utils.exam_catalog import exam_catalog
+from src.utils.pdf_service_gotenberg import (
+    gerar_pdf_exames_laboratoriais, gerar_pdf_exames_imagem, gerar_pdf_vacinas
+)
+
+# Limite de pacientes por lote
+PDF_BATCH_MAX = int(os.getenv('PDF_BATCH_MAX', '500'))
+
+# Workers do pool compartilhado pelos lotes (padrão: vagas de segundo plano do Gotenberg)
+PDF_BATCH_WORKERS = int(os.getenv('PDF_BATCH_WORKERS', '0')) or gotenberg_client.background_concurrency
+
+# Tipo de documento -> (categoria das recomendações, prefixo do arquivo, gerador)
+TIPOS_DOCUMENTO = {
+    'laboratorio': ('laboratorio', 'exames_laboratoriais', gerar_pdf_exames_laboratoriais),
+    'imagem': ('imagem', 'exames_imagem', gerar_pdf_exames_imagem),
+    'vacina': ('vacina', 'vacinas', gerar_pdf_vacinas),
+}
+
+FORMATOS = ('zip', 'pdf')
+
+
+class LoteInvalido(ValueError):
+    """Requisição de lote malformada"""
+
+
+class Documento:
+    """Um documento do lote (paciente + tipo), com o PDF ainda não gerado"""
+
+    __slots__ = ('indice', 'paciente', 'tipo', 'nome_arquivo', 'pdf')
+
+    def __init__(self, indice, paciente, tipo, nome_arquivo, pdf):
+        self.indice = indice
+        self.paciente = paciente
+        self.tipo = tipo
+        self.nome_arquivo = nome_arquivo
+        self.pdf = pdf
+
+
+def _slug(texto):
+    texto = unicodedata.normalize('NFKD', str(texto or '')).encode('ascii', 'ignore').decode('ascii')
+    return re.sub(r'[^A-Za-z0-9]+', '_', texto).strip('_').lower()[:40] or 'paciente'
+
+
+def planejar_lote(pacientes, tipos=None):
+    """
+    Monta a lista de documentos do lote
+
+    Args:
+        pacientes: lista de {dados_paciente, recomendacoes}
+        tipos: tipos de documento a gerar (padrão: todos de TIPOS_DOCUMENTO)
+
+    Returns:
+        list[Documento]: documentos com HTML renderizado, na ordem paciente/tipo
+    """
+    if not isinstance(pacientes, list) or not pacientes:
+        raise LoteInvalido('Lista de pacientes não fornecida')
+    if len(pacientes) > PDF_BATCH_MAX:
+        raise LoteInvalido(f'Lote excede o limite de {PDF_BATCH_MAX} pacientes')
+
+    tipos = list(tipos or TIPOS_DOCUMENTO)
+    desconhecidos = [t for t in tipos if t not in TIPOS_DOCUMENTO]
+    if desconhecidos:
+        raise LoteInvalido(f'Tipos de documento inválidos: {", ".join(map(str, desconhecidos))}')
+
+    documentos = []
+    for i, item in enumerate(pacientes, start=1):
+        if not isinstance(item, dict):
+            raise LoteInvalido(f'Paciente {i} inválido')
+        dados_paciente = item.get('dados_paciente') or {}
+        recomendacoes = item.get('recomendacoes') or []
+        nome = _slug(dados_paciente.get('nome'))
+
+        for tipo in tipos:
+            categoria, prefixo, gerar = TIPOS_DOCUMENTO[tipo]
+            itens = [rec for rec in recomendacoes if isinstance(rec, dict) and exam_catalog.categoria(rec) == categoria]
+            if not itens:
+                continue
+            documentos.append(Documento(
+                indice=len(documentos),
+                paciente=i,
+                tipo=tipo,
+                nome_arquivo=f'{i:04d}_{nome}/{prefixo}.pdf',
+                pdf=gerar(dados_paciente, itens, stream=True)
+            ))
+    return documentos
+
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def _pool():
+    """Pool de threads compartilhado por todos os lotes do processo"""
+    global _executor, _executor_pid
+    with _executor_lock:
+        # Threads não sobrevivem ao fork: recriar no processo filho
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(max_workers=PDF_BATCH_WORKERS, thread_name_prefix='pdf-lote')
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def _converter(documento):
+    with gotenberg_client.segundo_plano():
+        return documento.pdf.bytes()
+
+
+def gerar_em_paralelo(documentos, workers=None):
+    """
+    Converte os documentos no pool compartilhado
+
+    No máximo 2 x workers documentos do lote ficam pendentes ao mesmo tempo, de
+    modo que a memória não cresce com o tamanho do lote quando o consumidor é
+    lento e um lote grande não ocupa sozinho a fila do pool.
+
+    Yields:
+        (Documento, bytes | None, str | None): em ordem de conclusão
+    """
+    pendentes_max = max(1, workers or PDF_BATCH_WORKERS) * 2
+    fila = deque(documentos)
+    executor = _pool()
+    pendentes = {}
+    try:
+        while fila or pendentes:
+            while fila and len(pendentes) < pendentes_max:
+                documento = fila.popleft()
+                pendentes[executor.submit(_converter, documento)] = documento
+            prontos, _ = wait(pendentes, return_when=FIRST_COMPLETED)
+            for future in prontos:
+                documento = pendentes.pop(future)
+                try:
+                    yield documento, future.result(), None
+                except Exception as e:
+                    yield documento, None, str(e)
+    finally:
+        # Consumidor abandonou o gerador: cancelar o que ainda não começou (o pool é compartilhado)
+        for future in pendentes:
+            future.cancel()
+
+
+class _BufferDeSaida:
+    """Destino não posicionável do ZipFile; os bytes escritos são retirados em blocos"""
+
+    def __init__(self):
+        self._partes = []
+
+    def write(self, data):
+        self._partes.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def retirar(self):
+        data = b''.join(self._partes)
+        self._partes = []
+        return data
+
+
+def zip_em_blocos(documentos, workers=None):
+    """
+    Gera um ZIP em blocos com um PDF por documento, na ordem em que ficam prontos
+
+    O arquivo indice.json no fim do ZIP lista os documentos gerados e as falhas.
+    """
+    buffer = _BufferDeSaida()
+    indice = {'documentos': [], 'erros': []}
+    # PDFs já são comprimidos internamente: armazenar sem recomprimir
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_STORED) as arquivo:
+        for documento, pdf, erro in gerar_em_paralelo(documentos, workers):
+            registro = {'paciente': documento.paciente, 'tipo': documento.tipo, 'arquivo': documento.nome_arquivo}
+            if erro is not None:
+                registro['erro'] = erro
+                indice['erros'].append(registro)
+                continue
+            arquivo.writestr(documento.nome_arquivo, pdf)
+            indice['documentos'].append(registro)
+            yield buffer.retirar()
+
+        indice['documentos'].sort(key=lambda r: r['arquivo'])
+        indice['erros'].sort(key=lambda r: r['arquivo'])
+        arquivo.writestr('indice.json', json.dumps(indice, ensure_ascii=False, indent=2))
+    yield buffer.retirar()
+
+
+def mesclar_lote(documentos, workers=None):
+    """
+    Gera todos os documentos e os junta em um único PDF, na ordem paciente/tipo
+
+    Returns:
+        (bytes | None, list): PDF mesclado e lista de falhas (PDF None se houver falhas)
+    """
+    pdfs = [None] * len(documentos)
+    erros = []
+    for documento, pdf, erro in gerar_em_paralelo(documentos, workers):
+        if erro is not None:
+            erros.append({'paciente': documento.paciente, 'tipo': documento.tipo, 'erro': erro})
+        else:
+            pdfs[documento.indice] = pdf
+    if erros:
+        return None, sorted(erros, key=lambda e: (e['paciente'], e['tipo']))
+    if len(pdfs) == 1:
+        return pdfs[0], []
+    return gotenberg_client.merge_pdfs(pdfs), []
@@ -0,0 +1,221 @@
+"""
+Cache de PDFs endereçado pelo conteúdo
+
+A chave é o hash SHA-256 do HTML renderizado em forma canônica (espaços em
+branco colapsados), de modo que reimpressões e cliques duplos com o mesmo
+paciente/recomendações reutilizam o PDF já convertido pelo Gotenberg.
+
+Dois níveis:
+- Memória: LRU limitado em bytes (PDF_CACHE_MEMORY_MB)
+- Disco: um arquivo por chave, com remoção dos menos usados quando o diretório
+  excede PDF_CACHE_DISK_MB, em PDF_CACHE_DIR (padrão src/database/pdf_cache,
+  junto dos demais dados da aplicação). Diretório 0700 e arquivos 0600 (os
+  PDFs trazem nome e exames do paciente); um diretório de outro usuário
+  desliga o nível
+"""
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from src.utils.private_storage import APP_DATA_DIR, abrir_privado, diretorio_privado
+from src.utils.structured_log import get_logger
+
+log = get_logger(__name__)
+
+# Versão do formato da chave (mudar invalida o cache inteiro)
+CACHE_KEY_VERSION = 'v1'
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def canonical_html(html):
+    """Forma canônica do HTML para o hash (ignora diferenças de indentação/quebras)"""
+    return _WHITESPACE.sub(' ', html).strip()
+
+
+class PDFCache:
+    """Cache de PDFs em dois níveis (memória LRU + disco)"""
+
+    def __init__(self, memory_bytes=None, disk_bytes=None, cache_dir=None):
+        self.memory_bytes = memory_bytes if memory_bytes is not None else \
+            int(float(os.getenv('PDF_CACHE_MEMORY_MB', '64')) * 1024 * 1024)
+        self.disk_bytes = disk_bytes if disk_bytes is not None else \
+            int(float(os.getenv('PDF_CACHE_DISK_MB', '512')) * 1024 * 1024)
+        self.cache_dir = cache_dir or os.getenv('PDF_CACHE_DIR') or os.path.join(APP_DATA_DIR, 'pdf_cache')
+
+        self._memory = OrderedDict()
+        self._memory_size = 0
+        self._disk_size = None
+        self._disk_checked = False
+        self._lock = threading.Lock()
+        self._counters = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+
+    @staticmethod
+    def key_for(html):
+        """Chave do cache (também usada como ETag) para o HTML renderizado"""
+        digest = hashlib.sha256(canonical_html(html).encode('utf-8')).hexdigest()
+        return f'{CACHE_KEY_VERSION}-{digest}'
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[-2:], f'{key}.pdf')
+
+    # Memória
+
+    def _memory_put(self, key, data):
+        if len(data) > self.memory_bytes:
+            return
+        with self._lock:
+            old = self._memory.pop(key, None)
+            if old is not None:
+                self._memory_size -= len(old)
+            self._memory[key] = data
+            self._memory_size += len(data)
+            while self._memory_size > self.memory_bytes:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_size -= len(evicted)
+
+    # Disco
+
+    def _disk_available(self):
+        """Nível em disco ativo e diretório privado (conferido uma vez)"""
+        if self.disk_bytes <= 0:
+            return False
+        if not self._disk_checked:
+            try:
+                diretorio_privado(self.cache_dir)
+            except OSError as e:
+                # Diretório de outro usuário: seus arquivos não são lidos nem recebem PDFs
+                log.warning('pdf_cache_diretorio_inseguro', diretorio=self.cache_dir, erro=str(e))
+                self.disk_bytes = 0
+                return False
+            self._disk_checked = True
+        return True
+
+    def _scan_disk(self):
+        """Lista (mtime, tamanho, caminho) dos arquivos do cache em disco"""
+        entries = []
+        if not os.path.isdir(self.cache_dir):
+            return entries
+        for bucket in os.scandir(self.cache_dir):
+            if not bucket.is_dir():
+                continue
+            for entry in os.scandir(bucket.path):
+                if entry.name.endswith('.pdf'):
+                    try:
+                        st = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((st.st_mtime, st.st_size, entry.path))
+        return entries
+
+    def _evict_disk(self):
+        """Remove os arquivos menos usados até ficar abaixo de 90% do limite"""
+        entries = sorted(self._scan_disk())
+        total = sum(size for _, size, _ in entries)
+        target = self.disk_bytes * 0.9
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                with self._lock:
+                    self._counters['evictions'] += 1
+            except FileNotFoundError:
+                total -= size
+            except OSError as e:
+                log.warning('pdf_cache_remocao_falhou', erro=str(e))
+        self._disk_size = total
+
+    def _disk_get(self, key):
+        if not self._disk_available():
+            return None
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            # mtime marca o último uso (ordem de remoção do nível em disco)
+            os.utime(path)
+            return data
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            log.warning('pdf_cache_leitura_falhou', chave=key, erro=str(e))
+            return None
+
+    def _disk_put(self, key, data):
+        if not self._disk_available():
+            return
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+            tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with abrir_privado(tmp_path) as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            log.warning('pdf_cache_gravacao_falhou', chave=key, erro=str(e))
+            return
+        with self._lock:
+            if self._disk_size is None:
+                self._disk_size = sum(size for _, size, _ in self._scan_disk())
+            else:
+                self._disk_size += len(data)
+            over_budget = self._disk_size > self.disk_bytes
+        if over_budget:
+            self._evict_disk()
+
+    # API pública
+
+    def get(self, key):
+        """Retorna os bytes do PDF em cache ou None"""
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self._counters['memory_hits'] += 1
+                return data
+
+        data = self._disk_get(key)
+        with self._lock:
+            self._counters['disk_hits' if data is not None else 'misses'] += 1
+        if data is not None:
+            self._memory_put(key, data)
+        return data
+
+    def put(self, key, data):
+        """Armazena o PDF nos dois níveis"""
+        if not data:
+            return
+        with self._lock:
+            self._counters['stores'] += 1
+        self._memory_put(key, data)
+        self._disk_put(key, data)
+
+    def clear(self):
+        """Esvazia o nível em memória e remove os arquivos em disco"""
+        with self._lock:
+            self._memory.clear()
+            self._memory_size = 0
+        for _, _, path in (self._scan_disk() if self._disk_available() else ()):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        self._disk_size = 0
+
+    def stats(self):
+        """Contadores de acertos por nível e ocupação"""
+        with self._lock:
+            stats = dict(self._counters)
+            stats['memory_entries'] = len(self._memory)
+            stats['memory_bytes'] = self._memory_size
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_ratio'] = round((stats['memory_hits'] + stats['disk_hits']) / lookups, 4) if lookups else 0.0
+        stats['disk_bytes'] = self._disk_size
+        return stats
+
+
+# Instância global usada pelos endpoints /gerar-pdf-*
+pdf_cache = PDFCache()
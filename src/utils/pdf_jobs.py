@@ -0,0 +1,359 @@
+"""
+Fila assíncrona de geração de PDFs
+
+A requisição valida o pedido, renderiza o HTML e devolve o id do job na hora;
+um pool de threads faz a conversão no Gotenberg (sem prender o worker HTTP por
+até GOTENBERG_TIMEOUT segundos) e grava o resultado em PDF_JOBS_DIR. As
+conversões dos jobs são de segundo plano: cedem a vez aos PDFs interativos.
+
+O estado de cada job é espelhado em <id>.json no mesmo diretório, de modo que
+qualquer processo do servidor consegue responder à consulta e ao download.
+Os resultados contêm dados de pacientes: o diretório é criado com modo 0700 e os
+arquivos com 0600. Uma thread de limpeza remove, uma vez por minuto, resultados
+e jobs esquecidos após PDF_JOBS_TTL segundos. O prazo conta a partir do fim do
+job: pendentes e em andamento só expiram se o processo que os criou morreu.
+"""
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+
+from src.utils.gotenberg_client import gotenberg_client
+from src.utils.private_storage import APP_DATA_DIR, abrir_privado, diretorio_privado
+from src.utils.structured_log import get_logger
+from src.utils.pdf_batch import (
+    TIPOS_DOCUMENTO, FORMATOS, LoteInvalido, planejar_lote, zip_em_blocos, mesclar_lote
+)
+
+log = get_logger(__name__)
+
+# Estados do job
+PENDENTE = 'pendente'
+PROCESSANDO = 'processando'
+CONCLUIDO = 'concluido'
+ERRO = 'erro'
+
+TIPO_LOTE = 'lote'
+
+_JOB_ID = re.compile(r'^[0-9a-f]{32}$')
+
+# Intervalo entre varreduras de jobs expirados (segundos)
+INTERVALO_LIMPEZA = 60
+TERMINAIS = (CONCLUIDO, ERRO)
+
+
+def _processo_vivo(pid):
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class FilaCheia(Exception):
+    """Limite de jobs pendentes atingido"""
+
+
+class PDFJobQueue:
+    """Fila de jobs de PDF com pool de threads, resultados em disco e expiração por TTL"""
+
+    def __init__(self, workers=None, ttl=None, max_pending=None, jobs_dir=None):
+        self.workers = workers or int(os.getenv('PDF_JOBS_WORKERS', '0')) or gotenberg_client.max_concurrency
+        self.ttl = ttl or int(os.getenv('PDF_JOBS_TTL', '3600'))
+        self.max_pending = max_pending or int(os.getenv('PDF_JOBS_MAX_PENDING', '1000'))
+        self.jobs_dir = jobs_dir or os.getenv('PDF_JOBS_DIR') or os.path.join(APP_DATA_DIR, 'pdf_jobs')
+
+        self._cond = threading.Condition()
+        self._jobs = {}
+        self._fila = deque()
+        self._threads = []
+        self._pid = None
+        self._ultima_limpeza = 0.0
+        self._counters = {'submitted': 0, 'completed': 0, 'failed': 0, 'rejected': 0, 'expired': 0}
+
+    # Arquivos
+
+    def _meta_path(self, job_id):
+        return os.path.join(self.jobs_dir, f'{job_id}.json')
+
+    def _result_path(self, job):
+        return os.path.join(self.jobs_dir, f"{job['id']}.{job['extensao']}")
+
+    def _salvar_meta(self, job):
+        path = self._meta_path(job['id'])
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        try:
+            with abrir_privado(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(job, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            log.warning('pdf_job_estado_gravacao_falhou', job=job['id'], erro=str(e))
+
+    def _ler_meta(self, job_id):
+        try:
+            with open(self._meta_path(job_id), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            log.warning('pdf_job_estado_leitura_falhou', job=job_id, erro=str(e))
+            return None
+
+    def _remover(self, job):
+        for path in (self._result_path(job), self._meta_path(job['id'])):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                log.warning('pdf_job_remocao_falhou', erro=str(e))
+
+    def _expirado(self, job, agora):
+        if job['expira_em'] >= agora:
+            return False
+        if job['status'] in TERMINAIS:
+            return True
+        # Pendente ou em andamento atrás de uma fila longa: expira apenas se o
+        # processo dono morreu (o job nunca vai terminar)
+        return not _processo_vivo(job.get('pid'))
+
+    # Workers
+
+    def _iniciar_workers(self):
+        # Threads não sobrevivem ao fork: recriar no processo filho
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._fila.clear()
+        self._threads = [
+            threading.Thread(target=self._executar, name=f'pdf-jobs-{i}', daemon=True)
+            for i in range(self.workers)
+        ]
+        self._threads.append(threading.Thread(target=self._limpar, name='pdf-jobs-limpeza', daemon=True))
+        for thread in self._threads:
+            thread.start()
+
+    def _executar(self):
+        while True:
+            with self._cond:
+                while not self._fila:
+                    self._cond.wait()
+                job, produzir = self._fila.popleft()
+            self._processar(job, produzir)
+
+    def _limpar(self):
+        # Fora do caminho do submit(): a varredura do diretório não atrasa a resposta 202
+        while True:
+            time.sleep(INTERVALO_LIMPEZA)
+            try:
+                self.purge()
+            except Exception as e:
+                log.warning('pdf_jobs_limpeza_falhou', erro=str(e))
+
+    def _atualizar(self, job, **campos):
+        with self._cond:
+            job.update(campos)
+            job['atualizado_em'] = datetime.now().isoformat()
+            snapshot = dict(job)
+        self._salvar_meta(snapshot)
+
+    def _processar(self, job, produzir):
+        self._atualizar(job, status=PROCESSANDO)
+        path = self._result_path(job)
+        tmp_path = f'{path}.part'
+        try:
+            with abrir_privado(tmp_path) as f, gotenberg_client.segundo_plano():
+                produzir(f)
+            tamanho = os.path.getsize(tmp_path)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            with self._cond:
+                self._counters['failed'] += 1
+            self._atualizar(job, status=ERRO, erro=str(e), expira_em=time.time() + self.ttl)
+            return
+        with self._cond:
+            self._counters['completed'] += 1
+        self._atualizar(job, status=CONCLUIDO, tamanho=tamanho, expira_em=time.time() + self.ttl)
+
+    # API pública
+
+    def submit(self, tipo, produzir, nome_arquivo, mimetype='application/pdf', etag=None):
+        """
+        Enfileira um job
+
+        Args:
+            tipo: tipo do documento (informativo)
+            produzir: função que recebe o arquivo de saída e grava o resultado
+            nome_arquivo: nome sugerido no download
+            mimetype: tipo do resultado
+            etag: ETag do resultado, se conhecido antes da conversão
+
+        Returns:
+            dict: estado inicial do job
+
+        Raises:
+            FilaCheia: limite de jobs pendentes atingido
+            PermissionError: PDF_JOBS_DIR pertence a outro usuário
+        """
+        agora = time.time()
+        job = {
+            'id': uuid.uuid4().hex,
+            'tipo': tipo,
+            'status': PENDENTE,
+            'criado_em': datetime.now().isoformat(),
+            'atualizado_em': datetime.now().isoformat(),
+            # Renovado ao terminar; antes disso só vale se o processo dono morrer
+            'expira_em': agora + self.ttl,
+            'pid': os.getpid(),
+            'arquivo': nome_arquivo,
+            'extensao': nome_arquivo.rsplit('.', 1)[-1],
+            'mimetype': mimetype,
+            'etag': etag,
+            'tamanho': None,
+            'erro': None
+        }
+        with self._cond:
+            if len(self._fila) >= self.max_pending:
+                self._counters['rejected'] += 1
+                raise FilaCheia(f'Fila de PDFs cheia ({self.max_pending} jobs pendentes)')
+            diretorio_privado(self.jobs_dir)
+            self._iniciar_workers()
+            self._jobs[job['id']] = job
+            self._counters['submitted'] += 1
+            snapshot = dict(job)
+        self._salvar_meta(snapshot)
+        with self._cond:
+            self._fila.append((job, produzir))
+            self._cond.notify()
+        return snapshot
+
+    def get(self, job_id):
+        """Estado do job (None se desconhecido ou expirado)"""
+        if not _JOB_ID.match(job_id or ''):
+            return None
+        with self._cond:
+            job = self._jobs.get(job_id)
+            job = dict(job) if job is not None else None
+        if job is None:
+            # Job criado por outro processo do servidor
+            job = self._ler_meta(job_id)
+        if job is None or self._expirado(job, time.time()):
+            return None
+        return job
+
+    def result_path(self, job):
+        """Caminho do resultado de um job concluído"""
+        return self._result_path(job)
+
+    def purge(self, force=False):
+        """Remove jobs e resultados expirados (no máximo uma varredura por INTERVALO_LIMPEZA)"""
+        agora = time.time()
+        with self._cond:
+            if not force and agora - self._ultima_limpeza < INTERVALO_LIMPEZA:
+                return
+            self._ultima_limpeza = agora
+            expirados = [job for job in self._jobs.values()
+                         if job['expira_em'] < agora and job['status'] in TERMINAIS]
+            for job in expirados:
+                del self._jobs[job['id']]
+            ativos = set(self._jobs)
+
+        if not os.path.isdir(self.jobs_dir):
+            return
+        removidos = 0
+        for entry in os.scandir(self.jobs_dir):
+            if not entry.name.endswith('.json') or entry.name[:-5] in ativos:
+                continue
+            job = self._ler_meta(entry.name[:-5])
+            if job is not None and self._expirado(job, agora):
+                self._remover(job)
+                removidos += 1
+        with self._cond:
+            self._counters['expired'] += removidos
+
+    def stats(self):
+        """Contadores e ocupação da fila"""
+        with self._cond:
+            stats = dict(self._counters)
+            stats['pending'] = len(self._fila)
+            stats['running'] = sum(1 for job in self._jobs.values() if job['status'] == PROCESSANDO)
+            stats['workers'] = self.workers
+        return stats
+
+
+def _gravar_documento(documento):
+    def produzir(f):
+        f.write(documento.pdf.bytes())
+    return produzir
+
+
+def _gravar_zip(documentos):
+    def produzir(f):
+        for chunk in zip_em_blocos(documentos):
+            f.write(chunk)
+    return produzir
+
+
+def _gravar_mesclado(documentos):
+    def produzir(f):
+        pdf, erros = mesclar_lote(documentos)
+        if erros:
+            raise RuntimeError('; '.join(f"paciente {e['paciente']} ({e['tipo']}): {e['erro']}" for e in erros))
+        f.write(pdf)
+    return produzir
+
+
+def criar_job(pedido, fila=None):
+    """
+    Valida o pedido, renderiza os documentos e enfileira a conversão
+
+    Pedido:
+        - tipo 'laboratorio' | 'imagem' | 'vacina': {dados_paciente, recomendacoes}
+        - tipo 'lote': {pacientes, formato ('pdf' | 'zip'), documentos}
+
+    Raises:
+        LoteInvalido: pedido malformado ou sem documentos
+        FilaCheia: limite de jobs pendentes atingido
+    """
+    fila = fila or pdf_jobs
+    if not isinstance(pedido, dict):
+        raise LoteInvalido('Dados não fornecidos')
+
+    tipo = pedido.get('tipo', TIPO_LOTE)
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+
+    if tipo == TIPO_LOTE:
+        formato = pedido.get('formato', 'pdf')
+        if formato not in FORMATOS:
+            raise LoteInvalido(f'Formato inválido: {formato}')
+        documentos = planejar_lote(pedido.get('pacientes'), pedido.get('documentos'))
+        if not documentos:
+            raise LoteInvalido('Nenhum exame ou vacina encontrado nos pacientes do lote')
+        if formato == 'zip':
+            return fila.submit(tipo, _gravar_zip(documentos), f'documentos_{timestamp}.zip', 'application/zip')
+        return fila.submit(tipo, _gravar_mesclado(documentos), f'documentos_{timestamp}.pdf')
+
+    if tipo not in TIPOS_DOCUMENTO:
+        raise LoteInvalido(f'Tipo de documento inválido: {tipo}')
+    documentos = planejar_lote([pedido], [tipo])
+    if not documentos:
+        raise LoteInvalido('Nenhum exame ou vacina encontrado')
+    documento = documentos[0]
+    prefixo = TIPOS_DOCUMENTO[tipo][1]
+    return fila.submit(tipo, _gravar_documento(documento), f'{prefixo}_{timestamp}.pdf', etag=documento.pdf.etag)
+
+
+# Instância global usada pelos endpoints /pdf-jobs
+pdf_jobs = PDFJobQueue()
@@ -7,8 +7,11 @@ import uuid
 import base64
 import io
 import qrcode
-from jinja2 import Template
+from src.utils.template_env import render_template
 import os
+from src.utils.structured_log import get_logger
+
+log = get_logger(__name__)
 
 # Importar WeasyPrint
 try:
@@ -16,7 +19,7 @@ try:
     WEASYPRINT_AVAILABLE = True
 except ImportError:
     WEASYPRINT_AVAILABLE = False
-    print("⚠️ WeasyPrint não disponível - usando fallback para reportlab")
+    log.warning('weasyprint_indisponivel', detalhe='usando fallback para reportlab')
 
 def generate_qr_code(data):
     """Gera QR Code e retorna como base64"""
@@ -65,20 +68,19 @@ def gerar_justificativa_clinica(dados_paciente, comorbidades=None):
     
     return justificativa
 
-def render_pdf_from_template(template_path, context):
+def render_pdf_from_template(template_name, context):
     """
     Renderiza PDF a partir de template HTML usando WeasyPrint
+
+    Args:
+        template_name: Nome do template em src/templates (pré-compilado)
+        context: Variáveis do template
     """
     if not WEASYPRINT_AVAILABLE:
         raise ImportError("WeasyPrint não está disponível")
     
-    # Ler template
-    with open(template_path, 'r', encoding='utf-8') as f:
-        template_content = f.read()
-    
     # Renderizar template com Jinja2
-    template = Template(template_content)
-    html_content = template.render(**context)
+    html_content = render_template(template_name, **context)
     
     # Gerar PDF com WeasyPrint
     pdf_bytes = HTML(string=html_content).write_pdf()
@@ -120,12 +122,8 @@ def gerar_pdf_exames(dados_paciente, exames, tipo_exame="LABORATORIAIS"):
         'document_code': document_code
     }
     
-    # Caminho do template
-    template_dir = os.path.join(os.path.dirname(__file__), '..', 'templates')
-    template_path = os.path.join(template_dir, 'solicitacao_exames_template.html')
-    
     # Gerar PDF
-    pdf_bytes = render_pdf_from_template(template_path, context)
+    pdf_bytes = render_pdf_from_template('solicitacao_exames_template.html', context)
     
     return pdf_bytes
 
@@ -157,12 +155,8 @@ def gerar_pdf_vacinas(dados_paciente, vacinas):
         'document_code': document_code
     }
     
-    # Caminho do template
-    template_dir = os.path.join(os.path.dirname(__file__), '..', 'templates')
-    template_path = os.path.join(template_dir, 'prescricao_vacinas_template.html')
-    
     # Gerar PDF
-    pdf_bytes = render_pdf_from_template(template_path, context)
+    pdf_bytes = render_pdf_from_template('prescricao_vacinas_template.html', context)
     
     return pdf_bytes
 
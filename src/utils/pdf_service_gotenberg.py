@@ -2,15 +2,15 @@
 Serviço de geração de PDFs usando Gotenberg (Chromium)
 """
 
-import os
-import urllib.request
-import urllib.error
 from datetime import datetime
-from jinja2 import Template
+from src.utils.template_env import get_template
+from src.utils.gotenberg_client import gotenberg_client
+from src.utils.pdf_cache import pdf_cache
+from src.utils.stage_timer import etapa
 
 # URL do microserviço Gotenberg no Railway
-# Será definida via variável de ambiente
-GOTENBERG_URL = os.getenv('GOTENBERG_URL', 'http://localhost:3000')
+# Definida via variável de ambiente GOTENBERG_URL (lida pelo cliente compartilhado)
+GOTENBERG_URL = gotenberg_client.base_url
 
 def gerar_justificativa_clinica(dados_paciente):
     """Gera justificativa clínica automática baseada nos dados do paciente"""
@@ -86,162 +86,8 @@ def gerar_html_solicitacao_exames(dados_paciente, exames, tipo='laboratoriais'):
     
     justificativa = gerar_justificativa_clinica(dados_paciente)
     
-    # Template HTML
-    template_html = """
-    <!DOCTYPE html>
-    <html lang="pt-BR">
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>{{ titulo }}</title>
-        <style>
-            @page {
-                size: A4;
-                margin: 2cm;
-            }
-            body {
-                font-family: Arial, sans-serif;
-                font-size: 11pt;
-                line-height: 1.4;
-                color: #333;
-            }
-            .header {
-                text-align: center;
-                margin-bottom: 30px;
-                border-bottom: 2px solid #4A90E2;
-                padding-bottom: 15px;
-            }
-            .logo {
-                font-size: 24pt;
-                font-weight: bold;
-                color: #4A90E2;
-                margin-bottom: 5px;
-            }
-            .subtitle {
-                font-size: 10pt;
-                color: #666;
-            }
-            h1 {
-                font-size: 16pt;
-                text-align: center;
-                margin: 20px 0;
-                color: #333;
-            }
-            .patient-info {
-                background-color: #f5f5f5;
-                padding: 15px;
-                border-radius: 5px;
-                margin-bottom: 20px;
-            }
-            .patient-info p {
-                margin: 5px 0;
-            }
-            .justification {
-                background-color: #fff3cd;
-                border-left: 4px solid #ffc107;
-                padding: 15px;
-                margin-bottom: 20px;
-            }
-            .justification strong {
-                display: block;
-                margin-bottom: 10px;
-                color: #856404;
-            }
-            .exams-list {
-                margin-bottom: 30px;
-            }
-            .exam-item {
-                margin-bottom: 15px;
-                padding: 10px;
-                border-left: 3px solid #4A90E2;
-                background-color: #f8f9fa;
-            }
-            .exam-title {
-                font-weight: bold;
-                color: #4A90E2;
-                margin-bottom: 5px;
-            }
-            .exam-subtitle {
-                font-size: 9pt;
-                color: #666;
-                margin-bottom: 5px;
-            }
-            .exam-description {
-                font-size: 10pt;
-                color: #555;
-            }
-            .signature {
-                margin-top: 50px;
-                text-align: center;
-            }
-            .signature-line {
-                border-top: 1px solid #333;
-                width: 300px;
-                margin: 0 auto;
-                padding-top: 10px;
-            }
-            .footer {
-                position: fixed;
-                bottom: 0;
-                left: 0;
-                right: 0;
-                text-align: center;
-                font-size: 8pt;
-                color: #999;
-                padding: 10px;
-                border-top: 1px solid #ddd;
-            }
-        </style>
-    </head>
-    <body>
-        <div class="header">
-            <div class="logo">evidēns digital</div>
-            <div class="subtitle">Sistema Inteligente de Recomendações Clínicas</div>
-        </div>
-        
-        <h1>{{ titulo }}</h1>
-        
-        <div class="patient-info">
-            <p><strong>Paciente:</strong> {{ paciente_nome }}</p>
-            <p><strong>Idade:</strong> {{ paciente_idade }} anos</p>
-            <p><strong>Sexo:</strong> {{ paciente_sexo }}</p>
-            <p><strong>Data:</strong> {{ data_emissao }}</p>
-        </div>
-        
-        <div class="justification">
-            <strong>JUSTIFICATIVA CLÍNICA:</strong>
-            {{ justificativa }}
-        </div>
-        
-        <div class="exams-list">
-            <h3>Exames Solicitados:</h3>
-            {% for exam in exames %}
-            <div class="exam-item">
-                <div class="exam-title">{{ loop.index }}. {{ exam.titulo }}</div>
-                {% if exam.subtitulo %}
-                <div class="exam-subtitle">{{ exam.subtitulo }}</div>
-                {% endif %}
-                {% if exam.descricao %}
-                <div class="exam-description">{{ exam.descricao }}</div>
-                {% endif %}
-            </div>
-            {% endfor %}
-        </div>
-        
-        <div class="signature">
-            <div class="signature-line">
-                Assinatura e Carimbo do Médico
-            </div>
-        </div>
-        
-        <div class="footer">
-            Documento gerado em {{ data_hora_completa }} | evidens.digital
-        </div>
-    </body>
-    </html>
-    """
-    
-    template = Template(template_html)
+    # Template HTML (pré-compilado em src/templates)
+    template = get_template('solicitacao_exames_gotenberg.html')
     
     html = template.render(
         titulo=titulo,
@@ -262,176 +108,8 @@ def gerar_html_prescricao_vacinas(dados_paciente, vacinas):
     
     justificativa = gerar_justificativa_clinica(dados_paciente)
     
-    # Template HTML
-    template_html = """
-    <!DOCTYPE html>
-    <html lang="pt-BR">
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>PRESCRIÇÃO DE VACINAS</title>
-        <style>
-            @page {
-                size: A4;
-                margin: 2cm;
-            }
-            body {
-                font-family: Arial, sans-serif;
-                font-size: 11pt;
-                line-height: 1.4;
-                color: #333;
-            }
-            .header {
-                text-align: center;
-                margin-bottom: 30px;
-                border-bottom: 2px solid #28a745;
-                padding-bottom: 15px;
-            }
-            .logo {
-                font-size: 24pt;
-                font-weight: bold;
-                color: #28a745;
-                margin-bottom: 5px;
-            }
-            .subtitle {
-                font-size: 10pt;
-                color: #666;
-            }
-            h1 {
-                font-size: 16pt;
-                text-align: center;
-                margin: 20px 0;
-                color: #333;
-            }
-            .patient-info {
-                background-color: #f5f5f5;
-                padding: 15px;
-                border-radius: 5px;
-                margin-bottom: 20px;
-            }
-            .patient-info p {
-                margin: 5px 0;
-            }
-            .justification {
-                background-color: #d4edda;
-                border-left: 4px solid #28a745;
-                padding: 15px;
-                margin-bottom: 20px;
-            }
-            .justification strong {
-                display: block;
-                margin-bottom: 10px;
-                color: #155724;
-            }
-            .vaccines-list {
-                margin-bottom: 30px;
-            }
-            .vaccine-item {
-                margin-bottom: 15px;
-                padding: 10px;
-                border-left: 3px solid #28a745;
-                background-color: #f8f9fa;
-            }
-            .vaccine-title {
-                font-weight: bold;
-                color: #28a745;
-                margin-bottom: 5px;
-            }
-            .vaccine-subtitle {
-                font-size: 9pt;
-                color: #666;
-                margin-bottom: 5px;
-            }
-            .vaccine-priority {
-                display: inline-block;
-                padding: 2px 8px;
-                border-radius: 3px;
-                font-size: 8pt;
-                font-weight: bold;
-                margin-left: 10px;
-            }
-            .priority-alta {
-                background-color: #dc3545;
-                color: white;
-            }
-            .priority-media {
-                background-color: #ffc107;
-                color: #333;
-            }
-            .signature {
-                margin-top: 50px;
-                text-align: center;
-            }
-            .signature-line {
-                border-top: 1px solid #333;
-                width: 300px;
-                margin: 0 auto;
-                padding-top: 10px;
-            }
-            .footer {
-                position: fixed;
-                bottom: 0;
-                left: 0;
-                right: 0;
-                text-align: center;
-                font-size: 8pt;
-                color: #999;
-                padding: 10px;
-                border-top: 1px solid #ddd;
-            }
-        </style>
-    </head>
-    <body>
-        <div class="header">
-            <div class="logo">evidēns digital</div>
-            <div class="subtitle">Sistema Inteligente de Recomendações Clínicas</div>
-        </div>
-        
-        <h1>PRESCRIÇÃO DE VACINAS</h1>
-        
-        <div class="patient-info">
-            <p><strong>Paciente:</strong> {{ paciente_nome }}</p>
-            <p><strong>Idade:</strong> {{ paciente_idade }} anos</p>
-            <p><strong>Sexo:</strong> {{ paciente_sexo }}</p>
-            <p><strong>Data:</strong> {{ data_emissao }}</p>
-        </div>
-        
-        <div class="justification">
-            <strong>JUSTIFICATIVA CLÍNICA:</strong>
-            {{ justificativa }}
-        </div>
-        
-        <div class="vaccines-list">
-            <h3>Vacinas Recomendadas:</h3>
-            {% for vaccine in vacinas %}
-            <div class="vaccine-item">
-                <div class="vaccine-title">
-                    {{ loop.index }}. {{ vaccine.titulo }}
-                    {% if vaccine.prioridade %}
-                    <span class="vaccine-priority priority-{{ vaccine.prioridade|lower }}">{{ vaccine.prioridade }}</span>
-                    {% endif %}
-                </div>
-                {% if vaccine.subtitulo %}
-                <div class="vaccine-subtitle">{{ vaccine.subtitulo }}</div>
-                {% endif %}
-            </div>
-            {% endfor %}
-        </div>
-        
-        <div class="signature">
-            <div class="signature-line">
-                Assinatura e Carimbo do Médico
-            </div>
-        </div>
-        
-        <div class="footer">
-            Documento gerado em {{ data_hora_completa }} | evidens.digital
-        </div>
-    </body>
-    </html>
-    """
-    
-    template = Template(template_html)
+    # Template HTML (pré-compilado em src/templates)
+    template = get_template('prescricao_vacinas_gotenberg.html')
     
     html = template.render(
         paciente_nome=dados_paciente.get('nome', 'Não informado'),
@@ -448,64 +126,115 @@ def gerar_html_prescricao_vacinas(dados_paciente, vacinas):
 
 def gerar_pdf_via_gotenberg(html_content):
     """Gera PDF usando Gotenberg (Chromium)"""
-    
-    try:
-        import io
-        from urllib.parse import urlencode
-        
-        # Endpoint do Gotenberg para conversão HTML -> PDF
-        url = f"{GOTENBERG_URL}/forms/chromium/convert/html"
-        
-        # Criar boundary para multipart/form-data
-        boundary = '----WebKitFormBoundary7MA4YWxkTrZu0gW'
-        
-        # Construir corpo da requisição multipart/form-data
-        body = io.BytesIO()
-        body.write(f'--{boundary}\r\n'.encode())
-        body.write(b'Content-Disposition: form-data; name="files"; filename="index.html"\r\n')
-        body.write(b'Content-Type: text/html\r\n\r\n')
-        body.write(html_content.encode('utf-8'))
-        body.write(f'\r\n--{boundary}--\r\n'.encode())
-        
-        # Criar requisição
-        req = urllib.request.Request(
-            url,
-            data=body.getvalue(),
-            headers={
-                'Content-Type': f'multipart/form-data; boundary={boundary}'
-            },
-            method='POST'
-        )
-        
-        # Fazer requisição
-        with urllib.request.urlopen(req, timeout=30) as response:
-            return response.read()
-        
-    except urllib.error.HTTPError as e:
-        raise Exception(f"Erro HTTP ao gerar PDF via Gotenberg: {e.code} - {e.reason}")
-    except urllib.error.URLError as e:
-        raise Exception(f"Erro de conexão ao gerar PDF via Gotenberg: {str(e.reason)}")
-    except Exception as e:
-        raise Exception(f"Erro ao gerar PDF via Gotenberg: {str(e)}")
-
-
-def gerar_pdf_exames_laboratoriais(dados_paciente, exames):
+    return gotenberg_client.convert_html(html_content)
+
+
+def abrir_pdf_via_gotenberg(html_content):
+    """Gera PDF usando Gotenberg, retornando o corpo em streaming (GotenbergStream)"""
+    return gotenberg_client.stream_html(html_content)
+
+
+class _PDFEmCache:
+    """PDF servido do cache, com a mesma interface de GotenbergStream"""
+
+    def __init__(self, data):
+        self.data = data
+        self.content_length = len(data)
+
+    def __iter__(self):
+        yield self.data
+
+    def read(self):
+        return self.data
+
+    def close(self):
+        pass
+
+
+class _PDFArmazenado:
+    """Repassa os blocos do Gotenberg e grava o PDF no cache ao final da transmissão"""
+
+    def __init__(self, stream, etag):
+        self._stream = stream
+        self._etag = etag
+        self.content_length = stream.content_length
+
+    def __iter__(self):
+        chunks = []
+        for chunk in self._stream:
+            chunks.append(chunk)
+            yield chunk
+        data = b''.join(chunks)
+        # Só armazenar transmissões completas
+        if self.content_length is None or len(data) == self.content_length:
+            pdf_cache.put(self._etag, data)
+
+    def read(self):
+        return b''.join(self)
+
+    def close(self):
+        self._stream.close()
+
+
+class DocumentoPDF:
+    """
+    PDF endereçado pelo conteúdo
+
+    O ETag é o hash canônico do HTML renderizado: o mesmo HTML sempre produz o
+    mesmo documento, então reimpressões são servidas do cache sem nova
+    renderização no Chromium.
+    """
+
+    def __init__(self, html):
+        self.html = html
+        self.etag = pdf_cache.key_for(html)
+        self.cached = False
+
+    def abrir(self):
+        """Retorna o PDF em blocos (do cache ou transmitido do Gotenberg)"""
+        with etapa('pdf_cache'):
+            data = pdf_cache.get(self.etag)
+        if data is not None:
+            self.cached = True
+            return _PDFEmCache(data)
+        # Até o Gotenberg responder (o corpo é transmitido depois)
+        with etapa('gotenberg'):
+            stream = abrir_pdf_via_gotenberg(self.html)
+        return _PDFArmazenado(stream, self.etag)
+
+    def bytes(self):
+        """Retorna os bytes completos do PDF"""
+        stream = self.abrir()
+        try:
+            return stream.read()
+        finally:
+            stream.close()
+
+
+def _converter(html, stream):
+    documento = DocumentoPDF(html)
+    return documento if stream else documento.bytes()
+
+
+def gerar_pdf_exames_laboratoriais(dados_paciente, exames, stream=False):
     """Gera PDF de solicitação de exames laboratoriais (formato simplificado)"""
     from .pdf_service_gotenberg_simple import gerar_html_exames_simples
-    html = gerar_html_exames_simples(dados_paciente, exames, tipo_exame="LABORATORIAIS")
-    return gerar_pdf_via_gotenberg(html)
+    with etapa('html'):
+        html = gerar_html_exames_simples(dados_paciente, exames, tipo_exame="LABORATORIAIS")
+    return _converter(html, stream)
 
 
-def gerar_pdf_exames_imagem(dados_paciente, exames):
+def gerar_pdf_exames_imagem(dados_paciente, exames, stream=False):
     """Gera PDF de solicitação de exames de imagem (formato simplificado)"""
     from .pdf_service_gotenberg_simple import gerar_html_exames_simples
-    html = gerar_html_exames_simples(dados_paciente, exames, tipo_exame="IMAGEM")
-    return gerar_pdf_via_gotenberg(html)
+    with etapa('html'):
+        html = gerar_html_exames_simples(dados_paciente, exames, tipo_exame="IMAGEM")
+    return _converter(html, stream)
 
 
-def gerar_pdf_vacinas(dados_paciente, vacinas):
+def gerar_pdf_vacinas(dados_paciente, vacinas, stream=False):
     """Gera PDF de prescrição de vacinas (formato Receita Simples)"""
     from .pdf_service_gotenberg_simple import gerar_html_prescricao_vacinas_simples
-    html = gerar_html_prescricao_vacinas_simples(dados_paciente, vacinas)
-    return gerar_pdf_via_gotenberg(html)
-
+    with etapa('html'):
+        html = gerar_html_prescricao_vacinas_simples(dados_paciente, vacinas)
+    return _converter(html, stream)
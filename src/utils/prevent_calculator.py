@@ -2,20 +2,30 @@
 Módulo de Cálculo de Risco Cardiovascular PREVENT 2024
 Baseado em: https://www.ahajournals.org/doi/10.1161/CIR.0000000000001315
 """
-import json
 import math
 from pathlib import Path
+from src.utils.config_registry import config_registry
+from src.utils.structured_log import get_logger
 
-# Carregar configurações
+log = get_logger(__name__)
+
+# Importar NumPy (cálculo em lote vetorizado)
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+    log.warning('numpy_indisponivel', detalhe='cálculo PREVENT em lote usará o caminho escalar')
+
+# Carregar configurações (snapshot compartilhado via config_registry)
 CONFIG_PATH = Path(__file__).resolve().parent.parent.parent / 'config' / 'prevent_coefficients.json'
 
 def load_coefficients():
     """Carrega coeficientes do arquivo de configuração"""
     try:
-        with open(CONFIG_PATH, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        return config_registry.get(CONFIG_PATH)
     except Exception as e:
-        print(f"Erro ao carregar coeficientes PREVENT: {e}")
+        log.error('config_carregamento_falhou', arquivo=str(CONFIG_PATH), erro=str(e))
         return None
 
 def calculate_prevent_risk(patient_data):
@@ -101,7 +111,7 @@ def calculate_prevent_risk(patient_data):
         }
         
     except Exception as e:
-        print(f"Erro no cálculo PREVENT: {e}")
+        log.warning('prevent_calculo_falhou', erro=str(e))
         return None
 
 def get_risk_classification(risk_10_year):
@@ -139,6 +149,214 @@ def get_risk_classification(risk_10_year):
             return 'alto'
             
     except Exception as e:
-        print(f"Erro na classificação de risco: {e}")
+        log.warning('prevent_classificacao_falhou', erro=str(e))
         return 'desconhecido'
 
+
+# Campos de entrada do cálculo em lote e valores padrão (iguais aos de calculate_prevent_risk)
+PREVENT_CAMPOS = {
+    'age': 0,
+    'sex': 'masculino',
+    'totalCholesterol': 0,
+    'hdlCholesterol': 0,
+    'systolicBP': 0,
+    'diabetes': False,
+    'smoking': False,
+    'weight': 0,
+    'height': 0,
+    'creatinine': 0,
+}
+
+PREVENT_RESULTADOS = ('risk10Year', 'risk30Year', 'egfr', 'bmi', 'classificacao')
+
+def _colunas_do_lote(patients):
+    """
+    Normaliza o lote para colunas
+
+    Aceita uma lista de pacientes (dicts, como em calculate_prevent_risk) ou um
+    dict de colunas {campo: [valores]}. Colunas ausentes recebem o valor padrão.
+    """
+    if isinstance(patients, dict):
+        tamanhos = {len(v) for v in patients.values() if isinstance(v, (list, tuple))}
+        if len(tamanhos) > 1:
+            raise ValueError('Todas as colunas devem ter o mesmo tamanho')
+        n = tamanhos.pop() if tamanhos else 0
+        colunas = {}
+        for campo, padrao in PREVENT_CAMPOS.items():
+            valores = patients.get(campo)
+            colunas[campo] = list(valores) if isinstance(valores, (list, tuple)) else [padrao] * n
+        return colunas, n
+
+    if not isinstance(patients, (list, tuple)) or not all(isinstance(p, dict) for p in patients):
+        raise ValueError('O lote deve ser uma lista de pacientes ou um objeto de colunas')
+    colunas = {campo: [p.get(campo, padrao) for p in patients] for campo, padrao in PREVENT_CAMPOS.items()}
+    return colunas, len(patients)
+
+def _numero(valor):
+    """Valores ausentes (falsy) viram 0; tipos não numéricos viram NaN (linha inválida)"""
+    if not valor:
+        return 0.0
+    if isinstance(valor, (int, float)):
+        return float(valor)
+    return math.nan
+
+def _coluna_numerica(valores, n):
+    """Converte uma coluna em float64, com caminho rápido para colunas só numéricas"""
+    arr = np.asarray(valores)
+    if arr.dtype.kind in 'biuf' and arr.shape == (n,):
+        return arr.astype(np.float64)
+    return np.fromiter((_numero(v) for v in valores), dtype=np.float64, count=n)
+
+def _coluna_booleana(valores, n):
+    """Converte uma coluna em bool usando a truthiness do Python"""
+    arr = np.asarray(valores)
+    if arr.dtype.kind == 'b' and arr.shape == (n,):
+        return arr
+    return np.fromiter((bool(v) for v in valores), dtype=bool, count=n)
+
+def _arredondar(valores, casas):
+    """
+    Equivalente vetorizado de round(v, casas) do Python
+
+    np.round escala, arredonda e divide; só diverge de round() quando o valor
+    escalado cai a um passo de ponto flutuante do meio-termo. Esses casos
+    limítrofes são recalculados com round().
+    """
+    resultado = np.round(valores, casas)
+    with np.errstate(invalid='ignore'):
+        escalado = valores * (10.0 ** casas)
+        limitrofes = np.abs(escalado - np.floor(escalado) - 0.5) < 1e-6
+    for i in np.flatnonzero(limitrofes & np.isfinite(valores)):
+        resultado[i] = round(float(valores[i]), casas)
+    return resultado
+
+def _coluna_saida(valores, presente):
+    """Converte o array em lista JSON, com None onde o valor não está presente"""
+    saida = valores.astype(object)
+    saida[~presente] = None
+    return saida.tolist()
+
+def _calcular_lote_escalar(colunas, n):
+    """Fallback sem NumPy: aplica o cálculo escalar paciente a paciente"""
+    resultados = {campo: [] for campo in PREVENT_RESULTADOS}
+    for i in range(n):
+        result = calculate_prevent_risk({campo: colunas[campo][i] for campo in PREVENT_CAMPOS})
+        for campo in ('risk10Year', 'risk30Year', 'egfr', 'bmi'):
+            resultados[campo].append(result[campo] if result else None)
+        resultados['classificacao'].append(get_risk_classification(result['risk10Year']) if result else None)
+    return resultados
+
+def calculate_prevent_risk_batch(patients):
+    """
+    Calcula o risco PREVENT 2024 para um lote de pacientes de forma vetorizada
+
+    Produz os mesmos valores de calculate_prevent_risk + get_risk_classification
+    aplicados paciente a paciente, mas com eGFR, IMC, log odds e riscos
+    calculados em arrays NumPy.
+
+    Args:
+        patients: Lista de dicts no formato de calculate_prevent_risk ou dict de
+            colunas {campo: [valores]} com os mesmos nomes de campo
+
+    Returns:
+        dict: Colunas risk10Year, risk30Year, egfr, bmi e classificacao, com
+            None nas posições de pacientes com dados insuficientes; None se os
+            coeficientes não puderem ser carregados
+
+    Raises:
+        ValueError: se o lote não estiver em um formato reconhecido
+    """
+    config = load_coefficients()
+    if not config:
+        return None
+
+    colunas, n = _colunas_do_lote(patients)
+    if not NUMPY_AVAILABLE:
+        return _calcular_lote_escalar(colunas, n)
+
+    def numerica(campo):
+        return _coluna_numerica(colunas[campo], n)
+
+    def booleana(campo):
+        return _coluna_booleana(colunas[campo], n)
+
+    age = numerica('age')
+    total_chol = numerica('totalCholesterol')
+    hdl_chol = numerica('hdlCholesterol')
+    systolic_bp = numerica('systolicBP')
+    weight = numerica('weight')
+    height = numerica('height')
+    creatinine = numerica('creatinine')
+    diabetes = booleana('diabetes')
+    smoking = booleana('smoking')
+    sex = np.array([v.lower() if isinstance(v, str) else None for v in colunas['sex']], dtype=object)
+    feminino = sex == 'feminino'
+
+    # Coeficientes por paciente conforme o sexo
+    coefficients = config['coefficients']
+    nomes = ('intercept', 'beta_age', 'beta_chol', 'beta_hdl', 'beta_sbp', 'beta_diabetes', 'beta_smoking')
+    coef = {nome: np.zeros(n) for nome in nomes}
+    sexo_conhecido = np.zeros(n, dtype=bool)
+    for nome_sexo, coeffs in coefficients.items():
+        mascara = sex == nome_sexo
+        sexo_conhecido |= mascara
+        for nome in nomes:
+            coef[nome][mascara] = coeffs[nome]
+
+    # Validar dados mínimos (mesma regra de truthiness do cálculo escalar)
+    obrigatorios = np.column_stack([age, total_chol, hdl_chol, systolic_bp])
+    valido = sexo_conhecido & (obrigatorios != 0).all(axis=1)
+    for coluna in (age, total_chol, hdl_chol, systolic_bp, creatinine):
+        valido &= ~np.isnan(coluna)
+
+    with np.errstate(all='ignore'):
+        # eGFR (se creatinina disponível)
+        tem_egfr = creatinine > 0
+        egfr = 175 * (creatinine ** -1.154) * (age ** -0.203)
+        egfr = np.where(feminino, egfr * 0.742, egfr)
+        valido &= ~(tem_egfr & ~np.isfinite(egfr))
+
+        # IMC (se peso e altura disponíveis)
+        tem_bmi = (weight != 0) & (height != 0)
+        bmi = weight / ((height / 100) ** 2)
+        valido &= ~(tem_bmi & ~np.isfinite(bmi))
+
+        # Log odds e probabilidade
+        log_odds = (
+            coef['intercept'] +
+            coef['beta_age'] * age +
+            coef['beta_chol'] * total_chol +
+            coef['beta_hdl'] * hdl_chol +
+            coef['beta_sbp'] * systolic_bp +
+            np.where(diabetes, coef['beta_diabetes'], 0.0) +
+            np.where(smoking, coef['beta_smoking'], 0.0)
+        )
+        exp_log_odds = np.exp(log_odds)
+        risk_10_year = exp_log_odds / (1 + exp_log_odds) * 100
+        valido &= np.isfinite(risk_10_year)
+        risk_30_year = risk_10_year * 2.8
+
+    # Arredondamento idêntico ao round() do caminho escalar
+    risk10 = _arredondar(risk_10_year, 1)
+    risk30 = _arredondar(risk_30_year, 1).astype(object)
+    risk30[risk_30_year > 85] = 85
+    egfr_out = _coluna_saida(np.rint(np.where(tem_egfr & valido, egfr, 0)).astype(np.int64), tem_egfr & valido)
+    bmi_out = _coluna_saida(_arredondar(bmi, 1), tem_bmi & valido)
+
+    # Classificação sobre o risco arredondado, como no endpoint escalar
+    classifications = config['risk_classification']
+    faixas = np.select(
+        [risk10 < classifications['baixo']['threshold'],
+         risk10 < classifications['borderline']['threshold'],
+         risk10 < classifications['intermediario']['threshold']],
+        ['baixo', 'borderline', 'intermediario'],
+        default='alto'
+    )
+
+    return {
+        'risk10Year': _coluna_saida(risk10, valido),
+        'risk30Year': _coluna_saida(risk30, valido),
+        'egfr': egfr_out,
+        'bmi': bmi_out,
+        'classificacao': _coluna_saida(faixas, valido),
+    }
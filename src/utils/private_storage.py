@@ -0,0 +1,44 @@
+"""
+Diretórios e arquivos privados para dados em disco
+
+Caches e filas em disco guardam dados de pacientes (PDFs com nome e exames,
+resultados de jobs, check-ups à espera do banco) ou decidem o que a aplicação
+responde (tabela de regras). Os diretórios são criados com modo 0700 e os
+arquivos com 0600. Um diretório que já existe só é aceito se pertencer ao
+usuário do processo; assim outro usuário local não consegue criá-lo antes
+(em /tmp, por exemplo) para ler os arquivos ou plantar os seus.
+"""
+import os
+import stat
+
+# Diretório de dados da aplicação, ao lado do banco SQLite (sobrevive a reinicializações)
+APP_DATA_DIR = os.getenv('EVIDENS_DATA_DIR') or \
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'database')
+
+
+def diretorio_privado(path: str) -> str:
+    """
+    Cria o diretório com modo 0700 (ou confere o existente) e devolve o caminho
+
+    Raises:
+        PermissionError: se o caminho não for um diretório (link simbólico
+            incluído) ou pertencer a outro usuário
+    """
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    st = os.lstat(path)
+    if not stat.S_ISDIR(st.st_mode):
+        raise PermissionError(f'{path} não é um diretório')
+    if hasattr(os, 'getuid'):
+        if st.st_uid != os.getuid():
+            raise PermissionError(f'{path} pertence a outro usuário')
+        if st.st_mode & 0o077:
+            # Diretório próprio criado por uma versão anterior com o umask padrão
+            os.chmod(path, 0o700)
+    return path
+
+
+def abrir_privado(path: str, modo: str = 'wb', **kwargs):
+    """Abre para escrita criando o arquivo com modo 0600 ('w' trunca, 'a' acrescenta)"""
+    flags = os.O_WRONLY | os.O_CREAT | (os.O_APPEND if modo.startswith('a') else os.O_TRUNC)
+    flags |= getattr(os, 'O_NOFOLLOW', 0)
+    return os.fdopen(os.open(path, flags, 0o600), modo, **kwargs)
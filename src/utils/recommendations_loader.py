@@ -1,20 +1,22 @@
 """
 Módulo para Carregar e Processar Recomendações Médicas
 """
-import json
 from pathlib import Path
 from typing import List, Dict, Optional
+from src.utils.config_registry import config_registry
+from src.utils.structured_log import get_logger
 
-# Carregar configurações
+log = get_logger(__name__)
+
+# Carregar configurações (snapshot compartilhado via config_registry)
 CONFIG_PATH = Path(__file__).resolve().parent.parent.parent / 'config' / 'base_recommendations.json'
 
 def load_base_recommendations():
     """Carrega recomendações base do arquivo de configuração"""
     try:
-        with open(CONFIG_PATH, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        return config_registry.get(CONFIG_PATH)
     except Exception as e:
-        print(f"Erro ao carregar recomendações base: {e}")
+        log.error('config_carregamento_falhou', arquivo=str(CONFIG_PATH), erro=str(e))
         return None
 
 def filter_recommendations_by_criteria(
@@ -106,12 +108,11 @@ def add_reference_links(recommendations: List[Dict]) -> List[Dict]:
     Returns:
         Lista de recomendações com links adicionados
     """
-    from src.utils.reference_links import build_reference_links, build_reference_html
+    from src.utils.reference_links import resolve_reference_links
     
     for rec in recommendations:
         if 'referencia' in rec and rec['referencia']:
-            rec['referencias'] = build_reference_links(rec['referencia'])
-            rec['referencia_html'] = build_reference_html(rec['referencias'])
+            rec['referencias'], rec['referencia_html'] = resolve_reference_links(rec.get('titulo', ''), rec['referencia'])
     
     return recommendations
 
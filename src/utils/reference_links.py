@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
-from typing import List, Dict
+from functools import lru_cache
+from typing import List, Dict, Tuple
 
 def _split_refs(ref: str) -> List[str]:
     """Separa referências múltiplas preservando referências compostas como ACC/AHA.
@@ -30,45 +31,33 @@ def _norm(s: str) -> str:
 def _contains_any(haystack: str, needles: List[str]) -> bool:
     return any(n in haystack for n in needles)
 
+_USPSTF_POR_TITULO = (
+    (('hiv',), 'https://www.uspreventiveservicestaskforce.org/uspstf/recommendation/human-immunodeficiency-virus-hiv-infection-screening'),
+    (('hepatite c', 'hcv'), 'https://www.uspreventiveservicestaskforce.org/uspstf/recommendation/hepatitis-c-screening'),
+    (('tuberculose',), 'https://www.uspreventiveservicestaskforce.org/uspstf/recommendation/latent-tuberculosis-infection-screening'),
+    (('sífilis', 'sifilis', 'vdrl', 'rpr'), 'https://www.uspreventiveservicestaskforce.org/uspstf/recommendation/syphilis-infection-in-nonpregnant-adults-and-adolescents-screening'),
+    (('hepatite b', 'hbsag'), 'https://www.uspreventiveservicestaskforce.org/uspstf/recommendation/hepatitis-b-virus-infection-in-adults-screening'),
+    (('gonorreia', 'gonorréia', 'gonorrhoeae', 'clamídia', 'clamidia', 'chlamydia'), 'https://www.uspreventiveservicestaskforce.org/uspstf/recommendation/chlamydia-and-gonorrhea-screening'),
+    (('mamografia',), 'https://www.uspreventiveservicestaskforce.org/uspstf/recommendation/breast-cancer-screening'),
+    (('brca',), 'https://www.uspreventiveservicestaskforce.org/uspstf/recommendation/brca-related-cancer-risk-assessment-genetic-counseling-and-genetic-testing'),
+    (('colonoscopia', 'colorretal'), 'https://www.uspreventiveservicestaskforce.org/uspstf/recommendation/colorectal-cancer-screening'),
+    (('cervical', 'papanicolaou', 'pap', 'hpv'), 'https://www.uspreventiveservicestaskforce.org/uspstf/recommendation/cervical-cancer-screening'),
+    (('psa', 'próstata', 'prostata'), 'https://www.uspreventiveservicestaskforce.org/uspstf/recommendation/prostate-cancer-screening'),
+    (('aorta', 'aneurisma'), 'https://www.uspreventiveservicestaskforce.org/uspstf/recommendation/abdominal-aortic-aneurysm-screening'),
+    (('pulm', 'tomografia', 'tc tórax', 'tc torax', 'ldct'), 'https://www.uspreventiveservicestaskforce.org/uspstf/recommendation/lung-cancer-screening'),
+    (('densitometria', 'osteoporose', 'dexa'), 'https://www.uspreventiveservicestaskforce.org/uspstf/recommendation/osteoporosis-screening'),
+    (('pré-diabetes', 'prediabetes', 'diabetes tipo 2'), 'https://www.uspreventiveservicestaskforce.org/uspstf/recommendation/screening-for-prediabetes-and-type-2-diabetes'),
+    (('carótida', 'carotida'), 'https://www.uspreventiveservicestaskforce.org/uspstf/recommendation/carotid-artery-stenosis-screening'),
+    (('vitamina d',), 'https://www.uspreventiveservicestaskforce.org/uspstf/recommendation/vitamin-d-deficiency-screening'),
+    (('depress', 'phq-9'), 'https://www.uspreventiveservicestaskforce.org/uspstf/recommendation/depression-in-adults-screening'),
+    (('ovário', 'ovario'), 'https://www.uspreventiveservicestaskforce.org/uspstf/recommendation/ovarian-cancer-screening'),
+)
+
 def _uspstf_url_by_title(title_lc: str) -> str:
-    if _contains_any(title_lc, ['hiv']):
-        return 'https://www.uspreventiveservicestaskforce.org/uspstf/recommendation/human-immunodeficiency-virus-hiv-infection-screening'
-    if _contains_any(title_lc, ['hepatite c', 'hcv']):
-        return 'https://www.uspreventiveservicestaskforce.org/uspstf/recommendation/hepatitis-c-screening'
-    if _contains_any(title_lc, ['tuberculose']):
-        return 'https://www.uspreventiveservicestaskforce.org/uspstf/recommendation/latent-tuberculosis-infection-screening'
-    if _contains_any(title_lc, ['sífilis', 'sifilis', 'vdrl', 'rpr']):
-        return 'https://www.uspreventiveservicestaskforce.org/uspstf/recommendation/syphilis-infection-in-nonpregnant-adults-and-adolescents-screening'
-    if _contains_any(title_lc, ['hepatite b', 'hbsag']):
-        return 'https://www.uspreventiveservicestaskforce.org/uspstf/recommendation/hepatitis-b-virus-infection-in-adults-screening'
-    if _contains_any(title_lc, ['gonorreia', 'gonorréia', 'gonorrhoeae', 'clamídia', 'clamidia', 'chlamydia']):
-        return 'https://www.uspreventiveservicestaskforce.org/uspstf/recommendation/chlamydia-and-gonorrhea-screening'
-    if _contains_any(title_lc, ['mamografia']):
-        return 'https://www.uspreventiveservicestaskforce.org/uspstf/recommendation/breast-cancer-screening'
-    if _contains_any(title_lc, ['brca']):
-        return 'https://www.uspreventiveservicestaskforce.org/uspstf/recommendation/brca-related-cancer-risk-assessment-genetic-counseling-and-genetic-testing'
-    if _contains_any(title_lc, ['colonoscopia', 'colorretal']):
-        return 'https://www.uspreventiveservicestaskforce.org/uspstf/recommendation/colorectal-cancer-screening'
-    if _contains_any(title_lc, ['cervical', 'papanicolaou', 'pap', 'hpv']):
-        return 'https://www.uspreventiveservicestaskforce.org/uspstf/recommendation/cervical-cancer-screening'
-    if _contains_any(title_lc, ['psa', 'próstata', 'prostata']):
-        return 'https://www.uspreventiveservicestaskforce.org/uspstf/recommendation/prostate-cancer-screening'
-    if _contains_any(title_lc, ['aorta', 'aneurisma']):
-        return 'https://www.uspreventiveservicestaskforce.org/uspstf/recommendation/abdominal-aortic-aneurysm-screening'
-    if _contains_any(title_lc, ['pulm', 'tomografia', 'tc tórax', 'tc torax', 'ldct']):
-        return 'https://www.uspreventiveservicestaskforce.org/uspstf/recommendation/lung-cancer-screening'
-    if _contains_any(title_lc, ['densitometria', 'osteoporose', 'dexa']):
-        return 'https://www.uspreventiveservicestaskforce.org/uspstf/recommendation/osteoporosis-screening'
-    if _contains_any(title_lc, ['pré-diabetes', 'prediabetes', 'diabetes tipo 2']):
-        return 'https://www.uspreventiveservicestaskforce.org/uspstf/recommendation/screening-for-prediabetes-and-type-2-diabetes'
-    if _contains_any(title_lc, ['carótida', 'carotida']):
-        return 'https://www.uspreventiveservicestaskforce.org/uspstf/recommendation/carotid-artery-stenosis-screening'
-    if _contains_any(title_lc, ['vitamina d']):
-        return 'https://www.uspreventiveservicestaskforce.org/uspstf/recommendation/vitamin-d-deficiency-screening'
-    if _contains_any(title_lc, ['depress', 'phq-9']):
-        return 'https://www.uspreventiveservicestaskforce.org/uspstf/recommendation/depression-in-adults-screening'
-    if _contains_any(title_lc, ['ovário', 'ovario']):
-        return 'https://www.uspreventiveservicestaskforce.org/uspstf/recommendation/ovarian-cancer-screening'
+    # Primeira linha da tabela cujo termo aparece no título
+    for needles, url in _USPSTF_POR_TITULO:
+        if _contains_any(title_lc, needles):
+            return url
     return 'https://www.uspreventiveservicestaskforce.org/uspstf/recommendation-topics'
 
 def _resolve_url_by_org(token_lc: str, title_lc: str) -> str:
@@ -153,15 +142,20 @@ def _resolve_url_by_org(token_lc: str, title_lc: str) -> str:
         return 'https://sbn.org.br/diretrizes/'
     return ''
 
-def build_reference_links(title: str, referencia: str) -> List[Dict[str, str]]:
+@lru_cache(maxsize=4096)
+def _resolver(title: str, referencia: str) -> Tuple[Tuple[Tuple[str, str], ...], str]:
+    """Links (label, url) e HTML de um par (título, referência), memoizados"""
     title_lc = _norm(title)
-    tokens = _split_refs(referencia)
-    links: List[Dict[str, str]] = []
-    for tok in tokens:
-        tok_lc = _norm(tok)
-        url = _resolve_url_by_org(tok_lc, title_lc)
-        links.append({'label': tok, 'url': url})
-    return links
+    pares = tuple((tok, _resolve_url_by_org(_norm(tok), title_lc)) for tok in _split_refs(referencia))
+    return pares, build_reference_html([{'label': label, 'url': url} for label, url in pares])
+
+def resolve_reference_links(title: str, referencia: str) -> Tuple[List[Dict[str, str]], str]:
+    """Links e HTML da referência; títulos e referências repetidos são resolvidos uma única vez"""
+    pares, html = _resolver(title or '', referencia or '')
+    return [{'label': label, 'url': url} for label, url in pares], html
+
+def build_reference_links(title: str, referencia: str) -> List[Dict[str, str]]:
+    return resolve_reference_links(title, referencia)[0]
 
 def build_reference_html(links: List[Dict[str, str]]) -> str:
     parts = []
@@ -1,20 +1,26 @@
 """
 Módulo de Gerenciamento de Referências Médicas
 """
-import json
+import re
+import threading
 import unicodedata
+from functools import lru_cache
 from pathlib import Path
+from src.utils.config_registry import config_registry
+from src.utils.term_extractor import CompiledTerms
+from src.utils.structured_log import get_logger
 
-# Carregar configurações
+log = get_logger(__name__)
+
+# Carregar configurações (snapshot compartilhado via config_registry)
 CONFIG_PATH = Path(__file__).resolve().parent.parent.parent / 'config' / 'medical_references.json'
 
 def load_references():
     """Carrega referências do arquivo de configuração"""
     try:
-        with open(CONFIG_PATH, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        return config_registry.get(CONFIG_PATH)
     except Exception as e:
-        print(f"Erro ao carregar referências médicas: {e}")
+        log.error('config_carregamento_falhou', arquivo=str(CONFIG_PATH), erro=str(e))
         return None
 
 def normalize_text(value: str) -> str:
@@ -24,6 +30,98 @@ def normalize_text(value: str) -> str:
     normalized = unicodedata.normalize('NFD', str(value))
     return ''.join(ch for ch in normalized if unicodedata.category(ch) != 'Mn').lower().strip()
 
+_TOKEN = re.compile(r'[A-Z0-9]+')
+
+
+class CompiledReferences:
+    """
+    Índices das referências: organizações por prefixo de token e palavras-chave
+    das regras de override em um autômato, com resultados memoizados
+    """
+
+    def __init__(self, config):
+        self.config = config
+        references_db = config.get('references', {}) if config else {}
+
+        # Organização -> (posição, url); siglas compostas (ex.: 'AHA/ACC') ficam na busca por trecho
+        self._organizacoes = {}
+        self._compostas = []
+        for posicao, (key, ref_data) in enumerate(references_db.items()):
+            key_upper = key.upper()
+            if _TOKEN.fullmatch(key_upper):
+                self._organizacoes.setdefault(key_upper, (posicao, ref_data['url']))
+            else:
+                self._compostas.append((posicao, key_upper, ref_data['url']))
+        self._maior_sigla = max((len(k) for k in self._organizacoes), default=0)
+
+        # Palavras-chave das regras de override -> regras que as exigem
+        self._regras = list(config.get('override_rules', [])) if config else []
+        palavras = {}
+        self._exigidas = []
+        self._sem_palavras = []
+        for indice, rule in enumerate(self._regras):
+            # Palavra vazia está contida em qualquer título
+            ids = frozenset(palavras.setdefault(normalize_text(k), str(len(palavras)))
+                            for k in rule.get('keywords', []) if normalize_text(k))
+            self._exigidas.append(ids)
+            if not ids:
+                self._sem_palavras.append(indice)
+        self._por_palavra = {}
+        for indice, ids in enumerate(self._exigidas):
+            for id_palavra in ids:
+                self._por_palavra.setdefault(id_palavra, []).append(indice)
+        self._automato = CompiledTerms({'classes': [
+            {'id': id_palavra, 'termos': [palavra]} for palavra, id_palavra in palavras.items()
+        ]})
+
+        self.url_da_parte = lru_cache(maxsize=4096)(self._url_da_parte)
+        self.override = lru_cache(maxsize=4096)(self._override)
+
+    def _url_da_parte(self, part: str):
+        """URL da primeira organização (na ordem do arquivo) citada no início de um token da parte"""
+        part_upper = part.upper()
+        melhor = None
+        for token in _TOKEN.findall(part_upper):
+            for tamanho in range(1, min(len(token), self._maior_sigla) + 1):
+                achado = self._organizacoes.get(token[:tamanho])
+                if achado is not None and (melhor is None or achado[0] < melhor[0]):
+                    melhor = achado
+        for posicao, key_upper, url in self._compostas:
+            if (melhor is None or posicao < melhor[0]) and key_upper in part_upper:
+                melhor = (posicao, url)
+        return melhor[1] if melhor else None
+
+    def _override(self, title_norm: str):
+        """Primeira regra de override cujas palavras-chave aparecem todas no título"""
+        presentes = self._automato.classes(title_norm)
+        candidatas = set(self._sem_palavras)
+        for id_palavra in presentes:
+            candidatas.update(self._por_palavra.get(id_palavra, ()))
+        for indice in sorted(candidatas):
+            if self._exigidas[indice] <= presentes:
+                return self._regras[indice]
+        return None
+
+
+class ReferenceIndex:
+    """Ponto de acesso aos índices compilados, reconstruídos quando o arquivo muda"""
+
+    def __init__(self):
+        self._config = None
+        self._compiled = None
+        self._lock = threading.Lock()
+
+    @property
+    def compiled(self):
+        config = load_references()
+        if config is not self._config or self._compiled is None:
+            with self._lock:
+                if config is not self._config or self._compiled is None:
+                    self._compiled = CompiledReferences(config)
+                    self._config = config
+        return self._compiled
+
+
 def build_reference_links(referencia: str):
     """
     Constrói lista de links de referência a partir de uma string
@@ -37,11 +135,10 @@ def build_reference_links(referencia: str):
     if not referencia:
         return []
     
-    config = load_references()
-    if not config:
+    compiled = reference_index.compiled
+    if not compiled.config:
         return [{'label': referencia, 'url': '#'}]
     
-    references_db = config.get('references', {})
     links = []
     
     # Dividir por vírgula ou "e"
@@ -52,23 +149,11 @@ def build_reference_links(referencia: str):
         if not part:
             continue
         
-        # Tentar encontrar referência no banco de dados
-        found = False
-        for key, ref_data in references_db.items():
-            if key.upper() in part.upper():
-                links.append({
-                    'label': part,
-                    'url': ref_data['url']
-                })
-                found = True
-                break
-        
-        if not found:
-            # Se não encontrar, adicionar sem link
-            links.append({
-                'label': part,
-                'url': '#'
-            })
+        # Procurar a organização no índice; sem correspondência, adicionar sem link
+        links.append({
+            'label': part,
+            'url': compiled.url_da_parte(part) or '#'
+        })
     
     return links if links else [{'label': referencia, 'url': '#'}]
 
@@ -107,12 +192,10 @@ def apply_reference_overrides(recommendations):
     if not isinstance(recommendations, list):
         return
     
-    config = load_references()
-    if not config:
+    compiled = reference_index.compiled
+    if not compiled.config:
         return
     
-    override_rules = config.get('override_rules', [])
-    
     for rec in recommendations:
         if not isinstance(rec, dict):
             continue
@@ -121,14 +204,15 @@ def apply_reference_overrides(recommendations):
         if not title_norm:
             continue
         
-        # Verificar regras de override
-        for rule in override_rules:
-            keywords = rule.get('keywords', [])
-            if all(keyword in title_norm for keyword in keywords):
-                label = rule['label']
-                url = rule['url']
-                rec['referencia'] = label
-                rec['referencias'] = [{'label': label, 'url': url}]
-                rec['referencia_html'] = build_reference_html(rec['referencias'])
-                break
+        # Verificar regras de override (índice invertido de palavras-chave)
+        rule = compiled.override(title_norm)
+        if rule is not None:
+            label = rule['label']
+            url = rule['url']
+            rec['referencia'] = label
+            rec['referencias'] = [{'label': label, 'url': url}]
+            rec['referencia_html'] = build_reference_html(rec['referencias'])
+
 
+# Instância global; índices compilados na primeira consulta
+reference_index = ReferenceIndex()
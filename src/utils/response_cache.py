@@ -0,0 +1,98 @@
+"""
+Cache de respostas do check-up inteligente
+
+LRU limitado em entradas e com TTL, indexado pela chave clínica do paciente
+(PatientInput.chave_clinica: apenas os dados que alteram a resposta — idade,
+sexo, condições clínicas derivadas e valores numéricos do PREVENT). Nome e
+demais campos informativos não entram na chave, então pacientes com o mesmo
+perfil clínico compartilham a mesma resposta.
+
+A geração das configurações (config_registry.generation()) acompanha cada
+consulta: quando qualquer arquivo de config/ muda, o cache é esvaziado.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from src.utils.config_registry import config_registry
+
+
+class ResponseCache:
+    """LRU com TTL, invalidado quando a geração das configurações muda"""
+
+    def __init__(self, maxsize=None, ttl=None):
+        self.maxsize = maxsize if maxsize is not None else int(os.getenv('CHECKUP_CACHE_SIZE', '4096'))
+        self.ttl = ttl if ttl is not None else float(os.getenv('CHECKUP_CACHE_TTL', '600'))
+        self._entries = OrderedDict()
+        self._generation = None
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0, 'invalidations': 0}
+
+    @property
+    def enabled(self):
+        return self.maxsize > 0 and self.ttl > 0
+
+    def _check_generation(self):
+        generation = config_registry.generation()
+        if generation != self._generation:
+            with self._lock:
+                if generation != self._generation:
+                    if self._entries:
+                        self._counters['invalidations'] += 1
+                    self._entries.clear()
+                    self._generation = generation
+
+    def get(self, key):
+        """Valor em cache ou None (ausente, expirado ou configurações alteradas)"""
+        if not self.enabled:
+            return None
+        self._check_generation()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._counters['misses'] += 1
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self._counters['expirations'] += 1
+                self._counters['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counters['hits'] += 1
+            return value
+
+    def put(self, key, value):
+        """Armazena o valor (deve ser tratado como imutável pelos leitores)"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self._counters['evictions'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Contadores de acertos e ocupação"""
+        with self._lock:
+            stats = dict(self._counters)
+            stats['entries'] = len(self._entries)
+            stats['maxsize'] = self.maxsize
+            stats['ttl'] = self.ttl
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        return stats
+
+
+# Instância global usada por /checkup-intelligent
+checkup_cache = ResponseCache()
+
+# Corpos do formato compacto por (chave clínica, codificação): ficam fora das
+# avaliações em cache, que são compartilhadas entre threads e não são alteradas
+compact_cache = ResponseCache(
+    maxsize=int(os.getenv('CHECKUP_COMPACT_CACHE_SIZE', str(min(1024, checkup_cache.maxsize)))))
@@ -0,0 +1,262 @@
+"""
+Motor de Regras do Check-up Inteligente
+
+Compila a tabela declarativa de config/checkup_rules.json uma única vez em
+índices por sexo e faixa etária. Em cada requisição apenas as regras aplicáveis
+são avaliadas e as recomendações são clonadas de registros imutáveis
+pré-construídos. A tabela é recompilada apenas quando o config_registry
+entrega um novo snapshot do arquivo.
+
+A avaliação completa (todas as etapas) consulta a tabela materializada em disco
+(src/utils/rule_table.py, compartilhada entre workers via mmap) e avalia na
+requisição apenas a sobreposição dinâmica: regras que dependem de exames e
+medicações (diabetes, HbA1c, metformina, HIV) ou que podem ser suprimidas.
+"""
+import threading
+from bisect import bisect_right
+from functools import lru_cache
+from pathlib import Path
+from types import MappingProxyType
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+from src.utils.config_registry import config_registry
+from src.utils.exam_catalog import exam_catalog
+from src.utils.rule_table import carregar as carregar_tabela, materializavel
+from src.utils.structured_log import get_logger
+
+log = get_logger(__name__)
+
+# Carregar configurações (snapshot compartilhado via config_registry)
+CONFIG_PATH = Path(__file__).resolve().parent.parent.parent / 'config' / 'checkup_rules.json'
+
+SEXOS = ('masculino', 'feminino')
+
+def load_rules():
+    """Carrega a tabela de regras do arquivo de configuração"""
+    try:
+        return config_registry.get(CONFIG_PATH)
+    except Exception as e:
+        log.error('config_carregamento_falhou', arquivo=str(CONFIG_PATH), erro=str(e))
+        return None
+
+
+class Rule:
+    """Regra compilada: condições pré-processadas e registro imutável"""
+
+    __slots__ = ('index', 'id', 'item_id', 'etapa', 'sexo', 'idade_minima', 'idade_maxima',
+                 'requer', 'exclui', 'suprimido_por', 'campos_dinamicos',
+                 'destino', 'registro', 'titulo_lc')
+
+    def __init__(self, index: int, raw: Dict, item_id: Optional[int] = None):
+        recomendacao = dict(raw['recomendacao'])
+        # Campos opcionais sempre presentes (evita 'undefined' no frontend)
+        if recomendacao.get('subtitulo') is None:
+            recomendacao['subtitulo'] = ''
+        if recomendacao.get('grau_evidencia') is None:
+            recomendacao['grau_evidencia'] = ''
+        # Id do item no catálogo canônico (deduplicação e classificação por inteiro)
+        if item_id is not None:
+            recomendacao['item_id'] = item_id
+
+        self.index = index
+        self.id = raw['id']
+        self.item_id = item_id
+        self.etapa = raw['etapa']
+        self.sexo = raw.get('sexo')
+        self.idade_minima = raw.get('idade_minima')
+        self.idade_maxima = raw.get('idade_maxima')
+        self.requer = frozenset(raw.get('requer', []))
+        self.exclui = frozenset(raw.get('exclui', []))
+        self.suprimido_por = frozenset()
+        self.campos_dinamicos = tuple(raw.get('campos_dinamicos', []))
+        self.destino = raw.get('destino', 'recommendations')
+        self.registro = MappingProxyType(recomendacao)
+        self.titulo_lc = (recomendacao.get('titulo') or '').strip().lower()
+
+    def matches_age(self, age: int) -> bool:
+        if self.idade_minima is not None and age < self.idade_minima:
+            return False
+        if self.idade_maxima is not None and age > self.idade_maxima:
+            return False
+        return True
+
+    def build(self, contexto: Optional[Dict] = None) -> Dict:
+        """Clona o registro imutável, preenchendo campos dinâmicos se houver"""
+        rec = dict(self.registro)
+        if self.campos_dinamicos:
+            contexto = contexto or {}
+            for campo in self.campos_dinamicos:
+                rec[campo] = rec[campo].format_map(contexto)
+        return rec
+
+
+class CompiledRules:
+    """Tabela de regras compilada com índices por sexo e faixa etária"""
+
+    def __init__(self, config: Dict):
+        self.version = config.get('version')
+        self.etapas = tuple(config.get('etapas', []))
+        ordem = {etapa: i for i, etapa in enumerate(self.etapas)}
+        raw_rules = sorted(config.get('rules', []), key=lambda r: ordem.get(r['etapa'], len(ordem)))
+        catalogo = exam_catalog.compiled
+        self.rules = tuple(Rule(i, raw, self._item_id(catalogo, raw)) for i, raw in enumerate(raw_rules))
+        self.flags = frozenset().union(*(r.requer | r.exclui for r in self.rules))
+
+        # Supressão por título ("já existe exame de X?") resolvida em tempo de compilação:
+        # cada regra guarda os índices das regras cujos títulos a suprimem.
+        for rule, raw in zip(self.rules, raw_rules):
+            termos = [t.lower() for t in raw.get('suprimir_se_titulo_contem', [])]
+            if termos:
+                rule.suprimido_por = frozenset(
+                    other.index for other in self.rules
+                    if other.index != rule.index and any(t in other.titulo_lc for t in termos)
+                )
+
+        # Faixas etárias delimitadas pelos limites declarados nas regras
+        limites = set()
+        for rule in self.rules:
+            if rule.idade_minima is not None:
+                limites.add(rule.idade_minima)
+            if rule.idade_maxima is not None:
+                limites.add(rule.idade_maxima + 1)
+        self.limites_idade = tuple(sorted(limites))
+        representantes = [self.limites_idade[0] - 1] + list(self.limites_idade) if self.limites_idade else [0]
+
+        # Índice (sexo, faixa etária) -> regras candidatas em ordem de saída
+        self.sexos = SEXOS + (None,)
+        self.indice: Dict[Tuple[Optional[str], int], Tuple[Rule, ...]] = {}
+        for sexo in self.sexos:
+            for faixa, idade in enumerate(representantes):
+                self.indice[(sexo, faixa)] = tuple(
+                    r for r in self.rules
+                    if (r.sexo is None or r.sexo == sexo) and r.matches_age(idade)
+                )
+
+        self._plano = lru_cache(maxsize=4096)(self._compilar_plano)
+
+        # Regras avaliadas na requisição (fora da tabela materializada)
+        self.sobreposicao = {
+            chave: tuple(r for r in regras if not materializavel(r))
+            for chave, regras in self.indice.items()
+        }
+        # Sem tabela (diretório sem escrita, arquivo corrompido) vale o plano memoizado
+        self.tabela = carregar_tabela(self) if self.rules else None
+
+    @staticmethod
+    def _item_id(catalogo, raw: Dict) -> Optional[int]:
+        """Id declarado na regra ('item') ou resolvido pelo título no catálogo"""
+        if raw.get('item') is not None:
+            return int(raw['item'])
+        item = catalogo.item(raw['recomendacao'])
+        return item.id if item is not None else None
+
+    def faixa_etaria(self, age: int) -> int:
+        return bisect_right(self.limites_idade, age)
+
+    def _compilar_plano(self, sexo: Optional[str], faixa: int, flags: FrozenSet[str],
+                        etapas: Optional[Tuple[str, ...]]) -> Tuple[Rule, ...]:
+        """Seleciona as regras que disparam para a chave (determinístico, memoizado)"""
+        emitidas = set()
+        plano = []
+        for rule in self.indice[(sexo, faixa)]:
+            if etapas is not None and rule.etapa not in etapas:
+                continue
+            if not rule.requer <= flags or rule.exclui & flags:
+                continue
+            if rule.suprimido_por and not rule.suprimido_por.isdisjoint(emitidas):
+                continue
+            emitidas.add(rule.index)
+            plano.append(rule)
+        return tuple(plano)
+
+    def _plano_materializado(self, sexo: Optional[str], faixa: int,
+                             flags: FrozenSet[str]) -> Tuple[Rule, ...]:
+        """Consulta na tabela materializada + sobreposição das regras dinâmicas"""
+        rules = self.rules
+        estaticas = self.tabela.indices(sexo, faixa, flags)
+        dinamicas = []
+        for rule in self.sobreposicao[(sexo, faixa)]:
+            if not rule.requer <= flags or rule.exclui & flags:
+                continue
+            # Só suprimem as regras emitidas antes desta (na tabela ou na sobreposição)
+            if rule.suprimido_por and any(
+                i < rule.index and (i in dinamicas or i in estaticas) for i in rule.suprimido_por
+            ):
+                continue
+            dinamicas.append(rule.index)
+        if not dinamicas:
+            return tuple(rules[i] for i in estaticas)
+        return tuple(rules[i] for i in sorted([*estaticas, *dinamicas]))
+
+    def plan(self, age: int, sex: str, flags: Iterable[str] = (),
+             etapas: Optional[Iterable[str]] = None) -> Tuple[Rule, ...]:
+        sexo = sex if sex in SEXOS else None
+        flags = frozenset(flags) & self.flags
+        if etapas is None and self.tabela is not None:
+            return self._plano_materializado(sexo, self.faixa_etaria(age), flags)
+        etapas = tuple(etapas) if etapas is not None else None
+        return self._plano(sexo, self.faixa_etaria(age), flags, etapas)
+
+    def evaluate(self, age: int, sex: str, flags: Iterable[str] = (),
+                 contexto: Optional[Dict] = None,
+                 etapas: Optional[Iterable[str]] = None) -> Dict[str, List[Dict]]:
+        """
+        Avalia as regras para um paciente
+
+        Args:
+            age: Idade do paciente
+            sex: Sexo do paciente ('masculino' ou 'feminino')
+            flags: Condições clínicas ativas (ex: 'hipertensao', 'diabetico', 'hiv')
+            contexto: Valores para os campos dinâmicos (ex: CD4, carga viral)
+            etapas: Restringe a avaliação às etapas informadas
+
+        Returns:
+            dict: {'recommendations': [...], 'outras_recomendacoes': [...]}
+        """
+        resultado = {'recommendations': [], 'outras_recomendacoes': []}
+        for rule in self.plan(age, sex, flags, etapas):
+            resultado[rule.destino].append(rule.build(contexto))
+        return resultado
+
+
+def compile_rules(config: Optional[Dict] = None) -> CompiledRules:
+    """Compila a tabela de regras (carregando do arquivo se não informada)"""
+    if config is None:
+        config = load_rules() or {}
+    return CompiledRules(config)
+
+
+class RuleEngine:
+    """Ponto de acesso às regras compiladas, recompilando quando o arquivo muda"""
+
+    def __init__(self):
+        self._config = None
+        self._compiled = None
+        self._lock = threading.Lock()
+
+    @property
+    def compiled(self) -> CompiledRules:
+        config = load_rules()
+        if config is None and self._compiled is not None:
+            # Manter a última tabela válida se o arquivo ficar indisponível
+            return self._compiled
+        if config is not self._config:
+            with self._lock:
+                if config is not self._config:
+                    self._compiled = CompiledRules(config or {})
+                    self._config = config
+        return self._compiled
+
+    @property
+    def version(self):
+        return self.compiled.version
+
+    def plan(self, *args, **kwargs) -> Tuple[Rule, ...]:
+        return self.compiled.plan(*args, **kwargs)
+
+    def evaluate(self, *args, **kwargs) -> Dict[str, List[Dict]]:
+        return self.compiled.evaluate(*args, **kwargs)
+
+
+# Instância global; a tabela é compilada na importação
+rule_engine = RuleEngine()
+rule_engine.compiled
@@ -0,0 +1,173 @@
+"""
+Tabela materializada das regras do check-up
+
+Boa parte da resposta depende só de um domínio pequeno e discreto: sexo, faixa
+etária (limites declarados nas regras) e algumas flags clínicas (gestante,
+hipertensão, hipertensão resistente, DPOC, elegibilidade para AAA e LDCT, risco
+cardiovascular elevado). Esta etapa de build enumera o domínio e grava, para
+cada combinação, a lista de índices das regras que disparam. O arquivo é
+mapeado em memória (mmap), então todos os workers compartilham as mesmas
+páginas; na requisição resta uma consulta e a sobreposição das regras que
+dependem de exames (diabetes, HIV) ou que podem ser suprimidas.
+
+O nome do arquivo traz a assinatura das regras compiladas: uma tabela de outra
+versão de config/checkup_rules.json nunca é usada. A tabela decide o que a
+aplicação recomenda, então fica em um diretório da aplicação (modo 0700, ao lado
+do banco) e só é aceita se os offsets e os índices forem coerentes com as regras
+compiladas; caso contrário vale o plano calculado em memória. Para gerar na
+implantação:
+
+    python -m src.utils.rule_table
+"""
+import hashlib
+import mmap
+import os
+import struct
+import sys
+from array import array
+from src.utils.private_storage import APP_DATA_DIR, abrir_privado, diretorio_privado
+from src.utils.structured_log import get_logger
+
+log = get_logger(__name__)
+
+# Flags enumeradas na tabela (as demais entram na sobreposição dinâmica)
+FLAGS_MATERIALIZADAS = ('gestante', 'hipertensao', 'hipertensao_resistente', 'dpoc',
+                        'elegivel_aaa', 'elegivel_ldct', 'risco_elevado')
+
+# Diretório das tabelas (padrão: src/database/rule_tables)
+RULES_TABLE_DIR = os.getenv('CHECKUP_RULES_TABLE_DIR') or os.path.join(APP_DATA_DIR, 'rule_tables')
+
+_MAGIC = b'EVRTBL01'
+# magic, assinatura, marcador de ordem dos bytes, sexos, faixas, flags, chaves
+_CABECALHO = struct.Struct('=8s32sIHHHI')
+_ORDEM_BYTES = 0x01020304
+
+
+def materializavel(rule) -> bool:
+    """Regra que depende apenas de sexo, idade e flags materializadas e nunca é suprimida"""
+    return (not rule.suprimido_por
+            and (rule.requer | rule.exclui) <= frozenset(FLAGS_MATERIALIZADAS))
+
+
+def assinatura(compiled) -> bytes:
+    """Hash das regras compiladas (tudo que altera o conteúdo da tabela)"""
+    partes = [FLAGS_MATERIALIZADAS, compiled.limites_idade, compiled.sexos]
+    for rule in compiled.rules:
+        partes.append((rule.index, rule.id, rule.etapa, rule.sexo, rule.idade_minima, rule.idade_maxima,
+                       sorted(rule.requer), sorted(rule.exclui), sorted(rule.suprimido_por)))
+    return hashlib.sha256(repr(partes).encode('utf-8')).digest()
+
+
+def caminho(compiled, diretorio=None) -> str:
+    return os.path.join(diretorio or RULES_TABLE_DIR, f'checkup_rules_{assinatura(compiled).hex()[:16]}.tbl')
+
+
+def construir(compiled) -> bytes:
+    """Enumera o domínio e serializa a tabela"""
+    n_faixas = len(compiled.limites_idade) + 1
+    n_flags = len(FLAGS_MATERIALIZADAS)
+    offsets = array('I', [0])
+    dados = array('H')
+    for sexo in compiled.sexos:
+        for faixa in range(n_faixas):
+            for bits in range(1 << n_flags):
+                flags = frozenset(f for i, f in enumerate(FLAGS_MATERIALIZADAS) if bits >> i & 1)
+                plano = compiled._compilar_plano(sexo, faixa, flags, None)
+                dados.extend(rule.index for rule in plano if materializavel(rule))
+                offsets.append(len(dados))
+    cabecalho = _CABECALHO.pack(_MAGIC, assinatura(compiled), _ORDEM_BYTES,
+                                len(compiled.sexos), n_faixas, n_flags, len(offsets) - 1)
+    return cabecalho + offsets.tobytes() + dados.tobytes()
+
+
+def gravar(compiled, path=None) -> str:
+    """Grava a tabela de forma atômica (outros processos nunca veem arquivo parcial)"""
+    path = path or caminho(compiled)
+    diretorio_privado(os.path.dirname(path))
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with abrir_privado(tmp_path) as f:
+        f.write(construir(compiled))
+    os.replace(tmp_path, path)
+    return path
+
+
+class RuleTable:
+    """Tabela mapeada em memória: (sexo, faixa, bits das flags) -> índices das regras"""
+
+    def __init__(self, path, compiled):
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.path = path
+        magic, sig, ordem, n_sexos, self.n_faixas, n_flags, n_chaves = \
+            _CABECALHO.unpack_from(self._mmap, 0)
+        if (magic != _MAGIC or ordem != _ORDEM_BYTES or sig != assinatura(compiled)
+                or n_sexos != len(compiled.sexos) or self.n_faixas != len(compiled.limites_idade) + 1
+                or n_flags != len(FLAGS_MATERIALIZADAS)
+                or n_chaves != n_sexos * self.n_faixas * (1 << n_flags)):
+            self._mmap.close()
+            raise ValueError(f'Tabela de regras incompatível: {path}')
+        self.n_flags = n_flags
+        inicio = _CABECALHO.size
+        fim = inicio + 4 * (n_chaves + 1)
+        if len(self._mmap) < fim or (len(self._mmap) - fim) % 2:
+            self._mmap.close()
+            raise ValueError(f'Tabela de regras truncada: {path}')
+        view = memoryview(self._mmap)
+        self._offsets = view[inicio:fim].cast('I')
+        self._dados = view[fim:].cast('H')
+        erro = self._validar(compiled)
+        if erro:
+            self._offsets.release()
+            self._dados.release()
+            view.release()
+            self._mmap.close()
+            raise ValueError(f'Tabela de regras inválida ({erro}): {path}')
+        self._bit = {flag: 1 << i for i, flag in enumerate(FLAGS_MATERIALIZADAS)}
+        self._sexo = {sexo: i for i, sexo in enumerate(compiled.sexos)}
+
+    def _validar(self, compiled):
+        """Motivo da rejeição, ou None se offsets e índices são coerentes com as regras compiladas"""
+        offsets = self._offsets
+        if offsets[0] != 0 or offsets[-1] != len(self._dados):
+            return 'offsets fora dos dados'
+        if any(a > b for a, b in zip(offsets, offsets[1:])):
+            return 'offsets fora de ordem'
+        # Só regras materializáveis (o que implica índice < len(compiled.rules))
+        validos = {rule.index for rule in compiled.rules if materializavel(rule)}
+        if not validos.issuperset(self._dados):
+            return 'índice de regra desconhecido'
+        return None
+
+    def bits(self, flags) -> int:
+        bit = self._bit
+        return sum(bit[f] for f in flags if f in bit)
+
+    def indices(self, sexo, faixa: int, flags):
+        """Índices das regras materializadas que disparam (em ordem de saída)"""
+        chave = (self._sexo[sexo] * self.n_faixas + faixa) << self.n_flags | self.bits(flags)
+        return self._dados[self._offsets[chave]:self._offsets[chave + 1]]
+
+    @property
+    def tamanho(self) -> int:
+        return len(self._mmap)
+
+
+def carregar(compiled, diretorio=None):
+    """Abre a tabela das regras compiladas, gerando o arquivo se ainda não existir"""
+    path = caminho(compiled, diretorio)
+    try:
+        # Diretório de outro usuário: a tabela poderia ter sido plantada
+        diretorio_privado(os.path.dirname(path))
+        if not os.path.exists(path):
+            gravar(compiled, path)
+        return RuleTable(path, compiled)
+    except (OSError, ValueError, struct.error) as e:
+        log.warning('tabela_regras_indisponivel', arquivo=path, erro=str(e))
+        return None
+
+
+if __name__ == '__main__':
+    from src.utils.rule_engine import rule_engine
+    compiled = rule_engine.compiled
+    path = gravar(compiled, caminho(compiled, sys.argv[1] if len(sys.argv) > 1 else None))
+    print(f"Tabela de regras gravada em {path} ({os.path.getsize(path)} bytes)")
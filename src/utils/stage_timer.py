@@ -0,0 +1,164 @@
+"""
+Cronômetros por etapa (cabeçalho Server-Timing e histogramas em memória)
+
+    with etapa('prevent'):
+        risco = calculate_prevent_risk(dados)
+
+Cada etapa medida durante uma requisição entra no cabeçalho Server-Timing da
+resposta (visível no DevTools do navegador) e no histograma da rota. Fora de
+uma requisição (workers de PDF) só o histograma é alimentado, sob a rota
+'background'. O custo é um perf_counter() por ponta e um incremento no bucket.
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from flask import g, has_request_context, request
+
+# Limites superiores dos buckets, em milissegundos (o último bucket é +Inf)
+BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# Rota usada para etapas medidas fora de uma requisição
+ROTA_BACKGROUND = 'background'
+
+# Cabeçalho Server-Timing nas respostas (histogramas continuam ativos sem ele)
+SERVER_TIMING_HEADER = os.getenv('SERVER_TIMING_HEADER', '1').lower() not in ('0', 'false', 'no')
+
+
+class Histograma:
+    """Contagens por bucket, soma e total de observações"""
+
+    __slots__ = ('limites', 'contagens', 'soma', 'total')
+
+    def __init__(self, limites=BUCKETS_MS):
+        self.limites = limites
+        self.contagens = [0] * (len(limites) + 1)
+        self.soma = 0.0
+        self.total = 0
+
+    def observar(self, valor: float):
+        self.contagens[bisect_left(self.limites, valor)] += 1
+        self.soma += valor
+        self.total += 1
+
+    def percentil(self, p: float):
+        """Limite superior do bucket que contém o percentil (None se vazio ou em +Inf)"""
+        if not self.total:
+            return None
+        alvo = p * self.total
+        acumulado = 0
+        for limite, contagem in zip(self.limites, self.contagens):
+            acumulado += contagem
+            if acumulado >= alvo:
+                return limite
+        return None
+
+
+class StageTimings:
+    """Histogramas por (rota, etapa), compartilhados por todas as threads"""
+
+    def __init__(self):
+        self._histogramas = {}
+        self._lock = threading.Lock()
+
+    def observe(self, rota: str, etapa: str, ms: float):
+        with self._lock:
+            histograma = self._histogramas.get((rota, etapa))
+            if histograma is None:
+                histograma = self._histogramas[(rota, etapa)] = Histograma()
+            histograma.observar(ms)
+
+    def snapshot(self):
+        """Cópia de {(rota, etapa): (contagens por bucket, soma, total)}"""
+        with self._lock:
+            return {
+                chave: (list(h.contagens), h.soma, h.total)
+                for chave, h in self._histogramas.items()
+            }
+
+    def clear(self):
+        with self._lock:
+            self._histogramas.clear()
+
+    def stats(self):
+        """Resumo por rota e etapa: total, média e percentis aproximados (ms)"""
+        with self._lock:
+            itens = sorted(self._histogramas.items())
+            resumo = {}
+            for (rota, nome), h in itens:
+                resumo.setdefault(rota, {})[nome] = {
+                    'count': h.total,
+                    'sum_ms': round(h.soma, 3),
+                    'mean_ms': round(h.soma / h.total, 3) if h.total else 0.0,
+                    'p50_ms': h.percentil(0.5),
+                    'p95_ms': h.percentil(0.95),
+                    'p99_ms': h.percentil(0.99),
+                }
+        return resumo
+
+
+# Instância global (histogramas do processo)
+stage_timings = StageTimings()
+
+
+def _rota_atual() -> str:
+    regra = request.url_rule
+    return regra.rule if regra is not None else request.path
+
+
+def registrar(nome: str, ms: float):
+    """Registra a duração de uma etapa (cabeçalho da requisição atual + histograma)"""
+    if has_request_context():
+        rota = _rota_atual()
+        etapas = g.get('_etapas')
+        if etapas is None:
+            etapas = g._etapas = []
+        etapas.append((nome, ms))
+    else:
+        rota = ROTA_BACKGROUND
+    stage_timings.observe(rota, nome, ms)
+
+
+@contextmanager
+def etapa(nome: str):
+    """Mede o bloco como uma etapa (registrada mesmo se o bloco lançar exceção)"""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        registrar(nome, (time.perf_counter() - inicio) * 1000)
+
+
+def server_timing(etapas) -> str:
+    """Valor do cabeçalho Server-Timing (etapas repetidas são somadas)"""
+    duracoes = {}
+    for nome, ms in etapas:
+        duracoes[nome] = duracoes.get(nome, 0.0) + ms
+    return ', '.join(f'{nome};dur={ms:.2f}' for nome, ms in duracoes.items())
+
+
+def register_server_timing(app):
+    """Inclui Server-Timing (etapas + total) nas respostas das rotas instrumentadas"""
+
+    @app.before_request
+    def _iniciar_cronometro():
+        g._inicio_requisicao = time.perf_counter()
+
+    @app.after_request
+    def _adicionar_server_timing(response):
+        etapas = g.get('_etapas')
+        if not etapas:
+            return response
+        inicio = g.get('_inicio_requisicao')
+        total = (time.perf_counter() - inicio) * 1000 if inicio is not None else None
+        if total is not None:
+            stage_timings.observe(_rota_atual(), 'total', total)
+        if SERVER_TIMING_HEADER:
+            valor = server_timing(etapas)
+            if total is not None:
+                valor += f', total;dur={total:.2f}'
+            response.headers['Server-Timing'] = valor
+        # Etapas medidas depois daqui (corpo em streaming) vão só para o histograma
+        g._etapas = None
+        return response
@@ -0,0 +1,148 @@
+"""
+Log estruturado e assíncrono
+
+    log = get_logger(__name__)
+    log.warning('pdf_cache_leitura_falhou', chave=key, erro=str(e))
+
+Cada chamada vira um registro com nome do evento e campos; a formatação (JSON
+em uma linha, ou texto com LOG_FORMAT=text) e a escrita no stdout acontecem em
+uma thread de fundo (QueueHandler + QueueListener). Na requisição resta
+enfileirar o registro.
+
+Variáveis:
+    LOG_LEVEL: nível mínimo (padrão INFO; DEBUG liga os logs do caminho quente)
+    LOG_FORMAT: json (padrão) ou text
+    LOG_SAMPLE_RATE: fração dos registros abaixo de WARNING mantidos (padrão 1)
+"""
+import atexit
+import datetime
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+from logging.handlers import QueueHandler, QueueListener
+
+RAIZ = 'evidens'
+
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'json').lower()
+LOG_SAMPLE_RATE = float(os.getenv('LOG_SAMPLE_RATE', '1'))
+
+
+class JSONFormatter(logging.Formatter):
+    """Uma linha JSON por registro: ts, nivel, logger, evento e campos"""
+
+    def format(self, record):
+        dados = {
+            'ts': datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(timespec='milliseconds'),
+            'nivel': record.levelname,
+            'logger': record.name,
+            'evento': record.getMessage(),
+        }
+        dados.update(getattr(record, 'campos', None) or {})
+        if record.exc_info:
+            dados['exc'] = self.formatException(record.exc_info)
+        return json.dumps(dados, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Texto legível para desenvolvimento local: nível, logger, evento e chave=valor"""
+
+    def format(self, record):
+        campos = getattr(record, 'campos', None) or {}
+        texto = f"{record.levelname} {record.name} {record.getMessage()}"
+        if campos:
+            texto += ' ' + ' '.join(f'{k}={v}' for k, v in campos.items())
+        if record.exc_info:
+            texto += '\n' + self.formatException(record.exc_info)
+        return texto
+
+
+class SamplingFilter(logging.Filter):
+    """Mantém uma fração dos registros abaixo de WARNING (avisos e erros nunca são descartados)"""
+
+    def __init__(self, taxa: float):
+        super().__init__()
+        self.taxa = taxa
+
+    def filter(self, record):
+        return record.levelno >= logging.WARNING or self.taxa >= 1 or random.random() < self.taxa
+
+
+class _FilaHandler(QueueHandler):
+    """Enfileira o registro sem formatar (a formatação fica com a thread de fundo)"""
+
+    def prepare(self, record):
+        return record
+
+    def emit(self, record):
+        # Após fork (gunicorn --preload) a thread de escrita não existe no filho
+        if _listener_pid != os.getpid():
+            _iniciar_listener()
+        super().emit(record)
+
+
+class StructuredLogger(logging.LoggerAdapter):
+    """Adapter que transforma argumentos nomeados em campos do registro"""
+
+    _RESERVADOS = ('exc_info', 'stack_info', 'stacklevel', 'extra')
+
+    def process(self, msg, kwargs):
+        campos = {k: kwargs.pop(k) for k in list(kwargs) if k not in self._RESERVADOS}
+        if campos:
+            extra = dict(kwargs.get('extra') or {})
+            extra['campos'] = campos
+            kwargs['extra'] = extra
+        return msg, kwargs
+
+
+_lock = threading.Lock()
+_listener = None
+_listener_pid = None
+_saida = None
+_fila = None
+
+
+def _iniciar_listener():
+    global _listener, _listener_pid
+    with _lock:
+        if _listener_pid == os.getpid():
+            return
+        _listener = QueueListener(_fila, _saida)
+        _listener.start()
+        _listener_pid = os.getpid()
+        # Esvaziar a fila na saída do processo
+        atexit.register(_listener.stop)
+
+
+def configure_logging():
+    """Configura o logger raiz do projeto (uma vez por processo)"""
+    global _saida, _fila
+    if _fila is not None:
+        return
+    with _lock:
+        if _fila is not None:
+            return
+        _saida = logging.StreamHandler(sys.stdout)
+        _saida.setFormatter(TextFormatter() if LOG_FORMAT == 'text' else JSONFormatter())
+
+        _fila = queue.SimpleQueue()
+        handler = _FilaHandler(_fila)
+        if LOG_SAMPLE_RATE < 1:
+            handler.addFilter(SamplingFilter(LOG_SAMPLE_RATE))
+
+        raiz = logging.getLogger(RAIZ)
+        raiz.setLevel(getattr(logging, LOG_LEVEL, logging.INFO))
+        raiz.addHandler(handler)
+        # Não duplicar no logger raiz do Python (ex.: handlers do gunicorn)
+        raiz.propagate = False
+    _iniciar_listener()
+
+
+def get_logger(nome: str) -> StructuredLogger:
+    """Logger do módulo (ex.: get_logger(__name__) -> evidens.utils.pdf_cache)"""
+    configure_logging()
+    return StructuredLogger(logging.getLogger(f"{RAIZ}.{nome.removeprefix('src.')}"), {})
@@ -0,0 +1,65 @@
+"""
+Ambiente Jinja2 compartilhado pelos geradores de documentos
+
+Os templates de src/templates são compilados uma única vez (com cache de
+bytecode em disco entre processos) e obtidos pelo nome. O Jinja carrega
+qualquer .cache encontrado no diretório do bytecode, por isso ele fica em
+APP_DATA_DIR com modo 0700 e dono verificado; se não puder ser privado, o
+cache de bytecode é desligado. O ambiente é
+sandboxed e escapa HTML automaticamente, já que os dados do paciente vão
+direto para o HTML renderizado pelo Chromium/WeasyPrint. Alterações nos
+arquivos só são recarregadas em modo de desenvolvimento.
+"""
+import os
+from pathlib import Path
+from jinja2 import FileSystemBytecodeCache, FileSystemLoader, select_autoescape
+from jinja2.sandbox import SandboxedEnvironment
+from src.utils.private_storage import APP_DATA_DIR, diretorio_privado
+from src.utils.structured_log import get_logger
+
+log = get_logger(__name__)
+
+TEMPLATES_DIR = Path(__file__).resolve().parent.parent / 'templates'
+
+# Recarregar templates alterados apenas em desenvolvimento
+TEMPLATES_AUTO_RELOAD = (
+    os.getenv('TEMPLATES_AUTO_RELOAD', '').lower() in ('1', 'true')
+    or os.getenv('FLASK_ENV') == 'development'
+    or os.getenv('FLASK_DEBUG', '').lower() in ('1', 'true')
+)
+
+def _bytecode_cache():
+    cache_dir = os.getenv('TEMPLATES_BYTECODE_DIR') or os.path.join(APP_DATA_DIR, 'jinja_cache')
+    try:
+        diretorio_privado(cache_dir)
+    except OSError as e:
+        log.warning('jinja_bytecode_cache_indisponivel', dir=cache_dir, erro=str(e))
+        return None
+    return FileSystemBytecodeCache(cache_dir)
+
+template_env = SandboxedEnvironment(
+    loader=FileSystemLoader(str(TEMPLATES_DIR)),
+    autoescape=select_autoescape(['html']),
+    auto_reload=TEMPLATES_AUTO_RELOAD,
+    bytecode_cache=_bytecode_cache(),
+    cache_size=-1
+)
+
+def get_template(name):
+    """Retorna o template compilado pelo nome (relativo a src/templates)"""
+    return template_env.get_template(name)
+
+def render_template(name, **context):
+    """Renderiza o template nomeado com o contexto informado"""
+    return template_env.get_template(name).render(**context)
+
+def preload_templates():
+    """Compila todos os templates na inicialização (fora do caminho das requisições)"""
+    carregados = []
+    for name in template_env.list_templates(extensions=['html']):
+        try:
+            template_env.get_template(name)
+            carregados.append(name)
+        except Exception as e:
+            log.error('template_precarga_falhou', template=name, erro=str(e))
+    return carregados
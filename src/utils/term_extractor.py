@@ -0,0 +1,178 @@
+"""
+Extração de medicamentos e condições em texto livre
+
+Os termos de config/clinical_terms.json são compilados em um único autômato de
+Aho-Corasick (sem acentos e sem diferenciar maiúsculas). Uma passada sobre o
+texto encontra todas as classes, então o custo da varredura não cresce com o
+tamanho do dicionário. Cada achado traz a classe, o termo do dicionário e a
+posição no texto original.
+"""
+import threading
+import unicodedata
+from pathlib import Path
+from typing import Dict, FrozenSet, List, NamedTuple, Optional, Tuple
+from src.utils.config_registry import config_registry
+from src.utils.structured_log import get_logger
+
+log = get_logger(__name__)
+
+# Carregar configurações (snapshot compartilhado via config_registry)
+CONFIG_PATH = Path(__file__).resolve().parent.parent.parent / 'config' / 'clinical_terms.json'
+
+# Tipos de classe do dicionário
+MEDICACAO = 'medicacao'
+CONDICAO = 'condicao'
+
+def load_terms():
+    """Carrega o dicionário de termos do arquivo de configuração"""
+    try:
+        return config_registry.get(CONFIG_PATH)
+    except Exception as e:
+        log.error('config_carregamento_falhou', arquivo=str(CONFIG_PATH), erro=str(e))
+        return None
+
+def _dobrar_caractere(c: str) -> str:
+    decomposto = unicodedata.normalize('NFKD', c)
+    return ''.join(x for x in decomposto if not unicodedata.combining(x)).lower()
+
+def dobrar(texto: str) -> Tuple[str, Optional[List[int]]]:
+    """
+    Texto sem acentos e em minúsculas, com a posição original de cada caractere
+
+    Returns:
+        (texto dobrado, posições no original; None quando as posições coincidem)
+    """
+    if texto.isascii():
+        return texto.lower(), None
+    partes = []
+    posicoes = []
+    for i, c in enumerate(texto):
+        dobrado = _dobrar_caractere(c)
+        partes.append(dobrado)
+        posicoes.extend([i] * len(dobrado))
+    return ''.join(partes), posicoes
+
+
+class Achado(NamedTuple):
+    """Termo encontrado no texto (inicio/fim no texto original)"""
+
+    classe: str
+    tipo: str
+    termo: str
+    inicio: int
+    fim: int
+
+
+class CompiledTerms:
+    """Autômato de Aho-Corasick com todos os termos do dicionário"""
+
+    def __init__(self, config: Dict):
+        self.version = config.get('version')
+        self.tipos: Dict[str, str] = {}
+
+        # Termo dobrado -> (grafia do dicionário, classes); um termo pode pertencer a várias classes
+        padroes: Dict[str, Tuple[str, List[str]]] = {}
+        for raw in config.get('classes', []):
+            classe = raw['id']
+            self.tipos[classe] = raw.get('tipo', CONDICAO)
+            for termo in raw.get('termos', []):
+                chave, _ = dobrar(termo)
+                if not chave:
+                    continue
+                _, classes = padroes.setdefault(chave, (termo, []))
+                if classe not in classes:
+                    classes.append(classe)
+
+        # Trie: transições por estado, saída = (tamanho, termo, classes) dos padrões que terminam no estado
+        self._goto: List[Dict[str, int]] = [{}]
+        saidas: List[List[Tuple[int, str, Tuple[str, ...]]]] = [[]]
+        for chave, (termo, classes) in padroes.items():
+            estado = 0
+            for c in chave:
+                proximo = self._goto[estado].get(c)
+                if proximo is None:
+                    proximo = len(self._goto)
+                    self._goto[estado][c] = proximo
+                    self._goto.append({})
+                    saidas.append([])
+                estado = proximo
+            saidas[estado].append((len(chave), termo, tuple(classes)))
+
+        # Links de falha em largura; a saída de cada estado inclui a do seu link de falha
+        self._falha = [0] * len(self._goto)
+        fila = list(self._goto[0].values())
+        for estado in fila:
+            for c, proximo in self._goto[estado].items():
+                fila.append(proximo)
+                falha = self._falha[estado]
+                while falha and c not in self._goto[falha]:
+                    falha = self._falha[falha]
+                destino = self._goto[falha].get(c, 0)
+                self._falha[proximo] = destino if destino != proximo else 0
+                saidas[proximo] = saidas[proximo] + saidas[self._falha[proximo]]
+        self._saidas = [tuple(s) for s in saidas]
+
+    def extrair(self, texto: str, tipo: Optional[str] = None) -> List[Achado]:
+        """Todos os termos do dicionário presentes no texto, em ordem de posição"""
+        if not texto:
+            return []
+        dobrado, posicoes = dobrar(texto)
+        goto, falha, saidas = self._goto, self._falha, self._saidas
+        achados = []
+        estado = 0
+        for i, c in enumerate(dobrado):
+            while estado and c not in goto[estado]:
+                estado = falha[estado]
+            estado = goto[estado].get(c, 0)
+            for tamanho, termo, classes in saidas[estado]:
+                inicio = i - tamanho + 1
+                if posicoes is not None:
+                    inicio, fim = posicoes[inicio], posicoes[i] + 1
+                else:
+                    fim = i + 1
+                for classe in classes:
+                    if tipo is None or self.tipos[classe] == tipo:
+                        achados.append(Achado(classe, self.tipos[classe], termo, inicio, fim))
+        achados.sort(key=lambda a: (a.inicio, a.fim))
+        return achados
+
+    def classes(self, texto: str, tipo: Optional[str] = None) -> FrozenSet[str]:
+        """Classes encontradas no texto"""
+        return frozenset(achado.classe for achado in self.extrair(texto, tipo))
+
+
+class TermExtractor:
+    """Ponto de acesso ao autômato compilado, recompilando quando o dicionário muda"""
+
+    def __init__(self):
+        self._config = None
+        self._compiled = None
+        self._lock = threading.Lock()
+
+    @property
+    def compiled(self) -> CompiledTerms:
+        config = load_terms()
+        if config is None and self._compiled is not None:
+            # Manter o último dicionário válido se o arquivo ficar indisponível
+            return self._compiled
+        if config is not self._config:
+            with self._lock:
+                if config is not self._config:
+                    self._compiled = CompiledTerms(config or {})
+                    self._config = config
+        return self._compiled
+
+    @property
+    def version(self):
+        return self.compiled.version
+
+    def extrair(self, texto: str, tipo: Optional[str] = None) -> List[Achado]:
+        return self.compiled.extrair(texto, tipo)
+
+    def classes(self, texto: str, tipo: Optional[str] = None) -> FrozenSet[str]:
+        return self.compiled.classes(texto, tipo)
+
+
+# Instância global; o autômato é compilado na importação
+term_extractor = TermExtractor()
+term_extractor.compiled
@@ -0,0 +1,137 @@
+"""
+Catálogo único de vacinas (administração, marcas e sinônimos)
+
+config/vaccine_catalog.json substitui as duas tabelas VACINAS_ADMINISTRACAO
+(receita em HTML e PDFs de prescrição). Os sinônimos de todas as vacinas são
+compilados em um autômato (term_extractor.CompiledTerms); o título é associado
+à primeira vacina, na ordem do catálogo, com algum sinônimo presente, e o
+resultado fica memoizado por título.
+"""
+import threading
+from functools import lru_cache
+from pathlib import Path
+from types import MappingProxyType
+from typing import Dict, Mapping, Optional
+from src.utils.config_registry import config_registry
+from src.utils.term_extractor import CompiledTerms
+from src.utils.structured_log import get_logger
+
+log = get_logger(__name__)
+
+# Carregar configurações (snapshot compartilhado via config_registry)
+CONFIG_PATH = Path(__file__).resolve().parent.parent.parent / 'config' / 'vaccine_catalog.json'
+
+# Usado quando o catálogo não conhece a vacina (ou não pôde ser carregado)
+ADMINISTRACAO_PADRAO = MappingProxyType({
+    "doses": "Conforme orientação médica",
+    "via": "Conforme bula",
+    "volume": "Conforme bula",
+    "intervalo": "Conforme orientação médica",
+    "detalhes": "Aplicar conforme orientação médica e bula do fabricante."
+})
+
+def load_vaccines():
+    """Carrega o catálogo de vacinas do arquivo de configuração"""
+    try:
+        return config_registry.get(CONFIG_PATH)
+    except Exception as e:
+        log.error('config_carregamento_falhou', arquivo=str(CONFIG_PATH), erro=str(e))
+        return None
+
+
+class Vacina:
+    """Vacina do catálogo"""
+
+    __slots__ = ('id', 'nome', 'administracao')
+
+    def __init__(self, raw: Dict):
+        self.id = raw['id']
+        self.nome = raw.get('nome', raw['id'])
+        self.administracao = raw.get('administracao') or ADMINISTRACAO_PADRAO
+
+
+class CompiledVaccines:
+    """Autômato dos sinônimos e índice invertido sinônimo -> vacinas"""
+
+    def __init__(self, config: Dict):
+        self.version = config.get('version')
+        self.padrao = config.get('fallback') or ADMINISTRACAO_PADRAO
+        self.vacinas = []
+
+        termos = {}
+        # Cada vacina: lista de grupos (todos os termos do grupo precisam aparecer)
+        self._grupos = []
+        self._por_termo: Dict[str, list] = {}
+        for indice, raw in enumerate(config.get('vacinas', [])):
+            self.vacinas.append(Vacina(raw))
+            grupos = []
+            for sinonimo in raw.get('sinonimos', []):
+                grupo = [sinonimo] if isinstance(sinonimo, str) else list(sinonimo)
+                ids = frozenset(termos.setdefault(t, str(len(termos))) for t in grupo if t)
+                if ids:
+                    grupos.append(ids)
+                    for id_termo in ids:
+                        self._por_termo.setdefault(id_termo, set()).add(indice)
+            self._grupos.append(grupos)
+
+        self._automato = CompiledTerms({'classes': [
+            {'id': id_termo, 'termos': [termo]} for termo, id_termo in termos.items()
+        ]})
+        self.vacina = lru_cache(maxsize=1024)(self._vacina)
+
+    def _vacina(self, titulo: str) -> Optional[Vacina]:
+        """Primeira vacina do catálogo com algum sinônimo no título"""
+        # Só termos que começam uma palavra ('dt' não casa dentro de 'adulto')
+        presentes = frozenset(
+            achado.classe for achado in self._automato.extrair(titulo)
+            if achado.inicio == 0 or not titulo[achado.inicio - 1].isalnum()
+        )
+        candidatas = set()
+        for id_termo in presentes:
+            candidatas.update(self._por_termo.get(id_termo, ()))
+        for indice in sorted(candidatas):
+            if any(grupo <= presentes for grupo in self._grupos[indice]):
+                return self.vacinas[indice]
+        return None
+
+    def administracao(self, titulo: str) -> Mapping:
+        vacina = self.vacina(titulo or '')
+        return vacina.administracao if vacina is not None else self.padrao
+
+
+class VaccineCatalog:
+    """Ponto de acesso ao catálogo compilado, recompilando quando o arquivo muda"""
+
+    def __init__(self):
+        self._config = None
+        self._compiled = None
+        self._lock = threading.Lock()
+
+    @property
+    def compiled(self) -> CompiledVaccines:
+        config = load_vaccines()
+        if config is None and self._compiled is not None:
+            # Manter o último catálogo válido se o arquivo ficar indisponível
+            return self._compiled
+        if config is not self._config:
+            with self._lock:
+                if config is not self._config:
+                    self._compiled = CompiledVaccines(config or {})
+                    self._config = config
+        return self._compiled
+
+    @property
+    def version(self):
+        return self.compiled.version
+
+    def vacina(self, titulo: str) -> Optional[Vacina]:
+        return self.compiled.vacina(titulo or '')
+
+    def administracao(self, titulo: str) -> Mapping:
+        """Doses, via, volume, intervalo e detalhes de administração da vacina"""
+        return self.compiled.administracao(titulo)
+
+
+# Instância global; o catálogo é compilado na importação
+vaccine_catalog = VaccineCatalog()
+vaccine_catalog.compiled